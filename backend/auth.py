@@ -1,5 +1,8 @@
+import time
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -26,6 +29,20 @@ if not SECRET_KEY or SECRET_KEY == "your-secret-key-change-this":
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Resolução do usuário autenticado (principal) a cada requisição:
+# - "db": consulta o usuário no banco em toda requisição.
+# - "cache" (padrão): cache em memória por (sub, tenant_id, iat do token), com
+#   validade curta e tamanho limitado; invalidado quando o usuário é alterado
+#   ou removido (invalidate_user). Com várias instâncias, cada uma só invalida
+#   o próprio cache: a validade curta limita o tempo de dados desatualizados.
+# - "token": tokens com as claims role/uid/name dispensam o banco (validação
+#   pura do JWT); alterações de papel só valem após o token expirar. Tokens
+#   sem essas claims seguem o modo "cache".
+AUTH_PRINCIPAL_MODE = os.getenv("AUTH_PRINCIPAL_MODE", "cache")
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1000"))
+
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
@@ -44,75 +61,147 @@ def get_password_hash(password: str) -> str:
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Cria token JWT com tenant_id"""
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_claims(user: models.User) -> dict:
+    """Claims do token de acesso de um usuário (permitem a validação pura no modo "token")."""
+    return {
+        "sub": user.email,
+        "tenant_id": user.tenant_id,
+        "role": user.role,
+        "uid": user.id,
+        "name": user.name,
+    }
+
+# --- PRINCIPAL CACHE ---
+
+PrincipalKey = Tuple[str, int, Any]
+
+class PrincipalCache:
+    """LRU em memória de usuários autenticados (snapshots schemas.User), com validade."""
+
+    def __init__(self, ttl: int = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[PrincipalKey, Tuple[float, schemas.User]]" = OrderedDict()
+        self._lock = threading.Lock() # Dependências síncronas rodam no threadpool
+
+    def get(self, key: PrincipalKey) -> Optional[schemas.User]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def set(self, key: PrincipalKey, principal: schemas.User):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for key in [k for k, (_, principal) in self._entries.items() if principal.id == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Instância única por processo.
+principal_cache = PrincipalCache()
+
+def invalidate_user(user_id: int):
+    """Descarta o usuário do cache de autenticação (chamar ao alterar ou remover um usuário)."""
+    principal_cache.invalidate_user(user_id)
+
 # --- AUTHENTICATION ---
 
 def authenticate_user(db: Session, email: str, password: str):
     """Autentica usuário e retorna com tenant_id"""
-    print(f"DEBUG LOGIN: Tentando autenticar {email}")
     user = db.query(models.User).filter(models.User.email == email).first()
     if not user:
-        print("DEBUG LOGIN: Usuário não encontrado no banco.")
         return False
-    
-    print(f"DEBUG LOGIN: Usuário encontrado (ID: {user.id}). Verificando senha...")
     if not verify_password(password, user.hashed_password):
-        print("DEBUG LOGIN: Senha incorreta.")
-        print(f"DEBUG LOGIN: Hash no banco: {user.hashed_password[:10]}...")
-        # Debug: check if verify works with manual hash
-        # print(f"DEBUG LOGIN: Test verify: {pwd_context.verify(password, user.hashed_password)}")
         return False
-        
-    print("DEBUG LOGIN: Senha correta.")
     return user
 
+def _principal_from_claims(payload: dict) -> Optional[schemas.User]:
+    # Modo "token": usuário montado só com as claims, sem consultar o banco.
+    if payload.get("role") is None or payload.get("uid") is None or payload.get("name") is None:
+        return None
+    try:
+        return schemas.User(
+            id=payload["uid"],
+            email=payload["sub"],
+            name=payload["name"],
+            role=payload["role"],
+            tenant_id=payload["tenant_id"],
+        )
+    except ValueError:
+        return None
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
-    """Obtém usuário atual a partir do token (com validação de tenant)"""
+    """
+    Obtém usuário atual a partir do token (com validação de tenant).
+    Retorna um snapshot schemas.User (ver AUTH_PRINCIPAL_MODE para cache e validação pura do token).
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    print(f"DEBUG AUTH: Verifying token: {token[:10]}...")
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         tenant_id: int = payload.get("tenant_id")  # NOVO: Extrair tenant_id
-        print(f"DEBUG AUTH: Payload decoded. Email: {email}, Tenant: {tenant_id}")
         if email is None or tenant_id is None:
-            print("DEBUG AUTH: Email or tenant_id is None")
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
-    except JWTError as e:
-        print(f"DEBUG AUTH: JWTError: {str(e)}")
+    except JWTError:
         raise credentials_exception
-    
+
+    if AUTH_PRINCIPAL_MODE == "token":
+        principal = _principal_from_claims(payload)
+        if principal is not None:
+            return principal
+
+    # Tokens antigos sem iat: exp também identifica a emissão.
+    key = (email, tenant_id, payload.get("iat") or payload.get("exp"))
+    if AUTH_PRINCIPAL_MODE != "db":
+        principal = principal_cache.get(key)
+        if principal is not None:
+            return principal
+
     # NOVO: Validar que o usuário pertence ao tenant do token
     user = db.query(models.User).filter(
-        models.User.email == token_data.email,
+        models.User.email == email,
         models.User.tenant_id == tenant_id
     ).first()
-    
     if user is None:
-        print(f"DEBUG AUTH: User not found for email {token_data.email} and tenant {tenant_id}")
         raise credentials_exception
-    
-    print("DEBUG AUTH: User authenticated successfully")
-    # Armazenar tenant_id no objeto user para fácil acesso
-    user.current_tenant_id = tenant_id
-    return user
 
-def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+    principal = schemas.User.model_validate(user)
+    if AUTH_PRINCIPAL_MODE != "db":
+        principal_cache.set(key, principal)
+    return principal
+
+def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
     """Verifica se usuário está ativo e define contexto"""
     context.set_tenant_id(current_user.tenant_id)
     return current_user
@@ -121,7 +210,7 @@ def get_current_active_user(current_user: models.User = Depends(get_current_user
 
 def require_role(allowed_roles: list):
     """Decorator para verificar permissões por role"""
-    def role_checker(current_user: models.User = Depends(get_current_active_user)):
+    def role_checker(current_user: schemas.User = Depends(get_current_active_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -5,14 +5,88 @@ uma operação específica em um modelo SQLAlchemy, utilizando uma sessão de ba
 """
 
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import desc, or_, and_, insert, func, case, literal
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Dict, Any
+import base64
+import json
 
 from backend import models
 from backend import schemas
 from backend.auth import get_password_hash
-from backend.security import encrypt_value, decrypt_value # Importa funções de criptografia
+from backend.security import encrypt_value # Importa a função de criptografia
+from backend.services import company_info_cache, dashboard_service
+
+# --- PAGINATION HELPERS ---
+# Paginação por cursor (keyset): o cliente recebe um token opaco com os valores
+# da última linha da página e a próxima consulta continua a partir dela,
+# sem OFFSET (custo constante independentemente da página).
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Codifica os valores da chave de ordenação da última linha em um cursor opaco.
+    Datas são serializadas em ISO 8601.
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decodifica um cursor gerado por encode_cursor.
+    Levanta ValueError se o cursor for inválido.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise ValueError("Cursor inválido")
+    if not isinstance(values, list):
+        raise ValueError("Cursor inválido")
+    return values
+
+# --- OPTIMISTIC CONCURRENCY ---
+# Peças e OS têm uma coluna de versão (version_id_col, ver models.Part): o ETag
+# das rotas é a versão da linha e o If-Match das alterações é conferido contra ela.
+
+def etag(version: Optional[int]) -> str:
+    """ETag de uma versão de registro."""
+    return f'"{version}"'
+
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    """
+    Versão esperada do cabeçalho If-Match ('"3"' ou 'W/"3"'); None se ausente ou '*'.
+    Levanta ValueError se o cabeçalho for inválido.
+    """
+    if value is None or value.strip() == "*":
+        return None
+    tag = value.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise ValueError("If-Match inválido")
+
+def _check_version(db_obj, expected_version: Optional[int]):
+    """
+    Levanta StaleDataError se o registro não estiver na versão esperada. Se
+    estiver, o UPDATE do ORM ainda confere a mesma versão no banco (WHERE version = ...).
+    """
+    if expected_version is not None and db_obj.version != expected_version:
+        raise StaleDataError(f"{type(db_obj).__name__} {db_obj.id}: versão {db_obj.version}, esperada {expected_version}")
+
+# --- COMMIT ---
+# Funções de escrita com commit=False gravam apenas com flush e deixam o commit
+# para o caller: a rota grava o evento do webhook (webhook_outbox.publish) na
+# mesma transação da alteração e faz um único commit.
+
+def _save(db: Session, instance, commit: bool = True):
+    """Commit e refresh de `instance`; com commit=False, apenas flush."""
+    if commit:
+        db.commit()
+        db.refresh(instance)
+    else:
+        db.flush()
 
 # --- USER CRUD ---
 # Funções para operações CRUD na tabela de usuários (models.User).
@@ -123,24 +197,24 @@ def get_client_by_phone(db: Session, phone: str, tenant_id: int):
         models.Client.tenant_id == tenant_id
     ).first()
 
-def create_client(db: Session, client: schemas.ClientCreate, tenant_id: int):
+def create_client(db: Session, client: schemas.ClientCreate, tenant_id: int, commit: bool = True):
     """
     Cria um novo cliente no banco de dados.
     Args:
         db (Session): Sessão do banco de dados.
         client (schemas.ClientCreate): Dados do cliente para criação.
         tenant_id (int): ID do tenant.
+        commit (bool): Se False, apenas flush (o caller faz o commit).
     Returns:
         models.Client: O objeto cliente recém-criado.
     """
     client_data = client.model_dump()
     db_client = models.Client(**client_data, tenant_id=tenant_id)
     db.add(db_client)
-    db.commit()
-    db.refresh(db_client)
+    _save(db, db_client, commit)
     return db_client
 
-def update_client(db: Session, client_id: int, client_update: schemas.ClientUpdate):
+def update_client(db: Session, client_id: int, client_update: schemas.ClientUpdate, commit: bool = True):
     """
     Atualiza um cliente existente.
     """
@@ -153,8 +227,7 @@ def update_client(db: Session, client_id: int, client_update: schemas.ClientUpda
         setattr(db_client, key, value)
     
     db.add(db_client)
-    db.commit()
-    db.refresh(db_client)
+    _save(db, db_client, commit)
     return db_client
 
 def delete_client(db: Session, client_id: int):
@@ -248,7 +321,7 @@ def get_boat(db: Session, boat_id: int):
     """
     return db.query(models.Boat).filter(models.Boat.id == boat_id).first()
 
-def create_boat(db: Session, boat: schemas.BoatCreate, tenant_id: int):
+def create_boat(db: Session, boat: schemas.BoatCreate, tenant_id: int, commit: bool = True):
     """
     Cria uma nova embarcação no banco de dados.
     """
@@ -259,27 +332,24 @@ def create_boat(db: Session, boat: schemas.BoatCreate, tenant_id: int):
     # Cria a embarcação com o tenant_id
     db_boat = models.Boat(**boat_data, tenant_id=tenant_id)
     db.add(db_boat)
-    db.commit()
-    db.refresh(db_boat)
+    db.flush() # Gera o ID da embarcação para os motores.
     
     # Cria os motores associados, se houver.
     for engine_data in engines_data:
         db_engine = models.Engine(**engine_data, boat_id=db_boat.id, tenant_id=tenant_id)
         db.add(db_engine)
     
-    if engines_data:
-        db.commit()
-        db.refresh(db_boat)
-        
+    _save(db, db_boat, commit)
     return db_boat
 
-def update_boat(db: Session, boat_id: int, boat_update: schemas.BoatUpdate):
+def update_boat(db: Session, boat_id: int, boat_update: schemas.BoatUpdate, commit: bool = True):
     """
     Atualiza os dados de uma embarcação e sincroniza seus motores.
     Args:
         db (Session): Sessão do banco de dados.
         boat_id (int): ID da embarcação a ser atualizada.
         boat_update (schemas.BoatUpdate): Dados de atualização da embarcação e lista de motores.
+        commit (bool): Se False, apenas flush (o caller faz o commit).
     Returns:
         models.Boat: O objeto embarcação atualizado, ou None se não encontrada.
     """
@@ -313,8 +383,7 @@ def update_boat(db: Session, boat_id: int, boat_update: schemas.BoatUpdate):
                 new_engine = models.Engine(**engine_data.model_dump(exclude={'id'}), boat_id=db_boat.id)
                 db.add(new_engine)
 
-    db.commit()
-    db.refresh(db_boat)
+    _save(db, db_boat, commit)
     return db_boat
 
 def delete_boat(db: Session, boat_id: int):
@@ -338,16 +407,59 @@ def delete_boat(db: Session, boat_id: int):
 # --- PART CRUD ---
 # Funções para operações CRUD na tabela de peças (models.Part).
 
-def get_parts(db: Session, tenant_id: int):
-    """
-    Retorna uma lista de todas as peças de um tenant.
+def get_parts(
+    db: Session,
+    tenant_id: int,
+    sku: Optional[str] = None,
+    barcode: Optional[str] = None,
+    group: Optional[str] = None,
+    subgroup: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    low_stock: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """
+    Retorna as peças de um tenant ordenadas por (name, id), com filtros opcionais.
+    Os filtros usam os índices compostos (tenant_id, ...) de models.Part.
     Args:
         db (Session): Sessão do banco de dados.
         tenant_id (int): ID do tenant.
+        sku, barcode, group, subgroup, manufacturer (Optional[str]): Filtros por igualdade.
+        low_stock (Optional[bool]): True para peças com quantity <= min_stock, False para as demais.
+        cursor (Optional[str]): Cursor retornado pela página anterior (ver encode_cursor).
+        limit (Optional[int]): Tamanho da página. Sem limite, retorna todas as peças.
     Returns:
-        List[models.Part]: Lista de objetos peça.
-    """
-    return db.query(models.Part).filter(models.Part.tenant_id == tenant_id).all()
+        List[models.Part]: Lista de objetos peça. Com `limit`, retorna até limit + 1 linhas;
+        a linha extra indica que existe uma próxima página.
+    """
+    query = db.query(models.Part).filter(models.Part.tenant_id == tenant_id)
+    if sku:
+        query = query.filter(models.Part.sku == sku)
+    if barcode:
+        query = query.filter(models.Part.barcode == barcode)
+    if group:
+        query = query.filter(models.Part.group == group)
+    if subgroup:
+        query = query.filter(models.Part.subgroup == subgroup)
+    if manufacturer:
+        query = query.filter(models.Part.manufacturer == manufacturer)
+    if low_stock is True:
+        query = query.filter(models.Part.quantity <= models.Part.min_stock)
+    elif low_stock is False:
+        query = query.filter(models.Part.quantity > models.Part.min_stock)
+
+    if cursor:
+        last_name, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            models.Part.name > last_name,
+            and_(models.Part.name == last_name, models.Part.id > last_id)
+        ))
+
+    query = query.order_by(models.Part.name, models.Part.id)
+    if limit:
+        query = query.limit(limit + 1)
+    return query.all()
 
 def get_part(db: Session, part_id: int):
     """
@@ -371,38 +483,72 @@ def get_part_by_sku(db: Session, sku: str):
     """
     return db.query(models.Part).filter(models.Part.sku == sku).first()
 
-def create_part(db: Session, part: schemas.PartCreate, tenant_id: int):
+def create_part(db: Session, part: schemas.PartCreate, tenant_id: int, commit: bool = True):
     """
     Cria uma nova peça no inventário.
     """
     db_part = models.Part(**part.model_dump(), tenant_id=tenant_id)
     db.add(db_part)
-    db.commit()
-    db.refresh(db_part)
+    _save(db, db_part, commit)
     return db_part
 
-def update_part(db: Session, part_id: int, part_update: schemas.PartUpdate):
+def update_part(db: Session, part_id: int, part_update: schemas.PartUpdate, expected_version: Optional[int] = None, commit: bool = True):
     """
     Atualiza os dados de uma peça.
     Args:
         db (Session): Sessão do banco de dados.
         part_id (int): ID da peça a ser atualizada.
         part_update (schemas.PartUpdate): Dados de atualização da peça.
+        expected_version (Optional[int]): Versão lida pelo cliente (If-Match).
+        commit (bool): Se False, apenas flush (o caller faz o commit).
     Returns:
         models.Part: O objeto peça atualizado, ou None se não encontrada.
+    Raises:
+        StaleDataError: A peça não está na versão esperada ou foi alterada ao mesmo tempo.
     """
     db_part = get_part(db, part_id)
     if not db_part:
         return None
+    _check_version(db_part, expected_version)
     
     update_data = part_update.model_dump(exclude_unset=True) # Obtém apenas os campos que foram definidos no schema de atualização.
     for key, value in update_data.items():
         setattr(db_part, key, value) # Atualiza os atributos do objeto do banco de dados.
     
-    db.commit()
-    db.refresh(db_part)
+    _save(db, db_part, commit)
     return db_part
 
+def adjust_part_quantities(
+    db: Session,
+    tenant_id: int,
+    deltas: Dict[int, float],
+    floor_zero: bool = False,
+    require_stock: bool = False,
+) -> int:
+    """
+    Soma a cada peça a sua quantidade em `deltas` (part_id -> quantidade com
+    sinal) com um único UPDATE ... SET quantity = quantity + CASE id ... END,
+    version = version + 1. O cálculo é feito no banco sobre o valor atual da
+    linha: escritas simultâneas não perdem a alteração uma da outra, sem ler
+    nem bloquear as peças antes. Não faz commit.
+    Args:
+        floor_zero (bool): A quantidade resultante não fica negativa.
+        require_stock (bool): Só altera as peças cujo estoque cobre a saída.
+    Returns:
+        int: Quantidade de peças alteradas (menor que len(deltas) se alguma
+            peça não existir no tenant ou, com require_stock, faltar estoque).
+    """
+    if not deltas:
+        return 0
+    part = models.Part
+    new_quantity = func.coalesce(part.quantity, 0) + case(deltas, value=part.id, else_=0.0)
+    query = db.query(part).filter(part.tenant_id == tenant_id, part.id.in_(list(deltas)))
+    if require_stock:
+        query = query.filter(new_quantity >= 0)
+    if floor_zero:
+        new_quantity = case((new_quantity < 0, 0.0), else_=new_quantity)
+    return query.update({part.quantity: new_quantity, part.version: part.version + 1}, synchronize_session=False)
+
 def delete_part(db: Session, part_id: int):
     """
     Deleta uma peça do estoque.
@@ -442,6 +588,110 @@ def get_orders(db: Session, tenant_id: int, status: Optional[str] = None):
         query = query.filter(models.ServiceOrder.status == status)
     return query.all()
 
+ORDER_SUMMARY_COLUMNS = (
+    models.ServiceOrder.id,
+    models.ServiceOrder.boat_id,
+    models.ServiceOrder.engine_id,
+    models.ServiceOrder.description,
+    models.ServiceOrder.diagnosis,
+    models.ServiceOrder.status,
+    func.coalesce(models.ServiceOrder.total_value, 0).label("total_value"),
+    models.ServiceOrder.created_at,
+    models.ServiceOrder.requester,
+    models.ServiceOrder.technician_name,
+    models.ServiceOrder.technician_id,
+    models.ServiceOrder.scheduled_at,
+    models.ServiceOrder.estimated_duration,
+    models.Boat.name.label("boat_name"),
+    models.Client.name.label("client_name"),
+    models.Client.phone.label("client_phone"),
+    models.Client.email.label("client_email"),
+    models.Client.telegram_id.label("client_telegram_id"),
+)
+ORDER_SUMMARY_INCLUDES = {"items", "notes"}
+
+def get_order_summaries(
+    db: Session,
+    tenant_id: int,
+    status: Optional[str] = None,
+    technician_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    include: Optional[set] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Retorna a projeção resumida (schemas.ServiceOrderSummary) das ordens de serviço de um tenant,
+    das mais recentes para as mais antigas, ordenadas por (created_at, id).
+    Consulta só as colunas da listagem (com barco e cliente via LEFT JOIN; o checklist
+    fica de fora e só vem em get_order); itens e notas vêm de uma consulta IN cada,
+    apenas se pedidos em `include`. Apoiada pelos índices (tenant_id, status, created_at)
+    e (tenant_id, created_at, id) de models.ServiceOrder.
+    Args:
+        db (Session): Sessão do banco de dados.
+        tenant_id (int): ID do tenant.
+        status (Optional[str]): Status da OS para filtrar.
+        technician_id (Optional[int]): ID do técnico associado.
+        created_from, created_to (Optional[datetime]): Intervalo da data de criação (inclusivo).
+        include (Optional[set]): Relacionamentos a incluir ("items", "notes").
+        cursor (Optional[str]): Cursor retornado pela página anterior (ver encode_cursor).
+        limit (Optional[int]): Tamanho da página. Sem limite, retorna todas as OS.
+    Returns:
+        List[dict]: Uma entrada por OS. Com `limit`, retorna até limit + 1 linhas;
+        a linha extra indica que existe uma próxima página.
+    """
+    query = db.query(*ORDER_SUMMARY_COLUMNS).select_from(models.ServiceOrder).outerjoin(
+        models.Boat, models.ServiceOrder.boat_id == models.Boat.id
+    ).outerjoin(
+        models.Client, models.Boat.client_id == models.Client.id
+    ).filter(models.ServiceOrder.tenant_id == tenant_id)
+    if status:
+        query = query.filter(models.ServiceOrder.status == status)
+    if technician_id:
+        query = query.filter(models.ServiceOrder.technician_id == technician_id)
+    if created_from:
+        query = query.filter(models.ServiceOrder.created_at >= created_from)
+    if created_to:
+        query = query.filter(models.ServiceOrder.created_at <= created_to)
+
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor)
+        try:
+            last_created_at = datetime.fromisoformat(last_created_at)
+        except (TypeError, ValueError):
+            raise ValueError("Cursor inválido")
+        query = query.filter(or_(
+            models.ServiceOrder.created_at < last_created_at,
+            and_(models.ServiceOrder.created_at == last_created_at, models.ServiceOrder.id < last_id)
+        ))
+
+    query = query.order_by(desc(models.ServiceOrder.created_at), desc(models.ServiceOrder.id))
+    if limit:
+        query = query.limit(limit + 1)
+    orders = [dict(row._mapping) for row in query.all()]
+
+    include = include or set()
+    if orders and include:
+        by_id = {order["id"]: order for order in orders}
+        if "items" in include:
+            for order in orders:
+                order["items"] = []
+            items = db.query(models.ServiceItem).filter(
+                models.ServiceItem.order_id.in_(list(by_id))
+            ).order_by(models.ServiceItem.id).all()
+            for item in items:
+                by_id[item.order_id]["items"].append(item)
+        if "notes" in include:
+            for order in orders:
+                order["notes"] = []
+            notes = db.query(models.OrderNote).filter(
+                models.OrderNote.order_id.in_(list(by_id))
+            ).order_by(models.OrderNote.created_at, models.OrderNote.id).all()
+            for note in notes:
+                by_id[note.order_id]["notes"].append(note)
+    return orders
+
 def get_order(db: Session, order_id: int):
     """
     Busca uma ordem de serviço pelo ID.
@@ -459,118 +709,221 @@ def get_order(db: Session, order_id: int):
         joinedload(models.ServiceOrder.boat).joinedload(models.Boat.owner)
     ).filter(models.ServiceOrder.id == order_id).first()
 
-def create_order(db: Session, order: schemas.ServiceOrderCreate, tenant_id: int):
+def create_order(db: Session, order: schemas.ServiceOrderCreate, tenant_id: int, commit: bool = True):
     """
     Cria uma nova ordem de serviço.
     """
     db_order = models.ServiceOrder(**order.model_dump(), tenant_id=tenant_id)
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    _save(db, db_order, commit)
     return db_order
 
-def update_order(db: Session, order_id: int, order_update: schemas.ServiceOrderUpdate):
+def update_order(db: Session, order_id: int, order_update: schemas.ServiceOrderUpdate, expected_version: Optional[int] = None, commit: bool = True):
     """
     Atualiza os dados de uma ordem de serviço.
     Args:
         db (Session): Sessão do banco de dados.
         order_id (int): ID da ordem de serviço a ser atualizada.
         order_update (schemas.ServiceOrderUpdate): Dados de atualização da ordem de serviço.
+        expected_version (Optional[int]): Versão lida pelo cliente (If-Match).
+        commit (bool): Se False, apenas flush (o caller faz o commit).
     Returns:
         models.ServiceOrder: O objeto ordem de serviço atualizado, ou None se não encontrada.
+    Raises:
+        StaleDataError: A OS não está na versão esperada ou foi alterada ao mesmo tempo.
     """
     db_order = get_order(db, order_id)
     if not db_order:
         return None
+    _check_version(db_order, expected_version)
     
     update_data = order_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_order, key, value)
     
-    db.commit()
-    db.refresh(db_order)
+    _save(db, db_order, commit)
     return db_order
 
-def add_order_item(db: Session, order_id: int, item: schemas.ServiceItemCreate):
+def _bump_order_total(db: Session, order_id: int, tenant_id: int, delta: float) -> bool:
+    """
+    Soma `delta` ao total da OS no próprio banco (UPDATE ... SET total_value = total_value + :delta)
+    e incrementa a versão da OS. Atômico mesmo com itens alterados ao mesmo tempo,
+    e também bloqueia a linha da OS até o commit. Não faz commit.
+    Returns:
+        bool: False se a OS não existir no tenant.
+    """
+    updated = db.query(models.ServiceOrder).filter(
+        models.ServiceOrder.id == order_id,
+        models.ServiceOrder.tenant_id == tenant_id
+    ).update(
+        {
+            models.ServiceOrder.total_value: func.coalesce(models.ServiceOrder.total_value, 0) + delta,
+            models.ServiceOrder.version: models.ServiceOrder.version + 1,
+        },
+        synchronize_session=False
+    )
+    return updated == 1
+
+def _lock_order_item(db: Session, order_id: int, item_id: int, tenant_id: int):
+    """Busca o item da OS (do tenant) com bloqueio de linha, para calcular a diferença do total."""
+    return db.query(models.ServiceItem).join(models.ServiceOrder).filter(
+        models.ServiceItem.id == item_id,
+        models.ServiceItem.order_id == order_id,
+        models.ServiceOrder.tenant_id == tenant_id
+    ).with_for_update(of=models.ServiceItem).first()
+
+def add_order_item(db: Session, order_id: int, item: schemas.ServiceItemCreate, tenant_id: int):
     """
-    Adiciona um item a uma ordem de serviço e recalcula o valor total da OS.
+    Adiciona um item a uma ordem de serviço e soma o total do item ao valor total da OS
+    (incremental, sem recalcular os demais itens).
     Args:
         db (Session): Sessão do banco de dados.
         order_id (int): ID da ordem de serviço.
         item (schemas.ServiceItemCreate): Dados do item a ser adicionado.
+        tenant_id (int): ID do tenant.
     Returns:
-        models.ServiceOrder: A ordem de serviço atualizada com o novo item e total recalculado.
+        models.ServiceOrder: A ordem de serviço atualizada, ou None se a OS não for encontrada.
     """
-    db_item = models.ServiceItem(**item.model_dump(), order_id=order_id)
-    db.add(db_item)
-    
-    # Recalcula o total da ordem de serviço.
-    db_order = get_order(db, order_id) # Pega a OS com os itens carregados para recalcular o total.
-    if db_order: # Verifica se a OS foi encontrada
-        # Soma o total de todos os itens existentes e adiciona o total do novo item.
-        db_order.total_value = sum(i.total for i in db_order.items if i.id != db_item.id) + db_item.total
-    
+    if not _bump_order_total(db, order_id, tenant_id, item.total):
+        db.rollback()
+        return None
+
+    db.add(models.ServiceItem(**item.model_dump(), order_id=order_id))
     db.commit()
-    db.refresh(db_order) # Refresh para garantir que o total_value atualizado esteja no objeto.
-    db.refresh(db_item) # Refresh para garantir que o item adicionado esteja no objeto.
-    return db_order
+    return get_order(db, order_id)
+
+def update_order_item(db: Session, order_id: int, item_id: int, item: schemas.ServiceItemUpdate, tenant_id: int):
+    """
+    Atualiza um item da OS e aplica ao total da OS apenas a diferença do item.
+    Se quantidade ou preço mudarem sem um novo total, o total do item é recalculado.
+    Returns:
+        models.ServiceOrder: A ordem de serviço atualizada, ou None se o item não for encontrado.
+    """
+    db_item = _lock_order_item(db, order_id, item_id, tenant_id)
+    if not db_item:
+        db.rollback()
+        return None
+
+    old_total = db_item.total or 0
+    update_data = item.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_item, key, value)
+    if "total" not in update_data and ("quantity" in update_data or "unit_price" in update_data):
+        db_item.total = db_item.quantity * db_item.unit_price
+
+    _bump_order_total(db, order_id, tenant_id, db_item.total - old_total)
+    db.commit()
+    return get_order(db, order_id)
+
+def delete_order_item(db: Session, order_id: int, item_id: int, tenant_id: int):
+    """
+    Remove um item da OS e subtrai o total do item do valor total da OS.
+    Returns:
+        models.ServiceOrder: A ordem de serviço atualizada, ou None se o item não for encontrado.
+    """
+    db_item = _lock_order_item(db, order_id, item_id, tenant_id)
+    if not db_item:
+        db.rollback()
+        return None
+
+    _bump_order_total(db, order_id, tenant_id, -(db_item.total or 0))
+    db.delete(db_item)
+    db.commit()
+    return get_order(db, order_id)
 
-def add_order_note(db: Session, order_id: int, note: schemas.OrderNoteCreate):
+def add_order_note(db: Session, order_id: int, note: schemas.OrderNoteCreate, commit: bool = True):
     """
     Adiciona uma nota a uma ordem de serviço.
     Args:
         db (Session): Sessão do banco de dados.
         order_id (int): ID da ordem de serviço.
         note (schemas.OrderNoteCreate): Dados da nota a ser adicionada.
+        commit (bool): Se False, apenas flush (o caller faz o commit).
     Returns:
         models.OrderNote: O objeto nota recém-criado.
     """
     db_note = models.OrderNote(**note.model_dump(), order_id=order_id)
     db.add(db_note)
-    db.commit()
-    db.refresh(db_note)
+    _save(db, db_note, commit)
     return db_note
 
-def complete_order(db: Session, order_id: int, tenant_id: int):
+def _get_order_for_status(db: Session, order_id: int, tenant_id: int):
+    """
+    Busca a OS do tenant para mudar o status, sem bloqueio de linha: a versão
+    da OS é conferida no UPDATE do commit, então de duas conclusões/reaberturas
+    simultâneas da mesma OS só a primeira é gravada (a outra levanta StaleDataError).
     """
-    Completa uma ordem de serviço:
+    return db.query(models.ServiceOrder).filter(
+        models.ServiceOrder.id == order_id,
+        models.ServiceOrder.tenant_id == tenant_id
+    ).first()
+
+def _apply_order_stock(db: Session, db_order: models.ServiceOrder, tenant_id: int, movement_type: models.MovementType, description: str):
+    """
+    Aplica ao estoque as peças de uma OS de forma set-based:
+    - Quantidades de todas as peças alteradas com um único UPDATE atômico
+      (ver adjust_part_quantities): duas OS concluídas ao mesmo tempo não
+      perdem a baixa uma da outra. Saídas não deixam o estoque negativo.
+    - Movimentos de estoque inseridos em lote (um por item da OS).
+    Não faz commit.
+    """
+    part_items = [item for item in db_order.items if item.type == models.ItemType.PART and item.part_id]
+    if not part_items:
+        return
+
+    outbound = movement_type == models.MovementType.OUT_OS
+    deltas: Dict[int, float] = {}
+    for item in part_items:
+        deltas[item.part_id] = deltas.get(item.part_id, 0) + (-item.quantity if outbound else item.quantity)
+
+    found_ids = {row[0] for row in db.query(models.Part.id).filter(
+        models.Part.id.in_(list(deltas)),
+        models.Part.tenant_id == tenant_id
+    ).all()}
+    adjust_part_quantities(db, tenant_id, deltas, floor_zero=outbound)
+
+    movements = [
+        {
+            "tenant_id": tenant_id,
+            "part_id": item.part_id,
+            "type": movement_type,
+            "quantity": item.quantity,
+            "description": description,
+            "reference_id": str(db_order.id),
+            "user": "Sistema", # O usuário deveria vir do contexto de autenticação real.
+        }
+        for item in part_items if item.part_id in found_ids
+    ]
+    if movements:
+        db.execute(insert(models.StockMovement), movements)
+
+def complete_order(db: Session, order_id: int, tenant_id: int, commit: bool = True):
+    """
+    Completa uma ordem de serviço, em uma única transação:
     - Muda o status da OS para "Concluído".
-    - Baixa as peças do estoque.
+    - Baixa as peças do estoque (ver _apply_order_stock).
     - Registra os movimentos de estoque.
     - Gera uma transação de receita.
     Args:
         db (Session): Sessão do banco de dados.
         order_id (int): ID da ordem de serviço a ser completada.
         tenant_id (int): ID do tenant (empresa) para registrar movimentos e transações.
+        commit (bool): Se False, apenas flush (o caller faz o commit).
     Returns:
         models.ServiceOrder: A ordem de serviço completada, ou None se não encontrada ou já completada.
+    Raises:
+        StaleDataError: A OS foi alterada ao mesmo tempo (ex: concluída por outra requisição).
     """
-    db_order = get_order(db, order_id)
-    # Ensure correct tenant check if necessary, or rely on caller
+    db_order = _get_order_for_status(db, order_id, tenant_id)
     if not db_order or db_order.status == models.OSStatus.COMPLETED:
         return None
     
     # Muda o status da ordem de serviço para CONCLUÍDO.
     db_order.status = models.OSStatus.COMPLETED
+    db.flush() # Confere a versão da OS antes de baixar o estoque.
     
     # Baixa o estoque das peças utilizadas na ordem de serviço.
-    for item in db_order.items:
-        if item.type == models.ItemType.PART and item.part_id: # Se o item for uma peça e tiver um part_id
-            part = get_part(db, item.part_id)
-            if part:
-                part.quantity = max(0, part.quantity - item.quantity) # Garante que a quantidade não seja negativa.
-                
-                # Registra o movimento de saída no estoque.
-                movement = models.StockMovement(
-                    tenant_id=tenant_id,
-                    part_id=part.id,
-                    type=models.MovementType.OUT_OS,
-                    quantity=item.quantity,
-                    description=f"Saída OS #{order_id}",
-                    reference_id=str(order_id),
-                    user="Sistema" # O usuário deveria vir do contexto de autenticação real.
-                )
-                db.add(movement)
+    _apply_order_stock(db, db_order, tenant_id, models.MovementType.OUT_OS, f"Saída OS #{order_id}")
     
     # Gera uma transação financeira de receita para a ordem de serviço.
     transaction = models.Transaction(
@@ -584,86 +937,189 @@ def complete_order(db: Session, order_id: int, tenant_id: int):
         order_id=order_id
     )
     db.add(transaction)
+    dashboard_service.apply_transactions(db, tenant_id, [transaction])
     
-    db.commit()
-    db.refresh(db_order)
+    _save(db, db_order, commit)
     return db_order
 
-def reopen_order(db: Session, order_id: int, tenant_id: int):
+def reopen_order(db: Session, order_id: int, tenant_id: int, commit: bool = True):
     """
-    Reabre uma ordem de serviço concluída:
+    Reabre uma ordem de serviço concluída, em uma única transação:
     - Muda status de 'Concluído' para 'Em Execução'.
     - Devolve as peças ao estoque.
     - Registra movimentos de devolução.
     - Cancela a transação de receita pendente.
+    Levanta StaleDataError se a OS for alterada ao mesmo tempo.
     """
-    db_order = get_order(db, order_id)
+    db_order = _get_order_for_status(db, order_id, tenant_id)
     if not db_order or db_order.status != models.OSStatus.COMPLETED:
         return None
     
     # Muda status de volta para Em Execução
     db_order.status = models.OSStatus.IN_PROGRESS
+    db.flush() # Confere a versão da OS antes de devolver o estoque.
     
     # Devolve estoque das peças utilizadas
-    for item in db_order.items:
-        if item.type == models.ItemType.PART and item.part_id:
-            part = get_part(db, item.part_id)
-            if part:
-                part.quantity += item.quantity
-                
-                # Registra o movimento de retorno no estoque
-                movement = models.StockMovement(
-                    tenant_id=tenant_id,
-                    part_id=part.id,
-                    type=models.MovementType.RETURN_OS,
-                    quantity=item.quantity,
-                    description=f"Retorno OS #{order_id} (Reabertura)",
-                    reference_id=str(order_id),
-                    user="Sistema"
-                )
-                db.add(movement)
+    _apply_order_stock(db, db_order, tenant_id, models.MovementType.RETURN_OS, f"Retorno OS #{order_id} (Reabertura)")
                 
     # Remove as transações financeiras vinculadas que ainda estão pendentes
     # Isso evita duplicidade quando a OS for concluída novamente
-    db.query(models.Transaction).filter(
+    pending_income = db.query(models.Transaction).filter(
         models.Transaction.order_id == order_id,
         models.Transaction.status == "PENDING",
         models.Transaction.type == "INCOME"
-    ).delete()
+    )
+    dashboard_service.apply_transactions(db, tenant_id, pending_income.all(), sign=-1)
+    pending_income.delete(synchronize_session=False)
 
-    db.commit()
-    db.refresh(db_order)
+    _save(db, db_order, commit)
     return db_order
 
 
 # --- TRANSACTION CRUD ---
 # Funções para operações CRUD na tabela de transações (models.Transaction).
 
-def get_transactions(db: Session, tenant_id: int):
-    """
-    Retorna uma lista de todas as transações financeiras de um tenant, ordenadas por data.
+def _transaction_filters(
+    tenant_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+) -> list:
+    conditions = [models.Transaction.tenant_id == tenant_id]
+    if date_from:
+        conditions.append(models.Transaction.date >= date_from)
+    if date_to:
+        conditions.append(models.Transaction.date <= date_to)
+    if type:
+        conditions.append(models.Transaction.type == type)
+    if status:
+        conditions.append(models.Transaction.status == status)
+    if category:
+        conditions.append(models.Transaction.category == category)
+    return conditions
+
+def _signed_amount():
+    # Receitas somam e despesas subtraem do saldo.
+    return case((models.Transaction.type == "INCOME", models.Transaction.amount), else_=-models.Transaction.amount)
+
+def get_transactions(
+    db: Session,
+    tenant_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    with_balance: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Retorna o extrato de transações financeiras de um tenant, das mais recentes
+    para as mais antigas, ordenadas por (date, id) e apoiadas pelo índice
+    (tenant_id, date, id) de models.Transaction.
+    Com `with_balance`, cada linha traz o saldo acumulado (running_balance) após
+    a transação: o saldo do topo da página vem de uma única soma no banco e o das
+    demais linhas de uma window function (SUM ... OVER) sobre a própria página.
+    Transações anteriores a `date_from` entram no saldo (saldo de abertura);
+    os demais filtros valem também para o saldo.
     Args:
         db (Session): Sessão do banco de dados.
         tenant_id (int): ID do tenant.
+        date_from, date_to (Optional[datetime]): Intervalo da data da transação (inclusivo).
+        type, status, category (Optional[str]): Filtros de tipo, status e categoria.
+        cursor (Optional[str]): Cursor retornado pela página anterior (ver encode_cursor).
+        limit (Optional[int]): Tamanho da página. Sem limite, retorna todas as transações.
+        with_balance (bool): Calcula o saldo acumulado de cada linha.
     Returns:
-        List[models.Transaction]: Lista de objetos transação.
-    """
-    return db.query(models.Transaction).filter(models.Transaction.tenant_id == tenant_id).order_by(desc(models.Transaction.date)).all()
-
-def create_transaction(db: Session, transaction: schemas.TransactionCreate, tenant_id: int):
+        List[dict]: Uma entrada por transação. Com `limit`, retorna até limit + 1 linhas;
+        a linha extra indica que existe uma próxima página.
+    """
+    conditions = _transaction_filters(tenant_id, date_from, date_to, type, status, category)
+    position = []
+    if cursor:
+        last_date, last_id = decode_cursor(cursor)
+        try:
+            last_date = datetime.fromisoformat(last_date)
+        except (TypeError, ValueError):
+            raise ValueError("Cursor inválido")
+        position.append(or_(
+            models.Transaction.date < last_date,
+            and_(models.Transaction.date == last_date, models.Transaction.id < last_id)
+        ))
+
+    columns = [models.Transaction.__table__.c[name] for name in schemas.Transaction.model_fields]
+    newest_first = (desc(models.Transaction.date), desc(models.Transaction.id))
+    if with_balance:
+        # Soma da página até a linha (inclusive), na ordem da listagem.
+        columns.append(func.sum(_signed_amount()).over(order_by=newest_first).label("page_total"))
+
+    query = db.query(*columns).filter(*conditions, *position).order_by(*newest_first)
+    if limit:
+        query = query.limit(limit + 1)
+    transactions = [dict(row._mapping) for row in query.all()]
+
+    if with_balance and transactions:
+        # Saldo após a primeira linha da página: tudo até ela, inclusive o que é anterior a date_from.
+        top = db.query(func.coalesce(func.sum(_signed_amount()), 0.0)).filter(
+            *_transaction_filters(tenant_id, None, date_to, type, status, category), *position
+        ).scalar()
+        for transaction in transactions:
+            page_total = transaction.pop("page_total")
+            signed = transaction["amount"] if transaction["type"] == "INCOME" else -transaction["amount"]
+            transaction["running_balance"] = round(top - page_total + signed, 2)
+    return transactions
+
+def get_transaction_totals(
+    db: Session,
+    tenant_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Totais do período (mesmos filtros de get_transactions) em uma única consulta
+    de agregação: receitas, despesas, pendentes, quantidade, saldo de abertura
+    (transações anteriores a `date_from`) e saldo de fechamento.
+    """
+    in_period = and_(*_transaction_filters(tenant_id, date_from, date_to, type, status, category))
+    income = case((and_(in_period, models.Transaction.type == "INCOME"), models.Transaction.amount), else_=0.0)
+    expense = case((and_(in_period, models.Transaction.type == "EXPENSE"), models.Transaction.amount), else_=0.0)
+    pending = case((and_(in_period, models.Transaction.status == "PENDING"), models.Transaction.amount), else_=0.0)
+    before = case((models.Transaction.date < date_from, _signed_amount()), else_=0.0) if date_from else literal(0.0)
+
+    row = db.query(
+        func.coalesce(func.sum(income), 0.0).label("income"),
+        func.coalesce(func.sum(expense), 0.0).label("expense"),
+        func.coalesce(func.sum(pending), 0.0).label("pending"),
+        func.count(case((in_period, 1))).label("count"),
+        func.coalesce(func.sum(before), 0.0).label("opening_balance"),
+    ).filter(*_transaction_filters(tenant_id, None, date_to, type, status, category)).one()
+
+    totals = {key: round(value, 2) if isinstance(value, float) else value for key, value in row._mapping.items()}
+    totals["balance"] = round(totals["income"] - totals["expense"], 2)
+    totals["closing_balance"] = round(totals["opening_balance"] + totals["balance"], 2)
+    return totals
+
+def create_transaction(db: Session, transaction: schemas.TransactionCreate, tenant_id: int, commit: bool = True):
     """
     Cria uma nova transação financeira no banco de dados.
     Args:
         db (Session): Sessão do banco de dados.
         transaction (schemas.TransactionCreate): Dados da transação para criação.
         tenant_id (int): ID do tenant.
+        commit (bool): Se False, apenas flush (o caller faz o commit).
     Returns:
         models.Transaction: O objeto transação recém-criado.
     """
     db_transaction = models.Transaction(**transaction.model_dump(), tenant_id=tenant_id)
     db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+    dashboard_service.apply_transactions(db, tenant_id, [db_transaction])
+    _save(db, db_transaction, commit)
     return db_transaction
 
 # --- STOCK MOVEMENT CRUD ---
@@ -686,7 +1142,8 @@ def get_movements(db: Session, tenant_id: int, part_id: Optional[int] = None):
 
 def create_stock_movement(db: Session, movement: schemas.StockMovementCreate, user_name: str, tenant_id: int):
     """
-    Registra um movimento de estoque e atualiza a quantidade da peça.
+    Registra um movimento de estoque e atualiza a quantidade da peça
+    (UPDATE atômico, ver adjust_part_quantities).
     """
     # 1. Cria o registro de movimento
     movement_data = movement.model_dump()
@@ -696,22 +1153,55 @@ def create_stock_movement(db: Session, movement: schemas.StockMovementCreate, us
     db.add(db_movement)
     
     # 2. Atualiza a quantidade da peça
-    part = get_part(db, movement.part_id)
-    if part:
-        if movement.type == models.MovementType.IN_INVOICE or \
-           movement.type == models.MovementType.RETURN_OS or \
-           movement.type == models.MovementType.ADJUSTMENT_PLUS:
-            part.quantity += movement.quantity
-        elif movement.type == models.MovementType.OUT_OS or \
-             movement.type == models.MovementType.ADJUSTMENT_MINUS:
-            part.quantity -= movement.quantity
-        
-        db.add(part)
+    if movement.type in (models.MovementType.IN_INVOICE, models.MovementType.RETURN_OS, models.MovementType.ADJUSTMENT_PLUS):
+        adjust_part_quantities(db, tenant_id, {movement.part_id: movement.quantity})
+    elif movement.type in (models.MovementType.OUT_OS, models.MovementType.ADJUSTMENT_MINUS):
+        adjust_part_quantities(db, tenant_id, {movement.part_id: -movement.quantity})
     
     db.commit()
     db.refresh(db_movement)
     return db_movement
 
+def create_invoice_entry(db: Session, entry: schemas.InvoiceEntryCreate, user_name: str, tenant_id: int, commit: bool = True):
+    """
+    Registra uma nota fiscal de entrada e os seus movimentos IN_INVOICE (referência =
+    número da nota), somando as quantidades às peças com um único UPDATE (ver
+    adjust_part_quantities). O fornecedor da nota é o usado pelo planejamento de reposição.
+    Levanta ValueError se o número da nota já foi lançado ou se alguma peça não existir.
+    """
+    if db.query(models.Invoice.id).filter(
+        models.Invoice.tenant_id == tenant_id, models.Invoice.number == entry.number
+    ).first():
+        raise ValueError(f"Nota fiscal {entry.number} já lançada.")
+
+    invoice = models.Invoice(
+        tenant_id=tenant_id,
+        number=entry.number,
+        supplier=entry.supplier,
+        date=entry.date or datetime.now(timezone.utc),
+        total_value=entry.total_value,
+        xml_key=entry.xml_key,
+    )
+    db.add(invoice)
+
+    deltas: Dict[int, float] = {}
+    for item in entry.items:
+        deltas[item.part_id] = deltas.get(item.part_id, 0) + item.quantity
+        db.add(models.StockMovement(
+            tenant_id=tenant_id,
+            part_id=item.part_id,
+            type=models.MovementType.IN_INVOICE,
+            quantity=item.quantity,
+            reference_id=entry.number,
+            description=f"Entrada NF {entry.number} - {entry.supplier}",
+            user=user_name,
+        ))
+    if adjust_part_quantities(db, tenant_id, deltas) != len(deltas):
+        db.rollback()
+        raise ValueError("Peça não encontrada.")
+    _save(db, invoice, commit)
+    return invoice
+
 # --- CONFIG CRUD ---
 # Funções para operações CRUD relacionadas a configurações (fabricantes, modelos, informações da empresa).
 
@@ -796,21 +1286,16 @@ def delete_model(db: Session, model_id: int):
 def get_company_info(db: Session, tenant_id: int):
     """
     Retorna as informações da empresa filtrando pelo tenant_id.
+    Lidas do cache por tenant (ver services/company_info_cache): a maioria das rotas
+    só precisa do n8n_webhook_url, sem consulta nem descriptografia a cada requisição.
     Args:
         db (Session): Sessão do banco de dados.
         tenant_id (int): ID do tenant.
     Returns:
-        models.CompanyInfo: O objeto com as informações da empresa, ou None.
+        CompanyInfoSnapshot: Cópia imutável com as credenciais descriptografadas, ou None.
     """
-    db_info = db.query(models.CompanyInfo).filter(models.CompanyInfo.tenant_id == tenant_id).first()
-    if db_info:
-        # Descriptografa dados sensíveis transparentemente ao ler
-        # Nota: Se quisermos esconder da API (frontend), deveríamos fazer isso em schemas ou criar outro DTO.
-        # Por enquanto, mantemos transparente para que o usuário veja o que digitou no form de config.
-        db_info.mercury_username = decrypt_value(db_info.mercury_username)
-        db_info.mercury_password = decrypt_value(db_info.mercury_password)
-        db_info.cert_password = decrypt_value(db_info.cert_password)
-    return db_info
+    # As credenciais descriptografadas são mantidas para que o usuário veja o que digitou no form de config.
+    return company_info_cache.load(db, tenant_id)
 
 def update_company_info(db: Session, info: schemas.CompanyInfoCreate, tenant_id: int):
     """
@@ -821,9 +1306,9 @@ def update_company_info(db: Session, info: schemas.CompanyInfoCreate, tenant_id:
         info (schemas.CompanyInfoCreate): Dados para atualização.
         tenant_id (int): ID do tenant.
     Returns:
-        models.CompanyInfo: O objeto atualizado.
+        CompanyInfoSnapshot: As informações atualizadas (ver get_company_info).
     """
-    db_info = get_company_info(db, tenant_id)
+    db_info = db.query(models.CompanyInfo).filter(models.CompanyInfo.tenant_id == tenant_id).first()
     if not db_info:
         # Se não houver informações da empresa, cria uma nova.
         db_info = models.CompanyInfo(tenant_id=tenant_id)
@@ -851,8 +1336,8 @@ def update_company_info(db: Session, info: schemas.CompanyInfoCreate, tenant_id:
                 setattr(db_info, key, value)
             
     db.commit()
-    db.refresh(db_info)
-    return db_info
+    company_info_cache.invalidate(tenant_id)
+    return get_company_info(db, tenant_id)
 
 # --- MAINTENANCE KIT CRUD ---
 
@@ -953,14 +1438,13 @@ def get_partner(db: Session, partner_id: int):
     """
     return db.query(models.Partner).filter(models.Partner.id == partner_id).first()
 
-def create_partner(db: Session, partner: schemas.PartnerCreate, tenant_id: int):
+def create_partner(db: Session, partner: schemas.PartnerCreate, tenant_id: int, commit: bool = True):
     """
     Cria um novo parceiro.
     """
     db_partner = models.Partner(**partner.model_dump(), tenant_id=tenant_id)
     db.add(db_partner)
-    db.commit()
-    db.refresh(db_partner)
+    _save(db, db_partner, commit)
     return db_partner
 
 def update_partner(db: Session, partner_id: int, partner_update: schemas.PartnerUpdate):
@@ -1031,14 +1515,13 @@ def get_inspection(db: Session, inspection_id: int):
     """
     return db.query(models.TechnicalInspection).filter(models.TechnicalInspection.id == inspection_id).first()
 
-def create_inspection(db: Session, inspection: schemas.TechnicalInspectionCreate, tenant_id: int):
+def create_inspection(db: Session, inspection: schemas.TechnicalInspectionCreate, tenant_id: int, commit: bool = True):
     """
     Cria uma nova inspeção técnica.
     """
     db_inspection = models.TechnicalInspection(**inspection.model_dump(), tenant_id=tenant_id)
     db.add(db_inspection)
-    db.commit()
-    db.refresh(db_inspection)
+    _save(db, db_inspection, commit)
     return db_inspection
 
 def update_inspection(db: Session, inspection_id: int, inspection_update: schemas.TechnicalInspectionUpdate):
@@ -1087,17 +1570,16 @@ def get_partner_quote(db: Session, quote_id: int):
     """
     return db.query(models.PartnerQuote).filter(models.PartnerQuote.id == quote_id).first()
 
-def create_partner_quote(db: Session, quote: schemas.PartnerQuoteCreate, tenant_id: int):
+def create_partner_quote(db: Session, quote: schemas.PartnerQuoteCreate, tenant_id: int, commit: bool = True):
     """
     Cria uma solicitação de orçamento para um parceiro.
     """
     db_quote = models.PartnerQuote(**quote.model_dump(), tenant_id=tenant_id)
     db.add(db_quote)
-    db.commit()
-    db.refresh(db_quote)
+    _save(db, db_quote, commit)
     return db_quote
 
-def update_partner_quote(db: Session, quote_id: int, quote_update: schemas.PartnerQuoteUpdate):
+def update_partner_quote(db: Session, quote_id: int, quote_update: schemas.PartnerQuoteUpdate, commit: bool = True):
     """
     Atualiza um orçamento (resposta do parceiro ou atualização interna).
     """
@@ -1113,8 +1595,7 @@ def update_partner_quote(db: Session, quote_id: int, quote_update: schemas.Partn
     if quote_update.quoted_value and not db_quote.response_date:
         db_quote.response_date = datetime.now(timezone.utc)
     
-    db.commit()
-    db.refresh(db_quote)
+    _save(db, db_quote, commit)
     return db_quote
 
 # --- TECHNICAL DELIVERY CRUD ---
@@ -1122,18 +1603,17 @@ def update_partner_quote(db: Session, quote_id: int, quote_update: schemas.Partn
 def get_technical_delivery(db: Session, order_id: int):
     return db.query(models.TechnicalDelivery).filter(models.TechnicalDelivery.service_order_id == order_id).first()
 
-def create_technical_delivery(db: Session, delivery: schemas.TechnicalDeliveryCreate, technician_id: int, tenant_id: int):
+def create_technical_delivery(db: Session, delivery: schemas.TechnicalDeliveryCreate, technician_id: int, tenant_id: int, commit: bool = True):
     db_delivery = models.TechnicalDelivery(
         **delivery.model_dump(),
         technician_id=technician_id,
         tenant_id=tenant_id
     )
     db.add(db_delivery)
-    db.commit()
-    db.refresh(db_delivery)
+    _save(db, db_delivery, commit)
     return db_delivery
 
-def update_technical_delivery(db: Session, delivery_id: int, delivery_update: schemas.TechnicalDeliveryUpdate):
+def update_technical_delivery(db: Session, delivery_id: int, delivery_update: schemas.TechnicalDeliveryUpdate, commit: bool = True):
     db_delivery = db.query(models.TechnicalDelivery).filter(models.TechnicalDelivery.id == delivery_id).first()
     if not db_delivery:
         return None
@@ -1142,6 +1622,5 @@ def update_technical_delivery(db: Session, delivery_id: int, delivery_update: sc
     for key, value in update_data.items():
         setattr(db_delivery, key, value)
     
-    db.commit()
-    db.refresh(db_delivery)
+    _save(db, db_delivery, commit)
     return db_delivery
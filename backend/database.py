@@ -3,14 +3,40 @@ Este arquivo configura a conexão com o banco de dados e gerencia as sessões do
 Ele é responsável por:
 1. Carregar variáveis de ambiente.
 2. Definir a URL do banco de dados.
-3. Criar o "engine" do SQLAlchemy.
+3. Criar o "engine" do SQLAlchemy, com o pool de conexões adequado ao ambiente.
 4. Criar uma classe de sessão para interagir com o DB.
 5. Fornecer uma dependência para injeção de sessão do DB no FastAPI.
+
+Pool de conexões (apenas PostgreSQL):
+- Funções serverless (Vercel) vivem pouco e sobem muitas de uma vez: usam
+  NullPool (uma conexão por sessão, devolvida ao fechar), e o pool fica a cargo
+  do pgbouncer/Supavisor do Supabase.
+- Workers de longa duração (Render, local) usam um QueuePool dimensionado, com
+  pre-ping (descarta conexões derrubadas pelo servidor ou pelo pooler antes
+  de usá-las) e reciclagem periódica.
+- statement_timeout e idle_in_transaction_session_timeout limitam consultas
+  presas. Em conexão direta vão nos parâmetros de conexão; atrás do pgbouncer
+  em modo transaction (porta 6543 do Supabase, ou ?pgbouncer=true na URL) os
+  parâmetros de inicialização não chegam ao servidor, então são aplicados com
+  SET LOCAL no início de cada transação; em modo session, com SET na conexão.
+
+- DB_POOL_MODE: auto (padrão: null em serverless, queue nos demais), null ou queue.
+- DB_POOL_SIZE / DB_MAX_OVERFLOW: conexões mantidas e extras do QueuePool (padrão 5 / 10).
+- DB_POOL_TIMEOUT: segundos de espera por uma conexão livre (padrão 30).
+- DB_POOL_RECYCLE: idade máxima, em segundos, de uma conexão do pool (padrão 1800).
+- DB_CONNECT_TIMEOUT: segundos para abrir uma conexão (padrão 10).
+- DB_STATEMENT_TIMEOUT_MS: padrão 30000 (0 desativa).
+- DB_IDLE_IN_TRANSACTION_TIMEOUT_MS: padrão 60000 (0 desativa).
+- DB_PGBOUNCER: auto (padrão), transaction, session ou off.
 """
 
-from sqlalchemy import create_engine
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 import os
 from dotenv import load_dotenv # Biblioteca para carregar variáveis de ambiente de um arquivo .env
 
@@ -20,27 +46,152 @@ load_dotenv(env_path)
 
 # Define a URL do banco de dados.
 # Tenta obter a URL da variável de ambiente "DATABASE_URL".
-# Se não estiver definida, usa SQLite com um arquivo local "mare_alta.db" por padrão.
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
     # Em produção, DATABASE_URL deve ser obrigatória (Supabase)
     raise ValueError("A variável de ambiente DATABASE_URL não está definida. Configure a conexão com o Supabase.")
-else:
-    # Correção para SQLAlchemy (postgres:// -> postgresql://)
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    
-    # Se for Postgres, normalmente não usamos check_same_thread
-    # Mas para Supabase/Neon, SSL mode pode ser exigido.
-    # SQLAlchemy geralmente lida bem, mas podemos forçar sslmode=require se necessário na string.
-    connect_args = {}
+
+# Correção para SQLAlchemy (postgres:// -> postgresql://)
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+POOL_MODE = os.getenv("DB_POOL_MODE", "auto").lower()
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.getenv("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", "60000"))
+PGBOUNCER = os.getenv("DB_PGBOUNCER", "auto").lower()
+
+SERVERLESS_ENV_VARS = ("VERCEL", "AWS_LAMBDA_FUNCTION_NAME") # Definidas pela plataforma em funções serverless
+SUPABASE_TRANSACTION_PORT = 6543 # Porta do pooler do Supabase em modo transaction
+
+# Contadores do pool desde o início do processo (ver pool_status).
+_pool_counters = {"connects": 0, "checkouts": 0, "invalidations": 0}
+_pool_settings: Dict[str, Any] = {}
+
+
+def resolve_pool_mode(mode: Optional[str] = None) -> str:
+    """'null' ou 'queue' (no modo auto, null apenas em funções serverless)."""
+    mode = mode or POOL_MODE
+    if mode in ("null", "queue"):
+        return mode
+    return "null" if any(os.getenv(name) for name in SERVERLESS_ENV_VARS) else "queue"
+
+
+def detect_pgbouncer(url: URL, setting: Optional[str] = None) -> Optional[str]:
+    """Modo do pooler entre a API e o PostgreSQL: 'transaction', 'session' ou None (conexão direta)."""
+    setting = setting or PGBOUNCER
+    if setting in ("transaction", "session"):
+        return setting
+    if setting == "off":
+        return None
+    if url.query.get("pgbouncer") == "true" or url.port == SUPABASE_TRANSACTION_PORT:
+        return "transaction"
+    return None
+
+
+def _timeouts() -> Dict[str, int]:
+    timeouts = {
+        "statement_timeout": STATEMENT_TIMEOUT_MS,
+        "idle_in_transaction_session_timeout": IDLE_IN_TRANSACTION_TIMEOUT_MS,
+    }
+    return {name: value for name, value in timeouts.items() if value > 0}
+
+
+def connect_args_for(pgbouncer: Optional[str]) -> Dict[str, Any]:
+    """Parâmetros do psycopg2; os timeouts só vão na conexão quando ela é direta."""
+    connect_args: Dict[str, Any] = {"connect_timeout": CONNECT_TIMEOUT}
+    timeouts = _timeouts()
+    if timeouts and pgbouncer is None:
+        connect_args["options"] = " ".join(f"-c {name}={value}" for name, value in timeouts.items())
+    return connect_args
+
+
+def _set_timeouts(engine: Engine, pgbouncer: str):
+    """Aplica os timeouts atrás do pgbouncer (por conexão em modo session, por transação em modo transaction)."""
+    timeouts = _timeouts()
+    if not timeouts:
+        return
+    if pgbouncer == "session":
+        statement = "; ".join(f"SET {name} = {value}" for name, value in timeouts.items())
+
+        @event.listens_for(engine, "connect")
+        def set_session_timeouts(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(statement)
+            cursor.close()
+            dbapi_connection.commit()
+    else:
+        statement = "; ".join(f"SET LOCAL {name} = {value}" for name, value in timeouts.items())
+
+        @event.listens_for(engine, "begin")
+        def set_transaction_timeouts(connection):
+            connection.exec_driver_sql(statement)
+
+
+def _count_pool_events(engine: Engine):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        _pool_counters["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        _pool_counters["checkouts"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        # Conexões descartadas: falha no pre-ping ou erro de conexão durante o uso.
+        _pool_counters["invalidations"] += 1
+
+
+def build_engine(database_url: str) -> Engine:
+    """Cria o engine com o pool e os timeouts do ambiente (ver a documentação do módulo)."""
+    url = make_url(database_url)
+    if url.get_backend_name() != "postgresql":
+        # SQLite (desenvolvimento e testes): pool padrão do SQLAlchemy.
+        _pool_settings.update(mode="default", pgbouncer=None)
+        engine = create_engine(url, connect_args={})
+        _count_pool_events(engine)
+        return engine
+
+    pgbouncer = detect_pgbouncer(url)
+    url = url.difference_update_query(["pgbouncer"]) # Parâmetro das URLs do Supabase/Prisma, desconhecido pelo psycopg2
+    mode = resolve_pool_mode()
+    if mode == "null":
+        pool_args: Dict[str, Any] = {"poolclass": NullPool}
+    else:
+        pool_args = {
+            "poolclass": QueuePool,
+            "pool_size": POOL_SIZE,
+            "max_overflow": MAX_OVERFLOW,
+            "pool_timeout": POOL_TIMEOUT,
+            "pool_recycle": POOL_RECYCLE,
+            "pool_pre_ping": True,
+            "pool_use_lifo": True, # Reusa as conexões recentes; as ociosas envelhecem e são recicladas.
+        }
+    _pool_settings.update(mode=mode, pgbouncer=pgbouncer)
+    engine = create_engine(url, connect_args=connect_args_for(pgbouncer), **pool_args)
+    if pgbouncer:
+        _set_timeouts(engine, pgbouncer)
+    _count_pool_events(engine)
+    return engine
+
+
+def pool_status() -> Dict[str, Any]:
+    """Configuração e uso do pool do processo (conexões em uso, livres e contadores)."""
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__, **_pool_settings, **_pool_counters}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    return status
+
 
 # Cria o "engine" do SQLAlchemy.
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args=connect_args
-)
+engine = build_engine(DATABASE_URL)
 
 # Cria uma classe SessionLocal.
 # Instâncias dessa classe serão nossas sessões de banco de dados.
@@ -65,7 +216,6 @@ def get_db():
         db.close() # Garante que a sessão seja fechada, liberando os recursos.
 
 # --- TENANT MIDDLEWARE (SQLAlchemy Listener) ---
-from sqlalchemy import event
 from sqlalchemy.orm import Session
 from backend import context
 
@@ -1,30 +1,36 @@
+"""
+Formato dos eventos enviados ao webhook do n8n.
 
-import httpx
-import logging
+A entrega é feita pelo outbox (services/webhook_outbox.py): os routers gravam
+o evento com webhook_outbox.publish e um worker o envia depois, com novas
+tentativas em caso de falha.
+"""
 
-logger = logging.getLogger(__name__)
+from datetime import datetime, timezone
+from typing import Any, Dict, List
 
-async def trigger_n8n_event(webhook_url: str, event_type: str, data: dict):
+
+def build_payload(event_type: str, data: dict) -> Dict[str, Any]:
     """
-    Dispara um evento para o webhook do n8n configurado.
-    O dado já deve vir enriquecido do caller.
+    Monta o payload de um evento para o n8n.
+    O dado já deve vir enriquecido (e serializável em JSON) do caller.
     """
-    if not webhook_url:
-        return
-
-    from datetime import datetime, timezone
-    
-    # Payload seguro para o n8n
-    payload = {
+    return {
         "event": event_type,
         "data": data,
         "timestamp": str(data.get("updated_at") or data.get("created_at") or datetime.now(timezone.utc).isoformat())
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(webhook_url, json=payload)
-            response.raise_for_status()
-            logger.info(f"N8N Webhook triggered successfully: {event_type} - Status {response.status_code}")
-    except Exception as e:
-        logger.error(f"Failed to trigger N8N Webhook: {str(e)}")
+
+def build_batch_payload(event_type: str, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Agrupa vários eventos do mesmo tipo em um único envio (rajadas, ex: várias
+    importações seguidas). `events` traz os payloads individuais, na ordem em que ocorreram.
+    """
+    return {
+        "event": event_type,
+        "batch": True,
+        "count": len(payloads),
+        "events": payloads,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
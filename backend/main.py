@@ -7,6 +7,7 @@ e serve os arquivos estáticos do frontend, se disponíveis.
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy import text # Import para usar SQL cru
 import os
 import traceback
@@ -32,6 +33,8 @@ from backend.routers.partners_router import router as partners_router
 from backend.routers.upload_router import router as upload_router
 from backend.routers.admin_router import router as admin_router
 from backend.routers.users_router import router as users_router
+from backend.routers.jobs_router import router as jobs_router
+from backend.routers.dashboard_router import router as dashboard_router
 
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse # Importa JSONResponse para o erro 404
@@ -58,6 +61,7 @@ app.add_middleware(
     allow_credentials=True, # Permite cookies e cabeçalhos de autorização.
     allow_methods=["*"],  # Permite todos os métodos HTTP (GET, POST, PUT, DELETE, etc.).
     allow_headers=["*"],  # Permite todos os cabeçalhos nas requisições.
+    expose_headers=["X-Next-Cursor", "ETag"],  # Cursor de paginação e versão dos registros lidos pelo frontend.
 )
 
 # Exception Handler Global para Debug em Produção
@@ -70,6 +74,15 @@ async def debug_exception_handler(request, exc):
         content={"detail": error_msg, "error_type": type(exc).__name__},
     )
 
+# Escrita concorrente detectada pela coluna de versão (ver models.Part): o
+# registro mudou entre a leitura e o UPDATE. O cliente recarrega e repete.
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request, exc):
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "O registro foi alterado por outra operação. Recarregue e tente novamente."},
+    )
+
 # Middleware de Logging para Debug
 @app.middleware("http")
 async def log_requests(request, call_next):
@@ -83,12 +96,38 @@ async def log_requests(request, call_next):
 
 
 
+# Worker das tarefas em segundo plano (retoma tarefas não concluídas), rotinas periódicas
+# e entrega dos webhooks gravados no outbox.
+@app.on_event("startup")
+async def start_job_workers():
+    from backend.services import job_queue, webhook_outbox
+    from backend.services import order_totals_service # noqa: F401 (registra a conciliação de totais das OS)
+    from backend.services import stock_ledger_service # noqa: F401 (registra os registros periódicos de estoque)
+    from backend.services import inventory_report_service # noqa: F401 (registra o recálculo do relatório de inventário)
+    from backend.services import reorder_planner_service # noqa: F401 (registra o envio do plano de reposição)
+    await job_queue.start()
+    await webhook_outbox.start()
+
+# Fecha o navegador e as sessões do Portal Mercury mantidas pelo pool
+# e encerra os processos de extração de PDF.
+@app.on_event("shutdown")
+async def close_mercury_sessions():
+    from backend.services import job_queue, webhook_outbox, finance_import_service
+    from backend.services.mercury_session_pool import pool
+    await webhook_outbox.stop()
+    await job_queue.stop()
+    await pool.close()
+    finance_import_service.shutdown_pdf_pool()
+    engine.dispose()
+
+
 # --- ROUTERS CONFIGURATION ---
 # Configuração robusta para suportar Vercel (que pode remover prefixo) e Render/Local (que mantêm)
 all_routers = [
     auth_router, orders_router, inventory_router, clients_router, 
     boats_router, fiscal_router, mercury_router, transactions_router, 
-    config_router, partners_router, upload_router, admin_router, users_router
+    config_router, partners_router, upload_router, admin_router, users_router,
+    jobs_router, dashboard_router
 ]
 
 for router in all_routers:
@@ -3,7 +3,7 @@ Este arquivo define os modelos de banco de dados usando SQLAlchemy.
 Cada classe representa uma tabela no banco de dados e seus atributos correspondem às colunas da tabela.
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Enum, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text, Boolean, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from backend.database import Base # Importa a classe Base do SQLAlchemy declarada em database.py
 from datetime import datetime, timezone
@@ -272,12 +272,28 @@ class Part(Base):
     subgroup = Column(String(100))   # Ex: "Filtro de Óleo"
     compatibility = Column(JSON)     # Lista de modelos: ["V8", "V6", "150hp"]
     last_price_updated_at = Column(DateTime, nullable=True) # Data da última atualização automática de preço
+    version = Column(Integer, nullable=False, default=1, server_default="1") # Versão da linha (concorrência otimista e ETag)
     
     # Relacionamento com StockMovement. Uma peça pode ter múltiplos movimentos de estoque.
     movements = relationship("StockMovement", back_populates="part")
     # Relacionamento com ServiceItem. Uma peça pode ser usada em múltiplos itens de serviço.
     service_items = relationship("ServiceItem", back_populates="part")
 
+    # Índices compostos por tenant: sustentam a paginação por cursor (name, id)
+    # e os filtros do catálogo sem varrer todas as peças do tenant.
+    # (tenant_id, sku) é único: chave do upsert da importação em lote.
+    __table_args__ = (
+        Index("ix_parts_tenant_name_id", "tenant_id", "name", "id"),
+        Index("uq_parts_tenant_sku", "tenant_id", "sku", unique=True),
+        Index("ix_parts_tenant_barcode", "tenant_id", "barcode"),
+        Index("ix_parts_tenant_group_subgroup", "tenant_id", "group", "subgroup"),
+        Index("ix_parts_tenant_subgroup", "tenant_id", "subgroup"),
+        Index("ix_parts_tenant_manufacturer", "tenant_id", "manufacturer"),
+    )
+    # Cada UPDATE pelo ORM confere e incrementa a versão: uma alteração baseada
+    # em uma leitura desatualizada falha (StaleDataError) em vez de sobrescrever outra.
+    __mapper_args__ = {"version_id_col": version}
+
 class ServiceOrder(Base):
     """
     Modelo para a tabela 'service_orders'. Armazena informações sobre as ordens de serviço.
@@ -299,6 +315,7 @@ class ServiceOrder(Base):
     scheduled_at = Column(DateTime, nullable=True) # Data e hora agendada para o serviço
     estimated_duration = Column(Integer, nullable=True)  # Duração estimada em horas
     checklist = Column(JSON, default=[]) # Checklist de itens (JSON)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # Versão da linha (concorrência otimista e ETag)
     
     # Relacionamento com Boat. A embarcação desta OS.
     boat = relationship("Boat", back_populates="service_orders")
@@ -313,6 +330,14 @@ class ServiceOrder(Base):
     # Relacionamento com Tecnico (User)
     assigned_technician = relationship("User", foreign_keys=[technician_id])
 
+    # Índices compostos por tenant: sustentam a listagem paginada por cursor
+    # (created_at, id), com e sem filtro de status (kanban).
+    __table_args__ = (
+        Index("ix_service_orders_tenant_status_created", "tenant_id", "status", "created_at"),
+        Index("ix_service_orders_tenant_created_id", "tenant_id", "created_at", "id"),
+    )
+    __mapper_args__ = {"version_id_col": version} # Ver Part.
+
     @property
     def boat_name(self):
         return self.boat.name if self.boat else None
@@ -412,6 +437,11 @@ class StockMovement(Base):
     # Relacionamento com Part. A peça envolvida no movimento.
     part = relationship("Part", back_populates="movements")
 
+    __table_args__ = (
+        # Kardex por peça (paginação por (date, id)) e estoque em uma data.
+        Index("ix_stock_movements_tenant_part_date", "tenant_id", "part_id", "date", "id"),
+    )
+
 class Transaction(Base):
     """
     Modelo para a tabela 'transactions'. Armazena transações financeiras (receitas e despesas).
@@ -428,6 +458,14 @@ class Transaction(Base):
     status = Column(String(50), default="PENDING")  # Status da transação: PAID (pago), PENDING (pendente), CANCELED (cancelado)
     order_id = Column(Integer, nullable=True) # ID da Ordem de Serviço relacionada (opcional)
     document_number = Column(String(100)) # Número do documento fiscal ou de referência
+    import_hash = Column(String(64), nullable=True) # Hash de deduplicação de extratos importados
+
+    __table_args__ = (
+        # Reimportar o mesmo extrato não duplica lançamentos (NULL para transações manuais).
+        Index("uq_transactions_import_hash", "tenant_id", "import_hash", unique=True),
+        # Extrato por período e paginação por cursor (date, id) em GET /api/transactions.
+        Index("ix_transactions_tenant_date", "tenant_id", "date", "id"),
+    )
 
 class Manufacturer(Base):
     """
@@ -780,3 +818,153 @@ class TechnicalDelivery(Base):
     tenant = relationship("Tenant")
     service_order = relationship("ServiceOrder", back_populates="technical_delivery")
     technician = relationship("User")
+
+class MercuryLookupCache(Base):
+    """
+    Modelo para a tabela 'mercury_lookup_cache'. Guarda, com prazo de validade,
+    o resultado das consultas ao Portal Mercury (preços e garantias) quando o
+    cache está configurado com MERCURY_CACHE_BACKEND=database.
+    """
+    __tablename__ = "mercury_lookup_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    kind = Column(String(20), nullable=False) # product (preços) ou warranty (garantia)
+    lookup_key = Column(String(200), nullable=False) # SKU/termo ou número de série normalizado
+    payload = Column(JSON) # Resultado da consulta
+    expires_at = Column(DateTime, nullable=False) # UTC
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index("uq_mercury_lookup_cache_key", "tenant_id", "kind", "lookup_key", unique=True),
+    )
+
+class BackgroundJob(Base):
+    """
+    Modelo para a tabela 'background_jobs'. Tarefas longas (ex: sincronização de
+    preços Mercury de todo o catálogo) executadas fora da requisição HTTP.
+    O progresso é gravado a cada lote, o que permite retomar a tarefa após um reinício.
+    """
+    __tablename__ = "background_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
+    kind = Column(String(50), nullable=False) # Tipo de tarefa (ex: mercury_price_sync)
+    status = Column(String(20), default="PENDING", index=True) # PENDING, RUNNING, COMPLETED, FAILED
+    params = Column(JSON) # Parâmetros da tarefa (ex: part_ids, concurrency)
+    total = Column(Integer, default=0) # Itens a processar
+    processed = Column(Integer, default=0) # Itens já processados
+    results = Column(JSON, default=[]) # Resultado por item (acumulado a cada lote)
+    error = Column(Text, nullable=True) # Mensagem de erro se FAILED
+    created_by = Column(String(100)) # Nome do usuário que criou a tarefa
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc)) # Último progresso (heartbeat)
+
+class TenantDailySummary(Base):
+    """
+    Modelo para a tabela 'tenant_daily_summaries'. Consolidado diário por tenant
+    (receitas, despesas, OS concluídas) que alimenta o dashboard sem varrer todas
+    as transações. Mantido de forma incremental a cada transação criada ou
+    removida (ver services/dashboard_service.py) e reconstruído periodicamente.
+    """
+    __tablename__ = "tenant_daily_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    day = Column(Date, nullable=False) # Dia (UTC) das transações
+    income = Column(Float, default=0) # Soma das transações INCOME
+    expense = Column(Float, default=0) # Soma das transações EXPENSE
+    transactions_count = Column(Integer, default=0) # Quantidade de transações no dia
+    orders_completed = Column(Integer, default=0) # Receitas geradas pela conclusão de OS
+
+    __table_args__ = (
+        Index("uq_tenant_daily_summaries_day", "tenant_id", "day", unique=True),
+    )
+
+class WebhookEvent(Base):
+    """
+    Modelo para a tabela 'webhook_events'. Outbox dos eventos enviados ao n8n:
+    o evento é gravado pela requisição que o gerou e entregue depois por um
+    worker de longa duração, com novas tentativas (ver services/webhook_outbox.py).
+    """
+    __tablename__ = "webhook_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
+    event_type = Column(String(50), nullable=False) # Ex: order_created, transactions_imported
+    url = Column(Text, nullable=False) # Webhook de destino (n8n_webhook_url no momento do evento)
+    payload = Column(JSON, nullable=False) # Dados do evento
+    status = Column(String(20), default="PENDING") # PENDING, SENDING, DELIVERED, FAILED
+    attempts = Column(Integer, default=0) # Tentativas de entrega já feitas
+    next_attempt_at = Column(DateTime, nullable=False) # Próxima tentativa (backoff exponencial)
+    claim_token = Column(String(36), nullable=True) # Worker que reservou o evento
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    delivered_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_webhook_events_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+class StatementImportProfile(Base):
+    """
+    Modelo para a tabela 'statement_import_profiles'. Mapeamento das colunas
+    de data, descrição e valor de um layout de extrato CSV (identificado pelo
+    cabeçalho), salvo por tenant para que reimportações não refaçam a detecção.
+    """
+    __tablename__ = "statement_import_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    header_signature = Column(String(64), nullable=False) # Hash do cabeçalho normalizado
+    headers = Column(JSON) # Cabeçalho original (para exibição)
+    date_column = Column(String(100), nullable=False)
+    description_column = Column(String(100), nullable=False)
+    amount_column = Column(String(100), nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index("uq_statement_import_profiles_signature", "tenant_id", "header_signature", unique=True),
+    )
+
+class StockSnapshot(Base):
+    """
+    Modelo para a tabela 'stock_snapshots'. Quantidade de uma peça em um
+    instante, gravada periodicamente para as peças movimentadas desde o último
+    registro (ver services/stock_ledger_service.py): o estoque em uma data parte
+    do registro anterior mais próximo em vez de repassar todo o histórico.
+    """
+    __tablename__ = "stock_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    part_id = Column(Integer, ForeignKey("parts.id"), nullable=False)
+    as_of = Column(DateTime, nullable=False) # Instante (UTC) do registro
+    quantity = Column(Float, nullable=False) # Quantidade da peça nesse instante
+
+    __table_args__ = (
+        Index("uq_stock_snapshots_part_as_of", "tenant_id", "part_id", "as_of", unique=True),
+    )
+
+class InventoryReport(Base):
+    """
+    Modelo para a tabela 'inventory_reports'. Relatório de inventário do dia
+    (valorização, curva ABC, cobertura e estoque parado) por tenant, calculado
+    uma vez por dia (ver services/inventory_report_service.py). O resumo e as
+    linhas por SKU ficam em colunas separadas: a abertura do relatório só lê o resumo.
+    """
+    __tablename__ = "inventory_reports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    day = Column(Date, nullable=False) # Dia (UTC) do cálculo
+    generated_at = Column(DateTime, nullable=False) # Instante (UTC) do cálculo
+    summary = Column(JSON, nullable=False) # Totais, classes ABC e listas resumidas
+    items = Column(JSON, nullable=False) # Uma linha por SKU
+
+    __table_args__ = (
+        Index("uq_inventory_reports_tenant_day", "tenant_id", "day", unique=True),
+    )
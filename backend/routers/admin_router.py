@@ -117,3 +117,13 @@ def update_tenant(
     db.commit()
     db.refresh(tenant)
     return tenant
+
+# --- Diagnóstico ---
+
+@router.get("/db-pool")
+def get_db_pool_status(
+    current_user: models.User = Depends(get_current_superuser)
+):
+    """Configuração e uso do pool de conexões do processo (conexões em uso, livres e descartadas)."""
+    from backend.database import pool_status
+    return pool_status()
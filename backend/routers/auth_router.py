@@ -56,10 +56,7 @@ def login(
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     # Cria o token de acesso com tenant_id
     access_token = auth.create_access_token(
-        data={
-            "sub": user.email,
-            "tenant_id": user.tenant_id  # NOVO: Incluir tenant_id no token
-        }, 
+        data=auth.token_claims(user), # Inclui tenant_id, role, uid e name no token
         expires_delta=access_token_expires
     )
     
@@ -70,13 +67,9 @@ def login(
 def refresh_token(current_user: models.User = Depends(auth.get_current_active_user)):
     """Atualiza o token de acesso (na prática gera um novo com validade estendida)"""
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    # Inclui tenant_id e role no novo token
+    # Inclui tenant_id, role, uid e name no novo token
     access_token = auth.create_access_token(
-        data={
-            "sub": current_user.email,
-            "tenant_id": current_user.tenant_id,
-            "role": current_user.role
-        },
+        data=auth.token_claims(current_user),
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
@@ -84,13 +77,17 @@ def refresh_token(current_user: models.User = Depends(auth.get_current_active_us
 
 
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: schemas.User = Depends(auth.get_current_active_user)):
+def read_users_me(
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
     """
     Endpoint para obter informações do usuário atualmente logado.
     Requer autenticação via token JWT.
     """
     # 'get_current_active_user' é uma dependência que verifica o token e retorna o usuário autenticado.
-    return current_user
+    # Lê do banco: o usuário autenticado pode vir só das claims do token (AUTH_PRINCIPAL_MODE=token).
+    return db.query(models.User).filter(models.User.id == current_user.id).first() or current_user
 
 @router.post("/register", response_model=schemas.User)
 def register(
@@ -134,11 +131,7 @@ def signup(
     # 2. Gera o token de acesso automaticamente
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={
-            "sub": new_user.email,
-            "tenant_id": new_user.tenant_id,
-            "role": new_user.role
-        }, 
+        data=auth.token_claims(new_user),
         expires_delta=access_token_expires
     )
     
@@ -186,6 +179,7 @@ def update_user(
     
     db.commit()
     db.refresh(db_user)
+    auth.invalidate_user(db_user.id) # Descarta o usuário do cache de autenticação
     return db_user
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -209,4 +203,5 @@ def delete_user(
     
     db.delete(db_user)
     db.commit()
+    auth.invalidate_user(user_id) # Tokens do usuário removido deixam de valer
     return None
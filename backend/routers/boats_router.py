@@ -2,7 +2,7 @@
 Este módulo define as rotas da API para gerenciamento de embarcações.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -10,7 +10,7 @@ from typing import List, Optional
 from backend import schemas
 from backend import crud
 from backend import auth
-from backend import integrations
+from backend.services import webhook_outbox
 from backend.database import get_db # Função de dependência para obter a sessão do banco de dados.
 
 # Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
@@ -32,7 +32,6 @@ def get_all_boats(
 @router.post("", response_model=schemas.Boat)
 def create_new_boat(
     boat: schemas.BoatCreate, # Dados da nova embarcação, incluindo motores.
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
@@ -41,14 +40,15 @@ def create_new_boat(
     Requer autenticação.
     """
     # Chama a função CRUD para criar a embarcação no banco de dados.
-    new_boat = crud.create_boat(db, boat, tenant_id=current_user.tenant_id)
+    new_boat = crud.create_boat(db, boat, tenant_id=current_user.tenant_id, commit=False)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         boat_data = schemas.Boat.model_validate(new_boat).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "boat_created", boat_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "boat_created", boat_data, commit=False)
+    db.commit()
+
     return new_boat
 
 @router.get("/{boat_id}", response_model=schemas.Boat)
@@ -70,7 +70,6 @@ def get_single_boat(
 def update_existing_boat(
     boat_id: int, # ID da embarcação a ser atualizada, passado como parâmetro de caminho.
     boat: schemas.BoatUpdate, # Dados de atualização para a embarcação e seus motores.
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
@@ -80,7 +79,7 @@ def update_existing_boat(
     Levanta um HTTPException 404 se a embarcação não for encontrada.
     """
     # Chama a função CRUD para atualizar a embarcação no banco de dados.
-    db_boat = crud.update_boat(db, boat_id=boat_id, boat_update=boat)
+    db_boat = crud.update_boat(db, boat_id=boat_id, boat_update=boat, commit=False)
     if db_boat is None:
         # Se a função CRUD retornar None, a embarcação não foi encontrada.
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Embarcação não encontrada")
@@ -89,8 +88,9 @@ def update_existing_boat(
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         boat_data = schemas.Boat.model_validate(db_boat).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "boat_updated", boat_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "boat_updated", boat_data, commit=False)
+    db.commit()
+
     return db_boat
 
 @router.delete("/{boat_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -2,7 +2,7 @@
 Este módulo define as rotas da API para gerenciamento de clientes.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -10,7 +10,7 @@ from typing import List
 from backend import schemas
 from backend import crud
 from backend import auth
-from backend import integrations
+from backend.services import webhook_outbox
 from backend.database import get_db # Função de dependência para obter a sessão do banco de dados.
 
 # Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
@@ -31,7 +31,6 @@ def get_all_clients(
 @router.post("", response_model=schemas.Client)
 def create_new_client(
     client: schemas.ClientCreate, # Dados do novo cliente.
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
@@ -40,14 +39,15 @@ def create_new_client(
     Requer autenticação.
     """
     # Chama a função CRUD para criar o cliente no banco de dados.
-    new_client = crud.create_client(db=db, client=client, tenant_id=current_user.tenant_id)
+    new_client = crud.create_client(db=db, client=client, tenant_id=current_user.tenant_id, commit=False)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         client_data = schemas.Client.model_validate(new_client).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "client_created", client_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "client_created", client_data, commit=False)
+    db.commit()
+
     return new_client
 
 @router.get("/{client_id}", response_model=schemas.Client)
@@ -69,7 +69,6 @@ def get_single_client(
 def update_existing_client(
     client_id: int,
     client: schemas.ClientUpdate, # Usando ClientUpdate
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
@@ -77,7 +76,7 @@ def update_existing_client(
     Atualiza um cliente existente.
     Requer autenticação.
     """
-    updated_client = crud.update_client(db, client_id=client_id, client_update=client)
+    updated_client = crud.update_client(db, client_id=client_id, client_update=client, commit=False)
     if not updated_client:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente não encontrado")
     
@@ -85,8 +84,9 @@ def update_existing_client(
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         client_data = schemas.Client.model_validate(updated_client).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "client_updated", client_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "client_updated", client_data, commit=False)
+    db.commit()
+
     return updated_client
 
 @router.delete("/{client_id}", status_code=status.HTTP_204_NO_CONTENT)
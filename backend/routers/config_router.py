@@ -12,6 +12,7 @@ from backend import schemas
 from backend import crud
 from backend import auth
 from backend.database import get_db # Função de dependência para obter a sessão do banco de dados.
+from backend.services import webhook_outbox
 
 # Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
 router = APIRouter(prefix="/api/config", tags=["Configuração"])
@@ -124,13 +125,23 @@ def update_company_information(
     Requer autenticação.
     """
     try:
-        print(f"DEBUG: Updating company info with: {info} for tenant {current_user.tenant_id}")
         # Chama a função CRUD para atualizar ou criar as informações da empresa.
         return crud.update_company_info(db, info, tenant_id=current_user.tenant_id)
     except Exception as e:
-        print(f"ERROR in update_company_information: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno: {str(e)}")
 
+@router.get("/webhooks/status", response_model=schemas.WebhookStatus)
+def get_webhook_status(
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna a situação das entregas ao webhook do n8n (pendentes, entregues,
+    descartadas, último erro) e os contadores de entrega do processo.
+    Requer autenticação.
+    """
+    return webhook_outbox.get_status(db, tenant_id=current_user.tenant_id)
+
 # --- MAINTENANCE KITS ---
 
 @router.get("/maintenance-kits", response_model=List[schemas.MaintenanceKit])
@@ -0,0 +1,28 @@
+"""
+Este módulo define as rotas da API para os indicadores do dashboard
+(faturamento por mês, OS por status, peças com estoque baixo).
+"""
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from backend import schemas
+from backend import auth
+from backend.database import get_db # Função de dependência para obter a sessão do banco de dados.
+from backend.services import dashboard_service
+
+# Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
+router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
+
+@router.get("/summary", response_model=schemas.DashboardSummary)
+def get_dashboard_summary(
+    months: int = Query(dashboard_service.DEFAULT_MONTHS, ge=1, le=60), # Meses no gráfico de faturamento.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna os indicadores do dashboard calculados no banco (GROUP BY), em vez de
+    listar OS, transações e peças para agregar no frontend.
+    Requer autenticação.
+    """
+    return dashboard_service.get_summary(db, tenant_id=current_user.tenant_id, months=months)
@@ -22,6 +22,7 @@ from backend.database import get_db
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from backend.services.fiscal_provider import FiscalProvider
+from backend.services import company_info_cache
 
 # Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
 router = APIRouter(
@@ -208,6 +209,8 @@ async def emit_invoice(
             fiscal_invoice.rejection_reason = result.get('message')
             
         db.commit()
+        if result['status'] == 'AUTHORIZED':
+            company_info_cache.invalidate(current_user.tenant_id) # sequence_nfe mudou
         
         result['db_id'] = fiscal_invoice.id
         result['number'] = str(next_seq)
@@ -3,8 +3,9 @@ Este módulo define as rotas da API para gerenciamento de inventário (estoque d
 e movimentações de estoque.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, UploadFile, File, Header
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from typing import List, Optional
 
 # Importa os esquemas de dados (Pydantic), funções CRUD e utilitários de autenticação.
@@ -14,9 +15,10 @@ from backend import crud
 from backend import auth
 from datetime import datetime, timezone
 from backend.database import get_db # Função de dependência para obter a sessão do banco de dados.
-from backend import models, integrations
+from backend import models
+from backend.services import webhook_outbox
+from backend.services import part_search_service, part_import_service, checkout_service, stock_ledger_service, inventory_report_service, reorder_planner_service
 from backend.models import UserRole
-from fastapi import BackgroundTasks
 
 # Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
 router = APIRouter(prefix="/api/inventory", tags=["Inventário"])
@@ -26,24 +28,108 @@ router = APIRouter(prefix="/api/inventory", tags=["Inventário"])
 
 @router.get("/parts", response_model=List[schemas.Part])
 def get_all_parts(
+    response: Response,
+    sku: Optional[str] = None, # Filtros opcionais (igualdade), apoiados pelos índices (tenant_id, ...).
+    barcode: Optional[str] = None,
+    group: Optional[str] = None,
+    subgroup: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    low_stock: Optional[bool] = None, # True: apenas peças com quantidade <= estoque mínimo.
+    cursor: Optional[str] = None, # Cursor da página anterior (cabeçalho X-Next-Cursor).
+    limit: Optional[int] = Query(None, ge=1, le=500), # Tamanho da página. Sem limite, retorna o catálogo inteiro.
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
     """
-    Retorna uma lista de todas as peças do estoque.
+    Retorna as peças do estoque ordenadas por nome, com filtros opcionais.
+    Com `limit`, usa paginação por cursor: se houver mais resultados, o cursor da
+    próxima página é retornado no cabeçalho `X-Next-Cursor`.
     Requer autenticação.
     """
-    # Chama a função CRUD para buscar todas as peças do banco de dados.
-    return crud.get_parts(db, tenant_id=current_user.tenant_id)
+    try:
+        parts = crud.get_parts(
+            db,
+            tenant_id=current_user.tenant_id,
+            sku=sku,
+            barcode=barcode,
+            group=group,
+            subgroup=subgroup,
+            manufacturer=manufacturer,
+            low_stock=low_stock,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if limit and len(parts) > limit:
+        parts = parts[:limit]
+        last = parts[-1]
+        response.headers["X-Next-Cursor"] = crud.encode_cursor([last.name, last.id])
+    return parts
+
+@router.get("/parts/search", response_model=List[schemas.Part])
+def search_parts(
+    q: str = Query(..., min_length=1), # Texto digitado (SKU, nome, código de barras ou modelo compatível).
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Busca aproximada de peças (type-ahead do PDV e do seletor de itens da OS).
+    Retorna as peças mais relevantes primeiro.
+    Requer autenticação.
+    """
+    return part_search_service.search_parts(db, tenant_id=current_user.tenant_id, q=q, limit=limit)
+
+@router.post("/parts/import", response_model=schemas.PartImportResult)
+def import_parts_file(
+    file: UploadFile = File(...), # Planilha CSV ou XLSX (ex: tabela de preços Mercury).
+    batch_size: int = Query(part_import_service.DEFAULT_BATCH_SIZE, ge=100, le=10000), # Linhas por commit.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.require_role([UserRole.ADMIN])) # Apenas administradores.
+):
+    """
+    Importa peças em lote a partir de um arquivo CSV ou XLSX.
+    Peças são identificadas pelo SKU: as existentes são atualizadas e as novas criadas.
+    O arquivo é lido em streaming e gravado em lotes; linhas inválidas são
+    reportadas no resumo sem interromper a importação.
+    Mudanças de quantidade são registradas no Kardex como movimentos de ajuste.
+    Requer privilégios de administrador.
+    """
+    try:
+        rows = part_import_service.iter_file_rows(file.file, file.filename)
+        summary = part_import_service.import_parts(
+            db, tenant_id=current_user.tenant_id, rows=rows, batch_size=batch_size, commit=False,
+            user=current_user.name
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # --- N8N INTEGRATION ---
+    if summary["upserted"]:
+        company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
+        if company and company.n8n_webhook_url:
+            summary_data = {
+                "filename": file.filename,
+                "upserted": summary["upserted"],
+                "error_count": summary["error_count"],
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+            webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "parts_imported", summary_data, commit=False)
+    db.commit()
+
+    return summary
 
 @router.get("/parts/{part_id}", response_model=schemas.Part)
 def get_single_part(
     part_id: int, # ID da peça a ser buscada, passado como parâmetro de caminho.
+    response: Response,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
     """
-    Retorna uma peça específica pelo seu ID.
+    Retorna uma peça específica pelo seu ID, com a versão no cabeçalho ETag.
     Requer autenticação.
     Levanta um HTTPException 404 se a peça não for encontrada.
     """
@@ -52,12 +138,12 @@ def get_single_part(
     if not part:
         # Se a função CRUD retornar None, a peça não foi encontrada.
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Peça não encontrada")
+    response.headers["ETag"] = crud.etag(part.version)
     return part
 
 @router.post("/parts", response_model=schemas.Part)
 def create_new_part(
     part: schemas.PartCreate, # Dados da nova peça para criação.
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
@@ -72,29 +158,37 @@ def create_new_part(
         # Se o SKU já existe, levanta uma exceção HTTP 400 Bad Request.
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="SKU já existe")
     # Chama a função CRUD para criar a peça no banco de dados.
-    new_part = crud.create_part(db=db, part=part, tenant_id=current_user.tenant_id)
+    new_part = crud.create_part(db=db, part=part, tenant_id=current_user.tenant_id, commit=False)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         part_data = schemas.Part.model_validate(new_part).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "part_created", part_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "part_created", part_data, commit=False)
+    db.commit()
+
     return new_part
 
 @router.put("/parts/{part_id}", response_model=schemas.Part)
 def update_existing_part(
     part_id: int, # ID da peça a ser atualizada.
     part_update: schemas.PartUpdate, # Dados de atualização da peça.
-    background_tasks: BackgroundTasks,
+    response: Response,
+    if_match: Optional[str] = Header(None), # ETag lido pelo cliente: se a peça mudou desde então, 412.
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
     """
     Atualiza os dados de uma peça existente pelo seu ID.
     Requer autenticação.
-    Levanta um HTTPException 404 se a peça não for encontrada.
+    Levanta um HTTPException 404 se a peça não for encontrada, 412 se o If-Match
+    não for a versão atual e 409 se a peça for alterada ao mesmo tempo.
     """
+    try:
+        expected_version = crud.parse_if_match(if_match)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Se o SKU foi alterado, verificar duplicidade no mesmo tenant
     if part_update.sku:
         existing = crud.get_part_by_sku(db, sku=part_update.sku)
@@ -102,21 +196,30 @@ def update_existing_part(
              raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="SKU já existe neste inventário")
 
     # Chama a função CRUD para atualizar a peça.
-    updated_part = crud.update_part(db, part_id=part_id, part_update=part_update)
+    try:
+        updated_part = crud.update_part(db, part_id=part_id, part_update=part_update, expected_version=expected_version, commit=False)
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED if expected_version is not None else status.HTTP_409_CONFLICT,
+            detail="A peça foi alterada por outro usuário. Recarregue e tente novamente."
+        )
     if not updated_part:
         # Se a função CRUD retornar None, a peça não foi encontrada.
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Peça não encontrada")
+    response.headers["ETag"] = crud.etag(updated_part.version)
         
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         part_data = schemas.Part.model_validate(updated_part).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "part_updated", part_data)
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "part_updated", part_data, commit=False)
         
         # Alerta de estoque baixo
         if updated_part.quantity <= updated_part.min_stock:
-            background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "low_stock_alert", part_data)
-            
+            webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "low_stock_alert", part_data, commit=False)
+    db.commit()
+
     return updated_part
 
 @router.delete("/parts/{part_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -152,6 +255,113 @@ def get_all_movements(
     # Chama a função CRUD para buscar as movimentações de estoque.
     return crud.get_movements(db, tenant_id=current_user.tenant_id, part_id=part_id)
 
+@router.get("/parts/{part_id}/kardex", response_model=List[schemas.KardexEntry])
+def get_part_kardex(
+    part_id: int, # ID da peça.
+    response: Response,
+    date_from: Optional[datetime] = None, # Início do período (inclusivo).
+    date_to: Optional[datetime] = None, # Fim do período (inclusivo).
+    cursor: Optional[str] = None, # Cursor da página anterior (cabeçalho X-Next-Cursor).
+    limit: int = Query(100, ge=1, le=500), # Tamanho da página.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna o Kardex da peça: movimentos dos mais recentes para os mais antigos,
+    cada um com o saldo da peça após o movimento. Paginado por cursor: se houver
+    mais resultados, o cursor da próxima página é retornado no cabeçalho `X-Next-Cursor`.
+    Requer autenticação.
+    """
+    try:
+        movements = stock_ledger_service.get_kardex(
+            db,
+            tenant_id=current_user.tenant_id,
+            part_id=part_id,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(movements) > limit:
+        movements = movements[:limit]
+        last = movements[-1]
+        response.headers["X-Next-Cursor"] = crud.encode_cursor([last["date"], last["id"]])
+    return movements
+
+@router.get("/stock-as-of", response_model=List[schemas.PartStockAsOf])
+def get_stock_as_of(
+    at: datetime, # Instante da posição de estoque (ex: fechamento do mês).
+    part_ids: Optional[List[int]] = Query(None), # Peças (opcional). Sem filtro, todas as peças.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna a quantidade em estoque das peças no instante `at`, calculada a partir
+    do registro periódico de estoque mais próximo e dos movimentos posteriores a ele.
+    Requer autenticação.
+    """
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None) # Datas gravadas em UTC "naive"
+    stock = stock_ledger_service.stock_as_of(db, tenant_id=current_user.tenant_id, as_of=at, part_ids=part_ids)
+    if not stock:
+        return []
+    query = db.query(models.Part.id, models.Part.sku, models.Part.name).filter(models.Part.tenant_id == current_user.tenant_id)
+    if part_ids:
+        query = query.filter(models.Part.id.in_(part_ids))
+    parts = query.order_by(models.Part.name, models.Part.id).all()
+    return [{"part_id": id, "sku": sku, "name": name, "quantity": stock[id]} for id, sku, name in parts if id in stock]
+
+# --- REPORTS (Relatórios) ---
+
+@router.get("/reports/analytics", response_model=schemas.InventoryReportSummary)
+def get_inventory_report(
+    refresh: bool = False, # Recalcula o relatório do dia (apenas administradores).
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna o resumo do relatório de inventário do dia: valorização, curva ABC,
+    giro, estoque parado e peças com cobertura baixa. Calculado uma vez por dia.
+    Requer autenticação.
+    """
+    if refresh and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas administradores podem recalcular o relatório.")
+    return inventory_report_service.get_summary(db, tenant_id=current_user.tenant_id, refresh=refresh)
+
+@router.get("/reports/analytics/items", response_model=schemas.InventoryReportItemsPage)
+def get_inventory_report_items(
+    abc_class: Optional[str] = Query(None, pattern="^[ABC]$"), # Filtra pela classe da curva ABC.
+    dead_stock: bool = False, # Apenas peças com estoque e sem consumo em 12 meses.
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna as linhas por SKU do relatório de inventário do dia, do maior para o menor valor de consumo.
+    Requer autenticação.
+    """
+    total, items = inventory_report_service.get_items(
+        db, tenant_id=current_user.tenant_id, abc_class=abc_class, dead_stock=dead_stock, offset=offset, limit=limit
+    )
+    return {"total": total, "items": items}
+
+@router.get("/reorder-plan", response_model=schemas.ReorderPlan)
+def get_reorder_plan(
+    horizon_days: int = Query(reorder_planner_service.HORIZON_DAYS, ge=1, le=365), # Dias de demanda a cobrir.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna a lista de compras sugerida, agrupada por fornecedor: consumo
+    previsto, peças de OS agendadas e kits de revisões próximas, mais o estoque mínimo.
+    Requer autenticação.
+    """
+    return reorder_planner_service.build_plan(db, tenant_id=current_user.tenant_id, horizon_days=horizon_days)
+
 @router.post("/movements", response_model=schemas.StockMovement)
 def create_stock_movement(
     movement: schemas.StockMovementCreate, # Dados da nova movimentação de estoque.
@@ -165,26 +375,40 @@ def create_stock_movement(
     # Chama a função CRUD para criar a movimentação no banco de dados.
     return crud.create_stock_movement(db=db, movement=movement, user_name=current_user.name, tenant_id=current_user.tenant_id)
 
+@router.post("/invoices", response_model=schemas.Invoice, status_code=status.HTTP_201_CREATED)
+def create_invoice_entry(
+    entry: schemas.InvoiceEntryCreate, # Nota fiscal e itens já vinculados às peças.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Dá entrada no estoque por nota fiscal: grava a nota (número e fornecedor) e um
+    movimento IN_INVOICE por item, referenciando o número da nota, em uma única transação.
+    Requer autenticação.
+    """
+    try:
+        return crud.create_invoice_entry(db, entry, user_name=current_user.name, tenant_id=current_user.tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 
 # --- QUICK SALE (PDV) ---
 
 @router.post("/quick-sale")
 def process_quick_sale(
     sale: schemas.QuickSaleRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.require_role([UserRole.ADMIN, UserRole.TECHNICIAN]))
 ):
     """
-    Processa uma venda direta (PDV) de peças.
+    Processa uma venda direta (PDV) de peças, em uma única transação
+    (ver checkout_service.process_quick_sale):
     1. Valida estoque.
     2. Deduz quantidades (MovementType.SALE_DIRECT).
     3. Gera Transação de Entrada (Receita).
+    Dispara um único webhook com a venda e as peças que ficaram com estoque baixo.
     """
     
-    total_sale_value = 0.0
-    items_summary = []
-    
     # Validação de Segurança (PDV)
     if current_user.role == UserRole.TECHNICIAN:
         for item in sale.items:
@@ -194,75 +418,27 @@ def process_quick_sale(
                     detail="Técnicos só podem dar até 10% de desconto. Solicite autorização ao Admin."
                 )
 
-    # Validação Prévia de Estoque
-    for item in sale.items:
-        part = crud.get_part(db, part_id=item.part_id)
-        if not part:
-             raise HTTPException(status_code=404, detail=f"Peça ID {item.part_id} não encontrada.")
-        
-        if part.quantity < item.quantity:
-             raise HTTPException(status_code=400, detail=f"Estoque insuficiente para {part.name} (SKU: {part.sku}). Disponível: {part.quantity}")
-
-    # Processamento
     try:
-        for item in sale.items:
-            part = crud.get_part(db, part_id=item.part_id) 
-            
-            # Calculo de valores para este item
-            unit_price = part.price
-            discount_amount = unit_price * (item.discount_percent / 100.0)
-            final_unit_price = unit_price - discount_amount
-            total_item = final_unit_price * item.quantity
-            
-            total_sale_value += total_item
-            
-            # Criar Movimento de Saída
-            mov = schemas.StockMovementCreate(
-                part_id=part.id,
-                type=models.MovementType.SALE_DIRECT,
-                quantity=item.quantity,
-                description=f"Venda Direta PDV - Desc: {item.discount_percent}%"
-            )
-            crud.create_stock_movement(db, mov, user_name=current_user.name, tenant_id=current_user.tenant_id)
-            
-            # Alerta de estoque baixo individual
-            if part.quantity - item.quantity <= part.min_stock:
-                company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
-                if company and company.n8n_webhook_url:
-                    part_data = schemas.Part.model_validate(part).model_dump(mode='json')
-                    part_data["quantity"] = part.quantity - item.quantity # Info atualizada
-                    background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "low_stock_alert", part_data)
-
-            items_summary.append(f"{item.quantity}x {part.name}")
-            
-        # Criar Transação Financeira
-        if total_sale_value > 0:
-            transaction = models.Transaction(
-                tenant_id=current_user.tenant_id,
-                description=f"Venda Balcão ({sale.payment_method or 'DINHEIRO'}): {', '.join(items_summary)[:100]}. Obs: {sale.notes or ''}",
-                amount=total_sale_value,
-                type="INCOME", # Receita
-                category="VENDAS_PECAS",
-                date=datetime.now(timezone.utc)
-            )
-            db.add(transaction)
-            db.commit()
-            
-            # --- N8N INTEGRATION ---
-            company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
-            if company and company.n8n_webhook_url:
-                sale_data = {
-                    "total_value": total_sale_value,
-                    "items": items_summary,
-                    "payment_method": sale.payment_method,
-                    "seller": current_user.name,
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
-                background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "quick_sale_processed", sale_data)
-            
-        return {"status": "success", "total_value": total_sale_value, "items_count": len(sale.items)}
-        
+        result = checkout_service.process_quick_sale(db, sale, tenant_id=current_user.tenant_id, user_name=current_user.name, commit=False)
+    except checkout_service.CheckoutError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao processar venda: {str(e)}")
 
+    # --- N8N INTEGRATION ---
+    company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
+    if company and company.n8n_webhook_url:
+        sale_data = {
+            "total_value": result["total_value"],
+            "items": result["items"],
+            "payment_method": sale.payment_method,
+            "seller": current_user.name,
+            "low_stock": result["low_stock"],
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "quick_sale_processed", sale_data, commit=False)
+    db.commit()
+
+    return {"status": "success", "total_value": result["total_value"], "items_count": len(sale.items)}
+
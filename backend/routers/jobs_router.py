@@ -0,0 +1,48 @@
+"""
+Este módulo define as rotas da API para acompanhar tarefas em segundo plano
+(progresso e resultado), como a sincronização de preços Mercury em lote.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from backend import schemas
+from backend import models
+from backend import auth
+from backend.database import get_db # Função de dependência para obter a sessão do banco de dados.
+
+# Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
+router = APIRouter(prefix="/api/jobs", tags=["Tarefas"])
+
+
+def _get_tenant_job(db: Session, job_id: int, tenant_id: int) -> models.BackgroundJob:
+    job = db.query(models.BackgroundJob).filter(
+        models.BackgroundJob.id == job_id,
+        models.BackgroundJob.tenant_id == tenant_id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tarefa não encontrada")
+    return job
+
+@router.get("/{job_id}", response_model=schemas.BackgroundJob)
+def get_job_progress(
+    job_id: int,
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna o status e o progresso (processed/total) de uma tarefa.
+    Pensado para polling pelo frontend.
+    """
+    return _get_tenant_job(db, job_id, current_user.tenant_id)
+
+@router.get("/{job_id}/result", response_model=schemas.BackgroundJobResult)
+def get_job_result(
+    job_id: int,
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Retorna a tarefa com o resultado por item (parcial enquanto estiver em execução).
+    """
+    return _get_tenant_job(db, job_id, current_user.tenant_id)
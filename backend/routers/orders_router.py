@@ -4,15 +4,17 @@ Ele inclui funcionalidades para criar, ler, atualizar e completar ordens,
 bem como adicionar itens e notas a elas.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Header
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from typing import List, Optional
+from datetime import datetime
 
 # Importa os esquemas de dados (Pydantic), funções CRUD e utilitários de autenticação.
 from backend import schemas
 from backend import crud
 from backend import auth
-from backend import integrations
+from backend.services import webhook_outbox
 from backend.database import get_db # Função de dependência para obter a sessão do banco de dados.
 
 # Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
@@ -23,7 +25,6 @@ router = APIRouter(prefix="/api/orders", tags=["Ordens de Serviço"])
 @router.put("/{order_id}/complete", response_model=schemas.ServiceOrder)
 def complete_service_order(
     order_id: int, # ID da ordem de serviço a ser completada.
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
@@ -34,7 +35,7 @@ def complete_service_order(
     Levanta um HTTPException 400 se a ordem não puder ser completada (ex: já completada ou não encontrada).
     """
     # Chama a função CRUD para completar a ordem de serviço.
-    order = crud.complete_order(db, order_id=order_id, tenant_id=current_user.tenant_id)
+    order = crud.complete_order(db, order_id=order_id, tenant_id=current_user.tenant_id, commit=False)
     if not order:
         # Se a função CRUD retornar None, a ordem não pode ser completada.
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Não foi possível completar a Ordem de Serviço (verifique se já está completa ou se existe).")
@@ -46,14 +47,14 @@ def complete_service_order(
         # Note: 'order' here is an ORM object, but Pydantic schema will ensure response is valid.
         # For the integration, we should dump it to a dict.
         order_data = schemas.ServiceOrder.model_validate(order).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "order_completed", order_data)
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "order_completed", order_data, commit=False)
+    db.commit()
 
     return order
 
 @router.put("/{order_id}/reopen", response_model=schemas.ServiceOrder)
 def reopen_service_order(
     order_id: int,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
@@ -61,7 +62,7 @@ def reopen_service_order(
     Reabre uma Ordem de Serviço que foi concluída.
     Isso devolve os itens ao estoque e permite novas edições.
     """
-    order = crud.reopen_order(db, order_id=order_id, tenant_id=current_user.tenant_id)
+    order = crud.reopen_order(db, order_id=order_id, tenant_id=current_user.tenant_id, commit=False)
     if not order:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Não foi possível reabrir a Ordem de Serviço (verifique se está concluída ou se existe).")
     
@@ -69,31 +70,66 @@ def reopen_service_order(
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         order_data = schemas.ServiceOrder.model_validate(order).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "order_reopened", order_data)
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "order_reopened", order_data, commit=False)
+    db.commit()
 
     return order
 
-@router.get("", response_model=List[schemas.ServiceOrder])
+@router.get("", response_model=List[schemas.ServiceOrderSummary])
 def get_all_service_orders(
+    response: Response,
     status: Optional[str] = None, # Parâmetro de query opcional para filtrar ordens por status.
+    technician_id: Optional[int] = None, # Filtra pelo técnico associado.
+    created_from: Optional[datetime] = None, # Início do intervalo da data de criação.
+    created_to: Optional[datetime] = None, # Fim do intervalo da data de criação.
+    include: Optional[str] = None, # Relacionamentos a incluir, separados por vírgula: items, notes.
+    cursor: Optional[str] = None, # Cursor da página anterior (cabeçalho X-Next-Cursor).
+    limit: Optional[int] = Query(None, ge=1, le=500), # Tamanho da página. Sem limite, retorna todas as OS.
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
     """
-    Retorna uma lista de todas as ordens de serviço, opcionalmente filtradas por status.
+    Retorna as ordens de serviço (projeção resumida), das mais recentes para as mais antigas,
+    com filtros opcionais. Itens e notas só são retornados com `?include=items,notes`.
+    Com `limit`, usa paginação por cursor: se houver mais resultados, o cursor da
+    próxima página é retornado no cabeçalho `X-Next-Cursor`.
     Requer autenticação.
     """
-    # Chama a função CRUD para buscar as ordens de serviço do banco de dados.
-    return crud.get_orders(db, tenant_id=current_user.tenant_id, status=status)
+    includes = {value.strip() for value in include.split(",") if value.strip()} if include else set()
+    invalid = includes - crud.ORDER_SUMMARY_INCLUDES
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"include inválido: {', '.join(sorted(invalid))}")
+
+    try:
+        orders = crud.get_order_summaries(
+            db,
+            tenant_id=current_user.tenant_id,
+            status=status,
+            technician_id=technician_id,
+            created_from=created_from,
+            created_to=created_to,
+            include=includes,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if limit and len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        response.headers["X-Next-Cursor"] = crud.encode_cursor([last["created_at"], last["id"]])
+    return orders
 
 @router.get("/{order_id}", response_model=schemas.ServiceOrder)
 def get_single_service_order(
     order_id: int, # ID da ordem de serviço a ser buscada.
+    response: Response,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
     """
-    Retorna uma ordem de serviço específica pelo seu ID.
+    Retorna uma ordem de serviço específica pelo seu ID, com a versão no cabeçalho ETag.
     Requer autenticação.
     Levanta um HTTPException 404 se a ordem não for encontrada.
     """
@@ -102,12 +138,12 @@ def get_single_service_order(
     if not order:
         # Se a função CRUD retornar None, a ordem não foi encontrada.
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ordem de Serviço não encontrada")
+    response.headers["ETag"] = crud.etag(order.version)
     return order
 
 @router.post("", response_model=schemas.ServiceOrder)
 def create_new_service_order(
     order: schemas.ServiceOrderCreate, # Dados da nova ordem de serviço para criação.
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
@@ -116,42 +152,59 @@ def create_new_service_order(
     Requer autenticação.
     """
     # Chama a função CRUD para criar a ordem de serviço.
-    new_order = crud.create_order(db=db, order=order, tenant_id=current_user.tenant_id)
+    new_order = crud.create_order(db=db, order=order, tenant_id=current_user.tenant_id, commit=False)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         order_data = schemas.ServiceOrder.model_validate(new_order).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "order_created", order_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "order_created", order_data, commit=False)
+    db.commit()
+
     return new_order
 
 @router.put("/{order_id}", response_model=schemas.ServiceOrder)
 def update_existing_service_order(
     order_id: int, # ID da ordem de serviço a ser atualizada.
     order_update: schemas.ServiceOrderUpdate, # Dados de atualização para a ordem de serviço.
-    background_tasks: BackgroundTasks,
+    response: Response,
+    if_match: Optional[str] = Header(None), # ETag lido pelo cliente: se a OS mudou desde então, 412.
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
     """
     Atualiza os dados de uma ordem de serviço existente pelo seu ID.
     Requer autenticação.
-    Levanta um HTTPException 404 se a ordem não for encontrada.
+    Levanta um HTTPException 404 se a ordem não for encontrada, 412 se o If-Match
+    não for a versão atual e 409 se a ordem for alterada ao mesmo tempo.
     """
+    try:
+        expected_version = crud.parse_if_match(if_match)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Chama a função CRUD para atualizar a ordem de serviço.
-    updated_order = crud.update_order(db, order_id=order_id, order_update=order_update)
+    try:
+        updated_order = crud.update_order(db, order_id=order_id, order_update=order_update, expected_version=expected_version, commit=False)
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED if expected_version is not None else status.HTTP_409_CONFLICT,
+            detail="A Ordem de Serviço foi alterada por outro usuário. Recarregue e tente novamente."
+        )
     if not updated_order:
         # Se a função CRUD retornar None, a ordem não foi encontrada.
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ordem de Serviço não encontrada")
+    response.headers["ETag"] = crud.etag(updated_order.version)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         # Notifica o n8n sobre a atualização (incluindo mudança de status)
         order_data = schemas.ServiceOrder.model_validate(updated_order).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "order_updated", order_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "order_updated", order_data, commit=False)
+    db.commit()
+
     return updated_order
 
 @router.post("/{order_id}/items", response_model=schemas.ServiceOrder)
@@ -163,22 +216,58 @@ def add_item_to_service_order(
 ):
     """
     Adiciona um item (peça ou serviço) a uma ordem de serviço existente.
-    Recalcula o valor total da ordem.
+    Soma o total do item ao valor total da ordem.
     Requer autenticação.
     Levanta um HTTPException 404 se a ordem não for encontrada.
     """
     # Chama a função CRUD para adicionar o item e atualizar a ordem.
-    order = crud.add_order_item(db, order_id=order_id, item=item)
+    order = crud.add_order_item(db, order_id=order_id, item=item, tenant_id=current_user.tenant_id)
     if not order:
         # Se a função CRUD retornar None (o que pode acontecer se a OS não existir), levanta erro.
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ordem de Serviço não encontrada")
     return order
 
+@router.put("/{order_id}/items/{item_id}", response_model=schemas.ServiceOrder)
+def update_item_of_service_order(
+    order_id: int, # ID da ordem de serviço.
+    item_id: int, # ID do item a ser atualizado.
+    item: schemas.ServiceItemUpdate, # Campos do item a alterar.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Atualiza um item de uma ordem de serviço.
+    O valor total da OS é ajustado pela diferença do item.
+    Requer autenticação.
+    Levanta um HTTPException 404 se o item não for encontrado na OS.
+    """
+    order = crud.update_order_item(db, order_id=order_id, item_id=item_id, item=item, tenant_id=current_user.tenant_id)
+    if not order:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item não encontrado na Ordem de Serviço")
+    return order
+
+@router.delete("/{order_id}/items/{item_id}", response_model=schemas.ServiceOrder)
+def delete_item_from_service_order(
+    order_id: int, # ID da ordem de serviço.
+    item_id: int, # ID do item a ser removido.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Remove um item de uma ordem de serviço.
+    O total do item é subtraído do valor total da OS.
+    Requer autenticação.
+    Levanta um HTTPException 404 se o item não for encontrado na OS.
+    """
+    order = crud.delete_order_item(db, order_id=order_id, item_id=item_id, tenant_id=current_user.tenant_id)
+    if not order:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item não encontrado na Ordem de Serviço")
+    return order
+
 @router.post("/{order_id}/notes", response_model=schemas.OrderNote)
 def add_note_to_service_order(
     order_id: int, # ID da ordem de serviço à qual a nota será adicionada.
     note: schemas.OrderNoteCreate, # Dados da nota a ser adicionada.
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
@@ -187,14 +276,15 @@ def add_note_to_service_order(
     Requer autenticação.
     """
     # Chama a função CRUD para adicionar a nota.
-    new_note = crud.add_order_note(db, order_id=order_id, note=note)
+    new_note = crud.add_order_note(db, order_id=order_id, note=note, commit=False)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         note_data = schemas.OrderNote.model_validate(new_note).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "order_note_created", note_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "order_note_created", note_data, commit=False)
+    db.commit()
+
     return new_note
 
 
@@ -211,7 +301,6 @@ def get_technical_delivery(
 def create_technical_delivery(
     order_id: int,
     delivery: schemas.TechnicalDeliveryCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
@@ -227,21 +316,21 @@ def create_technical_delivery(
 
     # Force correct order_id
     delivery.service_order_id = order_id
-    new_delivery = crud.create_technical_delivery(db, delivery, technician_id=current_user.id, tenant_id=current_user.tenant_id)
+    new_delivery = crud.create_technical_delivery(db, delivery, technician_id=current_user.id, tenant_id=current_user.tenant_id, commit=False)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         delivery_data = schemas.TechnicalDelivery.model_validate(new_delivery).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "technical_delivery_created", delivery_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "technical_delivery_created", delivery_data, commit=False)
+    db.commit()
+
     return new_delivery
 
 @router.put("/{order_id}/technical-delivery", response_model=schemas.TechnicalDelivery)
 def update_technical_delivery(
     order_id: int,
     delivery_update: schemas.TechnicalDeliveryUpdate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
@@ -249,20 +338,20 @@ def update_technical_delivery(
     if not delivery:
         raise HTTPException(status_code=404, detail="Technical delivery not found")
         
-    updated_delivery = crud.update_technical_delivery(db, delivery_id=delivery.id, delivery_update=delivery_update)
+    updated_delivery = crud.update_technical_delivery(db, delivery_id=delivery.id, delivery_update=delivery_update, commit=False)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         delivery_data = schemas.TechnicalDelivery.model_validate(updated_delivery).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "technical_delivery_updated", delivery_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "technical_delivery_updated", delivery_data, commit=False)
+    db.commit()
+
     return updated_delivery
 
 @router.post("/{order_id}/send-quotation", response_model=schemas.ServiceOrder)
 def send_quotation_for_approval(
     order_id: int,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
@@ -275,14 +364,15 @@ def send_quotation_for_approval(
 
     # Atualiza status para "Em Orçamento" se já não estiver
     if order.status != models.OSStatus.QUOTATION:
-        order = crud.update_order(db, order_id, schemas.ServiceOrderUpdate(status=models.OSStatus.QUOTATION))
+        order = crud.update_order(db, order_id, schemas.ServiceOrderUpdate(status=models.OSStatus.QUOTATION), commit=False)
 
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         order_data = schemas.ServiceOrder.model_validate(order).model_dump(mode='json')
         # Incluir detalhes dos itens para o orçamento
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "order_quotation_ready", order_data)
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "order_quotation_ready", order_data, commit=False)
+    db.commit()
 
     return order
 
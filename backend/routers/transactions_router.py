@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime, timezone
+import asyncio
 
 # Importa os esquemas de dados (Pydantic), funções CRUD e utilitários de autenticação.
 from backend import schemas
@@ -8,27 +10,81 @@ from backend import crud
 from backend import auth
 from backend.database import get_db
 from backend.services.finance_import_service import FinanceImportService
-from backend import integrations
+from backend.services import finance_import_service, webhook_outbox
 
 # Cria uma instância de APIRouter com um prefixo e tags para organização na documentação OpenAPI.
 router = APIRouter(prefix="/api/transactions", tags=["Transações Financeiras"])
 
-@router.get("", response_model=List[schemas.Transaction])
+@router.get("", response_model=List[schemas.TransactionLedgerEntry])
 def get_all_transactions(
+    response: Response,
+    date_from: Optional[datetime] = None, # Início do período (inclusivo).
+    date_to: Optional[datetime] = None, # Fim do período (inclusivo).
+    type: Optional[str] = None, # INCOME ou EXPENSE.
+    status: Optional[str] = None, # PAID, PENDING ou CANCELED.
+    category: Optional[str] = None, # Categoria da transação.
+    with_balance: bool = False, # Inclui o saldo acumulado (runningBalance) de cada transação.
+    cursor: Optional[str] = None, # Cursor da página anterior (cabeçalho X-Next-Cursor).
+    limit: Optional[int] = Query(None, ge=1, le=500), # Tamanho da página. Sem limite, retorna todas as transações.
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
     """
-    Lista todas as transações financeiras registradas.
+    Lista as transações financeiras, das mais recentes para as mais antigas, com filtros opcionais.
+    Com `limit`, usa paginação por cursor: se houver mais resultados, o cursor da
+    próxima página é retornado no cabeçalho `X-Next-Cursor`.
     Requer autenticação.
     """
-    # Chama a função CRUD para obter todas as transações do banco de dados.
-    return crud.get_transactions(db, tenant_id=current_user.tenant_id)
+    try:
+        transactions = crud.get_transactions(
+            db,
+            tenant_id=current_user.tenant_id,
+            date_from=date_from,
+            date_to=date_to,
+            type=type,
+            status=status,
+            category=category,
+            cursor=cursor,
+            limit=limit,
+            with_balance=with_balance,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if limit and len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        response.headers["X-Next-Cursor"] = crud.encode_cursor([last["date"], last["id"]])
+    return transactions
+
+@router.get("/totals", response_model=schemas.TransactionTotals)
+def get_transaction_totals(
+    date_from: Optional[datetime] = None, # Início do período (inclusivo).
+    date_to: Optional[datetime] = None, # Fim do período (inclusivo).
+    type: Optional[str] = None, # INCOME ou EXPENSE.
+    status: Optional[str] = None, # PAID, PENDING ou CANCELED.
+    category: Optional[str] = None, # Categoria da transação.
+    db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
+    current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
+):
+    """
+    Totais do período (receitas, despesas, pendentes, saldos de abertura e fechamento),
+    calculados no banco com os mesmos filtros da listagem.
+    Requer autenticação.
+    """
+    return crud.get_transaction_totals(
+        db,
+        tenant_id=current_user.tenant_id,
+        date_from=date_from,
+        date_to=date_to,
+        type=type,
+        status=status,
+        category=category,
+    )
 
 @router.post("", response_model=schemas.Transaction)
 def create_new_transaction(
     transaction: schemas.TransactionCreate, # Dados da nova transação para criação.
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db), # Injeta a sessão do banco de dados.
     current_user: schemas.User = Depends(auth.get_current_active_user) # Garante que o usuário esteja autenticado.
 ):
@@ -37,71 +93,66 @@ def create_new_transaction(
     Requer autenticação.
     """
     # Chama a função CRUD para criar a transação no banco de dados.
-    new_txn = crud.create_transaction(db=db, transaction=transaction, tenant_id=current_user.tenant_id)
+    new_txn = crud.create_transaction(db=db, transaction=transaction, tenant_id=current_user.tenant_id, commit=False)
     
     # --- N8N INTEGRATION ---
     company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
     if company and company.n8n_webhook_url:
         txn_data = schemas.Transaction.model_validate(new_txn).model_dump(mode='json')
-        background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "transaction_created", txn_data)
-        
+        webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "transaction_created", txn_data, commit=False)
+    db.commit()
+
     return new_txn
 
-@router.post("/import", response_model=List[schemas.Transaction])
+@router.post("/import", response_model=schemas.TransactionImportResult)
 async def import_financial_file(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    file: UploadFile = File(...), # Extrato em PDF, CSV ou OFX.
+    batch_size: int = Query(finance_import_service.DEFAULT_BATCH_SIZE, ge=100, le=10000), # Transações por commit.
+    date_column: Optional[str] = None, # Colunas do CSV (opcional): salvas no perfil do layout do extrato.
+    description_column: Optional[str] = None,
+    amount_column: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
     """
     Importa transações de um arquivo PDF, CSV ou OFX.
+    O arquivo é lido em streaming e gravado em lotes; lançamentos já importados
+    (mesmo documento/FITID, data e valor) são ignorados e linhas inválidas são
+    reportadas no resumo sem interromper a importação.
+    As colunas do CSV informadas (ou detectadas) ficam salvas para o layout do
+    extrato: a próxima importação do mesmo banco usa o mesmo mapeamento.
+    A leitura e a gravação rodam fora do event loop; as páginas do PDF são
+    extraídas em paralelo no pool de processos.
     """
-    content = await file.read()
-    filename = file.filename.lower()
-    
     try:
-        if filename.endswith('.csv'):
-            transactions_data = FinanceImportService.parse_csv(content)
-        elif filename.endswith('.pdf'):
-            transactions_data = FinanceImportService.parse_pdf(content)
-        elif filename.endswith('.ofx'):
-            transactions_data = FinanceImportService.parse_ofx(content)
+        if (file.filename or "").lower().endswith(".pdf"):
+            summary = await finance_import_service.import_pdf(
+                db, tenant_id=current_user.tenant_id, file_obj=file.file, batch_size=batch_size, commit=False
+            )
         else:
-            raise HTTPException(status_code=400, detail="Formato de arquivo não suportado. Use PDF, CSV ou OFX.")
-
-        imported_transactions = []
-        for txn_data in transactions_data:
-            # Add tenant_id and map to schema
-            txn_create = schemas.TransactionCreate(
-                type=txn_data.get("type", "EXPENSE"),
-                category=txn_data.get("category", "Importado"),
-                description=txn_data.get("description", "Sem descrição"),
-                amount=txn_data.get("amount", 0.0),
-                date=txn_data.get("date"),
-                status=txn_data.get("status", "PAID"),
-                document_number=txn_data.get("document_number")
+            resolver = finance_import_service.column_resolver(db, current_user.tenant_id, {
+                "date": date_column, "description": description_column, "amount": amount_column
+            })
+            rows = FinanceImportService.iter_file(file.file, file.filename, resolve_columns=resolver)
+            summary = await asyncio.to_thread(
+                finance_import_service.import_transactions,
+                db, tenant_id=current_user.tenant_id, rows=rows, batch_size=batch_size, commit=False
             )
-            # Save to DB
-            new_txn = crud.create_transaction(db=db, transaction=txn_create, tenant_id=current_user.tenant_id)
-            imported_transactions.append(new_txn)
-            
-        # --- N8N INTEGRATION ---
-        if imported_transactions:
-            company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
-            if company and company.n8n_webhook_url:
-                summary_data = {
-                    "count": len(imported_transactions),
-                    "filename": file.filename,
-                    "total_amount": sum(t.amount for t in imported_transactions),
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
-                background_tasks.add_task(integrations.trigger_n8n_event, company.n8n_webhook_url, "transactions_imported", summary_data)
-
-        return imported_transactions
-
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        print(f"Erro na importação: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro interno ao processar importação: {str(e)}")
+
+    # --- N8N INTEGRATION ---
+    if summary["imported"]:
+        company = crud.get_company_info(db, tenant_id=current_user.tenant_id)
+        if company and company.n8n_webhook_url:
+            summary_data = {
+                "count": summary["imported"],
+                "duplicates": summary["duplicates"],
+                "filename": file.filename,
+                "total_amount": summary["total_amount"],
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+            webhook_outbox.publish(db, current_user.tenant_id, company.n8n_webhook_url, "transactions_imported", summary_data, commit=False)
+    db.commit()
+
+    return summary
@@ -19,8 +19,9 @@ def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), c
     return users
 
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: schemas.User = Depends(auth.get_current_active_user)):
-    return current_user
+def read_users_me(db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_active_user)):
+    # Lê do banco: o usuário autenticado pode vir só das claims do token (AUTH_PRINCIPAL_MODE=token).
+    return db.query(models.User).filter(models.User.id == current_user.id).first() or current_user
 
 @router.patch("/me/complete-onboarding")
 def complete_onboarding(
@@ -45,6 +46,7 @@ def complete_onboarding(
     db_user.preferences = prefs
     db.commit()
     db.refresh(db_user)
+    auth.invalidate_user(db_user.id) # Descarta o usuário do cache de autenticação
     
     return {"status": "success", "onboarding_completed": True}
 
@@ -70,4 +72,5 @@ def update_user_me(
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    auth.invalidate_user(db_user.id) # Descarta o usuário do cache de autenticação
     return db_user
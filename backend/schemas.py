@@ -295,6 +295,23 @@ class Part(PartBase):
     """
     id: int # ID único da peça.
     last_price_updated_at: Optional[datetime] = None # Data última atualização automática.
+    version: Optional[int] = None # Versão da linha (mesmo valor do ETag; enviar em If-Match ao alterar).
+
+class PartImportError(CamelModel):
+    """
+    Schema para uma linha rejeitada na importação em lote de peças.
+    """
+    row: int # Número da linha no arquivo (o cabeçalho é a linha 1).
+    error: str # Motivo da rejeição.
+
+class PartImportResult(CamelModel):
+    """
+    Schema para o resumo da importação em lote de peças (CSV/XLSX).
+    """
+    processed: int # Linhas de dados lidas (exceto linhas em branco).
+    upserted: int # Peças criadas ou atualizadas.
+    error_count: int # Total de linhas rejeitadas.
+    errors: List[PartImportError] = [] # Detalhe das linhas rejeitadas (limitado).
 
 # --- SERVICE ITEM SCHEMAS ---
 # Esquemas para validação e serialização de dados relacionados a itens de serviço.
@@ -317,6 +334,16 @@ class ServiceItemCreate(ServiceItemBase):
     """
     pass
 
+class ServiceItemUpdate(CamelModel):
+    """
+    Schema para atualização de um item de serviço. Todos os campos são opcionais.
+    """
+    description: Optional[str] = None
+    quantity: Optional[float] = None
+    unit_cost: Optional[float] = None
+    unit_price: Optional[float] = None
+    total: Optional[float] = None # Se omitido e quantidade/preço mudarem, é recalculado.
+
 class ServiceItem(ServiceItemBase):
     """
     Schema para representação completa de um item de serviço.
@@ -394,6 +421,7 @@ class ServiceOrder(ServiceOrderBase):
     id: int # ID único da OS.
     total_value: float # Valor total da OS.
     created_at: datetime # Data de criação.
+    version: Optional[int] = None # Versão da linha (mesmo valor do ETag; enviar em If-Match ao alterar).
     items: Optional[List[ServiceItem]] = [] # Lista de itens de serviço.
     notes: Optional[List[OrderNote]] = [] # Lista de notas.
     checklist: Optional[List[Dict[str, Any]]] = []
@@ -410,6 +438,35 @@ class ServiceOrder(ServiceOrderBase):
     phone: Optional[str] = None
 
 
+class ServiceOrderSummary(CamelModel):
+    """
+    Projeção enxuta de uma ordem de serviço para listagens (kanban/lista).
+    Itens e notas só são preenchidos quando solicitados (?include=items,notes);
+    o checklist não faz parte da projeção (ver ServiceOrder).
+    """
+    id: int
+    boat_id: int
+    engine_id: Optional[int] = None
+    description: str
+    diagnosis: Optional[str] = None
+    status: OSStatus
+    total_value: float = 0
+    created_at: Optional[datetime] = None
+    requester: Optional[str] = None
+    technician_name: Optional[str] = None
+    technician_id: Optional[int] = None
+    scheduled_at: Optional[datetime] = None
+    estimated_duration: Optional[int] = None
+    items: Optional[List[ServiceItem]] = None
+    notes: Optional[List[OrderNote]] = None
+
+    boat_name: Optional[str] = None
+    client_name: Optional[str] = None
+    client_phone: Optional[str] = None
+    client_email: Optional[str] = None
+    client_telegram_id: Optional[str] = None
+
+
 # --- TRANSACTION SCHEMAS ---
 # Esquemas para validação e serialização de dados relacionados a transações financeiras.
 
@@ -438,6 +495,35 @@ class Transaction(TransactionBase):
     """
     id: int # ID único da transação.
 
+class TransactionLedgerEntry(Transaction):
+    """
+    Schema de uma linha do extrato de transações (GET /api/transactions).
+    """
+    running_balance: Optional[float] = None # Saldo acumulado após a transação (com ?with_balance=true).
+
+class TransactionTotals(CamelModel):
+    """
+    Schema dos totais do período do extrato de transações.
+    """
+    income: float # Soma das receitas do período.
+    expense: float # Soma das despesas do período.
+    balance: float # Receitas - despesas do período.
+    pending: float # Soma das transações pendentes do período.
+    count: int # Quantidade de transações do período.
+    opening_balance: float # Saldo das transações anteriores ao início do período.
+    closing_balance: float # Saldo de abertura + saldo do período.
+
+class TransactionImportResult(CamelModel):
+    """
+    Schema para o resumo da importação de extrato bancário (CSV, OFX ou PDF).
+    """
+    processed: int # Lançamentos lidos do arquivo (válidos ou não).
+    imported: int # Transações gravadas.
+    duplicates: int # Lançamentos ignorados por já terem sido importados.
+    error_count: int # Linhas rejeitadas (data ou valor inválido).
+    errors: List[PartImportError] = [] # Detalhe das linhas rejeitadas (limitado).
+    total_amount: float # Soma dos valores gravados.
+
 # --- STOCK MOVEMENT SCHEMAS ---
 # Esquemas para validação e serialização de dados relacionados a movimentos de estoque.
 
@@ -465,6 +551,51 @@ class StockMovement(StockMovementBase):
     id: int # ID único do movimento.
     date: datetime # Data e hora do movimento.
 
+class InvoiceEntryItem(CamelModel):
+    """
+    Schema de um item de uma nota de entrada já vinculado a uma peça.
+    """
+    part_id: int # ID da peça recebida.
+    quantity: float = Field(gt=0) # Quantidade recebida.
+
+class InvoiceEntryCreate(CamelModel):
+    """
+    Schema para a entrada de estoque por nota fiscal.
+    """
+    number: str = Field(min_length=1) # Número da nota fiscal (único por tenant).
+    supplier: str = Field(min_length=1) # Fornecedor da nota.
+    date: Optional[datetime] = None # Data da emissão (padrão: agora).
+    total_value: float = 0 # Valor total da nota.
+    xml_key: Optional[str] = None # Chave de acesso do XML (opcional).
+    items: List[InvoiceEntryItem] = Field(min_length=1) # Itens vinculados a peças.
+
+class Invoice(CamelModel):
+    """
+    Schema para representação de uma nota fiscal de entrada.
+    """
+    id: int
+    number: str
+    supplier: str
+    date: datetime
+    total_value: Optional[float] = 0
+    xml_key: Optional[str] = None
+    imported_at: Optional[datetime] = None
+
+class KardexEntry(StockMovement):
+    """
+    Schema de uma linha do Kardex da peça.
+    """
+    balance: float # Saldo da peça após o movimento.
+
+class PartStockAsOf(CamelModel):
+    """
+    Schema da quantidade de uma peça em uma data.
+    """
+    part_id: int # ID da peça.
+    sku: str # SKU da peça.
+    name: str # Nome da peça.
+    quantity: float # Quantidade em estoque na data.
+
 # --- CONFIG SCHEMAS ---
 # Esquemas para validação e serialização de dados relacionados à configuração da aplicação.
 
@@ -771,3 +902,170 @@ class TechnicalDelivery(TechnicalDeliveryBase):
     date: datetime
     created_at: datetime
     updated_at: datetime
+
+# --- BACKGROUND JOB SCHEMAS ---
+# Esquemas para acompanhamento de tarefas em segundo plano (ex: sincronização Mercury em lote).
+
+class BackgroundJob(CamelModel):
+    """
+    Schema para o progresso de uma tarefa em segundo plano.
+    """
+    id: int
+    kind: str # Tipo de tarefa (ex: mercury_price_sync).
+    status: str # PENDING, RUNNING, COMPLETED, FAILED.
+    total: int = 0 # Itens a processar.
+    processed: int = 0 # Itens já processados.
+    error: Optional[str] = None # Mensagem de erro se FAILED.
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class BackgroundJobResult(BackgroundJob):
+    """
+    Schema para uma tarefa com o resultado por item.
+    """
+    results: List[Dict[str, Any]] = []
+
+
+# --- INVENTORY REPORT SCHEMAS ---
+# Esquemas do relatório de inventário (ver services/inventory_report_service.py).
+
+class InventoryReportItem(CamelModel):
+    """
+    Linha do relatório de inventário para um SKU.
+    """
+    part_id: int
+    sku: str
+    name: str
+    quantity: float # Estoque atual.
+    cost: float # Custo unitário.
+    stock_value: float # Estoque x custo.
+    consumption: float # Quantidade consumida nos últimos 12 meses (OS e vendas diretas).
+    consumption_value: float # Consumo x custo.
+    abc_class: str # Classe na curva ABC (A, B ou C).
+    days_of_cover: Optional[float] = None # Dias de estoque no ritmo de consumo (sem consumo: null).
+    turnover: Optional[float] = None # Giro: consumo / estoque atual.
+
+class InventoryAbcClass(CamelModel):
+    """
+    Totais de uma classe da curva ABC.
+    """
+    abc_class: str
+    sku_count: int
+    stock_value: float
+    consumption_value: float
+    share: float # Fração do valor de consumo total.
+
+class InventoryReportSummary(CamelModel):
+    """
+    Resumo do relatório de inventário do dia.
+    """
+    day: str # Dia do cálculo (AAAA-MM-DD).
+    generated_at: datetime
+    sku_count: int
+    total_quantity: float
+    stock_value: float # Valor do estoque a custo.
+    sale_value: float # Valor do estoque a preço de venda.
+    consumption_value: float # Valor consumido nos últimos 12 meses.
+    turnover: Optional[float] = None # Giro do estoque: consumo / valor do estoque.
+    abc: List[InventoryAbcClass] = []
+    dead_stock_count: int # Peças com estoque e sem consumo em 12 meses.
+    dead_stock_value: float
+    dead_stock: List[InventoryReportItem] = [] # Maiores valores parados (limitado).
+    low_cover_count: int # Peças com cobertura abaixo de 30 dias.
+    low_cover: List[InventoryReportItem] = [] # Menores coberturas (limitado).
+
+class InventoryReportItemsPage(CamelModel):
+    """
+    Página das linhas por SKU do relatório de inventário.
+    """
+    total: int # Linhas após os filtros.
+    items: List[InventoryReportItem] = []
+
+# Esquemas do plano de reposição (ver services/reorder_planner_service.py).
+
+class ReorderPlanItem(CamelModel):
+    """
+    Peça a comprar no plano de reposição.
+    """
+    part_id: int
+    sku: str
+    name: str
+    quantity: float # Estoque atual.
+    min_stock: float # Estoque mínimo.
+    forecast: float # Consumo previsto no horizonte (média histórica).
+    scheduled: float # Quantidade reservada por OS em aberto.
+    kits: float # Quantidade dos kits de revisões próximas.
+    suggested_quantity: float # Quantidade sugerida para compra (arredondada para cima).
+    cost: float # Custo unitário.
+    estimated_cost: float # Quantidade sugerida x custo.
+
+class ReorderPlanSupplier(CamelModel):
+    """
+    Compras de um fornecedor no plano de reposição.
+    """
+    supplier: str # Fornecedor da última nota de entrada (ou fabricante da peça).
+    item_count: int
+    total_cost: float
+    items: List[ReorderPlanItem] = []
+
+class ReorderPlan(CamelModel):
+    """
+    Plano de reposição consolidado por fornecedor.
+    """
+    generated_at: datetime
+    horizon_days: int # Dias cobertos pelo plano.
+    history_days: int # Janela do consumo médio.
+    item_count: int
+    total_cost: float
+    suppliers: List[ReorderPlanSupplier] = []
+
+# --- DASHBOARD SCHEMAS ---
+# Esquemas dos indicadores do dashboard (ver services/dashboard_service.py).
+
+class DashboardMonth(CamelModel):
+    """
+    Receitas e despesas de um mês (consolidado diário somado).
+    """
+    month: str # Mês no formato AAAA-MM.
+    income: float
+    expense: float
+    orders_completed: int # Receitas geradas pela conclusão de OS no mês.
+
+class DashboardSummary(CamelModel):
+    """
+    Indicadores do dashboard, calculados no banco.
+    """
+    total_revenue: float # Soma de todas as transações INCOME.
+    total_expense: float # Soma de todas as transações EXPENSE.
+    revenue_by_month: List[DashboardMonth]
+    orders_by_status: Dict[str, int] # Quantidade de OS por status (todos os status, inclusive zerados).
+    open_orders: int # OS que não estão concluídas nem canceladas.
+    low_stock_count: int # Peças com quantidade <= estoque mínimo.
+
+
+# --- WEBHOOK SCHEMAS ---
+# Situação do outbox de webhooks do n8n (ver services/webhook_outbox.py).
+
+class WebhookProcessMetrics(CamelModel):
+    """
+    Contadores de entrega do processo da API desde o startup.
+    """
+    requests: int # POSTs feitos (um envio agrupado conta uma vez).
+    delivered: int # Eventos entregues.
+    batches: int # Envios agrupados.
+    errors: int # Tentativas com erro (inclui as que serão repetidas).
+    failed: int # Eventos descartados após esgotar as tentativas.
+    avg_latency_ms: Optional[float] = None
+
+class WebhookStatus(CamelModel):
+    """
+    Situação das entregas de webhook do tenant.
+    """
+    pending: int # Aguardando entrega ou nova tentativa.
+    delivered: int
+    failed: int
+    oldest_pending_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    process: WebhookProcessMetrics
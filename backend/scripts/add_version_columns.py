@@ -0,0 +1,34 @@
+"""
+Adiciona a coluna de versão (concorrência otimista, ver models.Part) às tabelas
+parts e service_orders de bancos criados antes dela. As linhas existentes
+começam na versão 1.
+Uso: python scripts/add_version_columns.py
+"""
+
+import sys
+import os
+from sqlalchemy import text, inspect
+
+# Add backend dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import engine
+
+TABLES = ("parts", "service_orders")
+
+def add_columns():
+    inspector = inspect(engine)
+    with engine.connect() as conn:
+        for table in TABLES:
+            columns = [col['name'] for col in inspector.get_columns(table)]
+            if 'version' in columns:
+                print(f"{table}.version already exists.")
+                continue
+            print(f"Adding {table}.version column...")
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+            print(f"{table}.version added.")
+        conn.commit()
+    print("Schema verification completed.")
+
+if __name__ == "__main__":
+    add_columns()
@@ -1,52 +1,37 @@
-import os
-import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, joinedload
-from models import ServiceOrder
+"""
+Confere (e opcionalmente corrige) as OS cujo total diverge da soma dos itens.
+A mesma conciliação roda periodicamente na API (services/order_totals_service.py);
+este script serve para uma verificação manual.
+Uso: python scripts/check_integrity.py [--tenant-id 1] [--fix]
+"""
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
+import sys
+import os
+import argparse
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    print("DATABASE_URL mismatch")
-    sys.exit(1)
+# Add backend dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+from backend.database import SessionLocal
+from backend.services import order_totals_service
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-db = SessionLocal()
+def main():
+    parser = argparse.ArgumentParser(description="Conciliação do valor total das Ordens de Serviço.")
+    parser.add_argument("--tenant-id", type=int, default=None)
+    parser.add_argument("--fix", action="store_true", help="Corrige os totais divergentes")
+    args = parser.parse_args()
 
-try:
-    orders = db.query(ServiceOrder).options(joinedload(ServiceOrder.items)).all()
-    print(f"Checking {len(orders)} orders for consistency...")
+    db = SessionLocal()
+    try:
+        drifted = order_totals_service.reconcile_order_totals(db, tenant_id=args.tenant_id, fix=args.fix)
+    finally:
+        db.close()
 
-    import models
-    total_items_in_db = db.query(models.ServiceItem).count()
-    print(f"Total items in 'service_items' table: {total_items_in_db}")
-    
-    inconsistent_count = 0
-    for order in orders:
-        calculated_total = sum(item.total for item in order.items)
-        # Use simple epsilon for float comparison or just round to 2 decimals
-        if abs(calculated_total - order.total_value) > 0.01:
-            print(f"Mismatch in Order #{order.id}: DB Total={order.total_value:.2f}, Items Sum={calculated_total:.2f}")
-            inconsistent_count += 1
-            
-            # Uncomment to fix automatically
-            # order.total_value = calculated_total
-            # db.add(order)
-    
-    # if inconsistent_count > 0:
-    #     db.commit()
-    #     print("Fixed totals.")
-            
-    print(f"\nFound {inconsistent_count} orders with mismatched totals.")
+    for order in drifted:
+        print(f"Mismatch in Order #{order['id']}: DB Total={order['total_value'] or 0:.2f}, Items Sum={order['items_total']:.2f}")
+    print(f"\nFound {len(drifted)} orders with mismatched totals.")
+    if drifted and args.fix:
+        print("Fixed totals.")
 
-finally:
-    db.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cria no banco as colunas e os índices declarados nos modelos que ainda não existem.
+
+O `create_all` da inicialização só cria colunas e índices de tabelas novas; em
+bancos já existentes (Supabase) os adicionados depois precisam ser criados à parte.
+Colunas novas são criadas sempre como anuláveis.
+Índices únicos só são criados se não houver valores duplicados; caso contrário
+o script lista as duplicatas, pula o índice e termina com código de saída 1.
+Uso: python scripts/create_missing_indexes.py
+"""
+
+import sys
+import os
+from sqlalchemy import func, inspect, select, text
+
+# Add backend dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import engine
+from backend import models
+from backend.services import part_search_service
+
+# Orientação para resolver duplicatas, por índice único. Os demais usam a genérica.
+DUPLICATE_INSTRUCTIONS = {
+    "uq_parts_tenant_sku": (
+        "Cada SKU deve existir uma única vez por tenant. Para cada SKU listado, mantenha uma "
+        "peça e altere o SKU das demais (ou transfira seus movimentos e itens de OS para a "
+        "peça mantida e exclua-as); depois rode este script novamente."
+    ),
+}
+
+
+def find_duplicates(conn, index, limit: int = 20):
+    """Valores repetidos (ignorando NULL) das colunas de um índice único, com a quantidade de linhas."""
+    columns = list(index.columns)
+    query = (
+        select(*columns, func.count().label("total"))
+        .where(*[column.isnot(None) for column in columns])
+        .group_by(*columns)
+        .having(func.count() > 1)
+        .limit(limit)
+    )
+    return conn.execute(query).all()
+
+
+def create_missing_indexes() -> bool:
+    """Cria colunas e índices ausentes. Retorna False se algum índice único foi pulado por duplicatas."""
+    print("Verificando índices declarados nos modelos...")
+    inspector = inspect(engine)
+    ok = True
+
+    for table in models.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            print(f"Tabela '{table.name}' não existe. Será criada pelo create_all da aplicação.")
+            continue
+
+        columns = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            print(f"Criando coluna {column.name} em {table.name}...")
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                with engine.connect() as conn:
+                    duplicates = find_duplicates(conn, index)
+                if duplicates:
+                    ok = False
+                    columns = ", ".join(column.name for column in index.columns)
+                    print(f"ERRO: índice único {index.name} não criado: há valores repetidos em {table.name} ({columns}):")
+                    for *values, total in duplicates:
+                        print(f"  {tuple(values)}: {total} linhas")
+                    print("  " + DUPLICATE_INSTRUCTIONS.get(
+                        index.name,
+                        "Remova ou corrija as linhas repetidas e rode este script novamente."
+                    ))
+                    continue
+            print(f"Criando índice {index.name} em {table.name}...")
+            index.create(bind=engine, checkfirst=True)
+
+    # Índices de busca específicos do dialeto (pg_trgm/tsvector ou FTS5).
+    print("Verificando índices de busca de peças...")
+    with engine.begin() as conn:
+        part_search_service.ensure_search_index(conn)
+
+    print("Verificação de índices concluída." if ok else "Verificação concluída com índices pendentes (ver erros acima).")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if create_missing_indexes() else 1)
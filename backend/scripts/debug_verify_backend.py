@@ -54,7 +54,6 @@ def test_workflow():
         updated_info = crud.update_company_info(db, update_data, user.tenant_id)
         
         # Verify
-        db.refresh(updated_info)
         print(f"   Updated Mercury User: {updated_info.mercury_username}")
         print(f"   Updated Mercury Pass: {updated_info.mercury_password}")
 
@@ -0,0 +1,42 @@
+"""
+Importa peças em lote (CSV/XLSX) diretamente no banco, sem passar pela API.
+Útil para tabelas de preço grandes (dezenas de milhares de SKUs).
+Uso: python scripts/import_parts.py tabela.csv --tenant-id 1 [--batch-size 2000]
+"""
+
+import sys
+import os
+import argparse
+
+# Add backend dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import SessionLocal
+from backend.services import part_import_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Importação em lote de peças (CSV/XLSX).")
+    parser.add_argument("path", help="Arquivo CSV ou XLSX")
+    parser.add_argument("--tenant-id", type=int, required=True)
+    parser.add_argument("--batch-size", type=int, default=part_import_service.DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            rows = part_import_service.iter_file_rows(f, args.path)
+            summary = part_import_service.import_parts(db, args.tenant_id, rows, batch_size=args.batch_size)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"Linhas processadas: {summary['processed']}")
+    print(f"Peças gravadas: {summary['upserted']}")
+    print(f"Linhas com erro: {summary['error_count']}")
+    for error in summary["errors"]:
+        print(f"  Linha {error['row']}: {error['error']}")
+
+if __name__ == "__main__":
+    main()
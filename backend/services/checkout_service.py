@@ -0,0 +1,119 @@
+"""
+Venda direta de peças no balcão (PDV).
+
+O carrinho inteiro é processado em uma única transação: as peças são lidas
+de uma vez (sem bloqueio), o estoque de todas é baixado com um único UPDATE
+condicional (quantity = quantity - :n apenas onde quantity >= :n, ver
+crud.adjust_part_quantities) e os movimentos de estoque e a receita são
+gravados com um único commit. Vendas simultâneas da mesma peça não perdem a
+baixa uma da outra nem deixam o estoque negativo. Uma venda de 30 itens faz
+poucas consultas, e não uma ou mais por item.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from backend import crud, models, schemas
+from backend.services import dashboard_service
+
+
+class CheckoutError(ValueError):
+    """Venda recusada (peça inexistente ou estoque insuficiente). `status_code` é o HTTP sugerido."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def process_quick_sale(db: Session, sale: schemas.QuickSaleRequest, tenant_id: int, user_name: str, commit: bool = True) -> Dict[str, Any]:
+    """
+    Valida e baixa o estoque de todo o carrinho e registra a receita, com um único commit
+    (com commit=False, o caller faz o commit). Se qualquer item for recusado, nada é gravado.
+    Returns:
+        dict: total_value, items (resumo 'Nx Nome') e low_stock (peças que ficaram
+              no estoque mínimo ou abaixo, com a quantidade atualizada).
+    Raises:
+        CheckoutError: 404 se uma peça não existir no tenant, 400 se faltar estoque
+            (409 se o estoque mudar entre a baixa recusada e a conferência).
+    """
+    # Quantidade total por peça (a mesma peça pode aparecer em várias linhas).
+    requested: Dict[int, float] = {}
+    for item in sale.items:
+        requested[item.part_id] = requested.get(item.part_id, 0) + item.quantity
+
+    parts = db.query(models.Part.id, models.Part.sku, models.Part.name, models.Part.price).filter(
+        models.Part.id.in_(list(requested)),
+        models.Part.tenant_id == tenant_id
+    ).all()
+    parts_by_id = {part.id: part for part in parts}
+    for item in sale.items:
+        if item.part_id not in parts_by_id:
+            raise CheckoutError(404, f"Peça ID {item.part_id} não encontrada.")
+
+    # Baixa condicional de todo o carrinho: se alguma peça não tiver estoque, nada é gravado.
+    updated = crud.adjust_part_quantities(db, tenant_id, {part_id: -quantity for part_id, quantity in requested.items()}, require_stock=True)
+    if updated < len(requested):
+        db.rollback()
+        available = dict(db.query(models.Part.id, models.Part.quantity).filter(
+            models.Part.id.in_(list(requested)), models.Part.tenant_id == tenant_id
+        ).all())
+        for part_id, quantity in requested.items():
+            if (available.get(part_id) or 0) < quantity:
+                part = parts_by_id[part_id]
+                raise CheckoutError(400, f"Estoque insuficiente para {part.name} (SKU: {part.sku}). Disponível: {available.get(part_id)}")
+        raise CheckoutError(409, "O estoque foi alterado durante a venda. Tente novamente.")
+
+    total_sale_value = 0.0
+    items_summary: List[str] = []
+    movements = []
+    for item in sale.items:
+        part = parts_by_id[item.part_id]
+
+        # Calculo de valores para este item
+        unit_price = part.price
+        discount_amount = unit_price * (item.discount_percent / 100.0)
+        final_unit_price = unit_price - discount_amount
+        total_sale_value += final_unit_price * item.quantity
+
+        movements.append({
+            "tenant_id": tenant_id,
+            "part_id": part.id,
+            "type": models.MovementType.SALE_DIRECT,
+            "quantity": item.quantity,
+            "description": f"Venda Direta PDV - Desc: {item.discount_percent}%",
+            "user": user_name,
+        })
+        items_summary.append(f"{item.quantity}x {part.name}")
+
+    if movements:
+        db.execute(insert(models.StockMovement), movements)
+
+    if total_sale_value > 0:
+        transaction = models.Transaction(
+            tenant_id=tenant_id,
+            description=f"Venda Balcão ({sale.payment_method or 'DINHEIRO'}): {', '.join(items_summary)[:100]}. Obs: {sale.notes or ''}",
+            amount=total_sale_value,
+            type="INCOME", # Receita
+            category="VENDAS_PECAS",
+            date=datetime.now(timezone.utc)
+        )
+        db.add(transaction)
+        dashboard_service.apply_transactions(db, tenant_id, [transaction])
+
+    # Quantidades já baixadas, lidas na mesma transação (uma consulta para o carrinho).
+    low_stock = [
+        dict(row._mapping) for row in db.query(
+            models.Part.id, models.Part.sku, models.Part.name, models.Part.quantity, models.Part.min_stock
+        ).filter(
+            models.Part.id.in_(list(requested)),
+            models.Part.tenant_id == tenant_id,
+            models.Part.quantity <= func.coalesce(models.Part.min_stock, 0)
+        ).order_by(models.Part.id).all()
+    ]
+    if commit:
+        db.commit()
+    return {"total_value": total_sale_value, "items": items_summary, "low_stock": low_stock}
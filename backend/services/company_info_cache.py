@@ -0,0 +1,122 @@
+"""
+Cache em memória das informações da empresa (CompanyInfo) por tenant.
+
+Quase toda rota de escrita lê a empresa para obter o n8n_webhook_url. Em vez
+de uma consulta e três descriptografias Fernet por requisição, guardamos um
+snapshot imutável por tenant (com as credenciais ainda criptografadas, como no
+banco) e, separadamente, o texto claro de cada valor criptografado já aberto.
+O objeto ORM nunca é alterado: nada descriptografado volta para o banco.
+
+crud.update_company_info (e quem alterar a empresa por fora do crud, como a
+numeração da NF-e) deve chamar invalidate(tenant_id). A validade limita a
+defasagem entre processos.
+
+- COMPANY_INFO_CACHE_TTL_SECONDS: validade do snapshot (padrão 300).
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from pydantic import ConfigDict
+
+from backend import models, schemas
+from backend.security import decrypt_value
+
+CACHE_TTL_SECONDS = int(os.getenv("COMPANY_INFO_CACHE_TTL_SECONDS", "300"))
+MAX_PLAINTEXTS = 1000
+
+SECRET_FIELDS = ("mercury_username", "mercury_password", "cert_password")
+
+
+class CompanyInfoSnapshot(schemas.CompanyInfo):
+    """Cópia imutável da linha CompanyInfo de um tenant."""
+    model_config = ConfigDict(frozen=True)
+
+    tenant_id: Optional[int] = None
+
+
+class CompanyInfoCache:
+    """Snapshots por tenant (com validade) e texto claro por valor criptografado."""
+
+    def __init__(self, ttl: int = CACHE_TTL_SECONDS, max_plaintexts: int = MAX_PLAINTEXTS):
+        self.ttl = ttl
+        self.max_plaintexts = max_plaintexts
+        self._snapshots: Dict[int, Tuple[float, Optional[CompanyInfoSnapshot]]] = {}
+        self._generations: Dict[int, int] = {}
+        self._plaintexts: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock() # Rotas síncronas rodam no threadpool
+
+    def get(self, tenant_id: int) -> Tuple[bool, Optional[CompanyInfoSnapshot]]:
+        """Returns: (encontrado, snapshot). O snapshot pode ser None (tenant sem empresa cadastrada)."""
+        with self._lock:
+            entry = self._snapshots.get(tenant_id)
+            if entry is None:
+                return False, None
+            expires_at, snapshot = entry
+            if expires_at <= time.monotonic():
+                del self._snapshots[tenant_id]
+                return False, None
+            return True, snapshot
+
+    def generation(self, tenant_id: int) -> int:
+        with self._lock:
+            return self._generations.get(tenant_id, 0)
+
+    def set(self, tenant_id: int, snapshot: Optional[CompanyInfoSnapshot], generation: int):
+        """Guarda o snapshot lido na `generation` informada; ignora se houve invalidação no meio."""
+        with self._lock:
+            if self._generations.get(tenant_id, 0) == generation:
+                self._snapshots[tenant_id] = (time.monotonic() + self.ttl, snapshot)
+
+    def invalidate(self, tenant_id: int):
+        with self._lock:
+            self._snapshots.pop(tenant_id, None)
+            self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._plaintexts.clear()
+
+    def plaintext(self, value: Optional[str]) -> Optional[str]:
+        """Texto claro de um valor do banco ('enc:...'), descriptografado uma única vez."""
+        if not value or not value.startswith("enc:"):
+            return value
+        with self._lock:
+            plain = self._plaintexts.get(value)
+            if plain is not None:
+                self._plaintexts.move_to_end(value)
+                return plain
+        plain = decrypt_value(value)
+        with self._lock:
+            self._plaintexts[value] = plain
+            while len(self._plaintexts) > self.max_plaintexts:
+                self._plaintexts.popitem(last=False)
+        return plain
+
+# Instância única por processo.
+cache = CompanyInfoCache()
+
+
+def load(db, tenant_id: int) -> Optional[CompanyInfoSnapshot]:
+    """
+    Snapshot da empresa do tenant, com as credenciais descriptografadas.
+    Consulta o banco apenas se não houver snapshot válido em cache.
+    """
+    found, snapshot = cache.get(tenant_id)
+    if not found:
+        generation = cache.generation(tenant_id)
+        db_info = db.query(models.CompanyInfo).filter(models.CompanyInfo.tenant_id == tenant_id).first()
+        snapshot = CompanyInfoSnapshot.model_validate(db_info) if db_info else None
+        cache.set(tenant_id, snapshot, generation)
+    if snapshot is None:
+        return None
+    return snapshot.model_copy(update={field: cache.plaintext(getattr(snapshot, field)) for field in SECRET_FIELDS})
+
+
+def invalidate(tenant_id: int):
+    """Descarta o snapshot do tenant (chamar após alterar a empresa)."""
+    cache.invalidate(tenant_id)
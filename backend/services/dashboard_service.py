@@ -0,0 +1,200 @@
+"""
+Indicadores do dashboard calculados no banco.
+
+Receitas e despesas vêm do consolidado diário por tenant (tabela
+tenant_daily_summaries): a leitura custa O(dias), e não O(transações).
+O consolidado é mantido de forma incremental (apply_transactions, na mesma
+transação de banco que cria ou remove a transação financeira) e reconstruído
+por completo periodicamente, para absorver alterações feitas fora da aplicação.
+OS por status e peças com estoque baixo são contadas com GROUP BY/COUNT sobre
+os índices por tenant.
+
+- DASHBOARD_ROLLUP_REBUILD_SECONDS: intervalo da reconstrução (0 desativa).
+"""
+
+import os
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.services import job_queue
+
+logger = logging.getLogger(__name__)
+
+REBUILD_INTERVAL_SECONDS = int(os.getenv("DASHBOARD_ROLLUP_REBUILD_SECONDS", "86400"))
+DEFAULT_MONTHS = 12
+
+COUNTERS = ("income", "expense", "transactions_count", "orders_completed")
+CLOSED_STATUSES = (models.OSStatus.COMPLETED, models.OSStatus.CANCELED)
+
+
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _empty_counters() -> Dict[str, float]:
+    return {counter: 0 for counter in COUNTERS}
+
+
+def _daily_deltas(transactions: Iterable[models.Transaction], sign: int) -> Dict[date, Dict[str, float]]:
+    per_day: Dict[date, Dict[str, float]] = {}
+    for transaction in transactions:
+        delta = per_day.setdefault(_day(transaction.date), _empty_counters())
+        amount = (transaction.amount or 0) * sign
+        if transaction.type == "INCOME":
+            delta["income"] += amount
+            if transaction.order_id:
+                delta["orders_completed"] += sign
+        elif transaction.type == "EXPENSE":
+            delta["expense"] += amount
+        delta["transactions_count"] += sign
+    return per_day
+
+
+def _increment(db: Session, tenant_id: int, deltas: Dict[date, Dict[str, float]]):
+    """
+    Soma os `deltas` ao consolidado de cada dia. Com um único comando
+    INSERT ... ON CONFLICT DO UPDATE (executemany) quando o dialeto suporta.
+    """
+    table = models.TenantDailySummary.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "day"],
+            set_={counter: table.c[counter] + stmt.excluded[counter] for counter in COUNTERS},
+        ), [{"tenant_id": tenant_id, "day": day, **delta} for day, delta in deltas.items()])
+        return
+
+    for day, delta in deltas.items():
+        row = db.query(models.TenantDailySummary).filter(
+            models.TenantDailySummary.tenant_id == tenant_id,
+            models.TenantDailySummary.day == day
+        ).with_for_update().first()
+        if row is None:
+            db.add(models.TenantDailySummary(tenant_id=tenant_id, day=day, **delta))
+        else:
+            for counter in COUNTERS:
+                setattr(row, counter, (getattr(row, counter) or 0) + delta[counter])
+
+
+def apply_transactions(db: Session, tenant_id: int, transactions: Iterable[models.Transaction], sign: int = 1):
+    """
+    Atualiza o consolidado diário com transações criadas (sign=1) ou removidas (sign=-1).
+    Deve ser chamada antes do commit de quem grava as transações. Não faz commit.
+    """
+    deltas = _daily_deltas(transactions, sign)
+    if deltas:
+        _increment(db, tenant_id, deltas)
+
+
+def rebuild(db: Session, tenant_id: Optional[int] = None):
+    """Reconstrói o consolidado a partir das transações com um único INSERT ... SELECT (com commit)."""
+    summaries = db.query(models.TenantDailySummary)
+    if tenant_id is not None:
+        summaries = summaries.filter(models.TenantDailySummary.tenant_id == tenant_id)
+    summaries.delete(synchronize_session=False)
+
+    transaction = models.Transaction
+    day = func.date(transaction.date)
+    source = select(
+        transaction.tenant_id,
+        day,
+        func.sum(case((transaction.type == "INCOME", transaction.amount), else_=0)),
+        func.sum(case((transaction.type == "EXPENSE", transaction.amount), else_=0)),
+        func.count(transaction.id),
+        func.sum(case(((transaction.type == "INCOME") & transaction.order_id.isnot(None), 1), else_=0)),
+    ).group_by(transaction.tenant_id, day)
+    if tenant_id is not None:
+        source = source.where(transaction.tenant_id == tenant_id)
+
+    db.execute(insert(models.TenantDailySummary).from_select(["tenant_id", "day", *COUNTERS], source))
+    db.commit()
+
+
+@job_queue.periodic(REBUILD_INTERVAL_SECONDS)
+def rebuild_all_tenants(db: Session):
+    """Rotina periódica: reconstrói o consolidado de todos os tenants."""
+    rebuild(db)
+
+
+def _ensure_backfilled(db: Session, tenant_id: int):
+    # Tenants com transações anteriores ao consolidado: reconstrói na primeira leitura.
+    has_summary = db.query(models.TenantDailySummary.id).filter(
+        models.TenantDailySummary.tenant_id == tenant_id
+    ).first()
+    if has_summary is None:
+        has_transactions = db.query(models.Transaction.id).filter(
+            models.Transaction.tenant_id == tenant_id
+        ).first()
+        if has_transactions is not None:
+            rebuild(db, tenant_id)
+
+
+def _month_starts(today: date, months: int):
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return list(reversed(starts))
+
+
+def get_summary(db: Session, tenant_id: int, months: int = DEFAULT_MONTHS, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Indicadores do dashboard de um tenant.
+    Returns:
+        dict: total_revenue, total_expense, revenue_by_month (últimos `months` meses,
+              incluindo meses sem movimento), orders_by_status, open_orders, low_stock_count.
+    """
+    _ensure_backfilled(db, tenant_id)
+    summary = models.TenantDailySummary
+
+    total_revenue, total_expense = db.query(
+        func.coalesce(func.sum(summary.income), 0),
+        func.coalesce(func.sum(summary.expense), 0),
+    ).filter(summary.tenant_id == tenant_id).one()
+
+    starts = _month_starts(today or datetime.now(timezone.utc).date(), months)
+    by_month = {start.strftime("%Y-%m"): {"month": start.strftime("%Y-%m"), "income": 0.0, "expense": 0.0, "orders_completed": 0} for start in starts}
+    rows = db.query(summary.day, summary.income, summary.expense, summary.orders_completed).filter(
+        summary.tenant_id == tenant_id,
+        summary.day >= starts[0]
+    ).all()
+    for row in rows:
+        month = by_month.get(row.day.strftime("%Y-%m"))
+        if month is not None:
+            month["income"] += row.income or 0
+            month["expense"] += row.expense or 0
+            month["orders_completed"] += row.orders_completed or 0
+
+    orders_by_status = {status.value: 0 for status in models.OSStatus}
+    for status, count in db.query(models.ServiceOrder.status, func.count(models.ServiceOrder.id)).filter(
+        models.ServiceOrder.tenant_id == tenant_id
+    ).group_by(models.ServiceOrder.status).all():
+        if status is not None:
+            orders_by_status[models.OSStatus(status).value] = count
+    open_orders = sum(count for status, count in orders_by_status.items()
+                      if status not in {closed.value for closed in CLOSED_STATUSES})
+
+    low_stock_count = db.query(func.count(models.Part.id)).filter(
+        models.Part.tenant_id == tenant_id,
+        models.Part.quantity <= models.Part.min_stock
+    ).scalar()
+
+    return {
+        "total_revenue": float(total_revenue),
+        "total_expense": float(total_expense),
+        "revenue_by_month": list(by_month.values()),
+        "orders_by_status": orders_by_status,
+        "open_orders": open_orders,
+        "low_stock_count": low_stock_count or 0,
+    }
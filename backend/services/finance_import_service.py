@@ -1,139 +1,584 @@
+"""
+Importação de extratos bancários (CSV, OFX e PDF).
+
+Os arquivos são lidos em streaming: o CSV em blocos de linhas com conversão
+vetorizada das colunas (pandas), o OFX e o PDF por geradores que devolvem uma
+transação de cada vez. As transações são gravadas em lotes com INSERT em massa,
+um commit por lote, em vez de um commit (e um refresh) por linha.
+
+Cada transação importada recebe um hash de (tenant, documento/FITID, data,
+valor), gravado em transactions.import_hash com índice único por tenant:
+reimportar o mesmo extrato não duplica lançamentos.
+
+As colunas de data, descrição e valor do CSV são identificadas pelo cabeçalho
+(ou informadas pelo usuário) e guardadas em um perfil por tenant e layout de
+cabeçalho (statement_import_profiles): a próxima importação do mesmo banco
+usa o perfil salvo sem refazer a detecção.
+
+O PDF é extraído fora do event loop: as páginas são divididas em tarefas de
+PDF_IMPORT_PAGES_PER_TASK páginas (padrão 4) e processadas em paralelo em um
+pool de PDF_IMPORT_WORKERS processos (padrão: núcleos da máquina, até 4), e as
+transações de cada página são gravadas assim que a página chega.
+"""
+
+import os
+import re
+import shutil
+import asyncio
+import hashlib
+import logging
+import tempfile
+import multiprocessing
+import unicodedata
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+import numpy as np
 import pandas as pd
 import pdfplumber
 from ofxtools.Parser import OFXTree
-from io import BytesIO
-from datetime import datetime
-import re
-import logging
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.services import dashboard_service, pdf_statement_parser
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BATCH_SIZE = 2000
+CSV_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 500
+
+# Pool de processos da extração de PDF: processos (e não threads) porque o
+# pdfplumber é Python puro e segura o GIL durante a extração do texto.
+PDF_WORKERS = int(os.getenv("PDF_IMPORT_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_IMPORT_PAGES_PER_TASK", "4"))
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+
+
+class RowError(NamedTuple):
+    """Linha do extrato que não pôde ser convertida em transação."""
+    row: int # Número da linha no arquivo (o cabeçalho do CSV é a linha 1).
+    error: str
+
+
+ParsedRow = Union[Dict[str, Any], RowError]
+ColumnResolver = Callable[[List[str]], Dict[str, str]]
+
+MAPPED_COLUMNS = ("date", "description", "amount")
+
+# Trechos do cabeçalho (normalizado) que identificam cada coluna, em ordem de preferência.
+COLUMN_HINTS = {
+    "date": ("data", "date", "dt_"),
+    "description": ("desc", "hist", "memo", "lancamento"),
+    "amount": ("valor", "amount", "pago", "recebido", "montante"),
+}
+
+# Sufixo de débito/crédito usado por vários bancos ('1.234,56 D').
+_SIGN_SUFFIX = re.compile(r"\s*([DdCc-])$")
+_CURRENCY_NOISE = re.compile(r"[R$\s]")
+
+
 class FinanceImportService:
     @staticmethod
-    def parse_csv(file_content: bytes):
+    def iter_file(file_obj, filename: str, resolve_columns: Optional[ColumnResolver] = None) -> Iterator[ParsedRow]:
+        """
+        Transações do arquivo (binário) de acordo com a extensão.
+        `resolve_columns` escolhe as colunas do CSV a partir do cabeçalho (ver column_resolver).
+        Levanta ValueError para formatos não suportados.
         """
-        Parses a CSV file and returns a list of transaction dictionaries.
-        Tries to identify columns automatically.
+        name = (filename or "").lower()
+        if name.endswith('.csv'):
+            return FinanceImportService.iter_csv(file_obj, resolve_columns=resolve_columns)
+        if name.endswith('.pdf'):
+            return FinanceImportService.iter_pdf(file_obj)
+        if name.endswith('.ofx'):
+            return FinanceImportService.iter_ofx(file_obj)
+        raise ValueError("Formato de arquivo não suportado. Use PDF, CSV ou OFX.")
+
+    @staticmethod
+    def iter_csv(file_obj, chunk_size: int = CSV_CHUNK_SIZE, resolve_columns: Optional[ColumnResolver] = None) -> Iterator[ParsedRow]:
         """
+        Lê o CSV em blocos de `chunk_size` linhas. As colunas são escolhidas uma
+        vez, pelo cabeçalho (detect_columns se `resolve_columns` não for informado).
+        Detecta ';' (Excel pt-BR) ou ',' como separador e UTF-8 ou Latin-1.
+        """
+        resolve_columns = resolve_columns or FinanceImportService.detect_columns
+        sample = file_obj.read(65536)
+        file_obj.seek(0)
         try:
-            df = pd.read_csv(BytesIO(file_content))
-            return FinanceImportService._dataframe_to_transactions(df)
-        except Exception as e:
+            sample.decode("utf-8")
+            encoding = "utf-8-sig"
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+        first_line = sample.split(b"\n", 1)[0]
+        delimiter = ";" if first_line.count(b";") > first_line.count(b",") else ","
+
+        try:
+            reader = pd.read_csv(file_obj, sep=delimiter, encoding=encoding, dtype=str, chunksize=chunk_size, skip_blank_lines=True)
+            columns = None
+            first_row = 2
+            for chunk in reader:
+                if columns is None:
+                    columns = resolve_columns(chunk.columns.tolist())
+                yield from FinanceImportService._parse_chunk(chunk, columns, first_row)
+                first_row += len(chunk)
+        except pd.errors.EmptyDataError:
+            raise ValueError("Arquivo vazio.")
+        except pd.errors.ParserError as e:
             logger.error(f"Error parsing CSV: {e}")
             raise ValueError(f"Não foi possível processar o arquivo CSV: {str(e)}")
 
     @staticmethod
-    def parse_ofx(file_content: bytes):
+    def iter_ofx(file_obj) -> Iterator[ParsedRow]:
         """
-        Parses an OFX file and returns a list of transaction dictionaries.
+        Transações de um arquivo OFX, uma por vez. O FITID do banco é usado como número do documento.
         """
         try:
             parser = OFXTree()
-            parser.parse(BytesIO(file_content))
+            parser.parse(file_obj)
             ofx = parser.convert()
-            
-            transactions = []
-            # OFX structure can vary, usually it's in statements
-            for stmt in ofx.statements:
-                for txn in stmt.banktranlist:
-                    transactions.append({
-                        "date": txn.dtposted,
-                        "description": txn.memo or txn.name,
-                        "amount": float(txn.trnamt),
-                        "type": "INCOME" if float(txn.trnamt) > 0 else "EXPENSE",
-                        "category": "Importado (OFX)",
-                        "document_number": txn.fitid
-                    })
-            return transactions
         except Exception as e:
             logger.error(f"Error parsing OFX: {e}")
             raise ValueError(f"Não foi possível processar o arquivo OFX: {str(e)}")
 
+        # OFX structure can vary, usually it's in statements
+        for stmt in ofx.statements:
+            for txn in stmt.banktranlist:
+                amount = float(txn.trnamt)
+                posted = txn.dtposted
+                if posted.tzinfo is not None:
+                    posted = posted.astimezone(timezone.utc).replace(tzinfo=None)
+                yield {
+                    "date": posted,
+                    "description": txn.memo or txn.name,
+                    "amount": abs(amount),
+                    "type": "INCOME" if amount > 0 else "EXPENSE",
+                    "category": "Importado (OFX)",
+                    "document_number": txn.fitid
+                }
+
     @staticmethod
-    def parse_pdf(file_content: bytes):
+    def iter_pdf(file_obj) -> Iterator[ParsedRow]:
         """
-        Parses a PDF file and extract transaction-like lines.
-        This is heuristic-based because bank PDFs vary wildly.
+        Extrai linhas com cara de transação, página a página (sem montar o texto inteiro),
+        no próprio processo. A importação pela API usa aiter_pdf_pages (pool de processos).
         """
-        transactions = []
         try:
-            with pdfplumber.open(BytesIO(file_content)) as pdf:
-                full_text = ""
-                for page in pdf.pages:
-                    full_text += page.extract_text() + "\n"
-                
-                # Simple heuristic: Look for lines that start with a date (DD/MM/YYYY or DD/MM)
-                # followed by some text and then a value at the end.
-                lines = full_text.split('\n')
-                date_pattern = r'(\d{2}/\d{2}(?:/\d{4})?)'
-                value_pattern = r'(-?[\d\.]+,\d{2})'
-                
-                for line in lines:
-                    dates = re.findall(date_pattern, line)
-                    values = re.findall(value_pattern, line)
-                    
-                    if dates and values:
-                        # Take the first date and the last value (usually the amount)
-                        date_str = dates[0]
-                        amount_str = values[-1].replace('.', '').replace(',', '.')
-                        amount = float(amount_str)
-                        
-                        # Description is what's between date and value
-                        description = line.replace(date_str, '').replace(values[-1], '').strip()
-                        
-                        # Convert date_str to datetime
-                        try:
-                            if len(date_str) == 5: # DD/MM
-                                date_obj = datetime.strptime(f"{date_str}/{datetime.now().year}", "%d/%m/%Y")
-                            else: # DD/MM/YYYY
-                                date_obj = datetime.strptime(date_str, "%d/%m/%Y")
-                        except:
-                            date_obj = datetime.now()
-
-                        transactions.append({
-                            "date": date_obj,
-                            "description": description,
-                            "amount": abs(amount),
-                            "type": "INCOME" if amount > 0 else "EXPENSE",
-                            "category": "Importado (PDF)",
-                            "status": "PAID"
-                        })
-            return transactions
+            pdf = pdfplumber.open(file_obj)
         except Exception as e:
             logger.error(f"Error parsing PDF: {e}")
             raise ValueError(f"Não foi possível processar o arquivo PDF: {str(e)}")
 
+        year = datetime.now().year
+        with pdf:
+            for page in pdf.pages:
+                yield from pdf_statement_parser.parse_page(page, year)
+
+    @staticmethod
+    def parse_csv(file_content: bytes) -> List[Dict[str, Any]]:
+        """Transações válidas de um CSV em memória (ver iter_csv)."""
+        return [row for row in FinanceImportService.iter_csv(BytesIO(file_content)) if not isinstance(row, RowError)]
+
+    @staticmethod
+    def parse_ofx(file_content: bytes) -> List[Dict[str, Any]]:
+        """Transações de um OFX em memória (ver iter_ofx)."""
+        return list(FinanceImportService.iter_ofx(BytesIO(file_content)))
+
+    @staticmethod
+    def parse_pdf(file_content: bytes) -> List[Dict[str, Any]]:
+        """Transações de um PDF em memória (ver iter_pdf)."""
+        return list(FinanceImportService.iter_pdf(BytesIO(file_content)))
+
+    @staticmethod
+    def detect_columns(cols: List[str]) -> Dict[str, str]:
+        """
+        Adivinha as colunas de data, descrição e valor pelo cabeçalho
+        (sem diferenciar maiúsculas e acentos). Na falta de pista, usa a
+        primeira, a segunda e a última coluna.
+        """
+        if not cols:
+            raise ValueError("Arquivo sem cabeçalho.")
+        normalized = [normalize_header(c) for c in cols]
+        fallback = {"date": cols[0], "description": cols[1] if len(cols) > 1 else cols[0], "amount": cols[-1]}
+        columns = {}
+        for column, hints in COLUMN_HINTS.items():
+            found = next((cols[i] for i, header in enumerate(normalized)
+                          if any(hint in header for hint in hints) and cols[i] not in columns.values()), None)
+            columns[column] = found or fallback[column]
+        return columns
+
+    @staticmethod
+    def parse_dates(values: pd.Series) -> pd.Series:
+        """
+        Converte a coluna inteira de datas (dia primeiro, formato brasileiro) em
+        datetime64 UTC "naive". Valores inválidos viram NaT.
+        """
+        dates = _to_naive_utc(pd.to_datetime(values, dayfirst=True, errors="coerce"))
+        # O formato é inferido pela primeira linha: linhas em outro formato são convertidas uma a uma.
+        retry = dates.isna() & values.notna()
+        if retry.any():
+            dates[retry] = _to_naive_utc(pd.to_datetime(values[retry], dayfirst=True, errors="coerce", format="mixed"))
+        return dates
+
+    @staticmethod
+    def parse_amounts(values: pd.Series) -> pd.Series:
+        """
+        Converte a coluna inteira de valores em float com operações vetorizadas de texto.
+        Aceita formato brasileiro ('R$ 1.234,56'), internacional ('1234.56'),
+        negativos entre parênteses ou com sufixo '-', e sufixo D (débito) / C (crédito).
+        Valores inválidos viram NaN.
+        """
+        text = values.astype("string").str.strip()
+        suffix = text.str.extract(_SIGN_SUFFIX, expand=False).str.upper()
+        text = text.str.replace(_SIGN_SUFFIX, "", regex=True).str.replace(_CURRENCY_NOISE, "", regex=True)
+        parenthesized = text.str.startswith("(") & text.str.endswith(")")
+        text = text.str.strip("()")
+
+        # Com vírgula, o ponto é separador de milhar: '1.234,56' -> '1234.56'.
+        has_comma = text.str.contains(",", regex=False)
+        text = text.where(~has_comma, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+
+        amounts = pd.to_numeric(text, errors="coerce").astype("float64")
+        negative = (parenthesized | suffix.isin(["D", "-"])).fillna(False).to_numpy(dtype=bool)
+        return pd.Series(np.where(negative, -amounts.abs(), amounts), index=values.index)
+
+    @staticmethod
+    def classify(amounts: pd.Series) -> np.ndarray:
+        """INCOME para valores positivos, EXPENSE para os demais."""
+        return np.where(amounts.to_numpy() > 0, "INCOME", "EXPENSE")
+
+    @staticmethod
+    def _parse_chunk(df: pd.DataFrame, columns: Dict[str, str], first_row: int) -> Iterator[ParsedRow]:
+        """
+        Converte um bloco do CSV com operações sobre as colunas inteiras.
+        Linhas com data ou valor inválido viram RowError.
+        """
+        dates = FinanceImportService.parse_dates(df[columns["date"]])
+        amounts = FinanceImportService.parse_amounts(df[columns["amount"]])
+        valid = (dates.notna() & amounts.notna()).to_numpy()
+
+        for position in np.flatnonzero(~valid):
+            yield RowError(first_row + int(position), "Data ou valor inválido.")
+
+        amounts = amounts[valid]
+        rows = zip(
+            dates[valid].to_numpy().astype("datetime64[us]").astype(object), # datetime do Python
+            df[columns["description"]][valid].fillna("").astype(str),
+            amounts.abs().to_numpy(),
+            FinanceImportService.classify(amounts),
+        )
+        for date, description, amount, kind in rows:
+            yield {
+                "date": date,
+                "description": description,
+                "amount": float(amount),
+                "type": str(kind),
+                "category": "Importado (CSV)",
+                "status": "PAID"
+            }
+
     @staticmethod
     def _dataframe_to_transactions(df):
         """
         Helper to convert a pandas DataFrame to a list of transaction dicts by guessing columns.
         """
-        # Try to find date, description and amount columns
-        cols = df.columns.tolist()
-        date_col = next((c for c in cols if 'data' in c.lower() or 'date' in c.lower()), cols[0])
-        desc_col = next((c for c in cols if 'desc' in c.lower() or 'hist' in c.lower() or 'memo' in c.lower()), cols[1] if len(cols) > 1 else cols[0])
-        amount_col = next((c for c in cols if 'valor' in c.lower() or 'amount' in c.lower() or 'pago' in c.lower() or 'recebido' in c.lower()), cols[-1])
-
-        transactions = []
-        for _, row in df.iterrows():
-            try:
-                date_val = str(row[date_col])
-                # Try common formats
-                try:
-                    date_obj = pd.to_datetime(date_val, dayfirst=True).to_pydatetime()
-                except:
-                    date_obj = datetime.now()
-
-                amount = float(str(row[amount_col]).replace(',', '.'))
-                
-                transactions.append({
-                    "date": date_obj,
-                    "description": str(row[desc_col]),
-                    "amount": abs(amount),
-                    "type": "INCOME" if amount > 0 else "EXPENSE",
-                    "category": "Importado (CSV)",
-                    "status": "PAID"
-                })
-            except:
-                continue
-        return transactions
+        columns = FinanceImportService.detect_columns(df.columns.tolist())
+        return [row for row in FinanceImportService._parse_chunk(df.astype(str), columns, 2) if not isinstance(row, RowError)]
+
+
+def _to_naive_utc(dates: pd.Series) -> pd.Series:
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert("UTC").dt.tz_localize(None) # UTC "naive", como as demais colunas
+    return dates
+
+
+def normalize_header(header: Any) -> str:
+    value = unicodedata.normalize("NFKD", str(header or "")).encode("ascii", "ignore").decode("ascii")
+    return value.strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def header_signature(headers: List[str]) -> str:
+    """Identifica o layout do extrato (mesmas colunas, na mesma ordem)."""
+    return hashlib.sha256("|".join(normalize_header(h) for h in headers).encode("utf-8")).hexdigest()
+
+
+def save_profile(db: Session, tenant_id: int, headers: List[str], columns: Dict[str, str]) -> models.StatementImportProfile:
+    """Grava (ou atualiza) o mapeamento de colunas do layout `headers` do tenant (com commit)."""
+    signature = header_signature(headers)
+    profile = db.query(models.StatementImportProfile).filter(
+        models.StatementImportProfile.tenant_id == tenant_id,
+        models.StatementImportProfile.header_signature == signature
+    ).first()
+    if profile is None:
+        profile = models.StatementImportProfile(tenant_id=tenant_id, header_signature=signature)
+        db.add(profile)
+    profile.headers = list(headers)
+    profile.date_column = columns["date"]
+    profile.description_column = columns["description"]
+    profile.amount_column = columns["amount"]
+    profile.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.commit()
+    return profile
+
+
+def column_resolver(db: Session, tenant_id: int, override: Optional[Dict[str, Optional[str]]] = None) -> ColumnResolver:
+    """
+    Escolhe as colunas do CSV do tenant:
+    1. `override` (colunas informadas pelo usuário): validadas e salvas no perfil do layout;
+    2. perfil salvo para o mesmo cabeçalho (sem detecção);
+    3. detect_columns, e o resultado é salvo como perfil do layout.
+    """
+    override = {k: v for k, v in (override or {}).items() if v}
+
+    def resolve(headers: List[str]) -> Dict[str, str]:
+        if override:
+            missing = [name for name in override.values() if name not in headers]
+            if missing:
+                raise ValueError(f"Colunas não encontradas no arquivo: {', '.join(missing)}")
+            columns = {**FinanceImportService.detect_columns(headers), **override}
+            save_profile(db, tenant_id, headers, columns)
+            return columns
+
+        profile = db.query(models.StatementImportProfile).filter(
+            models.StatementImportProfile.tenant_id == tenant_id,
+            models.StatementImportProfile.header_signature == header_signature(headers)
+        ).first()
+        if profile is not None:
+            return {"date": profile.date_column, "description": profile.description_column, "amount": profile.amount_column}
+
+        columns = FinanceImportService.detect_columns(headers)
+        save_profile(db, tenant_id, headers, columns)
+        return columns
+
+    return resolve
+
+
+def _dedup_key(row: Dict[str, Any]) -> str:
+    day = row["date"].date().isoformat() if isinstance(row["date"], datetime) else str(row["date"])
+    document = row.get("document_number")
+    if document:
+        # FITID/documento identifica o lançamento no banco.
+        return f"doc|{document}|{day}|{row['amount']:.2f}"
+    return f"line|{day}|{row['amount']:.2f}|{row['type']}|{row.get('description') or ''}"
+
+
+def import_hash(tenant_id: int, row: Dict[str, Any], occurrence: int = 0) -> str:
+    """
+    Hash de deduplicação da transação. `occurrence` diferencia lançamentos
+    idênticos no mesmo extrato (ex: duas compras de mesmo valor no mesmo dia):
+    a N-ésima repetição recebe sempre o mesmo hash ao ser reimportada.
+    """
+    return hashlib.sha256(f"{tenant_id}|{_dedup_key(row)}|{occurrence}".encode("utf-8")).hexdigest()
+
+
+def _to_record(row: Dict[str, Any], tenant_id: int, row_hash: str) -> Dict[str, Any]:
+    return {
+        "tenant_id": tenant_id,
+        "type": row.get("type", "EXPENSE"),
+        "category": row.get("category", "Importado"),
+        "description": row.get("description") or "Sem descrição",
+        "amount": row.get("amount", 0.0),
+        "date": row["date"],
+        "status": row.get("status", "PAID"),
+        "order_id": None,
+        "document_number": row.get("document_number"),
+        "import_hash": row_hash,
+    }
+
+
+def _insert_ignoring_duplicates(db: Session, records: List[Dict[str, Any]]) -> Optional[set]:
+    """
+    INSERT ... ON CONFLICT (tenant_id, import_hash) DO NOTHING RETURNING import_hash
+    para o dialeto da sessão: uma importação simultânea do mesmo extrato (envio
+    duplo, nova tentativa do cliente) não falha no índice único.
+    Returns:
+        set: Hashes efetivamente gravados, ou None se o dialeto não tiver ON CONFLICT.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+
+    table = models.Transaction.__table__
+    stmt = dialect_insert(table).on_conflict_do_nothing(
+        index_elements=["tenant_id", "import_hash"]
+    ).returning(table.c.import_hash)
+    return set(db.execute(stmt, records).scalars().all())
+
+
+def insert_batch(db: Session, tenant_id: int, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Grava um lote com um único INSERT, ignorando as transações já importadas. Não faz commit.
+    Returns:
+        list: Os registros efetivamente gravados (só eles entram no consolidado do dashboard).
+    """
+    hashes = [record["import_hash"] for record in records]
+    existing = {row[0] for row in db.query(models.Transaction.import_hash).filter(
+        models.Transaction.tenant_id == tenant_id,
+        models.Transaction.import_hash.in_(hashes)
+    ).all()}
+    new_records = [record for record in records if record["import_hash"] not in existing]
+    if not new_records:
+        return []
+
+    inserted = _insert_ignoring_duplicates(db, new_records)
+    if inserted is None:
+        db.execute(insert(models.Transaction.__table__), new_records)
+    else:
+        # Linhas gravadas por outra importação entre a consulta e o INSERT foram ignoradas.
+        new_records = [record for record in new_records if record["import_hash"] in inserted]
+    if new_records:
+        dashboard_service.apply_transactions(db, tenant_id, [SimpleNamespace(**record) for record in new_records])
+    return new_records
+
+
+def pdf_pool() -> ProcessPoolExecutor:
+    """Pool de processos da extração de PDF, criado no primeiro uso."""
+    global _pdf_pool
+    if _pdf_pool is None:
+        # "spawn": o processo da API tem threads (uvicorn, pool do banco) e não deve ser copiado com fork.
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+
+
+def _spool_to_disk(file_obj) -> str:
+    """Copia o upload para um arquivo temporário, que os processos do pool abrem pelo caminho."""
+    file_obj.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        shutil.copyfileobj(file_obj, tmp)
+    return tmp.name
+
+
+async def aiter_pdf_pages(file_obj, executor: Optional[Executor] = None) -> AsyncIterator[List[ParsedRow]]:
+    """
+    Transações do PDF, uma lista por página, na ordem das páginas. A extração
+    roda no pool de processos (run_in_executor): o event loop só aguarda os
+    resultados. No máximo 2 tarefas por processo ficam em andamento, então a
+    memória não cresce com o número de páginas do extrato.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or pdf_pool()
+    path = await asyncio.to_thread(_spool_to_disk, file_obj)
+    tasks: deque = deque()
+    try:
+        try:
+            pages = await loop.run_in_executor(executor, pdf_statement_parser.page_count, path)
+        except Exception as e:
+            logger.error(f"Error parsing PDF: {e}")
+            raise ValueError(f"Não foi possível processar o arquivo PDF: {str(e)}")
+
+        year = datetime.now().year
+        for start in range(0, pages, PDF_PAGES_PER_TASK):
+            stop = min(start + PDF_PAGES_PER_TASK, pages)
+            tasks.append(loop.run_in_executor(executor, pdf_statement_parser.extract_pages, path, start, stop, year))
+            if len(tasks) >= 2 * PDF_WORKERS:
+                for page_rows in await tasks.popleft():
+                    yield page_rows
+        while tasks:
+            for page_rows in await tasks.popleft():
+                yield page_rows
+    finally:
+        for task in tasks:
+            task.cancel()
+        os.unlink(path)
+
+
+class TransactionImporter:
+    """
+    Grava transações em lotes de `batch_size`, com um commit por lote.
+    As linhas podem chegar aos poucos (feed pode ser chamado várias vezes, como
+    na importação de PDF, página a página); finish grava o último lote e
+    devolve o resumo.
+    """
+
+    def __init__(self, db: Session, tenant_id: int, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.batch_size = batch_size
+        self.summary = {"processed": 0, "imported": 0, "duplicates": 0, "error_count": 0, "errors": [], "total_amount": 0.0}
+        self._occurrences: Dict[str, int] = {}
+        self._batch: List[Dict[str, Any]] = []
+
+    def feed(self, rows: Iterable[ParsedRow]):
+        summary = self.summary
+        try:
+            for row in rows:
+                summary["processed"] += 1
+                if isinstance(row, RowError):
+                    summary["error_count"] += 1
+                    if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                        summary["errors"].append({"row": row.row, "error": row.error})
+                    continue
+                key = _dedup_key(row)
+                occurrence = self._occurrences.get(key, 0)
+                self._occurrences[key] = occurrence + 1
+                self._batch.append(_to_record(row, self.tenant_id, import_hash(self.tenant_id, row, occurrence)))
+                if len(self._batch) >= self.batch_size:
+                    self._flush()
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def finish(self, commit: bool = True) -> Dict[str, Any]:
+        """
+        Grava o último lote; com commit=False ele fica na transação do caller
+        (ex: para gravar o evento do webhook junto com ele).
+        Returns:
+            dict: processed, imported, duplicates, error_count, errors (limitado a
+                  MAX_REPORTED_ERRORS) e total_amount (soma das transações gravadas).
+        """
+        try:
+            self._flush(commit)
+        except Exception:
+            self.db.rollback()
+            raise
+        summary = self.summary
+        logger.info(f"Importação de extrato (tenant {self.tenant_id}): {summary['imported']} gravadas, {summary['duplicates']} duplicadas, {summary['error_count']} erros")
+        return summary
+
+    def _flush(self, commit: bool = True):
+        if self._batch:
+            inserted = insert_batch(self.db, self.tenant_id, self._batch)
+            if commit:
+                self.db.commit()
+            self.summary["imported"] += len(inserted)
+            self.summary["duplicates"] += len(self._batch) - len(inserted)
+            self.summary["total_amount"] += sum(record["amount"] for record in inserted)
+            self._batch = []
+
+
+def import_transactions(db: Session, tenant_id: int, rows: Iterable[ParsedRow], batch_size: int = DEFAULT_BATCH_SIZE,
+                        commit: bool = True) -> Dict[str, Any]:
+    """Importa as transações em lotes de `batch_size` (ver TransactionImporter) e devolve o resumo."""
+    importer = TransactionImporter(db, tenant_id, batch_size)
+    importer.feed(rows)
+    return importer.finish(commit)
+
+
+async def import_pdf(db: Session, tenant_id: int, file_obj, batch_size: int = DEFAULT_BATCH_SIZE,
+                     executor: Optional[Executor] = None, commit: bool = True) -> Dict[str, Any]:
+    """
+    Importa um extrato PDF sem bloquear o event loop: as páginas são extraídas
+    no pool de processos e as transações de cada página são gravadas (em
+    thread) assim que a página chega.
+    """
+    importer = TransactionImporter(db, tenant_id, batch_size)
+    async for page_rows in aiter_pdf_pages(file_obj, executor):
+        await asyncio.to_thread(importer.feed, page_rows)
+    return await asyncio.to_thread(importer.finish, commit)
@@ -0,0 +1,231 @@
+"""
+Relatório de inventário: valorização, consumo, curva ABC, cobertura e estoque parado.
+
+O cálculo faz duas consultas por tenant (as peças em uma única busca e o
+consumo dos últimos 12 meses agregado no banco com GROUP BY) e o resto com
+pandas vetorizado: nenhuma consulta por peça. O resultado é gravado uma vez
+por dia em inventory_reports (resumo e linhas por SKU em colunas separadas),
+então abrir o relatório só lê o resumo já calculado. Uma rotina periódica
+recalcula o relatório dos tenants e remove os dias antigos.
+
+- Consumo: saídas por OS (OUT_OS) e vendas diretas (SALE_DIRECT) dos últimos
+  CONSUMPTION_DAYS dias, descontadas as devoluções de OS reabertas (RETURN_OS).
+- Curva ABC pelo valor de consumo (consumo x custo): A até 80% do valor
+  acumulado, B até 95%, C o restante (inclusive peças sem consumo).
+- Cobertura: dias que o estoque atual dura no ritmo de consumo dos 12 meses.
+- Estoque parado: peças com estoque e sem consumo no período.
+
+- INVENTORY_REPORT_REFRESH_SECONDS: intervalo do recálculo (padrão: diário; 0 desativa).
+- INVENTORY_REPORT_RETENTION_DAYS: dias de relatórios mantidos (padrão 7).
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.services import job_queue
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL_SECONDS = int(os.getenv("INVENTORY_REPORT_REFRESH_SECONDS", "86400"))
+RETENTION_DAYS = int(os.getenv("INVENTORY_REPORT_RETENTION_DAYS", "7"))
+
+CONSUMPTION_DAYS = 365
+ABC_LIMITS = (("A", 0.80), ("B", 0.95)) # Fração do valor de consumo acumulado de cada classe
+LOW_COVER_DAYS = 30 # Peças com cobertura abaixo disso entram na lista de reposição
+MAX_LISTED = 100 # Tamanho das listas do resumo (estoque parado, cobertura baixa)
+
+CONSUMPTION_TYPES = (models.MovementType.OUT_OS, models.MovementType.SALE_DIRECT)
+
+ITEM_COLUMNS = (
+    "part_id", "sku", "name", "quantity", "cost", "stock_value", "consumption",
+    "consumption_value", "abc_class", "days_of_cover", "turnover",
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # NaN (ex: cobertura de peça sem consumo) vira null no JSON.
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def consumption_by_part(db: Session, tenant_id: int, since: datetime) -> Dict[int, float]:
+    """Quantidade consumida por peça desde `since` (OS e vendas diretas, menos devoluções de OS)."""
+    movement = models.StockMovement
+    signed = case(
+        (movement.type.in_(CONSUMPTION_TYPES), movement.quantity),
+        (movement.type == models.MovementType.RETURN_OS, -movement.quantity),
+        else_=0.0,
+    )
+    rows = db.query(movement.part_id, func.sum(signed)).filter(
+        movement.tenant_id == tenant_id,
+        movement.date >= since,
+        movement.type.in_(CONSUMPTION_TYPES + (models.MovementType.RETURN_OS,)),
+    ).group_by(movement.part_id).all()
+    return {part_id: total for part_id, total in rows}
+
+
+def compute(db: Session, tenant_id: int, now: Optional[datetime] = None) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """
+    Calcula o relatório do tenant.
+    Returns:
+        tuple: (resumo, DataFrame com uma linha por SKU nas colunas ITEM_COLUMNS).
+    """
+    now = now or _utcnow()
+    parts = db.query(
+        models.Part.id, models.Part.sku, models.Part.name,
+        models.Part.quantity, models.Part.cost, models.Part.price,
+    ).filter(models.Part.tenant_id == tenant_id).all()
+    df = pd.DataFrame.from_records(parts, columns=["part_id", "sku", "name", "quantity", "cost", "price"])
+    df[["quantity", "cost", "price"]] = df[["quantity", "cost", "price"]].astype("float64").fillna(0.0)
+
+    consumption = consumption_by_part(db, tenant_id, now - timedelta(days=CONSUMPTION_DAYS))
+    df["consumption"] = df["part_id"].map(consumption).astype("float64").fillna(0.0).clip(lower=0.0)
+
+    in_stock = df["quantity"].clip(lower=0.0)
+    df["stock_value"] = in_stock * df["cost"]
+    df["sale_value"] = in_stock * df["price"]
+    df["consumption_value"] = df["consumption"] * df["cost"]
+
+    # Curva ABC: fração do valor de consumo acumulada antes de cada peça (maior valor primeiro).
+    df = df.sort_values(["consumption_value", "sku"], ascending=[False, True], kind="stable").reset_index(drop=True)
+    total_consumption = df["consumption_value"].sum()
+    if total_consumption > 0:
+        share_before = (df["consumption_value"].cumsum() - df["consumption_value"]) / total_consumption
+    else:
+        share_before = pd.Series(1.0, index=df.index)
+    consumed = (df["consumption_value"] > 0).to_numpy()
+    conditions = [consumed & (share_before < limit).to_numpy() for _, limit in ABC_LIMITS]
+    df["abc_class"] = np.select(conditions, [name for name, _ in ABC_LIMITS], default="C")
+
+    daily = df["consumption"] / CONSUMPTION_DAYS
+    df["days_of_cover"] = (in_stock / daily.where(daily > 0)).round(1)
+    df["turnover"] = (df["consumption"] / df["quantity"].where(df["quantity"] > 0)).round(2)
+
+    stock_value = df["stock_value"].sum()
+    abc = df.groupby("abc_class").agg(
+        sku_count=("part_id", "size"), stock_value=("stock_value", "sum"), consumption_value=("consumption_value", "sum"),
+    ).reindex(["A", "B", "C"], fill_value=0)
+    dead = df[(df["quantity"] > 0) & (df["consumption"] == 0)].sort_values("stock_value", ascending=False, kind="stable")
+    low_cover = df[df["days_of_cover"] < LOW_COVER_DAYS].sort_values("days_of_cover", kind="stable")
+
+    summary = {
+        "generated_at": now.isoformat(),
+        "sku_count": int(len(df)),
+        "total_quantity": float(in_stock.sum()),
+        "stock_value": round(float(stock_value), 2),
+        "sale_value": round(float(df["sale_value"].sum()), 2),
+        "consumption_value": round(float(total_consumption), 2),
+        "turnover": round(float(total_consumption / stock_value), 2) if stock_value > 0 else None,
+        "abc": [
+            {
+                "abc_class": name,
+                "sku_count": int(row.sku_count),
+                "stock_value": round(float(row.stock_value), 2),
+                "consumption_value": round(float(row.consumption_value), 2),
+                "share": round(float(row.consumption_value / total_consumption), 4) if total_consumption > 0 else 0.0,
+            }
+            for name, row in abc.iterrows()
+        ],
+        "dead_stock_count": int(len(dead)),
+        "dead_stock_value": round(float(dead["stock_value"].sum()), 2),
+        "dead_stock": _records(dead[list(ITEM_COLUMNS)].head(MAX_LISTED)),
+        "low_cover_count": int(len(low_cover)),
+        "low_cover": _records(low_cover[list(ITEM_COLUMNS)].head(MAX_LISTED)),
+    }
+    return summary, df[list(ITEM_COLUMNS)]
+
+
+def build(db: Session, tenant_id: int, now: Optional[datetime] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Calcula e grava (substituindo o do mesmo dia) o relatório do tenant. Faz commit.
+    Returns:
+        tuple: (resumo, linhas por SKU).
+    """
+    now = now or _utcnow()
+    summary, items = compute(db, tenant_id, now)
+    summary["day"] = now.date().isoformat()
+    items = _records(items)
+    report = models.InventoryReport(tenant_id=tenant_id, day=now.date(), generated_at=now, summary=summary, items=items)
+    db.query(models.InventoryReport).filter(
+        models.InventoryReport.tenant_id == tenant_id,
+        models.InventoryReport.day == now.date(),
+    ).delete(synchronize_session=False)
+    db.add(report)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Outra requisição gravou o relatório do dia ao mesmo tempo: o resultado é o mesmo.
+        db.rollback()
+    return summary, items
+
+
+def get_summary(db: Session, tenant_id: int, refresh: bool = False) -> Dict[str, Any]:
+    """Resumo do relatório do dia (calculado na primeira leitura do dia ou com `refresh`)."""
+    if not refresh:
+        summary = db.query(models.InventoryReport.summary).filter(
+            models.InventoryReport.tenant_id == tenant_id,
+            models.InventoryReport.day == _utcnow().date(),
+        ).scalar()
+        if summary is not None:
+            return summary
+    return build(db, tenant_id)[0]
+
+
+def get_items(
+    db: Session,
+    tenant_id: int,
+    abc_class: Optional[str] = None,
+    dead_stock: bool = False,
+    offset: int = 0,
+    limit: int = 100,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Linhas por SKU do relatório do dia, do maior para o menor valor de consumo.
+    Returns:
+        tuple: (total de linhas após os filtros, linhas da página).
+    """
+    items = db.query(models.InventoryReport.items).filter(
+        models.InventoryReport.tenant_id == tenant_id,
+        models.InventoryReport.day == _utcnow().date(),
+    ).scalar()
+    if items is None:
+        items = build(db, tenant_id)[1]
+    df = pd.DataFrame.from_records(items, columns=list(ITEM_COLUMNS))
+    if abc_class:
+        df = df[df["abc_class"] == abc_class]
+    if dead_stock:
+        df = df[(df["quantity"] > 0) & (df["consumption"] == 0)]
+    return len(df), _records(df.iloc[offset:offset + limit])
+
+
+def purge(db: Session, keep_days: int = RETENTION_DAYS) -> int:
+    """Remove os relatórios com mais de `keep_days` dias. Faz commit."""
+    cutoff = _utcnow().date() - timedelta(days=keep_days)
+    deleted = db.query(models.InventoryReport).filter(models.InventoryReport.day < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+@job_queue.periodic(REFRESH_INTERVAL_SECONDS)
+def refresh_all_tenants(db: Session):
+    """Rotina periódica: recalcula o relatório do dia dos tenants com peças e remove os antigos."""
+    tenant_ids = [row[0] for row in db.query(models.Part.tenant_id).distinct().all()]
+    for tenant_id in tenant_ids:
+        try:
+            build(db, tenant_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Falha ao calcular o relatório de inventário do tenant {tenant_id}: {e}")
+    purge(db)
@@ -0,0 +1,297 @@
+"""
+Fila de tarefas em segundo plano (persistida na tabela background_jobs).
+
+Endpoints criam a tarefa e retornam imediatamente; um worker asyncio no
+processo da API executa as tarefas e grava o progresso a cada lote. No
+startup (e periodicamente), tarefas pendentes ou interrompidas (sem sinal de
+vida há mais de JOB_STALE_SECONDS) são retomadas a partir dos itens não
+processados. Enquanto executa, a tarefa renova updated_at a cada
+JOB_HEARTBEAT_SECONDS, mesmo no meio de um lote demorado.
+
+Cada tipo de tarefa registra seu executor com @job_queue.handler("tipo").
+O acesso ao banco (reivindicação, carga e status final) roda em thread, fora
+do event loop; os executores fazem o mesmo com as suas consultas.
+Rotinas de manutenção periódicas (sem tenant, com sessão própria) são
+registradas com @job_queue.periodic(segundos) e rodam em thread.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", str(max(1, STALE_SECONDS // 3))))
+
+Handler = Callable[[Session, models.BackgroundJob], Awaitable[None]]
+_handlers: Dict[str, Handler] = {}
+
+Routine = Callable[[Session], Any]
+_periodic: List[Tuple[int, Routine]] = []
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+# Fábrica de sessões usada pelo worker (substituível nos testes).
+session_factory = SessionLocal
+
+
+def _utcnow() -> datetime:
+    # Colunas DateTime sem timezone: grava e compara sempre em UTC "naive".
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def handler(kind: str):
+    """Decorador que registra o executor de um tipo de tarefa."""
+    def register(func: Handler) -> Handler:
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def periodic(seconds: int):
+    """
+    Decorador que registra uma rotina síncrona executada a cada `seconds`
+    segundos pelo processo da API (a primeira execução ocorre após o intervalo).
+    """
+    def register(func: Routine) -> Routine:
+        if seconds > 0:
+            _periodic.append((seconds, func))
+        return func
+    return register
+
+
+def create_job(db: Session, tenant_id: int, kind: str, params: Dict[str, Any], total: int, created_by: Optional[str] = None) -> models.BackgroundJob:
+    """Persiste uma nova tarefa pendente. Use enqueue() para despachá-la ao worker."""
+    job = models.BackgroundJob(
+        tenant_id=tenant_id,
+        kind=kind,
+        status=PENDING,
+        params=params,
+        total=total,
+        processed=0,
+        results=[],
+        created_by=created_by,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def enqueue(job_id: int):
+    """
+    Envia a tarefa ao worker do processo. Sem worker ativo (ex: scripts),
+    a tarefa continua PENDING e é retomada no próximo startup da API.
+    """
+    if _queue is None:
+        logger.warning(f"Fila de tarefas inativa: tarefa {job_id} será executada no próximo startup")
+        return
+    _queue.put_nowait(job_id)
+
+
+def record_progress(db: Session, job: models.BackgroundJob, results: List[Dict[str, Any]], processed: int):
+    """Acrescenta o resultado de um lote e grava o progresso (commit)."""
+    job.results = (job.results or []) + results # Nova lista: o SQLAlchemy detecta a alteração do JSON
+    job.processed = (job.processed or 0) + processed
+    job.updated_at = _utcnow()
+    db.commit()
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """
+    Marca a tarefa como RUNNING de forma atômica, se ainda estiver pendente
+    ou parada. Evita que duas instâncias executem a mesma tarefa.
+    """
+    now = _utcnow()
+    claimed = db.query(models.BackgroundJob).filter(
+        models.BackgroundJob.id == job_id,
+        or_(
+            models.BackgroundJob.status == PENDING,
+            and_(
+                models.BackgroundJob.status == RUNNING,
+                models.BackgroundJob.updated_at < now - timedelta(seconds=STALE_SECONDS),
+            ),
+        ),
+    ).update({"status": RUNNING, "updated_at": now}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def _touch(job_id: int, factory: Callable[[], Session]):
+    db = factory()
+    try:
+        db.query(models.BackgroundJob).filter(
+            models.BackgroundJob.id == job_id,
+            models.BackgroundJob.status == RUNNING,
+        ).update({"updated_at": _utcnow()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _heartbeat(job_id: int, factory: Callable[[], Session]):
+    """
+    Renova updated_at da tarefa em execução (com sessão própria), para que
+    outra instância não a considere parada enquanto um lote ainda está em andamento.
+    """
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            await asyncio.to_thread(_touch, job_id, factory)
+        except Exception as e:
+            logger.warning(f"Não foi possível renovar a tarefa {job_id}: {e}")
+
+
+def _start(db: Session, job_id: int) -> Optional[models.BackgroundJob]:
+    """Reivindica e carrega a tarefa (atributos já lidos). None se outra instância a executa."""
+    if not _claim(db, job_id):
+        return None
+    job = db.query(models.BackgroundJob).filter(models.BackgroundJob.id == job_id).first()
+    if job.started_at is None:
+        job.started_at = _utcnow()
+        db.commit()
+        db.refresh(job)
+    return job
+
+
+def _complete(db: Session, job: models.BackgroundJob):
+    job.status = COMPLETED
+    job.finished_at = job.updated_at = _utcnow()
+    db.commit()
+
+
+def _set_status(db: Session, job_id: int, values: Dict[str, Any]):
+    """Descarta o que estiver pendente na sessão e grava o status final da tarefa."""
+    db.rollback()
+    db.query(models.BackgroundJob).filter(models.BackgroundJob.id == job_id).update(
+        values, synchronize_session=False
+    )
+    db.commit()
+
+
+async def run_job(job_id: int, factory: Optional[Callable[[], Session]] = None):
+    """Executa uma tarefa (se puder ser reivindicada) com sua própria sessão de banco."""
+    factory = factory or session_factory
+    db = factory()
+    try:
+        job = await asyncio.to_thread(_start, db, job_id)
+        if job is None:
+            return
+        run = _handlers.get(job.kind)
+        if run is None:
+            raise RuntimeError(f"Tipo de tarefa desconhecido: {job.kind}")
+
+        heartbeat = asyncio.create_task(_heartbeat(job_id, factory))
+        try:
+            await run(db, job)
+        finally:
+            heartbeat.cancel()
+
+        await asyncio.to_thread(_complete, db, job)
+    except asyncio.CancelledError:
+        # Shutdown: devolve a tarefa para a fila persistida.
+        await asyncio.to_thread(_set_status, db, job_id, {"status": PENDING})
+        raise
+    except Exception as e:
+        logger.exception(f"Tarefa {job_id} falhou")
+        await asyncio.to_thread(_set_status, db, job_id, {"status": FAILED, "error": str(e), "finished_at": _utcnow()})
+    finally:
+        await asyncio.to_thread(db.close)
+
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await run_job(job_id)
+        except Exception:
+            logger.exception(f"Erro inesperado no worker (tarefa {job_id})")
+        finally:
+            _queue.task_done()
+
+
+def _resumable_job_ids() -> List[int]:
+    db = session_factory()
+    try:
+        stale = _utcnow() - timedelta(seconds=STALE_SECONDS)
+        rows = db.query(models.BackgroundJob.id).filter(
+            or_(
+                models.BackgroundJob.status == PENDING,
+                and_(models.BackgroundJob.status == RUNNING, models.BackgroundJob.updated_at < stale),
+            )
+        ).order_by(models.BackgroundJob.id).all()
+        return [row[0] for row in rows]
+    finally:
+        db.close()
+
+
+async def _resume_loop():
+    """
+    Reenfileira periodicamente tarefas pendentes ou paradas (ex: processo
+    encerrado no meio da execução). _claim impede execução em duplicidade.
+    """
+    while True:
+        try:
+            for job_id in _resumable_job_ids():
+                logger.info(f"Retomando tarefa {job_id}")
+                _queue.put_nowait(job_id)
+        except Exception as e:
+            logger.warning(f"Não foi possível verificar tarefas pendentes: {e}")
+        await asyncio.sleep(STALE_SECONDS)
+
+
+def _run_routine(func: Routine):
+    db = session_factory()
+    try:
+        func(db)
+    finally:
+        db.close()
+
+
+async def _periodic_loop(seconds: int, func: Routine):
+    while True:
+        await asyncio.sleep(seconds)
+        try:
+            # Rotinas usam a sessão síncrona: fora do event loop.
+            await asyncio.to_thread(_run_routine, func)
+        except Exception:
+            logger.exception(f"Rotina periódica {func.__name__} falhou")
+
+
+async def start():
+    """Inicia os workers e as rotinas periódicas (startup da aplicação) e retoma tarefas não concluídas."""
+    global _queue
+    if _workers:
+        return
+    _queue = asyncio.Queue()
+    for _ in range(WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+    _workers.append(asyncio.create_task(_resume_loop()))
+    for seconds, func in _periodic:
+        _workers.append(asyncio.create_task(_periodic_loop(seconds, func)))
+
+
+async def stop():
+    """Cancela os workers (shutdown). Tarefas em andamento voltam para PENDING."""
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
@@ -0,0 +1,189 @@
+"""
+Cache com validade (TTL) das consultas ao Portal Mercury Marine.
+
+Técnicos consultam os mesmos SKUs e números de série várias vezes durante um
+serviço. O resultado fica guardado por tenant e consulta, com validades
+separadas para preços e garantias:
+
+- MERCURY_CACHE_BACKEND: 'memory' (LRU no processo, padrão) ou 'database'
+  (tabela mercury_lookup_cache, compartilhada entre instâncias/serverless).
+- MERCURY_PRICE_CACHE_TTL / MERCURY_WARRANTY_CACHE_TTL: validade em segundos.
+- MERCURY_CACHE_MAX_ENTRIES: tamanho máximo do LRU em memória.
+"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend import models
+
+logger = logging.getLogger(__name__)
+
+PRODUCT = "product"
+WARRANTY = "warranty"
+
+TTL_SECONDS = {
+    PRODUCT: int(os.getenv("MERCURY_PRICE_CACHE_TTL", "3600")), # Preços: 1 hora
+    WARRANTY: int(os.getenv("MERCURY_WARRANTY_CACHE_TTL", "86400")), # Garantias: 1 dia
+}
+BACKEND = os.getenv("MERCURY_CACHE_BACKEND", "memory")
+MAX_ENTRIES = int(os.getenv("MERCURY_CACHE_MAX_ENTRIES", "2000"))
+
+CacheKey = Tuple[int, str, str]
+
+
+def _utcnow() -> datetime:
+    # Coluna DateTime sem timezone: grava e compara sempre em UTC "naive".
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class MemoryCacheBackend:
+    """LRU em memória do processo. Entradas vencidas são descartadas na leitura."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, db: Session, key: CacheKey) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, db: Session, key: CacheKey, value: Any, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self, db: Optional[Session] = None, tenant_id: Optional[int] = None):
+        if tenant_id is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] == tenant_id]:
+            del self._entries[key]
+
+
+class DatabaseCacheBackend:
+    """
+    Cache na tabela mercury_lookup_cache (sobrevive a reinícios e é compartilhado entre instâncias).
+    As gravações usam uma sessão própria, na mesma conexão/engine da sessão recebida:
+    nunca confirmam nem desfazem a transação do caller.
+    """
+
+    name = "database"
+
+    def get(self, db: Session, key: CacheKey) -> Optional[Any]:
+        tenant_id, kind, lookup_key = key
+        entry = db.query(models.MercuryLookupCache).filter(
+            models.MercuryLookupCache.tenant_id == tenant_id,
+            models.MercuryLookupCache.kind == kind,
+            models.MercuryLookupCache.lookup_key == lookup_key,
+            models.MercuryLookupCache.expires_at > _utcnow(),
+        ).first()
+        return entry.payload if entry else None
+
+    def set(self, db: Session, key: CacheKey, value: Any, ttl: int):
+        tenant_id, kind, lookup_key = key
+        expires_at = _utcnow() + timedelta(seconds=ttl)
+        with Session(bind=db.get_bind()) as cache_db:
+            entry = cache_db.query(models.MercuryLookupCache).filter(
+                models.MercuryLookupCache.tenant_id == tenant_id,
+                models.MercuryLookupCache.kind == kind,
+                models.MercuryLookupCache.lookup_key == lookup_key,
+            ).first()
+            if entry:
+                entry.payload = value
+                entry.expires_at = expires_at
+            else:
+                cache_db.add(models.MercuryLookupCache(
+                    tenant_id=tenant_id, kind=kind, lookup_key=lookup_key,
+                    payload=value, expires_at=expires_at,
+                ))
+            try:
+                cache_db.commit()
+            except IntegrityError:
+                # Outra requisição gravou a mesma chave ao mesmo tempo: mantém a dela.
+                cache_db.rollback()
+
+    def clear(self, db: Optional[Session] = None, tenant_id: Optional[int] = None):
+        # Só apaga as entradas de um tenant: sem tenant_id não há o que limpar.
+        if db is None or tenant_id is None:
+            return
+        with Session(bind=db.get_bind()) as cache_db:
+            cache_db.query(models.MercuryLookupCache).filter(
+                models.MercuryLookupCache.tenant_id == tenant_id
+            ).delete(synchronize_session=False)
+            cache_db.commit()
+
+
+class MercuryLookupCache:
+    """Cache de consultas por (tenant, tipo, consulta), com contadores de acertos e falhas."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.counters = {kind: {"hits": 0, "misses": 0} for kind in TTL_SECONDS}
+
+    @staticmethod
+    def _key(tenant_id: int, kind: str, query: str) -> CacheKey:
+        return (tenant_id, kind, query.strip().upper())
+
+    def get(self, db: Session, tenant_id: int, kind: str, query: str) -> Optional[Any]:
+        try:
+            value = self.backend.get(db, self._key(tenant_id, kind, query))
+        except Exception as e:
+            # Falha no cache nunca deve impedir a consulta ao portal.
+            logger.warning(f"Cache Mercury indisponível: {e}")
+            value = None
+        self.counters[kind]["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, db: Session, tenant_id: int, kind: str, query: str, value: Any):
+        try:
+            self.backend.set(db, self._key(tenant_id, kind, query), value, TTL_SECONDS[kind])
+        except Exception as e:
+            logger.warning(f"Erro ao gravar no cache Mercury: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        result = {"backend": self.backend.name}
+        for kind, counter in self.counters.items():
+            total = counter["hits"] + counter["misses"]
+            result[kind] = {
+                **counter,
+                "hit_rate": round(counter["hits"] / total, 4) if total else 0.0,
+                "ttl_seconds": TTL_SECONDS[kind],
+            }
+        return result
+
+    def clear(self, db: Optional[Session] = None, tenant_id: Optional[int] = None):
+        """
+        Descarta as entradas do tenant (ou, no cache em memória, todas quando tenant_id é None).
+        Os contadores são do processo e só são zerados na limpeza completa.
+        """
+        self.backend.clear(db, tenant_id)
+        if tenant_id is None:
+            for counter in self.counters.values():
+                counter["hits"] = counter["misses"] = 0
+
+
+def _make_backend(name: str):
+    if name == "database":
+        return DatabaseCacheBackend()
+    return MemoryCacheBackend()
+
+
+# Instância única por processo.
+cache = MercuryLookupCache(_make_backend(BACKEND))
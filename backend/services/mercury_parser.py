@@ -0,0 +1,105 @@
+"""
+Parsing das páginas do Portal Mercury Marine (funções puras, sem navegador).
+
+Recebe o HTML já carregado pelo Playwright e devolve dicionários prontos para a
+API. Usa lxml (parser em C, XPath) em vez do html.parser do BeautifulSoup, e
+pode ser testado offline com os fixtures de tests/fixtures/mercury.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from lxml import html as lxml_html
+
+NO_RECORDS_MARKERS = ("NoRecords", "Nenhum registro encontrado")
+
+# Colunas das linhas de dados da tabela de preços (tr.Row, a partir da 2ª célula).
+PRICE_COLUMNS = ("codigo", "qtd", "descricao", "qtdaEst", "valorVenda", "valorTabela", "valorCusto")
+
+# Caminho da linha de dados da garantia:
+# body > table > tbody > tr > td > table:nth-of-type(2) > tbody > tr:nth-of-type(3)
+WARRANTY_ROW_XPATH = "(/html/body/table/tbody/tr/td/table[2]/tbody/tr[3])[1]"
+WARRANTY_SERIAL_XPATH = "//*[@id='warr_cardnr_serie_1']"
+WARRANTY_CLIENT_XPATH = "(//*[@id='warranty_clients']//table//tbody//tr[3])[1]"
+
+CLIENT_NAME_PREFIX = re.compile(r'^(NOME\s*:?\s*)', flags=re.IGNORECASE)
+
+
+def _text(element) -> str:
+    """Texto do elemento sem espaços nas pontas de cada trecho (equivale ao get_text(strip=True))."""
+    if element is None:
+        return ""
+    return "".join(piece.strip() for piece in element.itertext())
+
+
+def _first(root, xpath: str):
+    found = root.xpath(xpath)
+    return found[0] if found else None
+
+
+def _document(content: str):
+    return lxml_html.document_fromstring(content)
+
+
+def parse_price_table(content: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Extrai as linhas da página de preços (epdv002d2.asp).
+    Returns:
+        list: Uma entrada por item (codigo, qtd, descricao, qtdaEst, valorVenda, valorTabela, valorCusto);
+              lista vazia se o portal não encontrou registros.
+        None: Se a página não contém o formulário de preços (ex: layout alterado, sessão expirada).
+    """
+    if any(marker in content for marker in NO_RECORDS_MARKERS):
+        return []
+
+    form = _first(_document(content), "//form[@id='preco_item_web']")
+    if form is None:
+        return None
+
+    rows = []
+    for row in form.iter("tr"):
+        if "Row" not in (row.get("class") or "").split():
+            continue
+        cols = [child for child in row if child.tag == "td"]
+        if len(cols) >= 8:
+            rows.append({name: cols[index + 1].text_content().strip() for index, name in enumerate(PRICE_COLUMNS)})
+    return rows
+
+
+def parse_warranty(content: str, nro_motor: str) -> Optional[Dict[str, str]]:
+    """
+    Extrai os dados de garantia da página ewr010.asp.
+    Returns:
+        dict: nro_motor, nro_serie, modelo, dt_venda, status_garantia, vld_garantia (sem nome_cli,
+              que vem de outra página, ver parse_client_name).
+        None: Se o número do motor não aparece na página.
+    """
+    root = _document(content)
+    serial_upper = nro_motor.upper()
+    if not any(serial_upper in text.upper() for text in root.itertext()):
+        return None
+
+    row = _first(root, WARRANTY_ROW_XPATH)
+    cells = row.xpath("./td") if row is not None else []
+
+    def cell(position: int) -> str:
+        # Posição como no nth-of-type do CSS (1 = primeira coluna)
+        return _text(cells[position - 1]) if len(cells) >= position else ""
+
+    nro_serie = _text(_first(root, WARRANTY_SERIAL_XPATH))
+    return {
+        "nro_motor": nro_motor,
+        "nro_serie": nro_serie or nro_motor,
+        "modelo": cell(2),
+        "dt_venda": cell(3),
+        "status_garantia": cell(5),
+        "vld_garantia": cell(6),
+    }
+
+
+def parse_client_name(content: str) -> str:
+    """Extrai o nome do cliente da página ewr010c.asp (sem o prefixo 'Nome:')."""
+    element = _first(_document(content), WARRANTY_CLIENT_XPATH)
+    if element is None:
+        return ""
+    return CLIENT_NAME_PREFIX.sub('', _text(element)).strip()
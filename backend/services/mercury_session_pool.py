@@ -0,0 +1,272 @@
+"""
+Pool de sessões autenticadas no Portal Mercury Marine, por tenant.
+
+Um único Chromium por processo; cada tenant tem seu próprio BrowserContext já
+logado, reaproveitado entre as consultas. Assim cada busca de produto ou
+garantia paga só a navegação, e não a inicialização do navegador e o login.
+
+- Sessões ociosas por mais de MERCURY_POOL_IDLE_SECONDS são fechadas.
+- No máximo MERCURY_POOL_MAX_SESSIONS contextos abertos ao mesmo tempo
+  (a sessão ociosa usada há mais tempo é descartada para abrir uma nova).
+- Sessão expirada (portal volta para a tela de login) refaz o login na própria
+  aba que detectou a expiração (os cookies são do contexto) e repete a
+  navegação; navegador desconectado é reaberto.
+- O login de uma sessão nova roda fora do lock do pool: só as consultas do
+  mesmo tenant esperam por ele.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LOGIN_URL = "https://portal.mercurymarine.com.br/epdv/epdv001.asp"
+
+MAX_SESSIONS = int(os.getenv("MERCURY_POOL_MAX_SESSIONS", "5"))
+IDLE_TIMEOUT_SECONDS = int(os.getenv("MERCURY_POOL_IDLE_SECONDS", "600"))
+
+
+async def _find_login_frame(page):
+    """Retorna o frame com o formulário de login, ou None se a página não for a de login."""
+    for f in page.frames:
+        try:
+            if await f.query_selector("input[name='sUsuar']"):
+                return f
+        except Exception:
+            continue
+    return None
+
+
+async def login(page, username: str, password: str):
+    """
+    Faz login no portal. O formulário pode estar dentro de um frame,
+    então procura o frame que contém o campo de usuário.
+    """
+    await page.goto(LOGIN_URL, timeout=60000)
+    await page.wait_for_load_state(timeout=60000)
+
+    frame = await _find_login_frame(page) or page.main_frame
+    await frame.fill("input[name='sUsuar']", username)
+    await frame.fill("input[name='sSenha']", password)
+    await frame.press("input[name='sSenha']", "Enter")
+    await page.wait_for_load_state(timeout=60000)
+
+
+def _credentials_hash(username: str, password: str) -> str:
+    return hashlib.sha256(f"{username}\0{password}".encode("utf-8")).hexdigest()
+
+
+class MercurySession:
+    """
+    Contexto autenticado de um tenant. `page` é a aba principal (uso exclusivo
+    via MercurySessionPool.page); sincronizações em lote abrem abas próprias
+    no mesmo `context`.
+    """
+
+    def __init__(self, key: Any, username: str, password: str, context, page):
+        self.key = key
+        self.username = username
+        self.password = password
+        self.credentials_hash = _credentials_hash(username, password)
+        self.context = context
+        self.page = page
+        self.page_lock = asyncio.Lock()
+        self.login_lock = asyncio.Lock()
+        self.active = 0 # Usos em andamento (não pode ser descartada enquanto > 0)
+        self.last_used = time.monotonic()
+        self.logged_in_at = 0.0
+
+    async def login(self):
+        async with self.login_lock:
+            await login(self.page, self.username, self.password)
+            self.logged_in_at = time.monotonic()
+
+    def is_healthy(self) -> bool:
+        try:
+            return not self.page.is_closed() and self.context.browser.is_connected()
+        except Exception:
+            return False
+
+    async def navigate(self, page, url: str, timeout: int = 60000):
+        """
+        Navega para `url`. Se o portal redirecionar para a tela de login
+        (sessão expirada), refaz o login uma única vez e repete a navegação.
+        O login é feito em `page`, que o caller já detém: `self.page` pode estar
+        em uso exclusivo de outra consulta.
+        """
+        started = time.monotonic()
+        await page.goto(url, timeout=timeout)
+        if await _find_login_frame(page) is None:
+            return
+        # Várias abas podem detectar a expiração ao mesmo tempo: só a
+        # primeira refaz o login, as demais apenas repetem a navegação.
+        if self.logged_in_at < started:
+            logger.info(f"Mercury: sessão expirada (tenant {self.key}), refazendo login")
+            async with self.login_lock:
+                if self.logged_in_at < started:
+                    await login(page, self.username, self.password)
+                    self.logged_in_at = time.monotonic()
+        await page.goto(url, timeout=timeout)
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception as e:
+            logger.warning(f"Mercury: erro ao fechar sessão do tenant {self.key}: {e}")
+
+
+class MercurySessionPool:
+    """Pool de sessões por tenant sobre um único navegador Chromium."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_timeout: int = IDLE_TIMEOUT_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[Any, MercurySession]" = OrderedDict()
+        self._playwright = None
+        self._browser = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._key_locks: Dict[Any, asyncio.Lock] = {} # Serializa a criação/login da sessão de cada tenant
+        self._opening = 0 # Sessões em login (ainda fora de _sessions), contam no limite
+        self._loop = None
+
+    def _check_loop(self):
+        # Objetos do Playwright e locks do asyncio pertencem ao event loop em
+        # que foram criados. Se o loop mudou (ex: testes), começa do zero.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._key_locks = {}
+            self._opening = 0
+            self._sessions.clear()
+            self._playwright = None
+            self._browser = None
+
+    async def _ensure_browser(self):
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        try:
+            from playwright.async_api import async_playwright
+        except ImportError:
+            raise RuntimeError("Playwright não instalado. Scraper desativado.")
+
+        # Navegador caiu: as sessões dele não servem mais.
+        self._sessions.clear()
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        return self._browser
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        for key, session in list(self._sessions.items()):
+            if session.active == 0 and now - session.last_used > self.idle_timeout:
+                del self._sessions[key]
+                await session.close()
+
+    async def _make_room(self):
+        while len(self._sessions) + self._opening >= self.max_sessions:
+            idle = next((k for k, s in self._sessions.items() if s.active == 0), None)
+            if idle is None:
+                raise RuntimeError("Limite de sessões simultâneas do Portal Mercury atingido. Tente novamente.")
+            await self._sessions.pop(idle).close()
+
+    async def _acquire_existing(self, key: Any, username: str, password: str) -> Optional[MercurySession]:
+        """Sessão saudável já aberta para o tenant (marcada em uso), ou None. Chamar com _lock."""
+        await self._evict_idle()
+
+        session = self._sessions.get(key)
+        if session is not None and (
+            session.credentials_hash != _credentials_hash(username, password)
+            or not session.is_healthy()
+        ):
+            # Credenciais alteradas ou aba/navegador morto: recria a sessão.
+            del self._sessions[key]
+            if session.active == 0:
+                await session.close()
+            session = None
+
+        if session is not None:
+            self._sessions.move_to_end(key)
+            session.active += 1
+        return session
+
+    async def _get_session(self, key: Any, username: str, password: str) -> MercurySession:
+        self._check_loop()
+        async with self._lock:
+            session = await self._acquire_existing(key, username, password)
+        if session is not None:
+            return session
+
+        # Sessão nova: só uma criação por tenant, e o login (lento) fora do _lock.
+        key_lock = self._key_locks.setdefault(key, asyncio.Lock())
+        async with key_lock:
+            async with self._lock:
+                session = await self._acquire_existing(key, username, password)
+                if session is not None:
+                    return session
+                await self._make_room()
+                browser = await self._ensure_browser()
+                context = await browser.new_context()
+                session = MercurySession(key, username, password, context, await context.new_page())
+                self._opening += 1
+
+            try:
+                await session.login()
+            except Exception:
+                async with self._lock:
+                    self._opening -= 1
+                await session.close()
+                raise
+
+            async with self._lock:
+                self._opening -= 1
+                self._sessions[key] = session
+                self._sessions.move_to_end(key)
+                session.active += 1
+            return session
+
+    def _release(self, session: MercurySession):
+        session.active -= 1
+        session.last_used = time.monotonic()
+
+    @asynccontextmanager
+    async def session(self, key: Any, username: str, password: str):
+        """Sessão logada do tenant, compartilhada (para abrir abas próprias no contexto)."""
+        session = await self._get_session(key, username, password)
+        try:
+            yield session
+        finally:
+            self._release(session)
+
+    @asynccontextmanager
+    async def page(self, key: Any, username: str, password: str):
+        """Sessão logada do tenant com uso exclusivo da aba principal (`session.page`)."""
+        async with self.session(key, username, password) as session:
+            async with session.page_lock:
+                yield session
+
+    async def close(self):
+        """Fecha todas as sessões e o navegador (shutdown da aplicação)."""
+        for session in list(self._sessions.values()):
+            await session.close()
+        self._sessions.clear()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+# Instância única por processo.
+pool = MercurySessionPool()
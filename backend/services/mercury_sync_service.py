@@ -0,0 +1,217 @@
+"""
+Sincronização de preços com o Portal Mercury Marine.
+
+As N abas são abertas no BrowserContext já logado do tenant (pool de sessões,
+cookies compartilhados, sem novos logins) e cada aba é um worker que consome
+SKUs de uma fila comum. O parsing do HTML roda fora do event loop e os preços
+encontrados são gravados no banco de uma só vez ao final.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from backend import models, crud
+from backend.services import job_queue, mercury_parser
+from backend.services.mercury_session_pool import pool
+
+logger = logging.getLogger(__name__)
+
+# Usando o ID de pedido que estava no repositório original '11111111111111111'
+PRICE_SEARCH_URL = "https://portal.mercurymarine.com.br/epdv/epdv002d2.asp?s_nr_pedido_web=11111111111111111&s_nr_tabpre=&s_fm_cod_com=null&s_desc_item={item}"
+
+# Abas simultâneas por sincronização. O portal não lida bem com muitas
+# requisições paralelas da mesma sessão; 4 é um bom equilíbrio.
+DEFAULT_CONCURRENCY = int(os.getenv("MERCURY_SYNC_CONCURRENCY", "4"))
+MAX_CONCURRENCY = 8
+ITEM_TIMEOUT_MS = 30000
+
+JOB_KIND = "mercury_price_sync"
+# Peças por lote na tarefa em segundo plano: o progresso é gravado a cada lote.
+JOB_CHUNK_SIZE = int(os.getenv("MERCURY_SYNC_JOB_CHUNK", "50"))
+
+
+def parse_brl_currency(value_str: str) -> float:
+    """Converte string de moeda BRL ('1.234,56') para float (1234.56)."""
+    if not value_str:
+        return 0.0
+    try:
+        # Remove caracteres não numéricos exceto , e . (e R$)
+        clean_str = value_str.strip().replace("R$", "").strip()
+        # Remove pontos de milhar
+        clean_str = clean_str.replace(".", "")
+        # Troca vírgula decimal por ponto
+        clean_str = clean_str.replace(",", ".")
+        return float(clean_str)
+    except ValueError:
+        return 0.0
+
+
+def find_price_row(content: str, sku: str) -> Dict[str, Any]:
+    """
+    Procura na página de preços a linha com o código exato do SKU.
+    Função síncrona e pura (chamada em thread pelo sincronizador).
+    Returns:
+        dict: status ('found', 'not_found', 'parse_error', 'not_found_in_table') e, se encontrado, cost/price.
+    """
+    rows = mercury_parser.parse_price_table(content)
+    if rows is None:
+        return {"status": "parse_error"}
+    if not rows:
+        return {"status": "not_found"}
+
+    for row in rows:
+        if row["codigo"] == sku:
+            return {
+                "status": "found",
+                "price": parse_brl_currency(row["valorVenda"]),
+                "cost": parse_brl_currency(row["valorCusto"]),
+            }
+    return {"status": "not_found_in_table"}
+
+
+async def _fetch_price(page, sku: str, navigate: Callable) -> Dict[str, Any]:
+    try:
+        await navigate(page, PRICE_SEARCH_URL.format(item=sku), timeout=ITEM_TIMEOUT_MS)
+        content = await page.content()
+        # Parsing é CPU-bound: fora do event loop para não travar as outras abas.
+        return await asyncio.to_thread(find_price_row, content, sku)
+    except Exception as e:
+        logger.warning(f"Erro ao sincronizar SKU {sku}: {e}")
+        return {"status": "error"}
+
+
+async def _goto(page, url: str, timeout: int):
+    await page.goto(url, timeout=timeout)
+
+
+async def sync_prices(context, skus: List[str], concurrency: int = DEFAULT_CONCURRENCY, navigate: Optional[Callable] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Consulta os preços dos SKUs em paralelo, usando `concurrency` abas do
+    BrowserContext já autenticado. `navigate(page, url, timeout)` permite
+    tratar a expiração da sessão (ver MercurySession.navigate).
+    Returns:
+        dict: Resultado de find_price_row por SKU.
+    """
+    navigate = navigate or _goto
+    queue: asyncio.Queue = asyncio.Queue()
+    for sku in dict.fromkeys(skus): # Remove duplicados mantendo a ordem
+        queue.put_nowait(sku)
+
+    workers_count = max(1, min(concurrency, MAX_CONCURRENCY, queue.qsize()))
+    pages = [await context.new_page() for _ in range(workers_count)]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async def worker(page):
+        while True:
+            try:
+                sku = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            results[sku] = await _fetch_price(page, sku, navigate)
+
+    try:
+        await asyncio.gather(*(worker(page) for page in pages))
+    finally:
+        for page in pages:
+            await page.close()
+    return results
+
+
+async def fetch_prices(username: str, password: str, skus: List[str], concurrency: int = DEFAULT_CONCURRENCY, tenant_id: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Consulta todos os SKUs em paralelo usando a sessão logada do tenant no pool.
+    Levanta RuntimeError se o Playwright não estiver instalado.
+    """
+    async with pool.session(tenant_id or username, username, password) as session:
+        logger.info(f"Mercury: sincronizando {len(skus)} SKUs com {concurrency} abas")
+        return await sync_prices(session.context, skus, concurrency, navigate=session.navigate)
+
+
+def apply_price_updates(db: Session, parts: List[models.Part], prices: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Grava de uma vez (um único commit) os preços encontrados.
+    Returns:
+        list: Resumo por peça (id, sku, status e preço quando atualizado).
+    """
+    now = datetime.now(timezone.utc)
+    updates = []
+    summary = []
+    for part in parts:
+        result: Optional[Dict[str, Any]] = prices.get(part.sku)
+        if not result:
+            summary.append({"id": part.id, "sku": part.sku, "status": "error"})
+            continue
+        if result["status"] != "found":
+            summary.append({"id": part.id, "sku": part.sku, "status": result["status"]})
+            continue
+        updates.append({
+            "part_id": part.id,
+            "cost": result["cost"],
+            "price": result["price"],
+            "last_price_updated_at": now,
+        })
+        summary.append({"id": part.id, "sku": part.sku, "status": "updated", "price": result["price"]})
+
+    if updates:
+        # Preços absolutos vindos do portal: grava sem conferir a versão lida antes
+        # da consulta (que pode levar minutos), mas incrementa a versão de cada peça.
+        table = models.Part.__table__
+        db.execute(
+            update(table).where(table.c.id == bindparam("part_id")).values(
+                cost=bindparam("cost"),
+                price=bindparam("price"),
+                last_price_updated_at=bindparam("last_price_updated_at"),
+                version=table.c.version + 1,
+            ),
+            updates,
+        )
+        db.commit()
+    return summary
+
+
+def _load_chunk(db: Session, tenant_id: int, part_ids: List[int]) -> List[models.Part]:
+    return db.query(models.Part).filter(
+        models.Part.tenant_id == tenant_id,
+        models.Part.id.in_(part_ids)
+    ).all()
+
+
+def _save_chunk(db: Session, job: models.BackgroundJob, parts: List[models.Part], chunk_ids: List[int], prices: Dict[str, Dict[str, Any]]):
+    """Grava os preços do lote e o progresso da tarefa (peças removidas depois da criação ficam part_not_found)."""
+    found_ids = {part.id for part in parts}
+    summary = apply_price_updates(db, parts, prices)
+    summary += [{"id": part_id, "status": "part_not_found"} for part_id in chunk_ids if part_id not in found_ids]
+    job_queue.record_progress(db, job, summary, len(chunk_ids))
+
+
+@job_queue.handler(JOB_KIND)
+async def run_price_sync_job(db: Session, job: models.BackgroundJob):
+    """
+    Executor da tarefa de sincronização em lote. Processa apenas as peças
+    ainda sem resultado (retomada após reinício) e grava o progresso a cada lote.
+    As consultas e gravações rodam em thread; só a navegação no portal fica no event loop.
+    """
+    tenant_id = job.tenant_id
+    company = await asyncio.to_thread(crud.get_company_info, db, tenant_id=tenant_id)
+    if not company or not company.mercury_username or not company.mercury_password:
+        raise RuntimeError("Credenciais Mercury não configuradas")
+    username, password = company.mercury_username, company.mercury_password
+
+    done = {result["id"] for result in job.results or []}
+    remaining = [part_id for part_id in job.params["part_ids"] if part_id not in done]
+    concurrency = job.params.get("concurrency", DEFAULT_CONCURRENCY)
+
+    for start in range(0, len(remaining), JOB_CHUNK_SIZE):
+        chunk_ids = remaining[start:start + JOB_CHUNK_SIZE]
+        parts = await asyncio.to_thread(_load_chunk, db, tenant_id, chunk_ids)
+
+        prices = {}
+        if parts:
+            prices = await fetch_prices(username, password, [part.sku for part in parts], concurrency=concurrency, tenant_id=tenant_id)
+        await asyncio.to_thread(_save_chunk, db, job, parts, chunk_ids, prices)
@@ -0,0 +1,89 @@
+"""
+Conciliação do valor total das Ordens de Serviço.
+
+O total da OS é mantido de forma incremental (UPDATE ... total_value + :delta
+a cada item incluído, alterado ou removido, ver crud.add_order_item). Esta
+rotina periódica confere, em uma única consulta, as OS cujo total divergiu da
+soma dos itens (ex: alterações feitas direto no banco) e corrige todas com um
+único UPDATE. Substitui o antigo scripts/check_integrity.py.
+
+- ORDER_TOTALS_RECONCILE_SECONDS: intervalo da rotina (0 desativa).
+"""
+
+import os
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.services import job_queue
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("ORDER_TOTALS_RECONCILE_SECONDS", "3600"))
+TOLERANCE = 0.01 # Diferenças de arredondamento de float
+MAX_REPORTED_ORDERS = 500
+
+
+def _items_total():
+    # Soma dos itens da OS da linha corrente (subconsulta correlacionada).
+    return select(func.coalesce(func.sum(models.ServiceItem.total), 0)).where(
+        models.ServiceItem.order_id == models.ServiceOrder.id
+    ).scalar_subquery()
+
+
+def _drift_filters(items_total, tenant_id: Optional[int]):
+    filters = [func.abs(func.coalesce(models.ServiceOrder.total_value, 0) - items_total) > TOLERANCE]
+    if tenant_id is not None:
+        filters.append(models.ServiceOrder.tenant_id == tenant_id)
+    return filters
+
+
+def find_drifted_orders(db: Session, tenant_id: Optional[int] = None, limit: int = MAX_REPORTED_ORDERS) -> List[Dict[str, Any]]:
+    """
+    Lista as OS cujo total diverge da soma dos itens.
+    Returns:
+        list: id, tenant_id, total_value (gravado) e items_total (soma dos itens) por OS.
+    """
+    items_total = _items_total()
+    rows = db.execute(
+        select(
+            models.ServiceOrder.id,
+            models.ServiceOrder.tenant_id,
+            models.ServiceOrder.total_value,
+            items_total.label("items_total"),
+        ).where(*_drift_filters(items_total, tenant_id)).order_by(models.ServiceOrder.id).limit(limit)
+    ).all()
+    return [
+        {"id": row.id, "tenant_id": row.tenant_id, "total_value": row.total_value, "items_total": float(row.items_total)}
+        for row in rows
+    ]
+
+
+def reconcile_order_totals(db: Session, tenant_id: Optional[int] = None, fix: bool = True) -> List[Dict[str, Any]]:
+    """
+    Encontra e (se `fix`) corrige, com um único UPDATE, as OS com total divergente.
+    Returns:
+        list: As OS divergentes encontradas (ver find_drifted_orders), limitadas a MAX_REPORTED_ORDERS.
+    """
+    drifted = find_drifted_orders(db, tenant_id)
+    if drifted and fix:
+        items_total = _items_total()
+        db.execute(
+            update(models.ServiceOrder)
+            .where(*_drift_filters(items_total, tenant_id))
+            .values(total_value=items_total, version=models.ServiceOrder.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    return drifted
+
+
+@job_queue.periodic(RECONCILE_INTERVAL_SECONDS)
+def reconcile_all_tenants(db: Session):
+    """Rotina periódica: corrige os totais divergentes de todos os tenants."""
+    drifted = reconcile_order_totals(db)
+    if drifted:
+        logger.warning(f"Totais de {len(drifted)} OS divergiam da soma dos itens e foram corrigidos: {[o['id'] for o in drifted]}")
@@ -0,0 +1,318 @@
+"""
+Importação em lote de peças (tabelas de preço Mercury, planilhas de estoque).
+
+Lê CSV/XLSX em streaming, linha a linha, e grava em lotes com
+INSERT ... ON CONFLICT (tenant_id, sku) DO UPDATE — um commit por lote em vez
+de um commit por peça. A memória usada é limitada ao tamanho do lote.
+
+Quando o arquivo traz a quantidade, a diferença para o estoque anterior de cada
+peça é registrada como movimento de ajuste (ADJUSTMENT_PLUS/ADJUSTMENT_MINUS),
+para que o Kardex continue fechando com a quantidade atual.
+"""
+
+import csv
+import io
+import logging
+import unicodedata
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend import models
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 500
+
+# Cabeçalhos aceitos (normalizados: minúsculas, sem acentos, espaços -> '_')
+# para cada coluna de models.Part.
+COLUMN_ALIASES = {
+    "sku": ["sku", "codigo", "cod", "part_number", "partnumber", "item"],
+    "name": ["name", "nome", "descricao", "description"],
+    "barcode": ["barcode", "codigo_barras", "ean", "gtin"],
+    "quantity": ["quantity", "quantidade", "qtd", "estoque"],
+    "cost": ["cost", "custo", "valor_custo", "valorcusto"],
+    "price": ["price", "preco", "valor_venda", "valorvenda", "preco_venda"],
+    "min_stock": ["min_stock", "minstock", "estoque_minimo"],
+    "location": ["location", "localizacao", "local"],
+    "manufacturer": ["manufacturer", "fabricante", "marca"],
+    "group": ["group", "grupo"],
+    "subgroup": ["subgroup", "subgrupo"],
+}
+
+NUMERIC_COLUMNS = {"quantity", "cost", "price", "min_stock"}
+
+
+def _normalize_header(header: Any) -> str:
+    value = unicodedata.normalize("NFKD", str(header or "")).encode("ascii", "ignore").decode("ascii")
+    return value.strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def map_headers(headers: List[Any]) -> Dict[int, str]:
+    """
+    Mapeia a posição de cada cabeçalho reconhecido para a coluna de models.Part.
+    Levanta ValueError se não houver coluna de SKU.
+    """
+    lookup = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    mapping = {}
+    for index, header in enumerate(headers):
+        column = lookup.get(_normalize_header(header))
+        if column and column not in mapping.values():
+            mapping[index] = column
+    if "sku" not in mapping.values():
+        raise ValueError("Arquivo sem coluna de SKU/código.")
+    return mapping
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """
+    Converte números em formato brasileiro ('R$ 1.234,56') ou internacional ('1234.56').
+    Retorna None para células vazias e levanta ValueError para valores inválidos.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    clean = str(value).replace("R$", "").strip()
+    if not clean:
+        return None
+    if "," in clean:
+        clean = clean.replace(".", "").replace(",", ".")
+    return float(clean)
+
+
+def normalize_row(values: List[Any], mapping: Dict[int, str]) -> Dict[str, Any]:
+    """
+    Converte uma linha do arquivo em um dicionário de colunas de models.Part.
+    Células vazias são omitidas (não sobrescrevem dados existentes no upsert).
+    """
+    row = {}
+    for index, column in mapping.items():
+        raw = values[index] if index < len(values) else None
+        if column in NUMERIC_COLUMNS:
+            try:
+                number = parse_number(raw)
+            except ValueError:
+                raise ValueError(f"Valor inválido para '{column}': {raw}")
+            if number is not None:
+                row[column] = number
+        else:
+            text_value = str(raw).strip() if raw is not None else ""
+            if text_value:
+                row[column] = text_value
+
+    if not row.get("sku"):
+        raise ValueError("SKU vazio.")
+    if "name" in mapping.values() and not row.get("name"):
+        raise ValueError("Descrição vazia.")
+    return row
+
+
+def _decode_stream(file_obj) -> io.TextIOWrapper:
+    sample = file_obj.read(65536)
+    file_obj.seek(0)
+    try:
+        sample.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "latin-1" # Exportações do Excel em pt-BR (cp1252/latin-1)
+    return io.TextIOWrapper(file_obj, encoding=encoding, newline="")
+
+
+def iter_csv_rows(file_obj) -> Iterator[List[Any]]:
+    """Lê um CSV binário em streaming. Detecta ';' (Excel pt-BR) ou ',' como separador."""
+    stream = _decode_stream(file_obj)
+    first_line = stream.readline()
+    stream.seek(0)
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    try:
+        yield from csv.reader(stream, delimiter=delimiter)
+    finally:
+        stream.detach() # Não fecha o arquivo original (UploadFile cuida disso)
+
+
+def iter_xlsx_rows(file_obj) -> Iterator[List[Any]]:
+    """Lê a primeira planilha de um XLSX em modo read-only (sem carregar tudo na memória)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Importação de XLSX requer o pacote 'openpyxl'.")
+    workbook = load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        for values in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(values)
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(file_obj, filename: str) -> Iterator[List[Any]]:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return iter_csv_rows(file_obj)
+    if name.endswith(".xlsx"):
+        return iter_xlsx_rows(file_obj)
+    raise ValueError("Formato de arquivo não suportado. Use CSV ou XLSX.")
+
+
+def _upsert_statement(db: Session, update_columns: Tuple[str, ...]):
+    """
+    Monta o INSERT ... ON CONFLICT (tenant_id, sku) DO UPDATE para o dialeto da sessão.
+    Apenas `update_columns` são atualizadas em peças já existentes.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+
+    stmt = dialect_insert(models.Part.__table__)
+    update_set = {c: stmt.excluded[c] for c in update_columns}
+    if not update_set:
+        return stmt.on_conflict_do_nothing(index_elements=["tenant_id", "sku"])
+    update_set["version"] = models.Part.__table__.c.version + 1 # Invalida o ETag das peças alteradas.
+    return stmt.on_conflict_do_update(index_elements=["tenant_id", "sku"], set_=update_set)
+
+
+def _upsert_generic(db: Session, tenant_id: int, rows: List[Dict[str, Any]], update_columns: Tuple[str, ...]):
+    """Fallback sem ON CONFLICT: uma consulta para os SKUs existentes e gravação em massa."""
+    skus = [row["sku"] for row in rows]
+    existing = {sku: (part_id, version) for sku, part_id, version in db.query(
+        models.Part.sku, models.Part.id, models.Part.version
+    ).filter(models.Part.tenant_id == tenant_id, models.Part.sku.in_(skus)).all()}
+    # A versão lida entra no mapeamento: o UPDATE confere e incrementa a versão de cada peça.
+    updates = [
+        {"id": existing[row["sku"]][0], "version": existing[row["sku"]][1], **{c: row[c] for c in update_columns}}
+        for row in rows if row["sku"] in existing
+    ]
+    inserts = [row for row in rows if row["sku"] not in existing]
+    if updates:
+        db.bulk_update_mappings(models.Part, updates)
+    if inserts:
+        db.execute(insert(models.Part.__table__), inserts)
+
+
+def _stock_by_sku(db: Session, tenant_id: int, skus: List[str]) -> Dict[str, Tuple[int, float]]:
+    """(id, quantidade) atuais das peças do tenant com os SKUs informados."""
+    if not skus:
+        return {}
+    return {sku: (part_id, quantity or 0) for sku, part_id, quantity in db.query(
+        models.Part.sku, models.Part.id, models.Part.quantity
+    ).filter(models.Part.tenant_id == tenant_id, models.Part.sku.in_(skus)).all()}
+
+
+def _record_stock_adjustments(
+    db: Session,
+    tenant_id: int,
+    before: Dict[str, Tuple[int, float]],
+    after: Dict[str, Tuple[int, float]],
+    user: Optional[str] = None,
+):
+    """Registra um movimento de ajuste por peça cuja quantidade mudou na importação (peças novas partem de 0)."""
+    movements = []
+    for sku, (part_id, quantity) in after.items():
+        delta = (quantity or 0) - before.get(sku, (part_id, 0))[1]
+        if not delta:
+            continue
+        movements.append({
+            "tenant_id": tenant_id,
+            "part_id": part_id,
+            "type": models.MovementType.ADJUSTMENT_PLUS if delta > 0 else models.MovementType.ADJUSTMENT_MINUS,
+            "quantity": abs(delta),
+            "description": "Ajuste de estoque por importação de planilha",
+            "reference_id": "IMPORT",
+            "user": user,
+        })
+    if movements:
+        db.execute(insert(models.StockMovement.__table__), movements)
+
+
+def upsert_parts(db: Session, tenant_id: int, rows: List[Dict[str, Any]], user: Optional[str] = None) -> int:
+    """
+    Grava um lote de peças com upsert por (tenant_id, sku). Não faz commit.
+    Linhas repetidas no mesmo lote prevalecem pela última ocorrência.
+    Alterações de quantidade geram movimentos de ajuste em nome de `user`.
+    Returns:
+        int: Quantidade de peças gravadas.
+    """
+    unique_rows = {row["sku"]: {**row, "tenant_id": tenant_id} for row in rows}
+    stock_skus = [sku for sku, row in unique_rows.items() if "quantity" in row]
+    stock_before = _stock_by_sku(db, tenant_id, stock_skus)
+
+    # Um comando por conjunto de colunas (normalmente um só por lote), para
+    # que células vazias não sobrescrevam valores existentes.
+    by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for row in unique_rows.values():
+        by_columns.setdefault(tuple(sorted(row)), []).append(row)
+
+    for columns, group_rows in by_columns.items():
+        update_columns = tuple(c for c in columns if c not in ("sku", "tenant_id"))
+        if "name" not in columns:
+            # Arquivo sem descrição: peças novas usam o SKU como nome e
+            # peças existentes mantêm o nome atual.
+            for row in group_rows:
+                row["name"] = row["sku"]
+        stmt = _upsert_statement(db, update_columns)
+        if stmt is None:
+            _upsert_generic(db, tenant_id, group_rows, update_columns)
+        else:
+            db.execute(stmt, group_rows)
+
+    _record_stock_adjustments(db, tenant_id, stock_before, _stock_by_sku(db, tenant_id, stock_skus), user)
+    return len(unique_rows)
+
+
+def import_parts(
+    db: Session,
+    tenant_id: int,
+    rows: Iterator[List[Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    commit: bool = True,
+    user: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Importa as linhas (a primeira é o cabeçalho) em lotes de `batch_size`, com um commit por lote.
+    Com commit=False o último lote fica na transação do caller (ex: para gravar
+    o evento do webhook junto com ele). `user` assina os movimentos de ajuste de estoque.
+    Returns:
+        dict: processed, upserted, error_count e errors (linha e mensagem, limitado a MAX_REPORTED_ERRORS).
+    """
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Arquivo vazio.")
+    mapping = map_headers(header)
+
+    summary = {"processed": 0, "upserted": 0, "error_count": 0, "errors": []}
+    batch: List[Dict[str, Any]] = []
+
+    def flush(last: bool = False):
+        if batch:
+            summary["upserted"] += upsert_parts(db, tenant_id, batch, user)
+            if commit or not last:
+                db.commit()
+            batch.clear()
+
+    try:
+        for line_number, values in enumerate(rows, start=2):
+            if not any(v not in (None, "") for v in values):
+                continue # Linha em branco
+            summary["processed"] += 1
+            try:
+                batch.append(normalize_row(list(values), mapping))
+            except ValueError as e:
+                summary["error_count"] += 1
+                if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                    summary["errors"].append({"row": line_number, "error": str(e)})
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        flush(last=True)
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"Importação de peças (tenant {tenant_id}): {summary['upserted']} gravadas, {summary['error_count']} erros")
+    return summary
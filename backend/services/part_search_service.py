@@ -0,0 +1,189 @@
+"""
+Busca aproximada (fuzzy) de peças para o PDV e para o seletor de itens da OS.
+
+- PostgreSQL: índices GIN com pg_trgm (sku, name, barcode, compatibility) e um
+  índice tsvector; ranking por similaridade de trigramas + ts_rank. Para a
+  digitação incremental, o nome é comparado palavra a palavra (operador <%,
+  word_similarity) e o tsquery usa prefixos ('filt:*').
+- SQLite: tabela sombra FTS5 (parts_fts) mantida por triggers; ranking por bm25.
+- Outros bancos (ou SQLite sem FTS5): fallback com LIKE.
+"""
+
+import re
+import logging
+from typing import List
+
+from sqlalchemy import event, text, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from backend import models
+
+logger = logging.getLogger(__name__)
+
+# Expressão indexada do tsvector. A busca precisa usar exatamente a mesma
+# expressão para que o PostgreSQL aproveite o índice.
+PG_TSVECTOR_EXPR = (
+    "to_tsvector('simple', coalesce(sku, '') || ' ' || coalesce(name, '') || ' ' || coalesce(barcode, ''))"
+)
+
+PG_INDEX_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_parts_sku_trgm ON parts USING gin (sku gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_parts_name_trgm ON parts USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_parts_barcode_trgm ON parts USING gin (barcode gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_parts_compatibility_trgm ON parts USING gin ((compatibility::text) gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_parts_search_tsv ON parts USING gin ({PG_TSVECTOR_EXPR})",
+]
+
+SQLITE_FTS_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS parts_fts_ai AFTER INSERT ON parts BEGIN
+        INSERT INTO parts_fts(rowid, sku, name, barcode, compatibility)
+        VALUES (new.id, new.sku, new.name, new.barcode, new.compatibility);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS parts_fts_ad AFTER DELETE ON parts BEGIN
+        INSERT INTO parts_fts(parts_fts, rowid, sku, name, barcode, compatibility)
+        VALUES ('delete', old.id, old.sku, old.name, old.barcode, old.compatibility);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS parts_fts_au AFTER UPDATE ON parts BEGIN
+        INSERT INTO parts_fts(parts_fts, rowid, sku, name, barcode, compatibility)
+        VALUES ('delete', old.id, old.sku, old.name, old.barcode, old.compatibility);
+        INSERT INTO parts_fts(rowid, sku, name, barcode, compatibility)
+        VALUES (new.id, new.sku, new.name, new.barcode, new.compatibility);
+    END""",
+]
+
+PG_SEARCH_SQL = f"""
+    SELECT id,
+           GREATEST(similarity(sku, :q), word_similarity(:q, name), similarity(coalesce(barcode, ''), :q))
+           + CASE WHEN sku ILIKE :prefix OR barcode = :q THEN 1 ELSE 0 END
+           + ts_rank({PG_TSVECTOR_EXPR}, to_tsquery('simple', :tsquery)) AS score
+    FROM parts
+    WHERE tenant_id = :tenant_id
+      AND (
+        sku ILIKE :prefix
+        OR barcode = :q
+        OR sku % :q
+        OR :q <% name
+        OR (compatibility::text) ILIKE :contains
+        OR {PG_TSVECTOR_EXPR} @@ to_tsquery('simple', :tsquery)
+      )
+    ORDER BY score DESC, name
+    LIMIT :limit
+"""
+
+SQLITE_SEARCH_SQL = """
+    SELECT parts.id
+    FROM parts_fts
+    JOIN parts ON parts.id = parts_fts.rowid
+    WHERE parts_fts MATCH :match AND parts.tenant_id = :tenant_id
+    ORDER BY bm25(parts_fts, 10.0, 5.0, 10.0, 1.0), parts.name
+    LIMIT :limit
+"""
+
+
+def ensure_search_index(connection):
+    """
+    Cria (de forma idempotente) as estruturas de busca para o dialeto da conexão.
+    Executado automaticamente quando a tabela 'parts' é criada e pelo script
+    scripts/create_missing_indexes.py em bancos já existentes.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for ddl in PG_INDEX_DDL:
+            connection.execute(text(ddl))
+    elif dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'parts_fts'")
+        ).first()
+        try:
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5("
+                "sku, name, barcode, compatibility, "
+                "content='parts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            ))
+        except OperationalError as e:
+            logger.warning(f"FTS5 indisponível no SQLite, busca de peças usará LIKE: {e}")
+            return
+        for ddl in SQLITE_FTS_DDL:
+            connection.execute(text(ddl))
+        if not exists:
+            # Indexa as peças já existentes na primeira criação da tabela sombra.
+            connection.execute(text("INSERT INTO parts_fts(parts_fts) VALUES ('rebuild')"))
+
+
+@event.listens_for(models.Part.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    ensure_search_index(connection)
+
+
+@event.listens_for(models.Part.__table__, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS parts_fts"))
+
+
+def _tokens(q: str) -> List[str]:
+    return re.findall(r"\w+", q, flags=re.UNICODE)
+
+
+def _fts_match_expression(q: str) -> str:
+    """Converte o texto digitado em uma expressão FTS5 de prefixos ('"8m0"* "filtro"*')."""
+    return " ".join(f'"{token}"*' for token in _tokens(q))
+
+
+def _pg_prefix_query(q: str) -> str:
+    """Converte o texto digitado em um tsquery de prefixos ('8m0:* & filt:*')."""
+    return " & ".join(f"{token}:*" for token in _tokens(q))
+
+
+def _search_like(db: Session, tenant_id: int, q: str, limit: int) -> List[models.Part]:
+    pattern = f"%{q}%"
+    return db.query(models.Part).filter(
+        models.Part.tenant_id == tenant_id,
+        or_(
+            models.Part.sku.ilike(pattern),
+            models.Part.name.ilike(pattern),
+            models.Part.barcode.ilike(pattern),
+        )
+    ).order_by(models.Part.name, models.Part.id).limit(limit).all()
+
+
+def search_parts(db: Session, tenant_id: int, q: str, limit: int = 20) -> List[models.Part]:
+    """
+    Retorna as peças do tenant mais relevantes para o texto `q`, em ordem de relevância.
+    """
+    q = q.strip()
+    if not q:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        rows = db.execute(text(PG_SEARCH_SQL), {
+            "q": q,
+            "tsquery": _pg_prefix_query(q),
+            "prefix": f"{q}%",
+            "contains": f"%{q}%",
+            "tenant_id": tenant_id,
+            "limit": limit,
+        }).fetchall()
+    elif dialect == "sqlite":
+        match = _fts_match_expression(q)
+        if not match:
+            return []
+        try:
+            rows = db.execute(text(SQLITE_SEARCH_SQL), {
+                "match": match,
+                "tenant_id": tenant_id,
+                "limit": limit,
+            }).fetchall()
+        except OperationalError:
+            return _search_like(db, tenant_id, q, limit)
+    else:
+        return _search_like(db, tenant_id, q, limit)
+
+    ids = [row[0] for row in rows]
+    if not ids:
+        return []
+    parts_by_id = {p.id: p for p in db.query(models.Part).filter(models.Part.id.in_(ids)).all()}
+    return [parts_by_id[i] for i in ids if i in parts_by_id]
@@ -0,0 +1,76 @@
+"""
+Parsing de extratos bancários em PDF (funções puras, executadas no pool de processos).
+
+Cada tarefa abre o PDF pelo caminho do arquivo temporário e extrai um
+intervalo de páginas: o texto de uma página não depende das demais, então as
+páginas são processadas em paralelo e devolvidas uma a uma, sem montar o
+texto do extrato inteiro. O módulo só importa pdfplumber para que os
+processos do pool (iniciados com "spawn") não carreguem a aplicação.
+
+The parsing is heuristic-based because bank PDFs vary wildly.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pdfplumber
+
+# Linha de transação: começa com uma data (DD/MM/AAAA ou DD/MM), seguida do
+# histórico e do valor no fim da linha ('-1.234,56').
+DATE_PATTERN = re.compile(r'(\d{2}/\d{2}(?:/\d{4})?)')
+VALUE_PATTERN = re.compile(r'(-?[\d\.]+,\d{2})')
+
+
+def parse_line(line: str, year: int) -> Optional[Dict[str, Any]]:
+    """Transação da linha, ou None se a linha não tiver data e valor."""
+    date_match = DATE_PATTERN.search(line)
+    if date_match is None:
+        return None
+    values = VALUE_PATTERN.findall(line)
+    if not values:
+        return None
+
+    # Take the first date and the last value (usually the amount)
+    date_str = date_match.group(1)
+    try:
+        if len(date_str) == 5: # DD/MM
+            date_obj = datetime.strptime(f"{date_str}/{year}", "%d/%m/%Y")
+        else: # DD/MM/YYYY
+            date_obj = datetime.strptime(date_str, "%d/%m/%Y")
+        amount = float(values[-1].replace('.', '').replace(',', '.'))
+    except ValueError:
+        return None
+
+    # Description is what's between date and value
+    description = line.replace(date_str, '').replace(values[-1], '').strip()
+    return {
+        "date": date_obj,
+        "description": description,
+        "amount": abs(amount),
+        "type": "INCOME" if amount > 0 else "EXPENSE",
+        "category": "Importado (PDF)",
+        "status": "PAID"
+    }
+
+
+def parse_page(page, year: int) -> List[Dict[str, Any]]:
+    """Transações de uma página do pdfplumber (libera os objetos da página em seguida)."""
+    rows = []
+    for line in (page.extract_text() or "").split('\n'):
+        row = parse_line(line, year)
+        if row is not None:
+            rows.append(row)
+    page.flush_cache()
+    return rows
+
+
+def page_count(path: str) -> int:
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pages(path: str, start: int, stop: int, year: int) -> List[List[Dict[str, Any]]]:
+    """Transações das páginas [start, stop) do PDF, uma lista por página."""
+    with pdfplumber.open(path) as pdf:
+        return [parse_page(pdf.pages[number], year) for number in range(start, stop)]
@@ -0,0 +1,179 @@
+"""
+Planejamento de reposição: lista de compras consolidada por fornecedor.
+
+Em vez de avaliar peça a peça quando o estoque cai abaixo do mínimo, o plano
+é calculado para o tenant inteiro de uma vez, com consultas agregadas no banco
+(GROUP BY) e a combinação feita com pandas vetorizado. A necessidade de cada
+peça no horizonte do plano soma:
+
+- Consumo previsto: média diária de consumo dos últimos HISTORY_DAYS dias
+  (OS e vendas diretas, menos devoluções) vezes o horizonte.
+- OS agendadas: peças das OS em aberto (pendentes, em orçamento, aprovadas ou
+  em execução) agendadas até o fim do horizonte ou sem data. A baixa dessas
+  peças só ocorre na conclusão da OS.
+- Revisões próximas: itens dos kits de manutenção do modelo do motor, para
+  motores a até KIT_MARGIN_HOURS horas do próximo múltiplo de interval_hours
+  e sem OS em aberto (a OS já entra na parcela anterior).
+
+A quantidade sugerida é o que falta para cobrir a necessidade mais o estoque
+mínimo, arredondada para cima. O fornecedor de cada peça é o da nota de
+entrada mais recente (movimento IN_INVOICE cuja referência é o número da
+nota, gravados juntos por crud.create_invoice_entry); sem nota, o fabricante
+da peça.
+
+- REORDER_HISTORY_DAYS: janela do consumo médio (padrão 90).
+- REORDER_HORIZON_DAYS: horizonte padrão do plano (padrão 30).
+- REORDER_KIT_MARGIN_HOURS: horas até a revisão para considerar o kit (padrão 10).
+- REORDER_PLAN_INTERVAL_SECONDS: intervalo do envio do plano ao n8n (evento
+  reorder_plan; padrão: diário; 0 desativa).
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.services import company_info_cache, inventory_report_service, job_queue, webhook_outbox
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = int(os.getenv("REORDER_HISTORY_DAYS", "90"))
+HORIZON_DAYS = int(os.getenv("REORDER_HORIZON_DAYS", "30"))
+KIT_MARGIN_HOURS = int(os.getenv("REORDER_KIT_MARGIN_HOURS", "10"))
+PLAN_INTERVAL_SECONDS = int(os.getenv("REORDER_PLAN_INTERVAL_SECONDS", "86400"))
+
+OPEN_STATUSES = (
+    models.OSStatus.PENDING, models.OSStatus.QUOTATION, models.OSStatus.APPROVED, models.OSStatus.IN_PROGRESS,
+)
+NO_SUPPLIER = "Sem fornecedor"
+
+ITEM_COLUMNS = (
+    "part_id", "sku", "name", "quantity", "min_stock", "forecast", "scheduled", "kits",
+    "suggested_quantity", "cost", "estimated_cost",
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _scheduled_demand(db: Session, tenant_id: int, until: datetime) -> Dict[int, float]:
+    """Peças das OS em aberto agendadas até `until` ou sem data."""
+    item, order = models.ServiceItem, models.ServiceOrder
+    rows = db.query(item.part_id, func.sum(item.quantity)).join(order, order.id == item.order_id).filter(
+        order.tenant_id == tenant_id,
+        order.status.in_(OPEN_STATUSES),
+        or_(order.scheduled_at.is_(None), order.scheduled_at <= until),
+        item.type == models.ItemType.PART,
+        item.part_id.isnot(None),
+    ).group_by(item.part_id).all()
+    return {part_id: total for part_id, total in rows}
+
+
+def _kit_demand(db: Session, tenant_id: int, margin_hours: int) -> Dict[int, float]:
+    """Itens dos kits de manutenção dos motores perto da próxima revisão."""
+    engine, kit, kit_item, order = models.Engine, models.MaintenanceKit, models.MaintenanceKitItem, models.ServiceOrder
+    hours_to_next = kit.interval_hours - func.coalesce(engine.hours, 0) % kit.interval_hours
+    open_order = select(order.id).where(
+        order.tenant_id == tenant_id, order.engine_id == engine.id, order.status.in_(OPEN_STATUSES),
+    ).exists()
+    rows = db.query(kit_item.part_id, func.sum(kit_item.quantity)).select_from(engine).join(
+        kit, and_(kit.tenant_id == engine.tenant_id, func.lower(kit.engine_model) == func.lower(engine.model))
+    ).join(kit_item, kit_item.kit_id == kit.id).filter(
+        engine.tenant_id == tenant_id,
+        kit.interval_hours > 0,
+        hours_to_next <= margin_hours,
+        kit_item.type == models.ItemType.PART,
+        kit_item.part_id.isnot(None),
+        ~open_order,
+    ).group_by(kit_item.part_id).all()
+    return {part_id: total for part_id, total in rows}
+
+
+def _last_suppliers(db: Session, tenant_id: int) -> Dict[int, str]:
+    """Fornecedor da nota de entrada mais recente de cada peça."""
+    movement, invoice = models.StockMovement, models.Invoice
+    latest = db.query(func.max(movement.id).label("id")).filter(
+        movement.tenant_id == tenant_id,
+        movement.type == models.MovementType.IN_INVOICE,
+    ).group_by(movement.part_id).subquery()
+    rows = db.query(movement.part_id, invoice.supplier).join(latest, latest.c.id == movement.id).join(
+        invoice, and_(invoice.tenant_id == tenant_id, invoice.number == movement.reference_id)
+    ).all()
+    return {part_id: supplier for part_id, supplier in rows}
+
+
+def build_plan(db: Session, tenant_id: int, horizon_days: int = HORIZON_DAYS, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Calcula o plano de reposição do tenant.
+    Returns:
+        dict: generated_at, horizon_days, history_days, item_count, total_cost e
+            suppliers (do maior para o menor custo, cada um com as linhas em ITEM_COLUMNS).
+    """
+    now = now or _utcnow()
+    parts = db.query(
+        models.Part.id, models.Part.sku, models.Part.name, models.Part.manufacturer,
+        models.Part.quantity, models.Part.min_stock, models.Part.cost,
+    ).filter(models.Part.tenant_id == tenant_id).all()
+    df = pd.DataFrame.from_records(parts, columns=["part_id", "sku", "name", "manufacturer", "quantity", "min_stock", "cost"])
+    df[["quantity", "min_stock", "cost"]] = df[["quantity", "min_stock", "cost"]].astype("float64").fillna(0.0)
+
+    consumption = inventory_report_service.consumption_by_part(db, tenant_id, now - timedelta(days=HISTORY_DAYS))
+    demand = {
+        "consumption": consumption,
+        "scheduled": _scheduled_demand(db, tenant_id, now + timedelta(days=horizon_days)),
+        "kits": _kit_demand(db, tenant_id, KIT_MARGIN_HOURS),
+    }
+    for column, values in demand.items():
+        df[column] = df["part_id"].map(values).astype("float64").fillna(0.0).clip(lower=0.0)
+    df["forecast"] = (df["consumption"] * horizon_days / HISTORY_DAYS).round(2)
+
+    # Falta para cobrir a necessidade do horizonte e ainda terminar no estoque mínimo.
+    shortfall = df["forecast"] + df["scheduled"] + df["kits"] + df["min_stock"] - df["quantity"].clip(lower=0.0)
+    df["suggested_quantity"] = np.ceil(shortfall.round(6)).clip(lower=0.0)
+    df = df[df["suggested_quantity"] > 0].copy()
+    df["estimated_cost"] = (df["suggested_quantity"] * df["cost"]).round(2)
+
+    suppliers = df["part_id"].map(_last_suppliers(db, tenant_id))
+    df["supplier"] = suppliers.fillna(df["manufacturer"]).replace("", np.nan).fillna(NO_SUPPLIER)
+
+    groups = []
+    for supplier, rows in df.sort_values("sku", kind="stable").groupby("supplier", sort=False):
+        groups.append({
+            "supplier": supplier,
+            "item_count": int(len(rows)),
+            "total_cost": round(float(rows["estimated_cost"].sum()), 2),
+            "items": rows[list(ITEM_COLUMNS)].to_dict(orient="records"),
+        })
+    groups.sort(key=lambda group: (-group["total_cost"], group["supplier"]))
+    return {
+        "generated_at": now.isoformat(),
+        "horizon_days": horizon_days,
+        "history_days": HISTORY_DAYS,
+        "item_count": int(len(df)),
+        "total_cost": round(float(df["estimated_cost"].sum()), 2),
+        "suppliers": groups,
+    }
+
+
+@job_queue.periodic(PLAN_INTERVAL_SECONDS)
+def publish_all_tenants(db: Session):
+    """Rotina periódica: envia ao n8n o plano de reposição dos tenants com webhook configurado."""
+    tenant_ids = [row[0] for row in db.query(models.CompanyInfo.tenant_id).filter(
+        models.CompanyInfo.n8n_webhook_url.isnot(None)
+    ).all()]
+    for tenant_id in tenant_ids:
+        try:
+            company = company_info_cache.load(db, tenant_id)
+            plan = build_plan(db, tenant_id)
+            if company and plan["item_count"]:
+                webhook_outbox.publish(db, tenant_id, company.n8n_webhook_url, "reorder_plan", plan)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Falha ao calcular o plano de reposição do tenant {tenant_id}: {e}")
@@ -0,0 +1,190 @@
+"""
+Kardex (extrato de movimentos por peça) e estoque em uma data.
+
+O saldo de cada linha do Kardex é calculado no banco: o saldo após a primeira
+linha da página vem da quantidade atual da peça menos os movimentos
+posteriores a ela (uma soma sobre o índice (tenant_id, part_id, date, id)), e
+o das demais linhas de uma window function (SUM ... OVER) sobre a própria
+página.
+
+O estoque de um conjunto de peças em um instante parte do registro de
+stock_snapshots anterior mais próximo e soma só os movimentos entre o registro
+e a data. Peças sem registro anterior partem da quantidade atual e descontam
+os movimentos posteriores à data. Os registros são gravados periodicamente,
+com um único INSERT ... SELECT, apenas para as peças movimentadas desde o
+último registro: o inventário de fim de mês não repassa anos de movimentos.
+
+- STOCK_SNAPSHOT_INTERVAL_SECONDS: intervalo dos registros (padrão: diário; 0 desativa).
+"""
+
+import os
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, and_, case, desc, func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from backend import crud, models
+from backend.services import job_queue
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("STOCK_SNAPSHOT_INTERVAL_SECONDS", "86400"))
+
+# Movimentos que aumentam o estoque; os demais (OUT_OS, ADJUSTMENT_MINUS, SALE_DIRECT) diminuem.
+INBOUND_TYPES = (models.MovementType.IN_INVOICE, models.MovementType.RETURN_OS, models.MovementType.ADJUSTMENT_PLUS)
+
+_KARDEX_COLUMNS = ("id", "part_id", "type", "quantity", "description", "reference_id", "user", "date")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def signed_quantity():
+    """Quantidade do movimento com sinal (positiva nas entradas)."""
+    movement = models.StockMovement
+    return case((movement.type.in_(INBOUND_TYPES), movement.quantity), else_=-movement.quantity)
+
+
+def _signed(row: Dict[str, Any]) -> float:
+    return row["quantity"] if row["type"] in INBOUND_TYPES else -row["quantity"]
+
+
+def get_kardex(
+    db: Session,
+    tenant_id: int,
+    part_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Movimentos da peça, dos mais recentes para os mais antigos, ordenados por
+    (date, id), cada um com o saldo da peça após o movimento (balance).
+    Levanta ValueError se o cursor for inválido.
+    Args:
+        cursor (Optional[str]): Cursor retornado pela página anterior (ver crud.encode_cursor).
+        limit (Optional[int]): Tamanho da página; retorna até limit + 1 linhas
+            (a linha extra indica que existe uma próxima página).
+    """
+    movement = models.StockMovement
+    newest_first = (desc(movement.date), desc(movement.id))
+    query = db.query(
+        *[movement.__table__.c[name] for name in _KARDEX_COLUMNS],
+        func.sum(signed_quantity()).over(order_by=newest_first).label("page_total"), # Soma da página até a linha
+    ).filter(movement.tenant_id == tenant_id, movement.part_id == part_id)
+    if date_from:
+        query = query.filter(movement.date >= date_from)
+    if date_to:
+        query = query.filter(movement.date <= date_to)
+    if cursor:
+        last_date, last_id = crud.decode_cursor(cursor)
+        try:
+            last_date = datetime.fromisoformat(last_date)
+        except (TypeError, ValueError):
+            raise ValueError("Cursor inválido")
+        query = query.filter(or_(movement.date < last_date, and_(movement.date == last_date, movement.id < last_id)))
+    query = query.order_by(*newest_first)
+    if limit:
+        query = query.limit(limit + 1)
+    rows = [dict(row._mapping) for row in query.all()]
+    if not rows:
+        return rows
+
+    # Saldo após a primeira linha: quantidade atual menos tudo o que veio depois dela.
+    top = rows[0]
+    current = db.query(models.Part.quantity).filter(
+        models.Part.id == part_id, models.Part.tenant_id == tenant_id
+    ).scalar() or 0.0
+    later = db.query(func.coalesce(func.sum(signed_quantity()), 0.0)).filter(
+        movement.tenant_id == tenant_id,
+        movement.part_id == part_id,
+        or_(movement.date > top["date"], and_(movement.date == top["date"], movement.id > top["id"]))
+    ).scalar()
+    top_balance = current - later
+    for row in rows:
+        row["balance"] = top_balance - row.pop("page_total") + _signed(row)
+    return rows
+
+
+def stock_as_of(db: Session, tenant_id: int, as_of: datetime, part_ids: Optional[List[int]] = None) -> Dict[int, float]:
+    """
+    Quantidade de cada peça do tenant (ou das `part_ids`) no instante `as_of`.
+    Returns:
+        dict: part_id -> quantidade.
+    """
+    movement, snapshot, part = models.StockMovement, models.StockSnapshot, models.Part
+
+    snapshot_filters = [snapshot.tenant_id == tenant_id, snapshot.as_of <= as_of]
+    if part_ids is not None:
+        snapshot_filters.append(snapshot.part_id.in_(part_ids))
+    latest = db.query(
+        snapshot.part_id, func.max(snapshot.as_of).label("as_of")
+    ).filter(*snapshot_filters).group_by(snapshot.part_id).subquery()
+
+    # 1. Peças com registro anterior à data: registro + movimentos entre o registro e a data.
+    forward = db.query(
+        snapshot.part_id, snapshot.quantity, func.coalesce(func.sum(signed_quantity()), 0.0)
+    ).join(
+        latest, and_(snapshot.part_id == latest.c.part_id, snapshot.as_of == latest.c.as_of)
+    ).outerjoin(
+        movement, and_(
+            movement.tenant_id == tenant_id,
+            movement.part_id == snapshot.part_id,
+            movement.date > snapshot.as_of,
+            movement.date <= as_of,
+        )
+    ).filter(snapshot.tenant_id == tenant_id).group_by(snapshot.part_id, snapshot.quantity)
+    stock = {part_id: quantity + delta for part_id, quantity, delta in forward.all()}
+
+    # 2. Demais peças: quantidade atual menos os movimentos posteriores à data.
+    later_filters = [movement.tenant_id == tenant_id, movement.date > as_of]
+    if part_ids is not None:
+        later_filters.append(movement.part_id.in_(part_ids))
+    later = db.query(
+        movement.part_id, func.sum(signed_quantity()).label("delta")
+    ).filter(*later_filters).group_by(movement.part_id).subquery()
+    backward = db.query(
+        part.id, part.quantity, func.coalesce(later.c.delta, 0.0)
+    ).outerjoin(later, later.c.part_id == part.id).outerjoin(
+        latest, latest.c.part_id == part.id
+    ).filter(part.tenant_id == tenant_id, latest.c.part_id.is_(None))
+    if part_ids is not None:
+        backward = backward.filter(part.id.in_(part_ids))
+    for part_id, quantity, delta in backward.all():
+        stock[part_id] = (quantity or 0.0) - delta
+    return stock
+
+
+def take_snapshots(db: Session, as_of: Optional[datetime] = None) -> int:
+    """
+    Grava a quantidade atual das peças (de todos os tenants) movimentadas desde
+    o último registro, com um único INSERT ... SELECT. Faz commit.
+    `as_of` é o instante do registro (padrão: agora).
+    Returns:
+        int: Quantidade de registros gravados.
+    """
+    movement, snapshot, part = models.StockMovement, models.StockSnapshot, models.Part
+    as_of = as_of or _utcnow()
+    last_snapshot = select(func.max(snapshot.as_of)).where(snapshot.part_id == part.id).scalar_subquery()
+    moved = select(movement.id).where(
+        movement.part_id == part.id,
+        or_(last_snapshot.is_(None), movement.date > last_snapshot),
+    ).exists()
+    result = db.execute(insert(snapshot).from_select(
+        ["tenant_id", "part_id", "as_of", "quantity"],
+        select(part.tenant_id, part.id, literal(as_of, DateTime), func.coalesce(part.quantity, 0.0)).where(moved),
+    ))
+    db.commit()
+    return result.rowcount
+
+
+@job_queue.periodic(SNAPSHOT_INTERVAL_SECONDS)
+def snapshot_all_tenants(db: Session):
+    """Rotina periódica: registra o estoque das peças movimentadas."""
+    count = take_snapshots(db)
+    if count:
+        logger.info(f"Estoque registrado para {count} peças")
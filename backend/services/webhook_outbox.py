@@ -0,0 +1,388 @@
+"""
+Outbox dos webhooks enviados ao n8n.
+
+Os routers gravam o evento na tabela webhook_events (publish com
+commit=False) na mesma transação da alteração que ele descreve, em vez de
+disparar o POST em BackgroundTasks: o evento é confirmado junto com a
+alteração ou descartado com ela. Um worker de longa duração no processo da
+API reserva os eventos pendentes e os entrega com um único httpx.AsyncClient
+(conexões reaproveitadas, sem novo handshake TLS por evento), limitando os
+envios simultâneos por endpoint. Falhas são repetidas com backoff
+exponencial; após WEBHOOK_MAX_ATTEMPTS, ou em erros definitivos (4xx), o
+evento fica FAILED com o último erro.
+
+O agrupamento é opcional (desligado por padrão): tipos listados em
+WEBHOOK_BATCH_EVENTS aguardam uma janela curta e os eventos do mesmo tipo,
+tenant e endpoint são enviados juntos. Um envio agrupado NÃO tem a chave
+`data`; o workflow do n8n desses tipos precisa tratar o formato
+(integrations.build_batch_payload):
+
+    {"event": "<tipo>", "batch": true, "count": N, "timestamp": "...",
+     "events": [{"event": "<tipo>", "data": {...}, "timestamp": "..."}, ...]}
+
+Um evento sozinho na janela segue no formato normal ({"event", "data", "timestamp"}).
+
+- WEBHOOK_POLL_SECONDS: intervalo de verificação de eventos (padrão 5).
+- WEBHOOK_TIMEOUT_SECONDS: timeout de cada POST (padrão 10).
+- WEBHOOK_MAX_ATTEMPTS: tentativas antes de desistir (padrão 8).
+- WEBHOOK_BACKOFF_BASE_SECONDS / WEBHOOK_BACKOFF_MAX_SECONDS: backoff (padrão 5 / 3600).
+- WEBHOOK_CONCURRENCY_PER_ENDPOINT: envios simultâneos por URL (padrão 4).
+- WEBHOOK_BATCH_EVENTS: tipos agrupados, separados por vírgula (padrão: nenhum;
+  ex: transactions_imported,parts_imported,quick_sale_processed,low_stock_alert).
+- WEBHOOK_BATCH_WINDOW_SECONDS: espera para agrupar uma rajada (padrão 2).
+- WEBHOOK_RETENTION_DAYS: eventos entregues são removidos após esse prazo (padrão 7).
+"""
+
+import os
+import time
+import uuid
+import random
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.orm import Session
+
+from backend import integrations, models
+from backend.database import SessionLocal
+from backend.services import job_queue
+
+logger = logging.getLogger(__name__)
+
+PENDING = "PENDING"
+SENDING = "SENDING"
+DELIVERED = "DELIVERED"
+FAILED = "FAILED"
+
+POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "5"))
+TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_BASE_SECONDS", "5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_MAX_SECONDS", "3600"))
+CONCURRENCY_PER_ENDPOINT = int(os.getenv("WEBHOOK_CONCURRENCY_PER_ENDPOINT", "4"))
+BATCH_EVENTS = frozenset(
+    name.strip() for name in os.getenv("WEBHOOK_BATCH_EVENTS", "").split(",") if name.strip()
+)
+BATCH_WINDOW_SECONDS = float(os.getenv("WEBHOOK_BATCH_WINDOW_SECONDS", "2"))
+RETENTION_DAYS = int(os.getenv("WEBHOOK_RETENTION_DAYS", "7"))
+
+CLAIM_LIMIT = 100 # Eventos reservados por rodada
+MAX_BATCH_SIZE = 50 # Eventos por envio agrupado
+LEASE_SECONDS = 120 # Eventos SENDING há mais tempo (worker encerrado) voltam a ser entregues
+
+# Fábrica de sessões usada pelo worker (substituível nos testes).
+session_factory = SessionLocal
+
+# Contadores do processo (desde o startup), ver get_status.
+metrics: Counter = Counter()
+
+_WAKE_KEY = "webhook_outbox_wake"
+_client: Optional[httpx.AsyncClient] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+_worker: Optional[asyncio.Task] = None
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+# (ids dos eventos, entregue, pode repetir, erro)
+Outcome = Tuple[List[int], bool, bool, Optional[str]]
+
+
+def _utcnow() -> datetime:
+    # Colunas DateTime sem timezone: grava e compara sempre em UTC "naive".
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def publish(db: Session, tenant_id: int, url: Optional[str], event_type: str, data: dict, commit: bool = True) -> Optional[models.WebhookEvent]:
+    """
+    Grava um evento para entrega ao webhook `url` (sem URL, não faz nada).
+    Com commit=False o evento entra na transação do caller e o worker é
+    acordado quando ela for confirmada.
+    Returns:
+        models.WebhookEvent: O evento gravado, ou None.
+    """
+    if not url:
+        return None
+    now = _utcnow()
+    delay = BATCH_WINDOW_SECONDS if event_type in BATCH_EVENTS else 0
+    webhook_event = models.WebhookEvent(
+        tenant_id=tenant_id,
+        event_type=event_type,
+        url=url,
+        payload=integrations.build_payload(event_type, jsonable_encoder(data)),
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    db.add(webhook_event)
+    db.info[_WAKE_KEY] = True
+    if commit:
+        db.commit()
+    return webhook_event
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session):
+    if session.info.pop(_WAKE_KEY, False):
+        notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_wake(session: Session):
+    session.info.pop(_WAKE_KEY, None)
+
+
+def notify():
+    """Acorda o worker (pode ser chamada de qualquer thread)."""
+    if _loop is None or _wakeup is None:
+        return
+    try:
+        _loop.call_soon_threadsafe(_wakeup.set)
+    except RuntimeError:
+        pass # Event loop já encerrado
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Espera antes da próxima tentativa: exponencial, com teto e ±20% de variação."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _due_filter(now: datetime):
+    return or_(
+        and_(models.WebhookEvent.status == PENDING, models.WebhookEvent.next_attempt_at <= now),
+        and_(models.WebhookEvent.status == SENDING, models.WebhookEvent.claimed_at < now - timedelta(seconds=LEASE_SECONDS)),
+    )
+
+
+def claim_due(db: Session, limit: int = CLAIM_LIMIT) -> List[models.WebhookEvent]:
+    """
+    Reserva (SENDING) os eventos com entrega vencida, em ordem de criação.
+    O token da reserva impede que dois workers entreguem o mesmo evento.
+    """
+    now = _utcnow()
+    ids = [row[0] for row in db.query(models.WebhookEvent.id).filter(_due_filter(now))
+           .order_by(models.WebhookEvent.id).limit(limit).all()]
+    if not ids:
+        return []
+    token = str(uuid.uuid4())
+    db.query(models.WebhookEvent).filter(
+        models.WebhookEvent.id.in_(ids),
+        _due_filter(now),
+    ).update({"status": SENDING, "claim_token": token, "claimed_at": now}, synchronize_session=False)
+    db.commit()
+    return db.query(models.WebhookEvent).filter(
+        models.WebhookEvent.claim_token == token
+    ).order_by(models.WebhookEvent.id).all()
+
+
+def build_deliveries(events: List[models.WebhookEvent]) -> List[Tuple[str, List[int], Dict[str, Any]]]:
+    """
+    Agrupa os eventos reservados em envios: um por evento, ou um por
+    (endpoint, tenant, tipo) para os tipos de WEBHOOK_BATCH_EVENTS.
+    Returns:
+        list: (url, ids dos eventos, corpo do POST).
+    """
+    groups: "OrderedDict[Any, List[models.WebhookEvent]]" = OrderedDict()
+    for webhook_event in events:
+        if webhook_event.event_type in BATCH_EVENTS:
+            key = (webhook_event.url, webhook_event.tenant_id, webhook_event.event_type)
+        else:
+            key = webhook_event.id
+        groups.setdefault(key, []).append(webhook_event)
+
+    deliveries = []
+    for group in groups.values():
+        for start in range(0, len(group), MAX_BATCH_SIZE):
+            chunk = group[start:start + MAX_BATCH_SIZE]
+            if len(chunk) == 1:
+                body = chunk[0].payload
+            else:
+                body = integrations.build_batch_payload(chunk[0].event_type, [e.payload for e in chunk])
+            deliveries.append((chunk[0].url, [e.id for e in chunk], body))
+    return deliveries
+
+
+def _semaphore(url: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(url)
+    if semaphore is None:
+        semaphore = _semaphores[url] = asyncio.Semaphore(CONCURRENCY_PER_ENDPOINT)
+    return semaphore
+
+
+async def _deliver(client: httpx.AsyncClient, url: str, ids: List[int], body: Dict[str, Any]) -> Outcome:
+    async with _semaphore(url):
+        started = time.monotonic()
+        try:
+            response = await client.post(url, json=body)
+        except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+            metrics["errors"] += 1
+            return ids, False, False, f"{type(e).__name__}: {e}"
+        except Exception as e: # Timeout, conexão recusada etc.
+            metrics["errors"] += 1
+            return ids, False, True, f"{type(e).__name__}: {e}"
+        finally:
+            metrics["requests"] += 1
+            metrics["latency_ms_total"] += int((time.monotonic() - started) * 1000)
+
+    if response.status_code < 300:
+        metrics["delivered"] += len(ids)
+        if len(ids) > 1:
+            metrics["batches"] += 1
+        return ids, True, False, None
+    metrics["errors"] += 1
+    # 408/429 e 5xx são temporários; demais 4xx (URL errada, payload recusado) não adiantam repetir.
+    retryable = response.status_code >= 500 or response.status_code in (408, 429)
+    return ids, False, retryable, f"HTTP {response.status_code}: {response.text[:200]}"
+
+
+def record_outcomes(db: Session, outcomes: List[Outcome]):
+    """Grava o resultado das entregas: DELIVERED, nova tentativa agendada ou FAILED (com commit)."""
+    now = _utcnow()
+    delivered = [event_id for ids, ok, _, _ in outcomes if ok for event_id in ids]
+    if delivered:
+        db.query(models.WebhookEvent).filter(models.WebhookEvent.id.in_(delivered)).update({
+            "status": DELIVERED,
+            "attempts": models.WebhookEvent.attempts + 1,
+            "delivered_at": now,
+            "claim_token": None,
+            "last_error": None,
+        }, synchronize_session=False)
+
+    failures = {event_id: (retryable, error) for ids, ok, retryable, error in outcomes if not ok for event_id in ids}
+    if failures:
+        for webhook_event in db.query(models.WebhookEvent).filter(models.WebhookEvent.id.in_(list(failures))).all():
+            retryable, error = failures[webhook_event.id]
+            webhook_event.attempts = (webhook_event.attempts or 0) + 1
+            webhook_event.last_error = error
+            webhook_event.claim_token = None
+            if retryable and webhook_event.attempts < MAX_ATTEMPTS:
+                webhook_event.status = PENDING
+                webhook_event.next_attempt_at = now + timedelta(seconds=backoff_seconds(webhook_event.attempts))
+            else:
+                webhook_event.status = FAILED
+                metrics["failed"] += 1
+                logger.error(f"Webhook {webhook_event.event_type} (evento {webhook_event.id}) descartado após {webhook_event.attempts} tentativas: {error}")
+    db.commit()
+
+
+async def dispatch_once(factory: Optional[Callable[[], Session]] = None, client: Optional[httpx.AsyncClient] = None) -> int:
+    """
+    Uma rodada do worker: reserva os eventos vencidos, entrega em paralelo
+    (respeitando o limite por endpoint) e grava os resultados.
+    Returns:
+        int: Quantidade de eventos reservados.
+    """
+    db = (factory or session_factory)()
+    own_client = None
+    try:
+        # Reserva e gravação dos resultados usam a sessão síncrona: fora do event loop.
+        events = await asyncio.to_thread(claim_due, db)
+        if not events:
+            return 0
+        if client is None:
+            client = _client or (own_client := httpx.AsyncClient(timeout=TIMEOUT_SECONDS))
+        outcomes = await asyncio.gather(*(
+            _deliver(client, url, ids, body) for url, ids, body in build_deliveries(events)
+        ))
+        await asyncio.to_thread(record_outcomes, db, list(outcomes))
+        return len(events)
+    finally:
+        if own_client is not None:
+            await own_client.aclose()
+        await asyncio.to_thread(db.close)
+
+
+async def _run():
+    while True:
+        _wakeup.clear()
+        try:
+            # Esvazia a fila enquanto houver eventos vencidos.
+            while await dispatch_once() >= CLAIM_LIMIT:
+                pass
+        except Exception:
+            logger.exception("Erro inesperado no envio de webhooks")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start():
+    """Cria o cliente HTTP compartilhado e inicia o worker (startup da aplicação)."""
+    global _client, _loop, _wakeup, _worker
+    if _worker is not None:
+        return
+    _client = httpx.AsyncClient(
+        timeout=TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    _worker = asyncio.create_task(_run())
+
+
+async def stop():
+    """Encerra o worker e o cliente HTTP (shutdown). Eventos reservados são retomados após LEASE_SECONDS."""
+    global _client, _loop, _wakeup, _worker
+    if _worker is not None:
+        _worker.cancel()
+        await asyncio.gather(_worker, return_exceptions=True)
+    if _client is not None:
+        await _client.aclose()
+    _client = _loop = _wakeup = _worker = None
+    _semaphores.clear()
+
+
+def get_status(db: Session, tenant_id: int) -> Dict[str, Any]:
+    """
+    Situação das entregas do tenant (contagem por status, pendência mais antiga,
+    último erro) e os contadores do processo.
+    """
+    counts = {status: 0 for status in (PENDING, SENDING, DELIVERED, FAILED)}
+    for status, count in db.query(models.WebhookEvent.status, func.count(models.WebhookEvent.id)).filter(
+        models.WebhookEvent.tenant_id == tenant_id
+    ).group_by(models.WebhookEvent.status).all():
+        counts[status] = count
+
+    oldest_pending_at = db.query(func.min(models.WebhookEvent.created_at)).filter(
+        models.WebhookEvent.tenant_id == tenant_id,
+        models.WebhookEvent.status.in_([PENDING, SENDING])
+    ).scalar()
+    last_error = db.query(models.WebhookEvent.last_error).filter(
+        models.WebhookEvent.tenant_id == tenant_id,
+        models.WebhookEvent.last_error.isnot(None)
+    ).order_by(models.WebhookEvent.id.desc()).limit(1).scalar()
+
+    requests = metrics["requests"]
+    return {
+        "pending": counts[PENDING] + counts[SENDING],
+        "delivered": counts[DELIVERED],
+        "failed": counts[FAILED],
+        "oldest_pending_at": oldest_pending_at,
+        "last_error": last_error,
+        "process": {
+            "requests": requests,
+            "delivered": metrics["delivered"],
+            "batches": metrics["batches"],
+            "errors": metrics["errors"],
+            "failed": metrics["failed"],
+            "avg_latency_ms": round(metrics["latency_ms_total"] / requests, 1) if requests else None,
+        },
+    }
+
+
+@job_queue.periodic(86400)
+def purge_delivered(db: Session):
+    """Rotina periódica: remove os eventos entregues há mais de WEBHOOK_RETENTION_DAYS dias."""
+    cutoff = _utcnow() - timedelta(days=RETENTION_DAYS)
+    db.query(models.WebhookEvent).filter(
+        models.WebhookEvent.status == DELIVERED,
+        models.WebhookEvent.delivered_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
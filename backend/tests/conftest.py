@@ -1,6 +1,7 @@
 """
 Pytest configuration and fixtures for backend tests
 """
+import os
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -25,6 +26,8 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+MERCURY_FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "mercury")
+
 
 @pytest.fixture(scope="function")
 def db() -> Generator:
@@ -139,3 +142,30 @@ def reset_dependency_overrides():
     """Reset dependency overrides after each test"""
     yield
     app.dependency_overrides.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_principal_cache():
+    """Each test has its own database: drop authenticated users cached by earlier tests"""
+    from backend.auth import principal_cache
+    principal_cache.clear()
+    yield
+    principal_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_company_info_cache():
+    """Tenant IDs repeat across test databases: drop company snapshots cached by earlier tests"""
+    from backend.services.company_info_cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def load_fixture():
+    """Read a recorded Mercury portal page (tests/fixtures/mercury) by file name"""
+    def load(name):
+        with open(os.path.join(MERCURY_FIXTURES_DIR, name), encoding="utf-8") as f:
+            return f.read()
+    return load
@@ -3,6 +3,7 @@ Test authentication router - FIXED VERSION
 """
 import pytest
 from fastapi.testclient import TestClient
+import auth
 
 
 @pytest.mark.routers
@@ -99,3 +100,40 @@ class TestAuthRouter:
         
         # Cleanup
         # (Rollback is handled by db fixture usually, but good to be safe)
+
+    def test_current_user_is_cached_and_invalidated(self, client: TestClient, auth_headers, test_user, test_tenant, db):
+        """Test the authenticated principal cache: no user query per request, dropped on user changes"""
+        from jose import jwt
+        from sqlalchemy import event
+        from models import User, UserRole
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        engine = db.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            assert client.get("/api/inventory/parts", headers=auth_headers).status_code == 200
+            statements.clear()
+            assert client.get("/api/inventory/parts", headers=auth_headers).status_code == 200
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert not any("FROM users" in statement for statement in statements)
+
+        # Alteração do usuário descarta o cache: o novo nome vale na próxima requisição.
+        response = client.put(f"/api/auth/users/{test_user.id}", json={"name": "Renamed"}, headers=auth_headers)
+        assert response.status_code == 200
+        token = client.post("/api/auth/refresh-token", headers=auth_headers).json()["accessToken"]
+        assert jwt.get_unverified_claims(token)["name"] == "Renamed"
+
+        # Usuário removido perde o acesso imediatamente.
+        other = User(name="Other", email="other@example.com", hashed_password=auth.get_password_hash("otherpassword"),
+                     role=UserRole.TECHNICIAN, tenant_id=test_tenant.id)
+        db.add(other)
+        db.commit()
+        login = client.post("/api/auth/login", data={"username": "other@example.com", "password": "otherpassword"})
+        other_headers = {"Authorization": f"Bearer {login.json()['accessToken']}"}
+        assert client.get("/api/inventory/parts", headers=other_headers).status_code == 200
+
+        assert client.delete(f"/api/auth/users/{other.id}", headers=auth_headers).status_code == 204
+        assert client.get("/api/inventory/parts", headers=other_headers).status_code == 401
@@ -302,3 +302,138 @@ class TestServiceOrderCRUD:
         orders = db.query(ServiceOrder).filter(ServiceOrder.tenant_id == test_tenant.id).all()
         
         assert len(orders) == 2
+
+    def test_complete_and_reopen_order(self, db: Session, test_tenant):
+        """Test set-based stock deduction and return when completing/reopening an order"""
+        import crud
+        from models import ServiceItem, StockMovement, Transaction, ItemType, MovementType
+
+        owner = Client(name="Stock Client", document="12345678900", email="stock@example.com", tenant_id=test_tenant.id)
+        db.add(owner)
+        db.commit()
+        boat = Boat(name="Stock Boat", model="Test Model", hull_id="STOCK-HULL", client_id=owner.id, tenant_id=test_tenant.id)
+        filter_part = Part(sku="FLT-1", name="Filter", quantity=10.0, price=50.0, tenant_id=test_tenant.id)
+        oil_part = Part(sku="OIL-1", name="Oil", quantity=1.0, price=80.0, tenant_id=test_tenant.id)
+        db.add_all([boat, filter_part, oil_part])
+        db.commit()
+
+        order = ServiceOrder(boat_id=boat.id, description="Revisão", status=OSStatus.IN_PROGRESS,
+                             tenant_id=test_tenant.id, total_value=340.0)
+        db.add(order)
+        db.commit()
+        db.add_all([
+            ServiceItem(order_id=order.id, type=ItemType.PART, description="Filter", part_id=filter_part.id,
+                        quantity=2, unit_price=50.0, total=100.0),
+            ServiceItem(order_id=order.id, type=ItemType.PART, description="Filter", part_id=filter_part.id,
+                        quantity=1, unit_price=50.0, total=50.0),
+            ServiceItem(order_id=order.id, type=ItemType.PART, description="Oil", part_id=oil_part.id,
+                        quantity=2, unit_price=80.0, total=160.0),
+            ServiceItem(order_id=order.id, type=ItemType.LABOR, description="Labor", quantity=1,
+                        unit_price=30.0, total=30.0),
+        ])
+        db.commit()
+
+        completed = crud.complete_order(db, order.id, test_tenant.id)
+        assert completed.status == OSStatus.COMPLETED
+        assert crud.complete_order(db, order.id, test_tenant.id) is None # Já concluída
+
+        db.expire_all()
+        assert db.get(Part, filter_part.id).quantity == 7.0
+        assert db.get(Part, oil_part.id).quantity == 0.0 # Nunca negativo
+        assert db.query(StockMovement).filter(StockMovement.type == MovementType.OUT_OS).count() == 3
+        assert db.query(Transaction).filter(Transaction.order_id == order.id).one().amount == 340.0
+
+        reopened = crud.reopen_order(db, order.id, test_tenant.id)
+        assert reopened.status == OSStatus.IN_PROGRESS
+
+        db.expire_all()
+        assert db.get(Part, filter_part.id).quantity == 10.0
+        assert db.query(StockMovement).filter(StockMovement.type == MovementType.RETURN_OS).count() == 3
+        assert db.query(Transaction).filter(Transaction.order_id == order.id).count() == 0
+
+    def test_order_item_totals_are_incremental(self, db: Session, test_tenant):
+        """Test order total maintenance on item add/update/delete and the reconciliation routine"""
+        import crud
+        import schemas
+        from models import ItemType
+        from backend.services import order_totals_service
+
+        owner = Client(name="Totals Client", document="12345678900", email="totals@example.com", tenant_id=test_tenant.id)
+        db.add(owner)
+        db.commit()
+        boat = Boat(name="Totals Boat", model="Test Model", hull_id="TOTALS-HULL", client_id=owner.id, tenant_id=test_tenant.id)
+        db.add(boat)
+        db.commit()
+        order = ServiceOrder(boat_id=boat.id, description="Totais", status=OSStatus.PENDING, tenant_id=test_tenant.id, total_value=0)
+        db.add(order)
+        db.commit()
+
+        item = schemas.ServiceItemCreate(type=ItemType.LABOR, description="Labor", quantity=2, unit_price=50.0, total=100.0)
+        result = crud.add_order_item(db, order.id, item, tenant_id=test_tenant.id)
+        result = crud.add_order_item(db, order.id, item, tenant_id=test_tenant.id)
+        assert result.total_value == 200.0
+        assert crud.add_order_item(db, 999999, item, tenant_id=test_tenant.id) is None
+
+        item_id = result.items[0].id
+        result = crud.update_order_item(db, order.id, item_id, schemas.ServiceItemUpdate(quantity=3), tenant_id=test_tenant.id)
+        assert result.total_value == 250.0 # 150 + 100
+        assert crud.update_order_item(db, order.id, item_id, schemas.ServiceItemUpdate(quantity=1), tenant_id=test_tenant.id + 1) is None
+
+        result = crud.delete_order_item(db, order.id, item_id, tenant_id=test_tenant.id)
+        assert result.total_value == 100.0
+        assert len(result.items) == 1
+
+        # Total alterado fora da aplicação: a conciliação encontra e corrige.
+        db.query(ServiceOrder).filter(ServiceOrder.id == order.id).update({"total_value": 999.0})
+        db.commit()
+        drifted = order_totals_service.reconcile_order_totals(db, tenant_id=test_tenant.id)
+        assert [o["id"] for o in drifted] == [order.id]
+        db.expire_all()
+        assert db.get(ServiceOrder, order.id).total_value == 100.0
+        assert order_totals_service.reconcile_order_totals(db, tenant_id=test_tenant.id) == []
+
+
+@pytest.mark.crud
+class TestCompanyInfoCRUD:
+    """Test company info operations"""
+
+    def test_company_info_is_cached_and_invalidated(self, db: Session, test_tenant):
+        """Test the per-tenant company snapshot: no query on repeated reads, dropped on update"""
+        import crud
+        import schemas
+        from sqlalchemy import event
+        from models import CompanyInfo
+
+        tenant_id = test_tenant.id
+        assert crud.get_company_info(db, tenant_id) is None
+        info = crud.update_company_info(db, schemas.CompanyInfoCreate(
+            companyName="Marina Cache",
+            mercuryPassword="secret",
+            n8nWebhookUrl="http://hooks.local/a"
+        ), tenant_id)
+        assert info.company_name == "Marina Cache"
+        assert info.mercury_password == "secret"
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        engine = db.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            info = crud.get_company_info(db, tenant_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert statements == []
+        assert info.n8n_webhook_url == "http://hooks.local/a"
+        assert info.mercury_password == "secret"
+        with pytest.raises(Exception):
+            info.n8n_webhook_url = "http://hooks.local/other" # Snapshot imutável
+
+        # O banco continua com o valor criptografado.
+        stored = db.query(CompanyInfo).filter(CompanyInfo.tenant_id == tenant_id).one()
+        assert stored.mercury_password.startswith("enc:")
+
+        crud.update_company_info(db, schemas.CompanyInfoCreate(n8nWebhookUrl="http://hooks.local/b"), tenant_id)
+        info = crud.get_company_info(db, tenant_id)
+        assert info.n8n_webhook_url == "http://hooks.local/b"
+        assert info.mercury_password == "secret"
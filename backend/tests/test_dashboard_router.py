@@ -0,0 +1,66 @@
+"""
+Test dashboard router
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.mark.routers
+class TestDashboardRouter:
+    """Test dashboard summary endpoint"""
+
+    def test_dashboard_summary(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test SQL-computed dashboard indicators backed by the daily rollup"""
+        from datetime import datetime, timezone
+        from models import Client, Boat, ServiceOrder, ServiceItem, Part, Transaction, TenantDailySummary, OSStatus, ItemType
+
+        # Transação anterior ao consolidado: entra pela reconstrução na primeira leitura.
+        db.add(Transaction(tenant_id=test_tenant.id, type="EXPENSE", category="Aluguel", description="Aluguel",
+                           amount=40.0, date=datetime.now(timezone.utc)))
+        db.add_all([
+            Part(sku="LOW-1", name="Low", quantity=1.0, min_stock=2.0, price=10.0, tenant_id=test_tenant.id),
+            Part(sku="OK-1", name="Ok", quantity=10.0, min_stock=2.0, price=10.0, tenant_id=test_tenant.id),
+        ])
+        owner = Client(name="Owner", document="12345678900", email="owner@example.com", tenant_id=test_tenant.id)
+        db.add(owner)
+        db.commit()
+        boat = Boat(name="Dash Boat", model="Model", hull_id="DASH-HULL", client_id=owner.id, tenant_id=test_tenant.id)
+        db.add(boat)
+        db.commit()
+        orders = [ServiceOrder(boat_id=boat.id, description=f"OS {i}", status=OSStatus.PENDING, tenant_id=test_tenant.id, total_value=0)
+                  for i in range(3)]
+        db.add_all(orders)
+        db.commit()
+        db.add(ServiceItem(order_id=orders[0].id, type=ItemType.LABOR, description="Labor", quantity=1, unit_price=300.0, total=300.0))
+        orders[0].total_value = 300.0
+        db.commit()
+
+        response = client.get("/api/dashboard/summary", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["totalExpense"] == 40.0
+        assert data["totalRevenue"] == 0.0
+        assert data["openOrders"] == 3
+        assert data["lowStockCount"] == 1
+
+        # Incremental: transação criada pela API e OS concluída.
+        response = client.post("/api/transactions", json={
+            "type": "INCOME", "category": "Serviços", "description": "Avulsa", "amount": 100.0,
+            "date": datetime.now(timezone.utc).isoformat()
+        }, headers=auth_headers)
+        assert response.status_code == 200
+        assert client.put(f"/api/orders/{orders[0].id}/complete", headers=auth_headers).status_code == 200
+
+        data = client.get("/api/dashboard/summary?months=3", headers=auth_headers).json()
+        assert data["totalRevenue"] == 400.0
+        assert data["ordersByStatus"][OSStatus.COMPLETED.value] == 1
+        assert data["openOrders"] == 2
+        assert len(data["revenueByMonth"]) == 3
+        current = data["revenueByMonth"][-1]
+        assert current["month"] == datetime.now(timezone.utc).strftime("%Y-%m")
+        assert (current["income"], current["expense"], current["ordersCompleted"]) == (400.0, 40.0, 1)
+
+        # Reabrir a OS remove a receita pendente do consolidado.
+        assert client.put(f"/api/orders/{orders[0].id}/reopen", headers=auth_headers).status_code == 200
+        assert client.get("/api/dashboard/summary", headers=auth_headers).json()["totalRevenue"] == 100.0
+        assert db.query(TenantDailySummary).filter(TenantDailySummary.tenant_id == test_tenant.id).count() == 1
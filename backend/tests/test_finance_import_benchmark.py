@@ -0,0 +1,88 @@
+"""
+Benchmarks for the CSV statement parse stage (requires pytest-benchmark).
+Compares the vectorized column parse against the previous row-by-row loop
+on a synthetic statement (FINANCE_BENCHMARK_ROWS lines, 100k by default).
+Run: pytest tests/test_finance_import_benchmark.py --benchmark-only
+(the 100k-row benchmarks are skipped in the regular test run)
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.finance_import_service import FinanceImportService, RowError
+
+pytest.importorskip("pytest_benchmark")
+
+ROWS = int(os.getenv("FINANCE_BENCHMARK_ROWS", "100000"))
+
+
+def build_statement(rows):
+    """Synthetic statement with Brazilian dates and amounts ('-1.234,56')"""
+    rng = np.random.default_rng(42)
+    days = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+    cents = rng.integers(-500000, 500000, rows)
+    return pd.DataFrame({
+        "Data": days.strftime("%d/%m/%Y"),
+        "Histórico": [f"Lançamento {i}" for i in range(rows)],
+        "Valor": [f"{c / 100:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for c in cents],
+    })
+
+
+def legacy_row_loop(df):
+    """Previous implementation: one pd.to_datetime and string replace per row"""
+    cols = df.columns.tolist()
+    date_col, desc_col, amount_col = cols[0], cols[1], cols[-1]
+    transactions = []
+    for _, row in df.iterrows():
+        try:
+            try:
+                date_obj = pd.to_datetime(str(row[date_col]), dayfirst=True).to_pydatetime()
+            except Exception:
+                date_obj = datetime.now()
+            amount = float(str(row[amount_col]).replace('.', '').replace(',', '.'))
+            transactions.append({
+                "date": date_obj,
+                "description": str(row[desc_col]),
+                "amount": abs(amount),
+                "type": "INCOME" if amount > 0 else "EXPENSE",
+            })
+        except Exception:
+            continue
+    return transactions
+
+
+def vectorized(df):
+    columns = FinanceImportService.detect_columns(df.columns.tolist())
+    return [row for row in FinanceImportService._parse_chunk(df, columns, 2) if not isinstance(row, RowError)]
+
+
+@pytest.fixture(scope="module")
+def statement(request):
+    if not request.config.getoption("benchmark_only"):
+        pytest.skip("Run with --benchmark-only")
+    return build_statement(ROWS)
+
+
+@pytest.mark.unit
+def test_benchmark_csv_parse_vectorized(benchmark, statement):
+    benchmark.group = "csv-statement-parse"
+    rows = benchmark.pedantic(vectorized, args=(statement,), rounds=3, iterations=1)
+    assert len(rows) == ROWS
+
+
+@pytest.mark.unit
+def test_benchmark_csv_parse_legacy_row_loop(benchmark, statement):
+    benchmark.group = "csv-statement-parse"
+    rows = benchmark.pedantic(legacy_row_loop, args=(statement,), rounds=1, iterations=1)
+    assert len(rows) == ROWS
+
+
+@pytest.mark.unit
+def test_vectorized_parse_matches_row_loop():
+    statement = build_statement(500)
+    expected = legacy_row_loop(statement)
+    rows = vectorized(statement)
+    assert [(r["date"], r["amount"], r["type"]) for r in rows] == [(r["date"], r["amount"], r["type"]) for r in expected]
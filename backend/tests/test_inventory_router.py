@@ -30,6 +30,124 @@ class TestInventoryRouter:
         data = response.json()
         assert len(data) == 3
     
+    def test_get_parts_paginated(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test keyset pagination and filters on the parts catalog"""
+        from models import Part
+
+        for i in range(5):
+            part = Part(
+                sku=f"PAGE-{i}",
+                name=f"Page Part {i}",
+                quantity=1.0 if i < 2 else 10.0,
+                min_stock=2.0,
+                price=10.0,
+                manufacturer="Mercury" if i % 2 == 0 else "Yamaha",
+                tenant_id=test_tenant.id
+            )
+            db.add(part)
+        db.commit()
+
+        response = client.get("/api/inventory/parts?limit=2", headers=auth_headers)
+        assert response.status_code == 200
+        assert [p["sku"] for p in response.json()] == ["PAGE-0", "PAGE-1"]
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = client.get(f"/api/inventory/parts?limit=2&cursor={cursor}", headers=auth_headers)
+        assert [p["sku"] for p in response.json()] == ["PAGE-2", "PAGE-3"]
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = client.get(f"/api/inventory/parts?limit=2&cursor={cursor}", headers=auth_headers)
+        assert [p["sku"] for p in response.json()] == ["PAGE-4"]
+        assert "X-Next-Cursor" not in response.headers
+
+        response = client.get("/api/inventory/parts?manufacturer=Mercury&low_stock=true", headers=auth_headers)
+        assert [p["sku"] for p in response.json()] == ["PAGE-0"]
+
+        response = client.get("/api/inventory/parts?limit=2&cursor=invalid", headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_search_parts(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test ranked fuzzy search over sku, name and compatibility"""
+        from models import Part
+
+        db.add(Part(sku="8M0123456", name="Filtro de Óleo", compatibility=["V8", "150HP"], tenant_id=test_tenant.id))
+        db.add(Part(sku="35-8M0065103", name="Filtro de Combustível", tenant_id=test_tenant.id))
+        db.add(Part(sku="92-858064K01", name="Graxa", tenant_id=test_tenant.id))
+        db.commit()
+
+        response = client.get("/api/inventory/parts/search?q=filt", headers=auth_headers)
+        assert response.status_code == 200
+        assert {p["sku"] for p in response.json()} == {"8M0123456", "35-8M0065103"}
+
+        response = client.get("/api/inventory/parts/search?q=8M0123", headers=auth_headers)
+        assert [p["sku"] for p in response.json()] == ["8M0123456"]
+
+        response = client.get("/api/inventory/parts/search?q=oleo", headers=auth_headers)
+        assert [p["sku"] for p in response.json()] == ["8M0123456"]
+
+        response = client.get("/api/inventory/parts/search?q=150hp", headers=auth_headers)
+        assert [p["sku"] for p in response.json()] == ["8M0123456"]
+
+    def test_import_parts(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test bulk CSV import: upsert by sku, per-row error report and stock adjustments"""
+        from models import Part, StockMovement, MovementType
+
+        db.add(Part(sku="IMP-1", name="Old Name", quantity=5.0, price=10.0, location="A1", tenant_id=test_tenant.id))
+        db.commit()
+
+        csv_content = (
+            "Código;Descrição;Quantidade;Preço\n"
+            "IMP-1;Filtro Atualizado;12;R$ 1.234,56\n"
+            "IMP-2;Vela de Ignição;3;45,90\n"
+            "IMP-3;Rotor;abc;10\n"
+            ";Sem Código;1;1\n"
+        ).encode("utf-8")
+
+        response = client.post(
+            "/api/inventory/parts/import",
+            files={"file": ("tabela.csv", csv_content, "text/csv")},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["processed"] == 4
+        assert data["upserted"] == 2
+        assert data["errorCount"] == 2
+        assert [e["row"] for e in data["errors"]] == [4, 5]
+
+        db.expire_all()
+        updated = db.query(Part).filter(Part.sku == "IMP-1").one()
+        assert updated.name == "Filtro Atualizado"
+        assert updated.price == 1234.56
+        assert updated.location == "A1"
+        created = db.query(Part).filter(Part.sku == "IMP-2").one()
+        assert created.quantity == 3.0
+
+        # A quantidade importada entra no Kardex como ajuste (peça nova parte de 0).
+        movements = {m.part_id: m for m in db.query(StockMovement).all()}
+        assert movements[updated.id].type == MovementType.ADJUSTMENT_PLUS and movements[updated.id].quantity == 7.0
+        assert movements[created.id].type == MovementType.ADJUSTMENT_PLUS and movements[created.id].quantity == 3.0
+
+        response = client.post(
+            "/api/inventory/parts/import",
+            files={"file": ("tabela.csv", b"sku;quantidade\nIMP-1;10\nIMP-2;3", "text/csv")},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        adjustments = db.query(StockMovement).filter(StockMovement.part_id == updated.id).order_by(StockMovement.id).all()
+        assert [(m.type, m.quantity) for m in adjustments] == [
+            (MovementType.ADJUSTMENT_PLUS, 7.0), (MovementType.ADJUSTMENT_MINUS, 2.0)
+        ]
+        assert db.query(StockMovement).filter(StockMovement.part_id == created.id).count() == 1
+
+        response = client.post(
+            "/api/inventory/parts/import",
+            files={"file": ("tabela.txt", b"sku\nX", "text/plain")},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+
     def test_create_part(self, client: TestClient, auth_headers):
         """Test creating a new part"""
         part_data = {
@@ -191,8 +309,269 @@ class TestInventoryRouter:
         
         assert response.status_code in [200, 201]
     
+    def test_quick_sale(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test the quick sale checkout: one transaction for the whole cart"""
+        from models import Part, StockMovement, Transaction
+
+        parts = [
+            Part(sku=f"SALE-{i}", name=f"Sale Part {i}", quantity=10.0, min_stock=8.0, price=100.0, tenant_id=test_tenant.id)
+            for i in range(2)
+        ]
+        db.add_all(parts)
+        db.commit()
+        ids = [part.id for part in parts]
+
+        sale = {
+            "items": [
+                {"partId": ids[0], "quantity": 2, "discountPercent": 10},
+                {"partId": ids[1], "quantity": 1},
+                {"partId": ids[0], "quantity": 1},
+            ],
+            "paymentMethod": "PIX",
+        }
+        response = client.post("/api/inventory/quick-sale", json=sale, headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_value"] == pytest.approx(180.0 + 100.0 + 100.0)
+        assert data["items_count"] == 3
+
+        db.expire_all()
+        assert [db.get(Part, part_id).quantity for part_id in ids] == [7.0, 9.0]
+        assert db.query(StockMovement).filter(StockMovement.part_id.in_(ids)).count() == 3
+        assert db.query(Transaction).filter(Transaction.category == "VENDAS_PECAS").count() == 1
+
+        # Estoque insuficiente em um item: nada é gravado.
+        sale = {"items": [{"partId": ids[1], "quantity": 1}, {"partId": ids[0], "quantity": 50}]}
+        response = client.post("/api/inventory/quick-sale", json=sale, headers=auth_headers)
+        assert response.status_code == 400
+
+        db.expire_all()
+        assert [db.get(Part, part_id).quantity for part_id in ids] == [7.0, 9.0]
+        assert db.query(StockMovement).filter(StockMovement.part_id.in_(ids)).count() == 3
+
+        response = client.post("/api/inventory/quick-sale", json={"items": [{"partId": 999999, "quantity": 1}]}, headers=auth_headers)
+        assert response.status_code == 404
+
     def test_unauthorized_access(self, client: TestClient):
         """Test accessing inventory without authentication"""
         response = client.get("/api/inventory/parts")
         
         assert response.status_code == 401
+
+    def test_part_kardex_and_stock_as_of(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test the paginated Kardex with running balance and the stock as of a date"""
+        from datetime import datetime, timedelta, timezone
+        from models import Part, StockMovement
+        from backend.services import stock_ledger_service
+
+        part = Part(sku="KARDEX-1", name="Kardex Part", quantity=10.0, price=10.0, tenant_id=test_tenant.id)
+        other = Part(sku="KARDEX-2", name="Other Part", quantity=3.0, price=10.0, tenant_id=test_tenant.id)
+        db.add_all([part, other])
+        db.commit()
+        part_id, other_id = part.id, other.id
+
+        # Saldos após cada movimento: 10, 7, 12, 10, 9, 10 (quantidade atual).
+        history = [("IN_INVOICE", 10), ("OUT_OS", 3), ("IN_INVOICE", 5), ("ADJUSTMENT_MINUS", 2), ("SALE_DIRECT", 1), ("RETURN_OS", 1)]
+        db.add_all([
+            StockMovement(tenant_id=test_tenant.id, part_id=part_id, type=kind, quantity=quantity,
+                          description=f"Movimento {day}", date=datetime(2024, 1, day, 10))
+            for day, (kind, quantity) in enumerate(history, start=1)
+        ])
+        db.commit()
+
+        first = client.get(f"/api/inventory/parts/{part_id}/kardex?limit=4", headers=auth_headers)
+        assert first.status_code == 200
+        assert [(m["description"], m["balance"]) for m in first.json()] == [
+            ("Movimento 6", 10.0), ("Movimento 5", 9.0), ("Movimento 4", 10.0), ("Movimento 3", 12.0)
+        ]
+        second = client.get(
+            f"/api/inventory/parts/{part_id}/kardex",
+            params={"limit": 4, "cursor": first.headers["X-Next-Cursor"]},
+            headers=auth_headers
+        )
+        assert [(m["description"], m["balance"]) for m in second.json()] == [("Movimento 2", 7.0), ("Movimento 1", 10.0)]
+        assert "X-Next-Cursor" not in second.headers
+
+        def stock_at(at):
+            response = client.get("/api/inventory/stock-as-of", params={"at": at.isoformat()}, headers=auth_headers)
+            assert response.status_code == 200
+            return {row["partId"]: row["quantity"] for row in response.json()}
+
+        assert stock_at(datetime(2024, 1, 3, 23, 59)) == {part_id: 12.0, other_id: 3.0}
+        assert stock_at(datetime(2023, 12, 31)) == {part_id: 0.0, other_id: 3.0}
+
+        # Registro periódico: só as peças movimentadas desde o último registro.
+        assert stock_ledger_service.take_snapshots(db) == 1
+        assert stock_ledger_service.take_snapshots(db) == 0
+
+        response = client.post(
+            "/api/inventory/movements",
+            json={"partId": part_id, "type": "IN_INVOICE", "quantity": 4, "description": "NF 123"},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        later = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(minutes=1)
+        assert stock_at(later) == {part_id: 14.0, other_id: 3.0}
+        assert stock_at(datetime(2024, 1, 3, 23, 59))[part_id] == 12.0
+
+        response = client.get("/api/inventory/stock-as-of", params={"at": later.isoformat(), "part_ids": [other_id]}, headers=auth_headers)
+        assert [row["sku"] for row in response.json()] == ["KARDEX-2"]
+
+    def test_inventory_report_valuation_abc_and_daily_cache(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test the inventory report: valuation, ABC classes, dead stock, cover and the daily cache"""
+        from datetime import datetime, timedelta, timezone
+        from models import Part, StockMovement, InventoryReport
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        specs = [
+            # sku, quantidade, custo, consumo em 12 meses
+            ("ABC-A", 10.0, 100.0, 365.0), # Valor consumido 36.500 (cobertura de 10 dias)
+            ("ABC-B", 50.0, 20.0, 300.0), # 6.000
+            ("ABC-C", 20.0, 10.0, 100.0), # 1.000
+            ("ABC-DEAD", 5.0, 200.0, 0.0), # Parada
+        ]
+        parts = [Part(sku=sku, name=sku, quantity=qty, cost=cost, price=cost * 2, tenant_id=test_tenant.id) for sku, qty, cost, _ in specs]
+        db.add_all(parts)
+        db.commit()
+        movements = []
+        for part, (_, _, _, consumed) in zip(parts, specs):
+            if consumed:
+                movements.append(StockMovement(tenant_id=test_tenant.id, part_id=part.id, type="OUT_OS", quantity=consumed / 2 + 5,
+                                               description="OS", date=now - timedelta(days=30)))
+                movements.append(StockMovement(tenant_id=test_tenant.id, part_id=part.id, type="SALE_DIRECT", quantity=consumed / 2,
+                                               description="Venda", date=now - timedelta(days=60)))
+                movements.append(StockMovement(tenant_id=test_tenant.id, part_id=part.id, type="RETURN_OS", quantity=5,
+                                               description="Reabertura", date=now - timedelta(days=20)))
+        # Consumo antigo (fora dos 12 meses) não conta.
+        movements.append(StockMovement(tenant_id=test_tenant.id, part_id=parts[3].id, type="OUT_OS", quantity=7,
+                                       description="OS antiga", date=now - timedelta(days=400)))
+        db.add_all(movements)
+        db.commit()
+
+        response = client.get("/api/inventory/reports/analytics", headers=auth_headers)
+        assert response.status_code == 200
+        report = response.json()
+        assert report["skuCount"] == 4
+        assert report["stockValue"] == 1000.0 + 1000.0 + 200.0 + 1000.0
+        assert report["consumptionValue"] == 36500.0 + 6000.0 + 1000.0
+        assert {c["abcClass"]: c["skuCount"] for c in report["abc"]} == {"A": 1, "B": 1, "C": 2}
+        assert report["deadStockCount"] == 1
+        assert report["deadStock"][0]["sku"] == "ABC-DEAD"
+        assert report["deadStockValue"] == 1000.0
+        assert [item["sku"] for item in report["lowCover"]] == ["ABC-A"]
+        assert report["lowCover"][0]["daysOfCover"] == 10.0
+
+        items = client.get("/api/inventory/reports/analytics/items?abc_class=C", headers=auth_headers).json()
+        assert items["total"] == 2
+        assert [item["sku"] for item in items["items"]] == ["ABC-C", "ABC-DEAD"]
+        assert items["items"][1]["daysOfCover"] is None
+
+        # Relatório do dia em cache: alterações só aparecem no próximo cálculo (ou com refresh).
+        db.add(Part(sku="ABC-NEW", name="Nova", quantity=1.0, cost=1.0, tenant_id=test_tenant.id))
+        db.commit()
+        assert client.get("/api/inventory/reports/analytics", headers=auth_headers).json()["skuCount"] == 4
+        assert client.get("/api/inventory/reports/analytics?refresh=true", headers=auth_headers).json()["skuCount"] == 5
+        assert db.query(InventoryReport).filter(InventoryReport.tenant_id == test_tenant.id).count() == 1
+
+    def test_reorder_plan_by_supplier(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test the reorder plan: consumption forecast, scheduled orders, upcoming kit revisions and supplier grouping"""
+        from datetime import datetime, timedelta, timezone
+        from models import (
+            Part, StockMovement, Client, Boat, Engine, ServiceOrder, ServiceItem,
+            MaintenanceKit, MaintenanceKitItem,
+        )
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        tid = test_tenant.id
+        filter_part = Part(sku="RP-FLT", name="Filtro", manufacturer="Mercury", quantity=0.0, min_stock=2.0, cost=50.0, tenant_id=tid)
+        oil = Part(sku="RP-OIL", name="Óleo", manufacturer="Yamaha", quantity=1.0, min_stock=0.0, cost=10.0, tenant_id=tid)
+        impeller = Part(sku="RP-IMP", name="Rotor", manufacturer="Yamaha", quantity=0.0, min_stock=0.0, cost=30.0, tenant_id=tid)
+        stocked = Part(sku="RP-OK", name="Vela", manufacturer="NGK", quantity=100.0, min_stock=5.0, cost=5.0, tenant_id=tid)
+        owner = Client(name="Armador", document="12345678900", tenant_id=tid)
+        db.add_all([filter_part, oil, impeller, stocked, owner])
+        db.commit()
+        boat = Boat(name="Barco", hull_id="HIN-1", client_id=owner.id, tenant_id=tid)
+        db.add(boat)
+        db.commit()
+        near, far, busy = [Engine(boat_id=boat.id, serial_number=f"SN-{hours}", model="F115", hours=hours, tenant_id=tid) for hours in (95, 50, 98)]
+        kit = MaintenanceKit(name="Revisão 100h", engine_model="f115", interval_hours=100, tenant_id=tid)
+        kit.items = [MaintenanceKitItem(type="PART", part_id=oil.id, item_description="Óleo", quantity=4)]
+        db.add_all([near, far, busy, kit])
+        db.commit()
+
+        # Entrada pela nota fiscal (fluxo da tela de estoque): o fornecedor vem da nota.
+        entry = {"number": "NF-1", "supplier": "Distribuidora Náutica", "date": "2024-01-05", "items": [{"partId": filter_part.id, "quantity": 2}]}
+        response = client.post("/api/inventory/invoices", json=entry, headers=auth_headers)
+        assert response.status_code == 201
+        assert client.post("/api/inventory/invoices", json=entry, headers=auth_headers).status_code == 400 # Nota já lançada
+        db.expire_all()
+        assert db.get(Part, filter_part.id).quantity == 2.0
+
+        db.add_all([
+            # 90 filtros consumidos em 90 dias: 1 por dia.
+            StockMovement(tenant_id=tid, part_id=filter_part.id, type="OUT_OS", quantity=90, description="OS", date=now - timedelta(days=10)),
+            # OS em aberto do motor perto da revisão (o kit não entra em dobro) e OS agendada para daqui a 60 dias.
+            ServiceOrder(boat_id=boat.id, engine_id=busy.id, description="Revisão", status="Aprovado", scheduled_at=now + timedelta(days=5), tenant_id=tid,
+                         items=[ServiceItem(type="PART", part_id=oil.id, description="Óleo", quantity=2, unit_price=20, total=40)]),
+            ServiceOrder(boat_id=boat.id, description="Troca de rotor", status="Pendente", scheduled_at=now + timedelta(days=60), tenant_id=tid,
+                         items=[ServiceItem(type="PART", part_id=impeller.id, description="Rotor", quantity=3, unit_price=60, total=180)]),
+        ])
+        db.commit()
+
+        response = client.get("/api/inventory/reorder-plan", headers=auth_headers)
+        assert response.status_code == 200
+        plan = response.json()
+        assert plan["horizonDays"] == 30
+        assert [group["supplier"] for group in plan["suppliers"]] == ["Distribuidora Náutica", "Yamaha"]
+        filters = plan["suppliers"][0]["items"][0]
+        assert (filters["sku"], filters["forecast"], filters["suggestedQuantity"]) == ("RP-FLT", 30.0, 30.0)
+        oil_row = plan["suppliers"][1]["items"][0]
+        assert (oil_row["sku"], oil_row["scheduled"], oil_row["kits"], oil_row["suggestedQuantity"]) == ("RP-OIL", 2.0, 4.0, 5.0)
+        assert plan["itemCount"] == 2
+        assert plan["totalCost"] == 1500.0 + 50.0
+
+        # Horizonte maior: a OS agendada para daqui a 60 dias entra no plano.
+        plan = client.get("/api/inventory/reorder-plan?horizon_days=90", headers=auth_headers).json()
+        assert [item["sku"] for item in plan["suppliers"][1]["items"]] == ["RP-IMP", "RP-OIL"]
+        assert plan["suppliers"][0]["items"][0]["suggestedQuantity"] == 90.0
+
+    def test_part_etag_if_match_and_atomic_stock(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test the part version: ETag, If-Match on PUT and stock changes applied atomically"""
+        from models import Part
+
+        part = Part(sku="VER-1", name="Hélice", quantity=10.0, min_stock=0.0, cost=100.0, price=200.0, tenant_id=test_tenant.id)
+        db.add(part)
+        db.commit()
+
+        response = client.get(f"/api/inventory/parts/{part.id}", headers=auth_headers)
+        assert response.headers["ETag"] == '"1"'
+        assert response.json()["version"] == 1
+
+        response = client.put(f"/api/inventory/parts/{part.id}", json={"price": 210.0}, headers={**auth_headers, "If-Match": '"1"'})
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"2"'
+
+        # Segunda edição baseada na leitura antiga: recusada sem sobrescrever o preço.
+        response = client.put(f"/api/inventory/parts/{part.id}", json={"price": 1.0}, headers={**auth_headers, "If-Match": 'W/"1"'})
+        assert response.status_code == 412
+        response = client.put(f"/api/inventory/parts/{part.id}", json={"price": 1.0}, headers={**auth_headers, "If-Match": "abc"})
+        assert response.status_code == 400
+
+        # Venda e movimento manual somam no banco e mudam a versão (o ETag lido antes deixa de valer).
+        sale = {"items": [{"partId": part.id, "quantity": 3}], "paymentMethod": "PIX"}
+        assert client.post("/api/inventory/quick-sale", json=sale, headers=auth_headers).status_code == 200
+        movement = {"partId": part.id, "type": "IN_INVOICE", "quantity": 5, "description": "NF 10"}
+        assert client.post("/api/inventory/movements", json=movement, headers=auth_headers).status_code == 200
+        response = client.get(f"/api/inventory/parts/{part.id}", headers=auth_headers)
+        assert response.json()["quantity"] == 12.0
+        assert response.json()["price"] == 210.0
+        assert response.headers["ETag"] == '"4"'
+        response = client.put(f"/api/inventory/parts/{part.id}", json={"quantity": 0}, headers={**auth_headers, "If-Match": '"2"'})
+        assert response.status_code == 412
+
+        # Venda maior que o estoque: nada é baixado.
+        sale["items"][0]["quantity"] = 13
+        assert client.post("/api/inventory/quick-sale", json=sale, headers=auth_headers).status_code == 400
+        db.expire_all()
+        assert db.get(Part, part.id).quantity == 12.0
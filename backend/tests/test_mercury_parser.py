@@ -0,0 +1,55 @@
+"""
+Offline tests for the Mercury portal parsers (recorded HTML fixtures)
+"""
+import pytest
+from routers import mercury_router
+
+mercury_parser = mercury_router.mercury_parser
+
+@pytest.mark.mercury
+class TestMercuryParser:
+    """Test parsing of price, warranty and client pages"""
+
+    def test_parse_price_table(self, load_fixture):
+        rows = mercury_parser.parse_price_table(load_fixture("price_table.html"))
+
+        assert [r["codigo"] for r in rows] == ["35-8M0065103", "35-8M0065103A"]
+        assert rows[1] == {
+            "codigo": "35-8M0065103A",
+            "qtd": "1",
+            "descricao": "FILTRO COMBUSTIVEL KIT",
+            "qtdaEst": "0",
+            "valorVenda": "R$ 1.289,00",
+            "valorTabela": "R$ 1.350,00",
+            "valorCusto": "R$ 845,10",
+        }
+
+    def test_parse_price_table_empty_and_unknown_pages(self, load_fixture):
+        assert mercury_parser.parse_price_table(load_fixture("price_no_records.html")) == []
+        assert mercury_parser.parse_price_table(load_fixture("login.html")) is None
+
+    def test_find_price_row(self, load_fixture):
+        find_price_row = mercury_router.mercury_sync_service.find_price_row
+        content = load_fixture("price_table.html")
+
+        assert find_price_row(content, "35-8M0065103A") == {"status": "found", "price": 1289.0, "cost": 845.1}
+        assert find_price_row(content, "35-8M00651")["status"] == "not_found_in_table"
+        assert find_price_row(load_fixture("price_no_records.html"), "X")["status"] == "not_found"
+        assert find_price_row(load_fixture("login.html"), "X")["status"] == "parse_error"
+
+    def test_parse_warranty(self, load_fixture):
+        data = mercury_parser.parse_warranty(load_fixture("warranty.html"), "2b123456")
+
+        assert data == {
+            "nro_motor": "2b123456",
+            "nro_serie": "2B123456",
+            "modelo": "150 ELPT FOURSTROKE",
+            "dt_venda": "15/03/2023",
+            "status_garantia": "Ativa",
+            "vld_garantia": "15/03/2026",
+        }
+        assert mercury_parser.parse_warranty(load_fixture("warranty_not_found.html"), "2B123456") is None
+
+    def test_parse_client_name(self, load_fixture):
+        assert mercury_parser.parse_client_name(load_fixture("warranty_clients.html")) == "João da Silva"
+        assert mercury_parser.parse_client_name(load_fixture("warranty_not_found.html")) == ""
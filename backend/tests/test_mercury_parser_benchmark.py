@@ -0,0 +1,31 @@
+"""
+Benchmarks for the Mercury portal parsers (requires pytest-benchmark).
+Run: pytest tests/test_mercury_parser_benchmark.py --benchmark-only
+"""
+import pytest
+from routers import mercury_router
+
+pytest.importorskip("pytest_benchmark")
+
+mercury_parser = mercury_router.mercury_parser
+
+
+def build_large_price_page(template, rows):
+    """Price page with `rows` items (a full catalog search result), built from the recorded one"""
+    row = template[template.index('<tr class="Row">'):template.index("</tr>", template.index('<tr class="Row">')) + 5]
+    body = "".join(row.replace("35-8M0065103", f"8M{i:07d}") for i in range(rows))
+    return template.replace(row, body, 1)
+
+
+@pytest.mark.mercury
+def test_benchmark_parse_price_table(benchmark, load_fixture):
+    content = build_large_price_page(load_fixture("price_table.html"), 500)
+    rows = benchmark(mercury_parser.parse_price_table, content)
+    assert len(rows) == 501
+
+
+@pytest.mark.mercury
+def test_benchmark_parse_warranty(benchmark, load_fixture):
+    content = load_fixture("warranty.html")
+    data = benchmark(mercury_parser.parse_warranty, content, "2B123456")
+    assert data["modelo"] == "150 ELPT FOURSTROKE"
@@ -2,6 +2,7 @@
 import pytest
 from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from main import app
 from routers import mercury_router
@@ -11,22 +12,22 @@ import crud
 
 # Remove global client creation, rely on fixture
 
+@pytest.fixture(autouse=True)
+def clear_mercury_cache():
+    """The lookup cache is process-wide: start every test empty"""
+    mercury_router.mercury_cache.cache.clear()
+    yield
+    mercury_router.mercury_cache.cache.clear()
+
 @pytest.fixture
 def mock_company_info(db, test_user):
     """Ensure Company Info exists with credentials"""
-    # Check if company info exists
-    company = crud.get_company_info(db, test_user.tenant_id)
-    if not company:
-        company_data = schemas.CompanyInfoCreate(
-            mercuryUsername="test_user",
-            mercuryPassword="test_password"
-        )
-        crud.update_company_info(db, company_data, test_user.tenant_id)
-    else:
-        # Update with creds if missing
-        company.mercury_username = "test_user"
-        company.mercury_password = "test_password"
-        db.commit()
+    # Creates the company info if missing, or sets the credentials
+    company_data = schemas.CompanyInfoCreate(
+        mercuryUsername="test_user",
+        mercuryPassword="test_password"
+    )
+    crud.update_company_info(db, company_data, test_user.tenant_id)
 
 def test_search_product_success(client, auth_headers, mock_company_info):
     mock_results = [{
@@ -125,12 +126,318 @@ def test_sync_price_success(client, auth_headers, db, mock_company_info, test_us
 
 def test_missing_credentials(client, auth_headers, db, test_user):
     # Ensure credentials are wiped
-    company = crud.get_company_info(db, test_user.tenant_id)
-    if company:
-        company.mercury_username = ""
-        db.commit()
+    crud.update_company_info(db, schemas.CompanyInfoCreate(mercuryUsername=""), test_user.tenant_id)
     
     response = client.get("/api/mercury/search/anything", headers=auth_headers)
     assert response.status_code == 400
     assert "Credenciais Mercury não configuradas" in response.json()["detail"]
 
+
+def _price_page(sku, venda, custo):
+    return f"""
+    <form id="preco_item_web"><table><tr class="Row">
+      <td></td><td>{sku}</td><td>1</td><td>DESC</td><td>3</td><td>{venda}</td><td>R$ 0,00</td><td>{custo}</td>
+    </tr></table></form>"""
+
+class FakePage:
+    def __init__(self, pages, log):
+        self.pages = pages
+        self.log = log
+        self.url = None
+
+    async def goto(self, url, timeout=None):
+        self.url = url
+        self.log.append(id(self))
+
+    async def content(self):
+        sku = self.url.split("s_desc_item=")[1]
+        return self.pages.get(sku, "Nenhum registro encontrado")
+
+    async def close(self):
+        pass
+
+class FakeContext:
+    def __init__(self, pages):
+        self.pages = pages
+        self.log = []
+
+    async def new_page(self):
+        return FakePage(self.pages, self.log)
+
+def test_sync_prices_fans_out_across_pages():
+    import asyncio
+    mercury_sync_service = mercury_router.mercury_sync_service
+
+    html = {f"SKU-{i}": _price_page(f"SKU-{i}", f"R$ {i},00", "R$ 1,00") for i in range(10)}
+    context = FakeContext(html)
+    skus = list(html) + ["MISSING"]
+
+    results = asyncio.run(mercury_sync_service.sync_prices(context, skus, concurrency=3))
+
+    assert len(set(context.log)) == 3 # Três abas no mesmo contexto
+    assert results["SKU-7"] == {"status": "found", "price": 7.0, "cost": 1.0}
+    assert results["MISSING"]["status"] == "not_found"
+
+def test_batch_sync_prices_job(client, auth_headers, db, mock_company_info, test_user):
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+
+    parts = [
+        crud.create_part(db, schemas.PartCreate(sku=sku, name=sku, price=1.0, cost=1.0), test_user.tenant_id)
+        for sku in ("BATCH-1", "BATCH-2", "BATCH-3")
+    ]
+    prices = {
+        "BATCH-1": {"status": "found", "price": 150.0, "cost": 90.0},
+        "BATCH-2": {"status": "not_found"},
+        "BATCH-3": {"status": "found", "price": 30.0, "cost": 20.0},
+    }
+
+    response = client.post(
+        "/api/mercury/batch-sync-prices?concurrency=2",
+        json=[p.id for p in parts],
+        headers=auth_headers
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert client.get(f"/api/jobs/{job_id}", headers=auth_headers).json()["status"] == "PENDING"
+
+    # Simula uma execução interrompida após a primeira peça: só as demais são consultadas.
+    job = db.get(models.BackgroundJob, job_id)
+    job.results = [{"id": parts[0].id, "sku": "BATCH-1", "status": "updated", "price": 150.0}]
+    job.processed = 1
+    db.commit()
+
+    # Nenhuma consulta da tarefa roda na thread do event loop.
+    import threading
+    sql_threads = set()
+    def on_execute(*args):
+        sql_threads.add(threading.get_ident())
+    event.listen(db.get_bind(), "before_cursor_execute", on_execute)
+
+    sync_service = mercury_router.mercury_sync_service
+    with patch.object(sync_service, "fetch_prices", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = prices
+        asyncio.run(mercury_router.job_queue.run_job(job_id, factory=sessionmaker(bind=db.get_bind())))
+    event.remove(db.get_bind(), "before_cursor_execute", on_execute)
+    assert sql_threads and threading.get_ident() not in sql_threads
+
+    assert mock_fetch.call_args.args[2] == ["BATCH-2", "BATCH-3"]
+    assert mock_fetch.call_args.kwargs["concurrency"] == 2
+
+    db.expire_all()
+    progress = client.get(f"/api/jobs/{job_id}", headers=auth_headers).json()
+    assert progress["status"] == "COMPLETED"
+    assert progress["processed"] == progress["total"] == 3
+
+    result = client.get(f"/api/jobs/{job_id}/result", headers=auth_headers).json()
+    assert {r["sku"]: r["status"] for r in result["results"]} == {
+        "BATCH-1": "updated", "BATCH-2": "not_found", "BATCH-3": "updated"
+    }
+    assert crud.get_part(db, parts[2].id).price == 30.0
+    assert crud.get_part(db, parts[1].id).price == 1.0
+
+    # Nenhuma peça do tenant: a requisição é rejeitada em vez de criar uma tarefa vazia.
+    response = client.post("/api/mercury/batch-sync-prices", json=[999999], headers=auth_headers)
+    assert response.status_code == 400
+
+def test_job_heartbeat_during_long_chunk(db, test_user, monkeypatch):
+    import asyncio
+    from datetime import datetime, timedelta
+    from sqlalchemy.orm import sessionmaker
+
+    job_queue = mercury_router.job_queue
+    monkeypatch.setattr(job_queue, "HEARTBEAT_SECONDS", 0.05)
+    seen = {}
+
+    async def slow_chunk(job_db, job):
+        # Lote demorado sem gravar progresso: só o heartbeat renova updated_at.
+        claimed_at = job.updated_at
+        await asyncio.sleep(0.3)
+        job_db.expire(job)
+        seen["renewed"] = job.updated_at > claimed_at
+
+    monkeypatch.setitem(job_queue._handlers, "slow_chunk", slow_chunk)
+    job = job_queue.create_job(db, tenant_id=test_user.tenant_id, kind="slow_chunk", params={}, total=1)
+    job.updated_at = datetime(2020, 1, 1)
+    db.commit()
+
+    asyncio.run(job_queue.run_job(job.id, factory=sessionmaker(bind=db.get_bind())))
+    assert seen["renewed"]
+    db.expire_all()
+    assert db.get(models.BackgroundJob, job.id).status == "COMPLETED"
+
+class FakePortalFrame:
+    def __init__(self, page):
+        self.page = page
+
+    async def query_selector(self, selector):
+        return self.page.at_login
+
+    async def fill(self, selector, value):
+        pass
+
+    async def press(self, selector, key):
+        self.page.portal["logins"] += 1
+        self.page.portal["expired"] = False
+        self.page.at_login = False
+
+class FakePortalPage:
+    def __init__(self, portal):
+        self.portal = portal
+        self.at_login = False
+        self.closed = False
+        self.main_frame = FakePortalFrame(self)
+        self.frames = [self.main_frame]
+        self.visited = []
+
+    async def goto(self, url, timeout=None):
+        self.visited.append(url)
+        self.at_login = "epdv001" in url or self.portal["expired"]
+
+    async def wait_for_load_state(self, timeout=None):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+class FakeBrowserContext:
+    def __init__(self, browser, portal):
+        self.browser = browser
+        self.portal = portal
+
+    async def new_page(self):
+        return FakePortalPage(self.portal)
+
+    async def close(self):
+        self.portal["closed_contexts"] += 1
+
+class FakeBrowser:
+    def __init__(self, portal):
+        self.portal = portal
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        return FakeBrowserContext(self, self.portal)
+
+def test_session_pool_reuses_and_relogs():
+    import asyncio
+    MercurySessionPool = mercury_router.mercury_session_pool.MercurySessionPool
+
+    portal = {"logins": 0, "expired": False, "closed_contexts": 0}
+
+    async def scenario():
+        pool = MercurySessionPool(max_sessions=1, idle_timeout=600)
+        pool._ensure_browser = AsyncMock(return_value=FakeBrowser(portal))
+
+        for _ in range(3):
+            async with pool.page(1, "user", "pass") as session:
+                await session.navigate(session.page, "https://portal/ewr010.asp")
+        assert portal["logins"] == 1 # Login único para consultas repetidas
+
+        portal["expired"] = True
+        async with pool.page(1, "user", "pass") as session:
+            await session.navigate(session.page, "https://portal/ewr010.asp")
+            assert not session.page.at_login
+        assert portal["logins"] == 2 # Sessão expirada: novo login transparente
+
+        async with pool.page(2, "other", "pass"):
+            pass
+        assert portal["closed_contexts"] == 1 # Limite de sessões: tenant 1 descartado
+
+    asyncio.run(scenario())
+
+def test_session_pool_login_isolation():
+    import asyncio
+    MercurySessionPool = mercury_router.mercury_session_pool.MercurySessionPool
+
+    portal = {"logins": 0, "expired": False, "closed_contexts": 0}
+
+    async def scenario():
+        pool = MercurySessionPool(max_sessions=5, idle_timeout=600)
+        pool._ensure_browser = AsyncMock(return_value=FakeBrowser(portal))
+
+        # Login lento de um tenant não bloqueia a sessão já aberta de outro.
+        async with pool.session(2, "other", "pass"):
+            pass
+        release = asyncio.Event()
+        original_login = mercury_router.mercury_session_pool.login
+
+        async def slow_login(page, username, password):
+            if username == "slow":
+                await release.wait()
+            await original_login(page, username, password)
+
+        with patch.object(mercury_router.mercury_session_pool, "login", slow_login):
+            cold = asyncio.create_task(pool._get_session(1, "slow", "pass"))
+            await asyncio.sleep(0)
+            session = await asyncio.wait_for(pool._get_session(2, "other", "pass"), timeout=1)
+            pool._release(session)
+            assert not cold.done()
+            release.set()
+            pool._release(await cold)
+
+        # Expiração detectada numa aba própria: o login é refeito nela, não na aba principal.
+        portal["expired"] = True
+        async with pool.session(2, "other", "pass") as session:
+            tab = await session.context.new_page()
+            main_visits = list(session.page.visited)
+            await session.navigate(tab, "https://portal/ewr010.asp")
+            assert not tab.at_login
+            assert session.page.visited == main_visits
+
+    asyncio.run(scenario())
+
+def test_search_product_cached(client, auth_headers, mock_company_info):
+    mock_results = [{"codigo": "CACHE-1", "valorVenda": "R$ 10,00", "valorCusto": "R$ 5,00"}]
+
+    with patch("routers.mercury_router.search_product_playwright", new_callable=AsyncMock) as mock_search:
+        mock_search.return_value = mock_results
+
+        first = client.get("/api/mercury/search/cache-1", headers=auth_headers).json()
+        second = client.get("/api/mercury/search/CACHE-1", headers=auth_headers).json()
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert second["results"] == mock_results
+        assert mock_search.call_count == 1
+
+        refreshed = client.get("/api/mercury/search/CACHE-1?refresh=true", headers=auth_headers).json()
+        assert refreshed["cached"] is False
+        assert mock_search.call_count == 2
+
+    stats = mercury_router.mercury_cache.cache.stats()
+    assert stats["product"]["hits"] == 1
+    assert stats["product"]["misses"] == 1
+
+def test_database_cache_backend(db, test_user):
+    mercury_cache = mercury_router.mercury_cache
+    WARRANTY = mercury_cache.WARRANTY
+
+    cache = mercury_cache.MercuryLookupCache(mercury_cache.DatabaseCacheBackend())
+    assert cache.get(db, test_user.tenant_id, WARRANTY, "1B234567") is None
+
+    cache.set(db, test_user.tenant_id, WARRANTY, "1b234567", {"modelo": "150 PRO XS"})
+    assert cache.get(db, test_user.tenant_id, WARRANTY, "1B234567") == {"modelo": "150 PRO XS"}
+    assert cache.get(db, test_user.tenant_id + 1, WARRANTY, "1B234567") is None # Isolado por tenant
+
+    entry = db.query(models.MercuryLookupCache).one()
+    entry.expires_at = entry.expires_at.replace(year=2000)
+    db.commit()
+    assert cache.get(db, test_user.tenant_id, WARRANTY, "1B234567") is None # Vencido
+    assert cache.stats()["warranty"]["hits"] == 1
+
+    # Gravar no cache não confirma nem desfaz a transação da requisição.
+    commits = []
+    def on_commit(session):
+        commits.append(session)
+    event.listen(db, "after_commit", on_commit)
+    cache.set(db, test_user.tenant_id, WARRANTY, "1B999999", {"modelo": "V8"})
+    event.remove(db, "after_commit", on_commit)
+    assert commits == []
+    assert cache.get(db, test_user.tenant_id, WARRANTY, "1B999999") == {"modelo": "V8"}
+
+    # A limpeza só apaga as entradas do tenant informado.
+    cache.set(db, test_user.tenant_id + 1, WARRANTY, "1B234567", {"modelo": "Outro"})
+    cache.clear(db, test_user.tenant_id)
+    assert db.query(models.MercuryLookupCache.tenant_id).distinct().all() == [(test_user.tenant_id + 1,)]
@@ -53,6 +53,58 @@ class TestOrdersRouter:
         data = response.json()
         assert len(data) == 2
     
+    def test_get_orders_paginated_summary(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test the slim order list: keyset pagination, filters and ?include"""
+        from datetime import datetime, timedelta
+        from models import Client, Boat, ServiceOrder, ServiceItem, OSStatus, ItemType
+
+        owner = Client(name="Owner", document="12345678900", email="owner@example.com", tenant_id=test_tenant.id)
+        db.add(owner)
+        db.commit()
+        boat = Boat(name="Test Boat", model="Test Boat", hull_id="TEST-HULL-PAGE", client_id=owner.id, tenant_id=test_tenant.id)
+        db.add(boat)
+        db.commit()
+
+        base = datetime(2024, 1, 1)
+        orders = [
+            ServiceOrder(boat_id=boat.id, description=f"Service {i}", tenant_id=test_tenant.id,
+                         status=OSStatus.COMPLETED if i == 0 else OSStatus.PENDING,
+                         created_at=base + timedelta(days=i // 2), diagnosis="Longo diagnóstico " * 50)
+            for i in range(5)
+        ]
+        db.add_all(orders)
+        db.commit()
+        db.add(ServiceItem(order_id=orders[4].id, type=ItemType.LABOR, description="Labor", quantity=1, unit_price=10.0, total=10.0))
+        db.commit()
+
+        response = client.get("/api/orders?limit=2", headers=auth_headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert [o["id"] for o in page] == [orders[4].id, orders[3].id]
+        assert "checklist" not in page[0] and page[0]["items"] is None
+        assert page[0]["diagnosis"].startswith("Longo diagnóstico")
+        assert page[0]["boatName"] == "Test Boat" and page[0]["clientName"] == "Owner"
+        assert page[0]["clientEmail"] == "owner@example.com"
+
+        seen = [o["id"] for o in page]
+        while "X-Next-Cursor" in response.headers:
+            response = client.get(f"/api/orders?limit=2&cursor={response.headers['X-Next-Cursor']}", headers=auth_headers)
+            seen += [o["id"] for o in response.json()]
+        assert seen == [orders[i].id for i in (4, 3, 2, 1, 0)]
+
+        response = client.get("/api/orders", params={"status": OSStatus.COMPLETED.value}, headers=auth_headers)
+        assert [o["id"] for o in response.json()] == [orders[0].id]
+
+        response = client.get("/api/orders", params={"created_from": "2024-01-02T00:00:00", "created_to": "2024-01-02T23:59:59"}, headers=auth_headers)
+        assert sorted(o["id"] for o in response.json()) == sorted([orders[2].id, orders[3].id])
+
+        response = client.get("/api/orders?include=items,notes&limit=1", headers=auth_headers)
+        data = response.json()
+        assert len(data[0]["items"]) == 1 and data[0]["notes"] == []
+
+        assert client.get("/api/orders?include=boat", headers=auth_headers).status_code == 400
+        assert client.get("/api/orders?cursor=invalido", headers=auth_headers).status_code == 400
+
     def test_create_order(self, client: TestClient, auth_headers, test_tenant, db):
         """Test creating a new service order"""
         from models import Client, Boat
@@ -200,3 +252,44 @@ class TestOrdersRouter:
         response = client.get("/api/orders")
         
         assert response.status_code == 401
+
+    def test_order_if_match_and_concurrent_completion(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test the order version: stale If-Match is rejected and a concurrent completion does not apply stock twice"""
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.orm.exc import StaleDataError
+        from models import Client, Boat, ServiceOrder, ServiceItem, Part, OSStatus
+        import crud
+
+        owner = Client(name="Owner", document="12345678900", tenant_id=test_tenant.id)
+        part = Part(sku="VER-OS", name="Filtro", quantity=10.0, cost=10.0, price=20.0, tenant_id=test_tenant.id)
+        db.add_all([owner, part])
+        db.commit()
+        boat = Boat(name="Test Boat", hull_id="TEST-HULL-VERSION", client_id=owner.id, tenant_id=test_tenant.id)
+        db.add(boat)
+        db.commit()
+        order = ServiceOrder(boat_id=boat.id, description="Revisão", status=OSStatus.PENDING, tenant_id=test_tenant.id,
+                             items=[ServiceItem(type="PART", part_id=part.id, description="Filtro", quantity=2, unit_price=20, total=40)])
+        db.add(order)
+        db.commit()
+
+        response = client.get(f"/api/orders/{order.id}", headers=auth_headers)
+        etag = response.headers["ETag"]
+        response = client.put(f"/api/orders/{order.id}", json={"diagnosis": "Troca de filtro"}, headers={**auth_headers, "If-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        response = client.put(f"/api/orders/{order.id}", json={"diagnosis": "Outro"}, headers={**auth_headers, "If-Match": etag})
+        assert response.status_code == 412
+
+        # Outra sessão leu a OS antes da conclusão: a sua conclusão é recusada e não baixa o estoque de novo.
+        other = sessionmaker(bind=db.get_bind())()
+        try:
+            stale = other.get(ServiceOrder, order.id)
+            assert stale.status == OSStatus.PENDING
+            assert client.put(f"/api/orders/{order.id}/complete", headers=auth_headers).status_code == 200
+            with pytest.raises(StaleDataError):
+                crud.complete_order(other, order.id, test_tenant.id)
+            other.rollback()
+        finally:
+            other.close()
+        db.expire_all()
+        assert db.get(Part, part.id).quantity == 8.0
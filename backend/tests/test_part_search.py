@@ -0,0 +1,65 @@
+"""
+Test the PostgreSQL part search (pg_trgm + tsvector)
+
+The query only runs on PostgreSQL: set TEST_POSTGRES_URL to a disposable
+database to run it (tables are created if missing; the data is rolled back).
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from database import Base
+from models import Part, Tenant
+from backend.services import part_search_service
+
+
+def test_prefix_query_for_typeahead():
+    """Test the tsquery built from partially typed words"""
+    assert part_search_service._pg_prefix_query("filt") == "filt:*"
+    assert part_search_service._pg_prefix_query(" 8M0  óle'o ") == "8M0:* & óle:* & o:*"
+    assert part_search_service._pg_prefix_query("--") == ""
+
+
+@pytest.fixture
+def pg_db():
+    """Session on TEST_POSTGRES_URL inside a transaction that is rolled back"""
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL não definida")
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    connection = engine.connect()
+    transaction = connection.begin()
+    part_search_service.ensure_search_index(connection)
+    session = Session(bind=connection)
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
+
+
+def test_postgres_search_matches_partial_words(pg_db):
+    """Test type-ahead on PostgreSQL: a partial word of the name, sku prefix and compatibility"""
+    tenant = Tenant(name="Busca PG", subdomain="busca-pg-test", is_active=True)
+    pg_db.add(tenant)
+    pg_db.flush()
+    pg_db.add_all([
+        Part(sku="8M0123456", name="Filtro de Óleo", compatibility=["V8", "150HP"], tenant_id=tenant.id),
+        Part(sku="35-8M0065103", name="Filtro de Combustível", tenant_id=tenant.id),
+        Part(sku="92-858064K01", name="Graxa", tenant_id=tenant.id),
+    ])
+    pg_db.flush()
+
+    def search(q):
+        return [p.sku for p in part_search_service.search_parts(pg_db, tenant.id, q)]
+
+    assert set(search("filt")) == {"8M0123456", "35-8M0065103"}
+    assert search("combus") == ["35-8M0065103"]
+    assert search("filtro comb")[0] == "35-8M0065103"
+    assert search("8M0123") == ["8M0123456"]
+    assert search("150hp") == ["8M0123456"]
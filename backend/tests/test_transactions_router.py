@@ -0,0 +1,251 @@
+"""
+Test transactions router
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.mark.routers
+class TestTransactionsRouter:
+    """Test transactions router endpoints"""
+
+    @pytest.fixture
+    def ledger(self, db, test_tenant):
+        """Twelve transactions, one per day of January 2024: +100 on even days, -30 on odd days"""
+        from datetime import datetime
+        from models import Transaction
+
+        for day in range(1, 13):
+            db.add(Transaction(
+                tenant_id=test_tenant.id,
+                type="INCOME" if day % 2 == 0 else "EXPENSE",
+                category="Serviço" if day % 2 == 0 else "Combustível",
+                description=f"Lançamento {day}",
+                amount=100.0 if day % 2 == 0 else 30.0,
+                date=datetime(2024, 1, day, 10),
+                status="PENDING" if day == 12 else "PAID",
+            ))
+        db.commit()
+
+    def test_ledger_keyset_pages_with_running_balance(self, client: TestClient, auth_headers, ledger):
+        """Test paging the ledger with cursor and the running balance of each line"""
+        pages, cursor = [], None
+        while True:
+            params = {"limit": 5, "with_balance": True, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/api/transactions", params=params, headers=auth_headers)
+            assert response.status_code == 200
+            pages.append(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        assert [len(page) for page in pages] == [5, 5, 2]
+        rows = [row for page in pages for row in page]
+        assert [row["description"] for row in rows] == [f"Lançamento {day}" for day in range(12, 0, -1)]
+
+        # Saldo após cada lançamento, calculado do mais antigo para o mais recente.
+        balance, expected = 0.0, {}
+        for day in range(1, 13):
+            balance += 100.0 if day % 2 == 0 else -30.0
+            expected[f"Lançamento {day}"] = balance
+        assert all(row["runningBalance"] == expected[row["description"]] for row in rows)
+
+        # Sem with_balance o saldo não é calculado.
+        row = client.get("/api/transactions", params={"limit": 1}, headers=auth_headers).json()[0]
+        assert row["runningBalance"] is None
+
+    def test_ledger_filters_and_period_totals(self, client: TestClient, auth_headers, ledger):
+        """Test the date range and type filters and the period totals"""
+        period = {"date_from": "2024-01-05T00:00:00", "date_to": "2024-01-08T23:59:59"}
+        rows = client.get("/api/transactions", params={**period, "with_balance": True}, headers=auth_headers).json()
+        assert [row["description"] for row in rows] == ["Lançamento 8", "Lançamento 7", "Lançamento 6", "Lançamento 5"]
+        assert rows[0]["runningBalance"] == 280.0 # Inclui os lançamentos anteriores ao período
+
+        rows = client.get("/api/transactions", params={**period, "type": "EXPENSE"}, headers=auth_headers).json()
+        assert [row["description"] for row in rows] == ["Lançamento 7", "Lançamento 5"]
+
+        totals = client.get("/api/transactions/totals", params=period, headers=auth_headers).json()
+        assert totals == {
+            "income": 200.0, "expense": 60.0, "balance": 140.0, "pending": 0.0, "count": 4,
+            "openingBalance": 140.0, "closingBalance": 280.0,
+        }
+        totals = client.get("/api/transactions/totals", headers=auth_headers).json()
+        assert totals["count"] == 12
+        assert totals["pending"] == 100.0
+        assert totals["closingBalance"] == 420.0
+
+        response = client.get("/api/transactions", params={"cursor": "inválido"}, headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_import_statement_in_batches_without_duplicates(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test the streaming statement import: batched insert, deduplication and rejected lines"""
+        from models import Transaction, TenantDailySummary
+
+        lines = ["Data;Descrição;Valor"]
+        lines += [f"{(i % 28) + 1:02d}/01/2024;Compra {i};-{i + 1},50" for i in range(250)]
+        lines += ["05/01/2024;Tarifa;-10,00", "05/01/2024;Tarifa;-10,00"] # Lançamentos idênticos no mesmo extrato
+        lines += ["sem data;Linha quebrada;abc", "10/01/2024;Depósito;300,00"]
+        content = ("\n".join(lines) + "\n").encode("utf-8")
+
+        def upload():
+            return client.post(
+                "/api/transactions/import?batch_size=100",
+                files={"file": ("extrato.csv", content, "text/csv")},
+                headers=auth_headers
+            )
+
+        response = upload()
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["processed"] == 254
+        assert summary["imported"] == 253
+        assert summary["duplicates"] == 0
+        assert summary["errorCount"] == 1
+        assert summary["errors"][0]["row"] == 254
+        assert db.query(Transaction).filter(Transaction.tenant_id == test_tenant.id).count() == 253
+
+        deposit = db.query(Transaction).filter(Transaction.description == "Depósito").one()
+        assert deposit.type == "INCOME"
+        assert deposit.amount == 300.0
+        assert deposit.date.day == 10 and deposit.date.month == 1
+        assert db.query(Transaction).filter(Transaction.description == "Tarifa").count() == 2
+
+        # Consolidado do dashboard atualizado junto com o lote.
+        assert db.query(TenantDailySummary).filter(TenantDailySummary.tenant_id == test_tenant.id).count() > 0
+
+        # Reimportação do mesmo extrato: nada é duplicado.
+        summary = upload().json()
+        assert summary["imported"] == 0
+        assert summary["duplicates"] == 253
+        assert db.query(Transaction).filter(Transaction.tenant_id == test_tenant.id).count() == 253
+
+    def test_import_batch_skips_rows_inserted_concurrently(self, test_tenant, db, monkeypatch):
+        """Test that a concurrent import of the same rows is ignored instead of violating the unique index"""
+        from datetime import datetime
+        from sqlalchemy import false
+        from models import Transaction, TenantDailySummary
+        from backend.services import finance_import_service
+
+        def record(n):
+            row = {"date": datetime(2024, 3, n), "description": f"Linha {n}", "amount": 10.0}
+            return finance_import_service._to_record(row, test_tenant.id, f"hash-{n}")
+
+        assert len(finance_import_service.insert_batch(db, test_tenant.id, [record(1)])) == 1
+        db.commit()
+
+        # A outra importação gravou a linha 1 depois da consulta de hashes existentes.
+        real_query = db.query
+        monkeypatch.setattr(db, "query", lambda *entities: real_query(*entities).filter(false()))
+        inserted = finance_import_service.insert_batch(db, test_tenant.id, [record(1), record(2)])
+        monkeypatch.undo()
+        db.commit()
+
+        assert [r["import_hash"] for r in inserted] == ["hash-2"]
+        assert db.query(Transaction).filter(Transaction.tenant_id == test_tenant.id).count() == 2
+        summaries = db.query(TenantDailySummary).filter(TenantDailySummary.tenant_id == test_tenant.id).all()
+        assert sum(summary.transactions_count for summary in summaries) == 2
+
+    def test_import_with_column_override_saves_profile(self, client: TestClient, auth_headers, test_tenant, db):
+        """Test explicit column mapping, BRL amounts and reuse of the saved profile"""
+        from models import Transaction, StatementImportProfile
+
+        content = (
+            "Valor (R$);Movimento;Lançamento\n"
+            "1.234,56 D;15/02/2024;Aluguel\n"
+            "R$ 2.000,00 C;16/02/2024;Recebimento cliente\n"
+        ).encode("utf-8")
+
+        response = client.post(
+            "/api/transactions/import?date_column=Movimento&description_column=Lançamento&amount_column=Valor (R$)",
+            files={"file": ("extrato.csv", content, "text/csv")},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["imported"] == 2
+
+        rent = db.query(Transaction).filter(Transaction.description == "Aluguel").one()
+        assert rent.type == "EXPENSE"
+        assert rent.amount == 1234.56
+        assert rent.date.day == 15 and rent.date.month == 2
+        income = db.query(Transaction).filter(Transaction.description == "Recebimento cliente").one()
+        assert income.type == "INCOME"
+        assert income.amount == 2000.0
+
+        profile = db.query(StatementImportProfile).filter(StatementImportProfile.tenant_id == test_tenant.id).one()
+        assert profile.date_column == "Movimento"
+
+        # Mesmo layout sem parâmetros: usa o perfil salvo.
+        content += "1,00 D;17/02/2024;Tarifa\n".encode("utf-8")
+        response = client.post(
+            "/api/transactions/import",
+            files={"file": ("extrato.csv", content, "text/csv")},
+            headers=auth_headers
+        )
+        summary = response.json()
+        assert summary["imported"] == 1
+        assert summary["duplicates"] == 2
+        assert summary["errorCount"] == 0
+
+    def test_import_unknown_column_override(self, client: TestClient, auth_headers):
+        """Test rejecting a column mapping that is not in the file header"""
+        response = client.post(
+            "/api/transactions/import?amount_column=Inexistente",
+            files={"file": ("extrato.csv", b"Data;Historico;Valor\n01/01/2024;X;1,00\n", "text/csv")},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+
+    def test_import_pdf_pages_in_process_pool(self, client: TestClient, auth_headers, test_tenant, db, monkeypatch):
+        """Test the PDF import: pages extracted in parallel and stored in page order"""
+        from models import Transaction
+        from backend.services import finance_import_service
+        from .statement_pdf import build_pdf
+
+        monkeypatch.setattr(finance_import_service, "PDF_PAGES_PER_TASK", 2)
+        monkeypatch.setattr(finance_import_service, "PDF_WORKERS", 2)
+        pages = [
+            ["Extrato de conta corrente", f"{page + 1:02d}/03/2024 Pagamento {page} -{page + 1}.000,50", f"{page + 1:02d}/03/2024 Recebimento {page} 25,00"]
+            for page in range(9)
+        ]
+        try:
+            response = client.post(
+                "/api/transactions/import",
+                files={"file": ("extrato.pdf", build_pdf(pages), "application/pdf")},
+                headers=auth_headers
+            )
+        finally:
+            finance_import_service.shutdown_pdf_pool()
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["processed"] == 18
+        assert summary["imported"] == 18
+
+        rows = db.query(Transaction).filter(Transaction.tenant_id == test_tenant.id).order_by(Transaction.id).all()
+        assert [row.description for row in rows[:4]] == ["Pagamento 0", "Recebimento 0", "Pagamento 1", "Recebimento 1"]
+        assert rows[-2].description == "Pagamento 8"
+        assert rows[-2].amount == 9000.5
+        assert rows[-2].type == "EXPENSE"
+        assert rows[-2].date.day == 9 and rows[-2].date.month == 3
+
+    def test_import_invalid_pdf(self, client: TestClient, auth_headers, monkeypatch):
+        """Test rejecting a file with .pdf extension that is not a PDF"""
+        from concurrent.futures import ThreadPoolExecutor
+        from backend.services import finance_import_service
+
+        with ThreadPoolExecutor(1) as executor:
+            monkeypatch.setattr(finance_import_service, "_pdf_pool", executor) # Sem subir processos para um arquivo inválido
+            response = client.post(
+                "/api/transactions/import",
+                files={"file": ("extrato.pdf", b"not a pdf", "application/pdf")},
+                headers=auth_headers
+            )
+        assert response.status_code == 400
+
+    def test_import_unsupported_format(self, client: TestClient, auth_headers):
+        """Test rejecting files that are not PDF, CSV or OFX"""
+        response = client.post(
+            "/api/transactions/import",
+            files={"file": ("extrato.txt", b"x", "text/plain")},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
@@ -0,0 +1,139 @@
+"""
+Test the n8n webhook outbox: persisted events, delivery, retry and batching
+"""
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import schemas
+from models import WebhookEvent
+from backend.services import webhook_outbox
+
+from .n8n_stub import N8nStub
+
+
+@pytest.fixture
+def n8n(db, test_tenant):
+    """Local stub configured as the tenant's n8n webhook"""
+    with N8nStub() as stub:
+        crud.update_company_info(db, schemas.CompanyInfoCreate(n8nWebhookUrl=stub.url), test_tenant.id)
+        yield stub
+
+
+def _dispatch(db):
+    return asyncio.run(webhook_outbox.dispatch_once(factory=sessionmaker(bind=db.get_bind())))
+
+
+def _make_due(db):
+    db.query(WebhookEvent).update({"next_attempt_at": webhook_outbox._utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+
+def test_event_is_persisted_and_delivered(client, auth_headers, db, n8n):
+    response = client.post("/api/clients", json={"name": "Outbox Client", "document": "98765432100"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["name"] == "Outbox Client"
+
+    webhook_event = db.query(WebhookEvent).one()
+    assert webhook_event.event_type == "client_created"
+    assert webhook_event.status == webhook_outbox.PENDING
+    assert n8n.received == []
+
+    assert _dispatch(db) == 1
+    assert [r["body"]["event"] for r in n8n.received] == ["client_created"]
+    assert n8n.received[0]["body"]["data"]["name"] == "Outbox Client"
+    db.expire_all()
+    assert webhook_event.status == webhook_outbox.DELIVERED
+    assert webhook_event.attempts == 1
+
+    status = client.get("/api/config/webhooks/status", headers=auth_headers).json()
+    assert status["delivered"] == 1
+    assert status["pending"] == 0
+
+
+def test_event_shares_the_request_transaction(client, auth_headers, db, n8n, monkeypatch):
+    from models import Client
+
+    def failing_publish(*args, **kwargs):
+        raise RuntimeError("falha ao gravar o evento")
+
+    # Se o evento não puder ser gravado, a alteração também não é confirmada.
+    monkeypatch.setattr(webhook_outbox, "publish", failing_publish)
+    with pytest.raises(RuntimeError):
+        client.post("/api/clients", json={"name": "Sem Evento", "document": "11122233344"}, headers=auth_headers)
+    db.rollback()
+    assert db.query(Client).filter(Client.name == "Sem Evento").count() == 0
+    assert db.query(WebhookEvent).count() == 0
+
+
+def test_failed_delivery_is_retried_with_backoff(db, test_tenant, n8n):
+    n8n.statuses = [503]
+    webhook_outbox.publish(db, test_tenant.id, n8n.url, "order_created", {"id": 1})
+
+    assert _dispatch(db) == 1
+    webhook_event = db.query(WebhookEvent).one()
+    assert webhook_event.status == webhook_outbox.PENDING
+    assert webhook_event.attempts == 1
+    assert "HTTP 503" in webhook_event.last_error
+    assert webhook_event.next_attempt_at > webhook_outbox._utcnow()
+    assert _dispatch(db) == 0 # Aguardando o backoff
+
+    _make_due(db)
+    assert _dispatch(db) == 1
+    db.expire_all()
+    assert webhook_event.status == webhook_outbox.DELIVERED
+    assert len(n8n.received) == 2
+
+    # 4xx definitivo: não repete.
+    n8n.statuses = [404]
+    webhook_outbox.publish(db, test_tenant.id, n8n.url, "order_updated", {"id": 1})
+    _dispatch(db)
+    failed = db.query(WebhookEvent).filter(WebhookEvent.event_type == "order_updated").one()
+    assert failed.status == webhook_outbox.FAILED
+
+
+def test_events_are_not_batched_by_default(db, test_tenant, n8n):
+    for count in (1, 2):
+        webhook_outbox.publish(db, test_tenant.id, n8n.url, "transactions_imported", {"count": count})
+
+    # Sem WEBHOOK_BATCH_EVENTS cada evento segue no formato normal, sem esperar a janela.
+    assert _dispatch(db) == 2
+    assert [r["body"]["data"]["count"] for r in n8n.received] == [1, 2]
+
+
+def test_burst_of_batchable_events_is_sent_together(db, test_tenant, n8n, monkeypatch):
+    monkeypatch.setattr(webhook_outbox, "BATCH_EVENTS", frozenset({"transactions_imported"}))
+    for count in (1, 2, 3):
+        webhook_outbox.publish(db, test_tenant.id, n8n.url, "transactions_imported", {"count": count})
+    webhook_outbox.publish(db, test_tenant.id, n8n.url, "client_created", {"id": 7})
+
+    # Eventos agrupáveis aguardam a janela da rajada.
+    assert _dispatch(db) == 1
+    assert [r["body"]["event"] for r in n8n.received] == ["client_created"]
+
+    _make_due(db)
+    assert _dispatch(db) == 3
+    batch = n8n.received[-1]["body"]
+    assert batch["event"] == "transactions_imported"
+    assert batch["batch"] is True
+    assert [e["data"]["count"] for e in batch["events"]] == [1, 2, 3]
+    assert db.query(WebhookEvent).filter(WebhookEvent.status == webhook_outbox.DELIVERED).count() == 4
+
+
+def test_dispatch_runs_database_work_off_the_event_loop(db, test_tenant, n8n, monkeypatch):
+    import threading
+    threads = {}
+    for name in ("claim_due", "record_outcomes"):
+        original = getattr(webhook_outbox, name)
+        def traced(*args, _name=name, _original=original):
+            threads[_name] = threading.get_ident()
+            return _original(*args)
+        monkeypatch.setattr(webhook_outbox, name, traced)
+
+    webhook_outbox.publish(db, test_tenant.id, n8n.url, "client_created", {"id": 1})
+    assert _dispatch(db) == 1
+    assert set(threads) == {"claim_due", "record_outcomes"}
+    assert threading.get_ident() not in threads.values()
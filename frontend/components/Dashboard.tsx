@@ -1,5 +1,5 @@
 import React, { useMemo, useState, useEffect } from 'react';
-import { ServiceOrder, OSStatus, Part, Transaction } from '../types';
+import { ServiceOrder, OSStatus, DashboardSummary } from '../types';
 import { ApiService } from '../services/api';
 import { BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer, Cell } from 'recharts';
 import { Wallet, AlertCircle, Wrench, Package, ArrowUpRight } from 'lucide-react';
@@ -11,8 +11,7 @@ interface DashboardProps {
 
 export const Dashboard: React.FC<DashboardProps> = ({ setView }) => {
   const [orders, setOrders] = useState<ServiceOrder[]>([]);
-  const [inventory, setInventory] = useState<Part[]>([]);
-  const [transactions, setTransactions] = useState<Transaction[]>([]);
+  const [summary, setSummary] = useState<DashboardSummary | null>(null);
   const [loading, setLoading] = useState(true);
   const { preferences } = useTheme();
 
@@ -23,14 +22,13 @@ export const Dashboard: React.FC<DashboardProps> = ({ setView }) => {
   const loadData = async () => {
     try {
       setLoading(true);
-      const [ordersData, partsData, transactionsData] = await Promise.all([
-        ApiService.getOrders(),
-        ApiService.getParts(),
-        ApiService.getTransactions()
+      // Indicadores agregados no servidor; só as OS recentes vêm como lista.
+      const [summaryData, recentOrders] = await Promise.all([
+        ApiService.getDashboardSummary(),
+        ApiService.getRecentOrders(10)
       ]);
-      setOrders(ordersData);
-      setInventory(partsData);
-      setTransactions(transactionsData);
+      setSummary(summaryData);
+      setOrders(recentOrders);
     } catch (error) {
       console.error("Erro ao carregar dados do dashboard:", error);
     } finally {
@@ -40,22 +38,21 @@ export const Dashboard: React.FC<DashboardProps> = ({ setView }) => {
 
   const kpi = useMemo(() => {
     // Para bater com o Financeiro, usamos as transações de entrada (INCOME)
-    const totalRevenue = transactions
-      .filter(t => t.type === 'INCOME')
-      .reduce((acc, curr) => acc + curr.amount, 0);
-
-    const pendingOrders = orders.filter(o => o.status === OSStatus.PENDING).length;
-    const activeOrders = orders.filter(o => o.status === OSStatus.IN_PROGRESS).length;
-    const lowStock = inventory.filter(p => p.quantity <= p.minStock).length;
-
-    return { totalRevenue, pendingOrders, activeOrders, lowStock };
-  }, [orders, inventory, transactions]);
+    const byStatus = summary?.ordersByStatus || {};
+    return {
+      totalRevenue: summary?.totalRevenue || 0,
+      pendingOrders: byStatus[OSStatus.PENDING] || 0,
+      activeOrders: byStatus[OSStatus.IN_PROGRESS] || 0,
+      lowStock: summary?.lowStockCount || 0,
+    };
+  }, [summary]);
 
+  const byStatus = summary?.ordersByStatus || {};
   const chartData = [
-    { name: 'Pendente', value: orders.filter(o => o.status === OSStatus.PENDING).length, color: '#f59e0b' },
-    { name: 'Orçamento', value: orders.filter(o => o.status === OSStatus.QUOTATION).length, color: '#3b82f6' },
-    { name: 'Execução', value: orders.filter(o => o.status === OSStatus.IN_PROGRESS).length, color: '#6366f1' },
-    { name: 'Concluído', value: orders.filter(o => o.status === OSStatus.COMPLETED).length, color: '#10b981' },
+    { name: 'Pendente', value: byStatus[OSStatus.PENDING] || 0, color: '#f59e0b' },
+    { name: 'Orçamento', value: byStatus[OSStatus.QUOTATION] || 0, color: '#3b82f6' },
+    { name: 'Execução', value: byStatus[OSStatus.IN_PROGRESS] || 0, color: '#6366f1' },
+    { name: 'Concluído', value: byStatus[OSStatus.COMPLETED] || 0, color: '#10b981' },
   ];
 
   const SkeletonKPI = () => (
@@ -117,7 +114,7 @@ export const Dashboard: React.FC<DashboardProps> = ({ setView }) => {
       </div>
 
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-8">
-        {loading && orders.length === 0 ? (
+        {loading && !summary ? (
           <>
             <SkeletonKPI />
             <SkeletonKPI />
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useMemo } from 'react';
-import { Transaction, TransactionCreate } from '../types';
+import { Transaction, TransactionCreate, TransactionTotals } from '../types';
 import { ApiService } from '../services/api';
 import {
   DollarSign, TrendingUp, TrendingDown, Plus,
@@ -11,6 +11,8 @@ import { useTheme } from '../context/ThemeContext';
 
 export const FinanceView: React.FC = () => {
   const [transactions, setTransactions] = useState<Transaction[]>([]);
+  const [totals, setTotals] = useState<TransactionTotals | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | undefined>();
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [isModalOpen, setIsModalOpen] = useState(false);
@@ -28,8 +30,13 @@ export const FinanceView: React.FC = () => {
   const loadTransactions = async () => {
     setLoading(true);
     try {
-      const data = await ApiService.getTransactions();
-      setTransactions(data);
+      const [page, periodTotals] = await Promise.all([
+        ApiService.getTransactionsPage(),
+        ApiService.getTransactionTotals()
+      ]);
+      setTransactions(page.items);
+      setNextCursor(page.nextCursor);
+      setTotals(periodTotals);
     } catch (error) {
       console.error("Erro ao carregar transações:", error);
     } finally {
@@ -37,21 +44,27 @@ export const FinanceView: React.FC = () => {
     }
   };
 
-  const kpi = useMemo(() => {
-    const income = transactions
-      .filter(t => t.type === 'INCOME')
-      .reduce((acc, curr) => acc + curr.amount, 0);
-
-    const expense = transactions
-      .filter(t => t.type === 'EXPENSE')
-      .reduce((acc, curr) => acc + curr.amount, 0);
-
-    const pending = transactions
-      .filter(t => t.status === 'PENDING')
-      .reduce((acc, curr) => acc + curr.amount, 0);
+  const loadMoreTransactions = async () => {
+    if (!nextCursor) return;
+    setLoading(true);
+    try {
+      const page = await ApiService.getTransactionsPage({}, 100, nextCursor);
+      setTransactions(prev => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error("Erro ao carregar transações:", error);
+    } finally {
+      setLoading(false);
+    }
+  };
 
-    return { income, expense, balance: income - expense, pending };
-  }, [transactions]);
+  // Totais de todo o extrato, calculados no servidor (a lista é carregada por páginas).
+  const kpi = useMemo(() => ({
+    income: totals?.income ?? 0,
+    expense: totals?.expense ?? 0,
+    balance: totals?.balance ?? 0,
+    pending: totals?.pending ?? 0
+  }), [totals]);
 
   const handleSave = async () => {
     if (!newTransaction.description || !newTransaction.amount || !newTransaction.date) {
@@ -119,8 +132,11 @@ export const FinanceView: React.FC = () => {
 
     setLoading(true);
     try {
-      const imported = await ApiService.importTransactions(file);
-      alert(`${imported.length} transações importadas com sucesso!`);
+      const result = await ApiService.importTransactions(file);
+      let message = `${result.imported} transações importadas com sucesso!`;
+      if (result.duplicates) message += `\n${result.duplicates} já importadas anteriormente foram ignoradas.`;
+      if (result.errorCount) message += `\n${result.errorCount} linhas não puderam ser lidas.`;
+      alert(message);
       loadTransactions();
     } catch (error: any) {
       console.error("Erro na importação:", error);
@@ -319,6 +335,17 @@ export const FinanceView: React.FC = () => {
             ))}
           </tbody>
         </table>
+        {nextCursor && (
+          <div className="p-4 border-t border-slate-100 dark:border-slate-700 text-center">
+            <button
+              onClick={loadMoreTransactions}
+              disabled={loading}
+              className="text-sm font-medium text-primary hover:underline disabled:opacity-50"
+            >
+              Carregar mais lançamentos
+            </button>
+          </div>
+        )}
       </div>
 
       {isModalOpen && (
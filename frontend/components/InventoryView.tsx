@@ -216,16 +216,16 @@ export const InventoryView: React.FC = () => {
         }
 
         try {
-            for (const item of itemsToProcess) {
-                if (item.partId) {
-                    await ApiService.createMovement({
-                        partId: Number(item.partId),
-                        type: 'IN_INVOICE',
-                        quantity: item.quantity,
-                        description: `Entrada NF ${invoiceForm.number} - ${invoiceForm.supplier}`
-                    });
-                }
-            }
+            // A nota (número e fornecedor) é gravada junto com as entradas: o
+            // planejamento de reposição agrupa as compras pelo fornecedor dela.
+            await ApiService.createInvoiceEntry({
+                number: invoiceForm.number,
+                supplier: invoiceForm.supplier,
+                date: invoiceForm.date || undefined,
+                totalValue: invoiceForm.totalValue,
+                xmlKey: invoiceForm.xmlKey,
+                items: itemsToProcess.map(item => ({ partId: Number(item.partId), quantity: item.quantity }))
+            });
             alert("Entrada de estoque processada com sucesso!");
             setInvoiceForm({ items: [] });
             await loadData();
@@ -497,14 +497,19 @@ export const InventoryView: React.FC = () => {
                 minStock: updatedPart.minStock,
                 location: updatedPart.location,
                 manufacturer: updatedPart.manufacturer
-            });
+            }, editingPart.version);
             await loadData();
             setIsEditModalOpen(false);
             setEditingPart(null);
             alert("Peça atualizada com sucesso!");
-        } catch (error) {
+        } catch (error: any) {
             console.error("Erro ao editar peça:", error);
-            alert("Erro ao salvar alterações.");
+            if (error?.response?.status === 412) {
+                alert("A peça foi alterada por outro usuário (ex: uma venda). Recarregue e edite novamente.");
+                await loadData();
+            } else {
+                alert("Erro ao salvar alterações.");
+            }
         }
     };
 
@@ -554,29 +559,25 @@ export const InventoryView: React.FC = () => {
 
         try {
             const partIds = partsToUpdate.map(p => p.id);
-            const response = await ApiService.batchSyncMercuryPrices(partIds);
-
-            if (response.status === 'success') {
-                const results = response.results;
-                let successCount = 0;
-                let errorCount = 0;
-
-                const finalStatus: Record<number, 'loading' | 'success' | 'error' | 'idle'> = {};
-
-                results.forEach((res: any) => {
-                    if (res.status === 'updated') {
-                        finalStatus[res.id] = 'success';
-                        successCount++;
-                    } else {
-                        finalStatus[res.id] = 'error';
-                        errorCount++;
-                    }
-                });
+            const job = await ApiService.batchSyncMercuryPrices(partIds);
+            let successCount = 0;
+            let errorCount = 0;
+
+            const finalStatus: Record<number, 'loading' | 'success' | 'error' | 'idle'> = {};
+
+            job.results.forEach(res => {
+                if (res.status === 'updated') {
+                    finalStatus[res.id] = 'success';
+                    successCount++;
+                } else {
+                    finalStatus[res.id] = 'error';
+                    errorCount++;
+                }
+            });
 
-                setUpdateStatus(prev => ({ ...prev, ...finalStatus }));
-                await loadData(); // Recarrega para mostrar novos preços
-                alert(`Atualização concluída!\n\n✅ ${successCount} peças atualizadas\n⚠️ ${errorCount} não encontradas ou com erro`);
-            }
+            setUpdateStatus(prev => ({ ...prev, ...finalStatus }));
+            await loadData(); // Recarrega para mostrar novos preços
+            alert(`Atualização concluída!\n\n✅ ${successCount} peças atualizadas\n⚠️ ${errorCount} não encontradas ou com erro`);
         } catch (error) {
             console.error("Erro na atualização em lote:", error);
             setUpdateStatus({});
@@ -71,6 +71,9 @@ export const OrdersView: React.FC<OrdersViewProps> = ({ role, onNavigate }) => {
     const [marinas, setMarinas] = useState<Marina[]>([]);
     const [users, setUsers] = useState<UserType[]>([]);  // ← Usuários técnicos
     const [selectedOrder, setSelectedOrder] = useState<ServiceOrder | null>(null);
+    const [nextOrdersCursor, setNextOrdersCursor] = useState<string | undefined>();
+    const [loadingOrderId, setLoadingOrderId] = useState<number | null>(null);
+    const openingOrderRef = useRef<number | null>(null);
     const [isCreating, setIsCreating] = useState(false);
     const [isItemSearchOpen, setIsItemSearchOpen] = useState(false); // New State for Modal
 
@@ -138,20 +141,15 @@ export const OrdersView: React.FC<OrdersViewProps> = ({ role, onNavigate }) => {
     const refreshData = async () => {
         try {
             const [ordersData, boatsData, partsData, clientsData, usersData] = await Promise.all([
-                ApiService.getOrders(),
+                ApiService.getOrdersPage(),
                 ApiService.getBoats(),
                 ApiService.getParts(),
                 ApiService.getClients(),
                 ApiService.getUsers()
             ]);
 
-            // Normalizar checklist - garantir array vazio se undefined
-            const normalizedOrders = ordersData.map(order => ({
-                ...order,
-                checklist: order.checklist || []
-            }));
-
-            setOrders(normalizedOrders);
+            setOrders(ordersData.items);
+            setNextOrdersCursor(ordersData.nextCursor);
             setBoats(boatsData);
             setParts(partsData);
             setClients(clientsData);
@@ -171,6 +169,36 @@ export const OrdersView: React.FC<OrdersViewProps> = ({ role, onNavigate }) => {
         }
     };
 
+    const loadMoreOrders = async () => {
+        if (!nextOrdersCursor) return;
+        try {
+            const page = await ApiService.getOrdersPage(undefined, 50, nextOrdersCursor);
+            setOrders(prev => [...prev, ...page.items]);
+            setNextOrdersCursor(page.nextCursor);
+        } catch (error) {
+            console.error("Erro ao carregar ordens:", error);
+        }
+    };
+
+    // A listagem traz a projeção resumida (sem itens, notas e checklist): a OS só é
+    // aberta, e portanto editada, depois de carregada por completo.
+    const openOrder = async (id: number) => {
+        openingOrderRef.current = id;
+        setLoadingOrderId(id);
+        try {
+            const full = await ApiService.getOrder(id);
+            if (openingOrderRef.current === id) {
+                setSelectedOrder(full);
+                setActiveTab('details');
+            }
+        } catch (error) {
+            console.error("Erro ao carregar ordem:", error);
+            alert("Falha ao carregar a ordem de serviço.");
+        } finally {
+            if (openingOrderRef.current === id) setLoadingOrderId(null);
+        }
+    };
+
     const isClient = role === UserRole.CLIENT;
 
     if (isClient) {
@@ -316,7 +344,8 @@ export const OrdersView: React.FC<OrdersViewProps> = ({ role, onNavigate }) => {
                 technicianName: updatedOrder.technicianName,
                 diagnosis: updatedOrder.diagnosis,
                 status: updatedOrder.status,
-                checklist: updatedOrder.checklist // Agora suportado pelo Backend
+                // Sem checklist carregado, o campo é omitido para não apagar o salvo no servidor
+                ...(updatedOrder.checklist !== undefined && { checklist: updatedOrder.checklist })
             });
         } catch (error) {
             console.error("Falha ao atualizar ordem:", error);
@@ -398,10 +427,7 @@ export const OrdersView: React.FC<OrdersViewProps> = ({ role, onNavigate }) => {
             });
             await refreshData();
             setIsCreating(false);
-            // Optionally auto-select:
-            const freshOrders = await ApiService.getOrders();
-            const created = freshOrders.find((o: ServiceOrder) => o.id.toString() === newOrder.id.toString()); // flexible compare
-            if (created) setSelectedOrder(created);
+            await openOrder(newOrder.id);
 
         } catch (error) {
             console.error("Erro ao criar OS:", error);
@@ -1051,12 +1077,12 @@ export const OrdersView: React.FC<OrdersViewProps> = ({ role, onNavigate }) => {
                     <div className="flex-1 overflow-y-auto p-6 space-y-4 pb-24 lg:pb-6 scrollbar-thin">
                         {filteredOrders.map(order => {
                             const boat = boats.find(b => b.id === order.boatId);
-                            const isActive = selectedOrder?.id === order.id;
+                            const isActive = selectedOrder?.id === order.id || loadingOrderId === order.id;
                             return (
                                 <div
                                     key={order.id}
-                                    onClick={() => { setSelectedOrder(order); setActiveTab('details'); }}
-                                    className={`p-5 rounded-3xl border-2 cursor-pointer transition-all relative overflow-hidden group ${isActive
+                                    onClick={() => openOrder(order.id)}
+                                    className={`p-5 rounded-3xl border-2 cursor-pointer transition-all relative overflow-hidden group ${loadingOrderId === order.id ? 'opacity-60 ' : ''}${isActive
                                         ? 'bg-white dark:bg-slate-800 border-primary shadow-xl shadow-primary/10'
                                         : 'bg-white dark:bg-slate-800 border-transparent hover:border-slate-200 dark:hover:border-slate-700 shadow-sm'
                                         }`}
@@ -1080,6 +1106,14 @@ export const OrdersView: React.FC<OrdersViewProps> = ({ role, onNavigate }) => {
                                 <p className="text-[10px] font-black uppercase tracking-widest text-slate-400">Nenhum resultado</p>
                             </div>
                         )}
+                        {nextOrdersCursor && (
+                            <button
+                                onClick={loadMoreOrders}
+                                className="w-full py-3 text-[10px] font-black uppercase tracking-widest text-primary hover:underline"
+                            >
+                                Carregar mais ordens
+                            </button>
+                        )}
                     </div>
                 </div>
 
@@ -1,12 +1,14 @@
 import axios from 'axios';
 import {
     User, ServiceOrder, Part, StockMovement, Client, Boat, Marina,
-    ServiceOrderCreate, ServiceItemCreate, OrderNoteCreate, ServiceOrderUpdate,
-    PartCreate, PartUpdate, StockMovementCreate,
-    TransactionCreate, Transaction,
+    ServiceOrderCreate, ServiceItemCreate, OrderNoteCreate, ServiceOrderUpdate, ServiceOrderPage,
+    PartCreate, PartUpdate, StockMovementCreate, InvoiceEntryCreate, Invoice,
+    TransactionCreate, Transaction, TransactionImportResult, DashboardSummary,
+    TransactionFilters, TransactionPage, TransactionTotals,
     Manufacturer, Model, CompanyInfo,
     BoatCreate, BoatUpdate, TenantSignup, ClientCreate, ClientUpdate,
-    ApiMaintenanceKit, ApiMaintenanceKitCreate, MarinaCreate, FiscalInvoice
+    ApiMaintenanceKit, ApiMaintenanceKitCreate, MarinaCreate, FiscalInvoice,
+    BackgroundJob, BackgroundJobResult, MercuryPriceSyncResult
 } from '../types';
 
 /**
@@ -40,6 +42,9 @@ api.interceptors.request.use((config) => {
     return config; // Retorna a configuração da requisição modificada.
 });
 
+// Intervalo entre as consultas de progresso de tarefas em segundo plano.
+const JOB_POLL_INTERVAL_MS = 2000;
+
 // Objeto que contém todos os métodos para interagir com a API do backend.
 export const ApiService = {
     // --- AUTH (Autenticação) ---
@@ -108,16 +113,40 @@ export const ApiService = {
 
     // --- ORDERS (Ordens de Serviço) ---
     /**
-     * Obtém uma lista de ordens de serviço.
+     * Obtém todas as ordens de serviço (projeção resumida, com itens e notas).
+     * O checklist só vem em getOrder; listagens longas devem usar getOrdersPage.
      * @param status Opcional: filtra as ordens por status.
      * @returns Uma lista de ordens de serviço.
      */
     getOrders: async (status?: string) => {
-        const params = status ? { status } : {};
+        const params = status ? { status, include: 'items,notes' } : { include: 'items,notes' };
         const response = await api.get<ServiceOrder[]>('/orders', { params });
         return response.data;
     },
 
+    /**
+     * Obtém uma página da listagem de ordens de serviço (projeção resumida, sem itens,
+     * notas e checklist), das mais recentes para as mais antigas.
+     * @param status Opcional: filtra as ordens por status.
+     * @param limit Tamanho da página.
+     * @param cursor Cursor da página anterior (nextCursor).
+     * @returns As ordens e o cursor da próxima página.
+     */
+    getOrdersPage: async (status?: string, limit = 50, cursor?: string): Promise<ServiceOrderPage> => {
+        const response = await api.get<ServiceOrder[]>('/orders', { params: { status, limit, cursor } });
+        return { items: response.data, nextCursor: response.headers['x-next-cursor'] || undefined };
+    },
+
+    /**
+     * Obtém as ordens de serviço mais recentes (projeção resumida, sem itens e notas).
+     * @param limit Quantidade de ordens.
+     * @returns As ordens mais recentes.
+     */
+    getRecentOrders: async (limit: number) => {
+        const response = await api.get<ServiceOrder[]>('/orders', { params: { limit } });
+        return response.data;
+    },
+
     /**
      * Obtém uma ordem de serviço específica pelo ID.
      * @param id O ID da ordem de serviço.
@@ -142,10 +171,12 @@ export const ApiService = {
      * Atualiza uma ordem de serviço existente.
      * @param id O ID da ordem de serviço a ser atualizada.
      * @param order Os dados de atualização da ordem de serviço.
+     * @param version Versão lida da OS (If-Match): se ela mudou desde então, a API responde 412.
      * @returns A ordem de serviço atualizada.
      */
-    updateOrder: async (id: number, order: ServiceOrderUpdate) => {
-        const response = await api.put<ServiceOrder>(`/orders/${id}`, order);
+    updateOrder: async (id: number, order: ServiceOrderUpdate, version?: number) => {
+        const headers = version !== undefined ? { 'If-Match': `"${version}"` } : undefined;
+        const response = await api.put<ServiceOrder>(`/orders/${id}`, order, { headers });
         return response.data;
     },
 
@@ -234,10 +265,12 @@ export const ApiService = {
      * Atualiza uma peça existente.
      * @param id O ID da peça a ser atualizada.
      * @param part Os dados de atualização da peça.
+     * @param version Versão lida da peça (If-Match): se ela mudou desde então, a API responde 412.
      * @returns A peça atualizada.
      */
-    updatePart: async (id: number, part: PartUpdate) => {
-        const response = await api.put<Part>(`/inventory/parts/${id}`, part);
+    updatePart: async (id: number, part: PartUpdate, version?: number) => {
+        const headers = version !== undefined ? { 'If-Match': `"${version}"` } : undefined;
+        const response = await api.put<Part>(`/inventory/parts/${id}`, part, { headers });
         return response.data;
     },
 
@@ -270,6 +303,17 @@ export const ApiService = {
         return response.data;
     },
 
+    /**
+     * Dá entrada no estoque por nota fiscal: grava a nota (número e fornecedor)
+     * e os movimentos de entrada dos itens em uma única transação.
+     * @param entry A nota e os itens vinculados às peças.
+     * @returns A nota registrada.
+     */
+    createInvoiceEntry: async (entry: InvoiceEntryCreate) => {
+        const response = await api.post<Invoice>('/inventory/invoices', entry);
+        return response.data;
+    },
+
     /**
      * Processa uma Venda Direta (PDV).
      */
@@ -422,18 +466,90 @@ export const ApiService = {
         return response.data;
     },
 
-    batchSyncMercuryPrices: async (partIds: number[]) => {
-        const response = await api.post(`/mercury/batch-sync-prices`, partIds);
+    /**
+     * Agenda a sincronização de preços de várias peças com o portal Mercury
+     * (tarefa em segundo plano) e aguarda a conclusão consultando o progresso.
+     * @param partIds Os IDs das peças.
+     * @param onProgress Chamado a cada consulta com o progresso da tarefa.
+     * @returns A tarefa concluída, com o resultado por peça.
+     */
+    batchSyncMercuryPrices: async (partIds: number[], onProgress?: (job: BackgroundJob) => void): Promise<BackgroundJobResult<MercuryPriceSyncResult>> => {
+        const response = await api.post<{ job_id: number }>(`/mercury/batch-sync-prices`, partIds);
+        const jobId = response.data.job_id;
+        while (true) {
+            const job = await ApiService.getJob(jobId);
+            onProgress?.(job);
+            if (job.status === 'FAILED') {
+                throw new Error(job.error || 'Falha na sincronização de preços');
+            }
+            if (job.status === 'COMPLETED') {
+                return ApiService.getJobResult<MercuryPriceSyncResult>(jobId);
+            }
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        }
+    },
+
+    // --- JOBS (Tarefas em segundo plano) ---
+    /**
+     * Obtém o status e o progresso de uma tarefa em segundo plano.
+     * @param jobId O ID da tarefa.
+     * @returns A tarefa (sem o resultado por item).
+     */
+    getJob: async (jobId: number) => {
+        const response = await api.get<BackgroundJob>(`/jobs/${jobId}`);
+        return response.data;
+    },
+
+    /**
+     * Obtém a tarefa com o resultado por item (parcial enquanto estiver em execução).
+     * @param jobId O ID da tarefa.
+     * @returns A tarefa com o resultado.
+     */
+    getJobResult: async <T = any>(jobId: number) => {
+        const response = await api.get<BackgroundJobResult<T>>(`/jobs/${jobId}/result`);
+        return response.data;
+    },
+
+    // --- DASHBOARD ---
+    /**
+     * Obtém os indicadores do dashboard, calculados no servidor.
+     * @param months Meses no gráfico de faturamento (padrão: 12).
+     * @returns Os indicadores consolidados.
+     */
+    getDashboardSummary: async (months?: number) => {
+        const response = await api.get<DashboardSummary>('/dashboard/summary', { params: months ? { months } : {} });
         return response.data;
     },
 
     // --- TRANSACTIONS (Transações Financeiras) ---
     /**
-     * Obtém uma lista de todas as transações financeiras.
-     * @returns Uma lista de transações.
+     * Obtém uma página do extrato de transações, das mais recentes para as mais antigas.
+     * @param filters Filtros de período, tipo, status e categoria.
+     * @param limit Tamanho da página.
+     * @param cursor Cursor da página anterior (nextCursor).
+     * @returns As transações (com o saldo acumulado) e o cursor da próxima página.
+     */
+    getTransactionsPage: async (filters: TransactionFilters = {}, limit = 100, cursor?: string): Promise<TransactionPage> => {
+        const params = {
+            date_from: filters.dateFrom, date_to: filters.dateTo, type: filters.type,
+            status: filters.status, category: filters.category,
+            with_balance: true, limit, cursor
+        };
+        const response = await api.get<Transaction[]>('/transactions', { params });
+        return { items: response.data, nextCursor: response.headers['x-next-cursor'] || undefined };
+    },
+
+    /**
+     * Obtém os totais do período (receitas, despesas, pendentes e saldos), calculados no servidor.
+     * @param filters Os mesmos filtros da listagem.
+     * @returns Os totais do período.
      */
-    getTransactions: async () => {
-        const response = await api.get<Transaction[]>('/transactions');
+    getTransactionTotals: async (filters: TransactionFilters = {}) => {
+        const params = {
+            date_from: filters.dateFrom, date_to: filters.dateTo, type: filters.type,
+            status: filters.status, category: filters.category
+        };
+        const response = await api.get<TransactionTotals>('/transactions/totals', { params });
         return response.data;
     },
 
@@ -450,12 +566,12 @@ export const ApiService = {
     /**
      * Importa transações de um arquivo (PDF, CSV, OFX).
      * @param file O arquivo a ser importado.
-     * @returns Uma lista das transações importadas.
+     * @returns O resumo da importação (gravadas, duplicadas e linhas rejeitadas).
      */
     importTransactions: async (file: File) => {
         const formData = new FormData();
         formData.append('file', file);
-        const response = await api.post<Transaction[]>('/transactions/import', formData, {
+        const response = await api.post<TransactionImportResult>('/transactions/import', formData, {
             headers: {
                 'Content-Type': 'multipart/form-data'
             }
@@ -161,6 +161,7 @@ export interface Part {
   subgroup?: string;
   compatibility?: string[];
   lastPriceUpdatedAt?: string;
+  version?: number; // Versão da linha (ETag), enviada em If-Match ao editar.
 }
 
 export interface PartCreate {
@@ -291,12 +292,13 @@ export interface ServiceOrder {
   items: ServiceItem[];
   totalValue: number;
   createdAt: string;
+  version?: number; // Versão da linha (ETag), enviada em If-Match ao editar.
   requester?: string;
   technicianName?: string;
   notes: OrderNote[];
   scheduledAt?: string;
   estimatedDuration?: number;
-  checklist?: ChecklistItem[];
+  checklist?: ChecklistItem[]; // Ausente na listagem: só vem completo em getOrder
   timeLogs?: { start: string; end?: string; }[];
   boatStatus?: string;
   engineStatus?: string;
@@ -304,6 +306,11 @@ export interface ServiceOrder {
   attachments?: { type: string; url: string; description: string; createdAt: string; }[];
 }
 
+export interface ServiceOrderPage {
+  items: ServiceOrder[]; // Projeção resumida: sem itens, notas e checklist
+  nextCursor?: string; // Ausente na última página
+}
+
 export interface ServiceOrderCreate {
   boatId: number;
   engineId?: number;
@@ -343,6 +350,15 @@ export interface Invoice {
   xmlKey?: string;
 }
 
+export interface InvoiceEntryCreate {
+  number: string;
+  supplier: string;
+  date?: string;
+  totalValue?: number;
+  xmlKey?: string;
+  items: { partId: number; quantity: number; }[]; // Apenas itens vinculados a peças
+}
+
 export interface Transaction {
   id: number;
   type: 'INCOME' | 'EXPENSE';
@@ -353,6 +369,39 @@ export interface Transaction {
   status: string;
   orderId?: number;
   documentNumber?: string;
+  runningBalance?: number; // Saldo acumulado após a transação (com withBalance)
+}
+
+export interface TransactionFilters {
+  dateFrom?: string;
+  dateTo?: string;
+  type?: 'INCOME' | 'EXPENSE';
+  status?: string;
+  category?: string;
+}
+
+export interface TransactionPage {
+  items: Transaction[];
+  nextCursor?: string; // Ausente na última página
+}
+
+export interface TransactionTotals {
+  income: number;
+  expense: number;
+  balance: number;
+  pending: number;
+  count: number;
+  openingBalance: number;
+  closingBalance: number;
+}
+
+export interface TransactionImportResult {
+  processed: number;
+  imported: number;
+  duplicates: number; // Lançamentos já importados anteriormente
+  errorCount: number;
+  errors: { row: number; error: string }[];
+  totalAmount: number;
 }
 
 export interface TransactionCreate {
@@ -366,6 +415,24 @@ export interface TransactionCreate {
   documentNumber?: string;
 }
 
+// --- DASHBOARD ---
+
+export interface DashboardMonth {
+  month: string; // AAAA-MM
+  income: number;
+  expense: number;
+  ordersCompleted: number;
+}
+
+export interface DashboardSummary {
+  totalRevenue: number;
+  totalExpense: number;
+  revenueByMonth: DashboardMonth[];
+  ordersByStatus: Record<string, number>;
+  openOrders: number;
+  lowStockCount: number;
+}
+
 // --- FISCAL (NF-e / NFS-e) ---
 
 export enum FiscalDocType {
@@ -455,6 +522,30 @@ export interface MercuryWarrantyData {
   nome_cli: string;
 }
 
+export interface MercuryPriceSyncResult {
+  id: number; // ID da peça
+  sku?: string;
+  status: 'updated' | 'not_found' | 'not_found_in_table' | 'parse_error' | 'error' | 'part_not_found';
+  price?: number;
+}
+
+export interface BackgroundJob {
+  id: number;
+  kind: string;
+  status: 'PENDING' | 'RUNNING' | 'COMPLETED' | 'FAILED';
+  total: number;
+  processed: number;
+  error?: string;
+  createdBy?: string;
+  createdAt?: string;
+  startedAt?: string;
+  finishedAt?: string;
+}
+
+export interface BackgroundJobResult<T = any> extends BackgroundJob {
+  results: T[];
+}
+
 export interface ApiMaintenanceKitItem {
   id: number;
   kitId: number;